@@ -31,6 +31,9 @@ __all__ = [
     "init",
     "log",
     "register_callbacks",
+    "register_collectors",
+    "SystemCollector",
+    "SystemMetric",
     "finish",
     "Audio",
     "Image",
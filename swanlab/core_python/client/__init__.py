@@ -5,19 +5,24 @@
 @description: swanlab 客户端，负责发送 http 请求
 """
 
+import calendar
 import json
-from datetime import datetime
+import threading
+import time
+from datetime import datetime, timezone
 from typing import Optional, Tuple, Dict, Union, List, AnyStr
 
 import requests
-from requests.adapters import HTTPAdapter
+from requests.adapters import HTTPAdapter, DEFAULT_POOLSIZE
 from urllib3.util.retry import Retry
 
 from swanlab.error import NetworkError, ApiError
 from swanlab.log import swanlog
 from swanlab.package import get_package_version
-from swanlab.toolkit import MediaBuffer
-from .cos import CosClient
+from swanlab.swanlab_settings import get_settings
+from swanlab.toolkit.telemetry import telemetry
+from .cos import CosClient, MediaFile, UploadBuffer
+from .encoding import encode_json, negotiate
 from .model import ProjectInfo, ExperimentInfo
 from .. import auth
 
@@ -42,7 +47,15 @@ class Client:
 
     REFRESH_TIME = 60 * 60 * 24 * 7  # 7天
     """
-    刷新时间，单位秒，如果sid过期时间减去当前时间小于这个时间，就刷新sid
+    刷新时间，单位秒，如果sid过期时间减去当前时间小于这个时间，就在后台刷新sid，不阻塞当前请求
+    """
+    EXPIRED_MARGIN = 60
+    """
+    sid 距离过期不足此时间（单位秒）时，在请求前同步刷新
+    """
+    REFRESH_RETRY = 60
+    """
+    后台刷新 sid 失败后，至少间隔此时间（单位秒）再重新尝试
     """
 
     def __init__(self, login_info: auth.LoginInfo):
@@ -61,6 +74,22 @@ class Client:
         # 当前项目所属的username
         self.__groupname = login_info.username
         self.__version = get_package_version()
+        # 请求体压缩方式与阈值，服务端不支持时会降级
+        settings = get_settings()
+        self.__encoding: Optional[str] = None if settings.upload_compression == "none" else settings.upload_compression
+        self.__compression_threshold = settings.upload_compression_threshold
+        # 请求的连接超时与读取超时，避免半开的连接使上传线程永远阻塞
+        self.__timeout = (settings.http_connect_timeout, settings.http_read_timeout)
+        # 连接池需要容纳所有上传通道（每个通道最多同时发起 upload_concurrency 个请求）的并发请求，
+        # 否则多出的连接在使用后被丢弃，每次都需要重新建立。上传模块依赖客户端，在这里导入避免循环导入
+        from ..uploader.thread.lane import default_lanes
+
+        self.__pool_size = max(DEFAULT_POOLSIZE, settings.upload_concurrency * len(default_lanes()))
+        # sid 的过期时间戳，只在登录与刷新时解析一次
+        self.__expired_at = self.__parse_expired_at(login_info.expired_at)
+        self.__refresh_lock = threading.Lock()
+        self.__refresher: Optional[threading.Thread] = None
+        self.__next_refresh = 0.0
         # 创建会话
         self.__create_session()
         # 标识当前实验会话（flagId）是否被其他进程顶掉
@@ -130,9 +159,16 @@ class Client:
     @property
     def sid_expired_at(self):
         """
-        获取sid的过期时间，字符串格式转时间
+        获取sid的过期时间（UTC，带时区信息）
+        """
+        return datetime.fromtimestamp(self.__expired_at, tz=timezone.utc)
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        """
+        请求的连接超时与读取超时，单位秒
         """
-        return datetime.strptime(self.__login_info.expired_at, "%Y-%m-%dT%H:%M:%S.%fZ")
+        return self.__timeout
 
     @property
     def web_proj_url(self):
@@ -148,17 +184,57 @@ class Client:
         """
         请求前的钩子
         """
-        # FIXME datetime.utcnow() -> datetime.now(datetime.UTC)
-        if (self.sid_expired_at - datetime.utcnow()).total_seconds() <= self.REFRESH_TIME:
-            # 刷新sid，新建一个会话
-            swanlog.debug("Refresh sid...")
-            self.__login_info = auth.login_by_key(self.__login_info.api_key, save=False)
-            self.__session.headers["cookie"] = f"sid={self.__login_info.sid}"
+        left = self.__expired_at - time.time()
+        if left <= self.EXPIRED_MARGIN:
+            # sid 即将过期，必须刷新后再请求
+            self.__refresh_sid()
+        elif left <= self.REFRESH_TIME:
+            self.__refresh_sid_in_background()
 
         # 携带实验会话Id
         if self.__exp is not None:
             self.__session.headers["flagId"] = self.__exp.flag_id
 
+    @staticmethod
+    def __parse_expired_at(expired_at: str) -> float:
+        """
+        将 sid 的过期时间（UTC 字符串）转换为时间戳
+        """
+        return calendar.timegm(datetime.strptime(expired_at, "%Y-%m-%dT%H:%M:%S.%fZ").timetuple())
+
+    def __refresh_sid(self):
+        """
+        刷新sid，多个线程同时刷新时只刷新一次
+        """
+        with self.__refresh_lock:
+            if self.__expired_at - time.time() > self.REFRESH_TIME:
+                return
+            swanlog.debug("Refresh sid...")
+            resp = auth.login_request(self.api_key, self.base_url, self.__timeout[1])
+            login_info = auth.LoginInfo(resp, self.api_key, self.base_url, self.web_host)
+            if login_info.is_fail:
+                raise ApiError(resp, "Failed to refresh sid")
+            self.__login_info = login_info
+            self.__expired_at = self.__parse_expired_at(login_info.expired_at)
+            self.__session.headers["cookie"] = f"sid={login_info.sid}"
+
+    def __refresh_sid_in_background(self):
+        """
+        在后台线程中刷新sid，刷新完成前继续使用当前的sid
+        """
+        if (self.__refresher is not None and self.__refresher.is_alive()) or time.time() < self.__next_refresh:
+            return
+
+        def refresh():
+            try:
+                self.__refresh_sid()
+            except Exception as e:
+                self.__next_refresh = time.time() + self.REFRESH_RETRY
+                swanlog.debug(f"Refresh sid failed: {e}")
+
+        self.__refresher = threading.Thread(target=refresh, name="SwanLabSidRefresher", daemon=True)
+        self.__refresher.start()
+
     def __create_session(self):
         """
         创建会话，这将在HTTP类实例化时调用
@@ -170,9 +246,12 @@ class Client:
             backoff_factor=0.1,
             status_forcelist=[429, 500, 502, 503, 504],
             allowed_methods=frozenset(["GET", "POST", "PUT", "DELETE", "PATCH"]),
+            # 重试耗尽后返回最后一次的响应，由响应钩子转换为 ApiError，而不是抛出 RetryError
+            raise_on_status=False,
         )
-        adapter = HTTPAdapter(max_retries=retry)
+        adapter = HTTPAdapter(pool_maxsize=self.__pool_size, max_retries=retry)
         session.mount("https://", adapter)
+        session.mount("http://", adapter)
 
         session.headers["swanlab-sdk"] = self.__version
         session.cookies.update({"sid": self.__login_info.sid})
@@ -181,8 +260,14 @@ class Client:
         def response_interceptor(response: requests.Response, *args, **kwargs):
             """
             捕获所有的http不为2xx的错误，以ApiError的形式抛出
+            同时记录请求延迟与发送的字节数
             """
+            body = response.request.body
+            telemetry.incr("http.requests")
+            telemetry.incr("http.bytes_sent", len(body) if body is not None else 0)
+            telemetry.observe("http.request.time", response.elapsed.total_seconds())
             if response.status_code // 100 != 2:
+                telemetry.incr("http.errors")
                 traceid = f"Trace id: {response.headers.get('traceid')}"
                 request = f"{response.request.method.upper()} {response.url}"
                 resp = f"{response.status_code} {response.reason}"
@@ -192,13 +277,40 @@ class Client:
 
         self.__session = session
 
+    @property
+    def encoding(self) -> Optional[str]:
+        """
+        当前请求体的压缩方式，为 None 时不压缩
+        """
+        return self.__encoding
+
+    def __send(self, method: str, url: str, data: Union[dict, list] = None) -> requests.Response:
+        """
+        发送携带 json 数据的请求，数据超过阈值时压缩请求体
+        如果服务端返回 415 不支持当前压缩方式，则根据服务端声明的 Accept-Encoding 降级后重新发送
+        """
+        if data is None:
+            return self.__session.request(method, url, timeout=self.__timeout)
+        # 不压缩时也使用 encode_json 序列化，保证 NaN 与 Infinity 的处理方式一致
+        body, headers = encode_json(data, self.__encoding, self.__compression_threshold)
+        try:
+            return self.__session.request(method, url, data=body, headers=headers, timeout=self.__timeout)
+        except ApiError as e:
+            if "Content-Encoding" not in headers or e.resp is None or e.resp.status_code != 415:
+                raise e
+            rejected = headers["Content-Encoding"]
+            encoding = negotiate(e.resp)
+            self.__encoding = None if encoding == rejected else encoding
+            swanlog.debug(f"Server does not support {rejected}, fallback to {self.__encoding}.")
+            return self.__send(method, url, data)
+
     def post(self, url: str, data: Union[dict, list] = None):
         """
         post请求
         """
         url = self.base_url + url
         self.__before_request()
-        resp = self.__session.post(url, json=data)
+        resp = self.__send("post", url, data)
         return decode_response(resp), resp
 
     def put(self, url: str, data: dict = None):
@@ -207,7 +319,7 @@ class Client:
         """
         url = self.base_url + url
         self.__before_request()
-        resp = self.__session.put(url, json=data)
+        resp = self.__send("put", url, data)
         return decode_response(resp), resp
 
     def get(self, url: str, params: dict = None):
@@ -216,7 +328,7 @@ class Client:
         """
         url = self.base_url + url
         self.__before_request()
-        resp = self.__session.get(url, params=params)
+        resp = self.__session.get(url, params=params, timeout=self.__timeout)
         return decode_response(resp), resp
 
     def patch(self, url: str, data: dict = None):
@@ -225,29 +337,32 @@ class Client:
         """
         url = self.base_url + url
         self.__before_request()
-        resp = self.__session.patch(url, json=data)
+        resp = self.__send("patch", url, data)
         return decode_response(resp), resp
 
     # ---------------------------------- 对象存储相关方法 ----------------------------------
 
     def __get_cos(self):
+        old = self.__cos
         self.__cos = CosClient(
             data=self.get(f"/project/{self.groupname}/{self.projname}/runs/{self.exp_id}/sts")[0],
         )
+        # 旧客户端中已经提交的上传任务会继续完成
+        old is not None and old.close()
 
-    def upload(self, buffer: MediaBuffer):
+    def upload(self, buffer: UploadBuffer):
         """
         上传文件，需要注意的是file_path应该为unix风格而不是windows风格
-        :param buffer: 自定义文件内存对象
+        :param buffer: 自定义文件内存对象，或者磁盘上的媒体文件
         """
         if self.__cos.should_refresh:
             self.__get_cos()
         return self.__cos.upload(buffer)
 
-    def upload_files(self, buffers: List[MediaBuffer]) -> Dict[str, Union[bool, List]]:
+    def upload_files(self, buffers: List[UploadBuffer]) -> Dict[str, Union[bool, List]]:
         """
         批量上传文件，keys和local_paths的长度应该相等
-        :param buffers: 文件内存对象
+        :param buffers: 文件内存对象，或者磁盘上的媒体文件
         :return: 返回上传结果, 包含success_all和detail两个字段，detail为每一个文件的上传结果（通过index索引对应）
         """
         if self.__cos.should_refresh:
@@ -396,6 +511,8 @@ class Client:
             "from": "sdk",
         }
         put_data = {k: v for k, v in put_data.items() if v is not None}  # 移除值为None的键
+        # 实验结束后不会再续传，中止仍未完成的分片上传
+        self.__cos is not None and self.__cos.abort_multipart_uploads()
         self.put(f"/project/{self.groupname}/{self.projname}/runs/{self.exp_id}/state", put_data)
         self.pending = True
 
@@ -461,5 +578,6 @@ __all__ = [
     "sync_error_handler",
     "decode_response",
     "CosClient",
+    "MediaFile",
     "Client",
 ]
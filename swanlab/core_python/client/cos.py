@@ -5,19 +5,83 @@
 @description: cos 对象，上传大文件到 Object Storage Service
 """
 
+import hashlib
+import os
+import time
 from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import List
+from typing import List, Union, BinaryIO, Iterator, Dict, Optional
 
 import boto3
 from botocore.config import Config as BotocoreConfig
+from botocore.exceptions import ClientError
 
 from swanlab.data.modules import MediaBuffer
 from swanlab.log import swanlog
+from swanlab.swanlab_settings import get_settings
+from swanlab.toolkit.telemetry import telemetry
+
+
+class MediaFile:
+    """
+    磁盘上的媒体文件，与 MediaBuffer 一样可以被上传，但上传时从磁盘流式读取，不会将文件内容读入内存
+    """
+
+    def __init__(self, path: str, file_name: str):
+        """
+        :param path: 本地文件路径
+        :param file_name: 上传到对象存储时的文件名，unix 风格，开头不能有/
+        """
+        self.path = path
+        self.file_name = file_name
+
+    @property
+    def size(self) -> int:
+        return os.path.getsize(self.path)
+
+    def open(self) -> BinaryIO:
+        return open(self.path, "rb")
+
+    def getvalue(self) -> bytes:
+        with self.open() as f:
+            return f.read()
+
+
+UploadBuffer = Union[MediaBuffer, MediaFile]
+
+
+def buffer_size(buffer: UploadBuffer) -> int:
+    """
+    获取待上传文件的字节数，不会复制文件内容，磁盘中的文件不存在时返回 0
+    """
+    if isinstance(buffer, MediaFile):
+        try:
+            return buffer.size
+        except OSError:
+            return 0
+    with buffer.getbuffer() as view:
+        return view.nbytes
+
+
+@contextmanager
+def open_buffer(buffer: UploadBuffer) -> Iterator[BinaryIO]:
+    """
+    以文件对象的形式打开待上传的文件，内存中的文件会被重置到开头，磁盘中的文件会在使用后关闭
+    """
+    if isinstance(buffer, MediaFile):
+        with buffer.open() as f:
+            yield f
+    else:
+        buffer.seek(0)
+        yield buffer
 
 
 class CosClient:
     REFRESH_TIME = 60 * 60 * 1.5  # 1.5小时
+    MAX_WORKERS = 10
+    # 单个分片在 botocore 自身重试之外的最大尝试次数
+    PART_ATTEMPTS = 3
 
     def __init__(self, data):
         """
@@ -33,6 +97,7 @@ class CosClient:
         path_style = 'path' if data.get('pathStyle', False) else 'virtual'
         endpoint_url = f"https://cos.{data['region']}.myqcloud.com" if end_point is None else end_point
 
+        settings = get_settings()
         self.__client = boto3.client(
             's3',
             endpoint_url=endpoint_url,
@@ -40,29 +105,59 @@ class CosClient:
             aws_access_key_id=credentials['tmpSecretId'],
             aws_secret_access_key=credentials['tmpSecretKey'],
             aws_session_token=credentials['sessionToken'],
-            config=BotocoreConfig(signature_version="s3", s3={'addressing_style': path_style}),
+            config=BotocoreConfig(
+                signature_version="s3",
+                s3={'addressing_style': path_style},
+                max_pool_connections=self.MAX_WORKERS,
+                connect_timeout=settings.http_connect_timeout,
+                read_timeout=settings.http_read_timeout,
+            ),
         )
+        self.__multipart_threshold = settings.upload_multipart_threshold
+        self.__part_size = settings.upload_part_size
+        # 凭证没有分片上传权限时降级为普通上传
+        self.__multipart = True
+        # 上传线程池在客户端的整个生命周期内复用
+        self.__executor = ThreadPoolExecutor(max_workers=self.MAX_WORKERS, thread_name_prefix="SwanLabCosUploader")
 
-    def upload(self, buffer: MediaBuffer):
+    def upload(self, buffer: UploadBuffer):
         """
         上传文件，需要注意的是file_path应该为unix风格而不是windows风格
         开头不能有/
-        :param buffer: 本地文件的二进制数据
+        文件内容以流的形式发送，超过分片阈值的文件使用分片上传
+        :param buffer: 本地文件的二进制数据，或者磁盘上的媒体文件
         """
         key = "{}/{}".format(self.__prefix, buffer.file_name)
         try:
             swanlog.debug("Uploading file: {}".format(key))
+            size = buffer_size(buffer)
+            with telemetry.timer("cos.upload.time"):
+                self.__upload(key, buffer, size)
+            telemetry.incr("cos.bytes_sent", size)
+        except Exception as e:
+            telemetry.incr("cos.errors")
+            swanlog.error("Upload error: {}".format(e))
+
+    def __upload(self, key: str, buffer: UploadBuffer, size: int):
+        if self.__multipart and size > self.__multipart_threshold:
+            # 如果对象存储中已有该文件未完成的分片上传，则续传
+            upload_id = self.__find_multipart(key)
+            uploaded = {} if upload_id is None else self.__list_parts(key, upload_id)
+            if upload_id is None:
+                upload_id = self.__create_multipart(key)
+            if upload_id is not None:
+                return self.__upload_multipart(key, upload_id, buffer, size, uploaded)
+        with open_buffer(buffer) as body:
             self.__client.put_object(
                 Bucket=self.__bucket,
                 Key=key,
-                Body=buffer.getvalue(),
+                Body=body,
+                ContentLength=size,
                 # 一年
                 CacheControl="max-age=31536000",
             )
-        except Exception as e:
-            swanlog.error("Upload error: {}".format(e))
 
-    def upload_files(self, buffers: List[MediaBuffer]):
+    def upload_files(self, buffers: List[UploadBuffer]):
         """
         批量上传文件，keys和local_paths的长度应该相等
         :param buffers: 本地文件的二进制对象集合
@@ -70,21 +165,128 @@ class CosClient:
         # executor.submit可能会失败，因为线程数有限或者线程池已经关闭
         # 来自此issue: https://github.com/SwanHubX/SwanLab/issues/889，此时需要一个个发送
         failed_buffers = []
-        with ThreadPoolExecutor(max_workers=10) as executor:
-            futures = []
-            for buffer in buffers:
-                try:
-                    futures.append(executor.submit(self.upload, buffer))
-                except RuntimeError:
-                    failed_buffers.append(buffer)
-            for future in futures:
-                future.result()
+        futures = []
+        for buffer in buffers:
+            try:
+                futures.append(self.__executor.submit(self.upload, buffer))
+            except RuntimeError:
+                failed_buffers.append(buffer)
+        for future in futures:
+            future.result()
         # 重试失败的buffer
         if len(failed_buffers):
             swanlog.debug("Retrying failed buffers: {}".format(len(failed_buffers)))
             for buffer in failed_buffers:
                 self.upload(buffer)
 
+    def close(self):
+        """
+        关闭上传线程池，已经提交的上传任务会继续完成
+        """
+        self.__executor.shutdown(wait=False)
+
+    # ---------------------------------- 分片上传 ----------------------------------
+
+    def __create_multipart(self, key: str) -> Optional[str]:
+        """
+        创建分片上传
+        :return: UploadId，凭证没有分片上传权限时返回 None
+        """
+        try:
+            resp = self.__client.create_multipart_upload(
+                Bucket=self.__bucket,
+                Key=key,
+                CacheControl="max-age=31536000",
+            )
+        except ClientError as e:
+            swanlog.debug("Multipart upload is not available, fallback to put_object: {}".format(e))
+            self.__multipart = False
+            return None
+        return resp["UploadId"]
+
+    def __find_multipart(self, key: str) -> Optional[str]:
+        """
+        查找该文件最近一次未完成的分片上传
+        """
+        try:
+            resp = self.__client.list_multipart_uploads(Bucket=self.__bucket, Prefix=key)
+        except ClientError:
+            return None
+        uploads = [u for u in resp.get("Uploads", []) if u["Key"] == key]
+        if not uploads:
+            return None
+        return max(uploads, key=lambda u: u["Initiated"])["UploadId"]
+
+    def __list_parts(self, key: str, upload_id: str) -> Dict[int, dict]:
+        """
+        列出已经上传的分片，以分片序号为键
+        """
+        parts = {}
+        paginator = self.__client.get_paginator("list_parts")
+        for page in paginator.paginate(Bucket=self.__bucket, Key=key, UploadId=upload_id):
+            for part in page.get("Parts", []):
+                parts[part["PartNumber"]] = part
+        return parts
+
+    def __upload_multipart(self, key: str, upload_id: str, buffer: UploadBuffer, size: int, uploaded: Dict[int, dict]):
+        """
+        分片上传文件，大小与 MD5 均与本地一致的已上传分片会被跳过，上传失败的分片单独重试
+        上传失败时不会立即中止分片上传，本次实验中再次上传同一文件时从已上传的分片处续传，
+        实验结束时仍未完成的分片上传由 abort_multipart_uploads 中止
+        :param uploaded: 已经上传的分片，以分片序号为键
+        """
+        parts = []
+        with open_buffer(buffer) as body:
+            for number, offset in enumerate(range(0, size, self.__part_size), start=1):
+                length = min(self.__part_size, size - offset)
+                body.seek(offset)
+                data = body.read(length)
+                part = uploaded.get(number)
+                # 非加密的分片 ETag 为分片内容的 MD5，文件在两次上传之间被修改时需要重新上传该分片
+                if part is None or part["Size"] != length or part["ETag"].strip('"') != hashlib.md5(data).hexdigest():
+                    part = {"ETag": self.__upload_part(key, upload_id, number, data)}
+                parts.append({"PartNumber": number, "ETag": part["ETag"]})
+        self.__client.complete_multipart_upload(
+            Bucket=self.__bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+
+    def abort_multipart_uploads(self):
+        """
+        中止当前实验目录下所有未完成的分片上传，在实验结束时调用，避免已上传的分片一直占用对象存储空间
+        """
+        try:
+            paginator = self.__client.get_paginator("list_multipart_uploads")
+            for page in paginator.paginate(Bucket=self.__bucket, Prefix=self.__prefix + "/"):
+                for upload in page.get("Uploads", []):
+                    swanlog.debug("Aborting incomplete multipart upload: {}".format(upload["Key"]))
+                    self.__client.abort_multipart_upload(
+                        Bucket=self.__bucket,
+                        Key=upload["Key"],
+                        UploadId=upload["UploadId"],
+                    )
+        except Exception as e:
+            swanlog.debug("Abort multipart uploads failed: {}".format(e))
+
+    def __upload_part(self, key: str, upload_id: str, number: int, data: bytes) -> str:
+        for attempt in range(self.PART_ATTEMPTS):
+            try:
+                resp = self.__client.upload_part(
+                    Bucket=self.__bucket,
+                    Key=key,
+                    UploadId=upload_id,
+                    PartNumber=number,
+                    Body=data,
+                )
+                return resp["ETag"]
+            except Exception as e:
+                if attempt == self.PART_ATTEMPTS - 1:
+                    raise
+                swanlog.debug("Upload part {} of {} failed, retrying: {}".format(number, key, e))
+                time.sleep(2**attempt)
+
     @property
     def should_refresh(self):
         # cos传递的是北京时间，需要添加8小时
@@ -0,0 +1,81 @@
+"""
+@author: cunyue
+@file: encoding.py
+@time: 2025/7/18 10:40
+@description: 请求体压缩，支持 gzip 与 deflate 两种 Content-Encoding
+"""
+
+import gzip
+import json
+import math
+import zlib
+from typing import Optional, Tuple, Union, Dict, Callable
+
+import requests
+
+ENCODERS: Dict[str, Callable[[bytes], bytes]] = {
+    "gzip": lambda body: gzip.compress(body, compresslevel=6),
+    "deflate": lambda body: zlib.compress(body, 6),
+}
+"""
+支持的压缩方式，按照优先级排列
+"""
+
+NAN = "NaN"
+INF = "INF"
+"""
+NaN 与 Infinity 不是合法的 json，序列化为与 swanlab.data.modules.Line 相同的字符串
+"""
+
+
+def sanitize(data):
+    """
+    递归地将数据中的 NaN 与 Infinity 替换为字符串
+    """
+    if isinstance(data, float):
+        if math.isnan(data):
+            return NAN
+        return INF if math.isinf(data) else data
+    if isinstance(data, dict):
+        return {k: sanitize(v) for k, v in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [sanitize(v) for v in data]
+    return data
+
+
+def dumps_json(data: Union[dict, list]) -> bytes:
+    """
+    将数据序列化为 json 字节串，压缩与不压缩的请求使用相同的序列化方式
+    数据中绝大多数情况下没有 NaN 与 Infinity，只在序列化失败时才遍历替换
+    """
+    try:
+        body = json.dumps(data, allow_nan=False)
+    except ValueError:
+        body = json.dumps(sanitize(data), allow_nan=False)
+    return body.encode("utf-8")
+
+
+def encode_json(data: Union[dict, list], encoding: Optional[str], threshold: int) -> Tuple[bytes, Dict[str, str]]:
+    """
+    将数据序列化为 json 并按需压缩
+    :param data: 需要发送的数据
+    :param encoding: 压缩方式，为 None 时不压缩
+    :param threshold: 压缩阈值，序列化后的字节数小于此值时不压缩
+    :return: 请求体与需要携带的请求头
+    """
+    body = dumps_json(data)
+    headers = {"Content-Type": "application/json"}
+    if encoding is not None and len(body) >= threshold:
+        body = ENCODERS[encoding](body)
+        headers["Content-Encoding"] = encoding
+    return body, headers
+
+
+def negotiate(resp: requests.Response) -> Optional[str]:
+    """
+    服务端不支持当前压缩方式时（415），根据响应头中的 Accept-Encoding 选择新的压缩方式 (RFC 7694)
+    :return: 服务端支持的压缩方式，没有可用的压缩方式时返回 None
+    """
+    accepted = resp.headers.get("Accept-Encoding", "")
+    accepted = [x.split(";")[0].strip().lower() for x in accepted.split(",")]
+    return next((x for x in ENCODERS if x in accepted), None)
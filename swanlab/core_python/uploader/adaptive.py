@@ -0,0 +1,231 @@
+"""
+@author: cunyue
+@file: adaptive.py
+@time: 2025/7/22 10:15
+@description: 自适应上传控制器，根据请求延迟与错误调整分块大小、并发数以及上传间隔（AIMD）
+每一次批量上传为一轮，本轮所有请求健康（没有拥塞信号且平均延迟不超过目标值）时加性增加分块大小与并发数、减少上传间隔，
+出现拥塞信号（超时、429/5xx、202 挂起）时乘性减少分块大小与并发数、增加上传间隔，所有值始终限制在用户设置的上下限内
+"""
+
+import threading
+import time
+from typing import Callable, Dict, List, TypeVar
+
+import requests
+
+from swanlab.error import ApiError, NetworkError
+from swanlab.swanlab_settings import get_settings
+from swanlab.toolkit.telemetry import telemetry
+
+T = TypeVar("T")
+
+
+def is_congestion(error: Exception) -> bool:
+    """
+    判断上传错误是否为拥塞信号：超时、连接错误、429 请求过多以及 5xx 服务端错误
+    """
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError, NetworkError)):
+        return True
+    if isinstance(error, ApiError) and error.resp is not None:
+        code = error.resp.status_code
+        return code == 429 or code >= 500
+    return False
+
+
+def clamp(value: float, low: float, high: float) -> float:
+    return max(low, min(high, value))
+
+
+class AdaptiveController:
+    """
+    AIMD 控制器，线程安全，同一轮中的请求可以在多个线程中并发记录
+    下限与上限相等时对应的值固定不变
+    """
+
+    DECREASE = 0.5
+    """
+    拥塞时分块大小与并发数的乘性减少系数，上传间隔按照其倒数增加
+    """
+    INTERVAL_STEP = 0.5
+    """
+    健康时上传间隔每轮的加性减少量，以及请求偏慢时的加性增加量，单位秒
+    """
+
+    def __init__(
+        self,
+        name: str,
+        records: int,
+        min_records: int,
+        max_bytes: int,
+        concurrency: int,
+        min_concurrency: int,
+        interval: float,
+        min_interval: float,
+        max_interval: float,
+        target_latency: float,
+        clock: Callable[[], float] = time.perf_counter,
+    ):
+        """
+        :param name: 控制器名称，对应指标类型
+        :param records: 分块记录数的上限，也是初始值
+        :param min_records: 分块记录数的下限
+        :param max_bytes: 分块字节数的上限，随分块记录数等比例缩放
+        :param concurrency: 并发数的上限，也是初始值
+        :param min_concurrency: 并发数的下限
+        :param interval: 上传间隔的初始值，单位秒
+        :param min_interval: 上传间隔的下限
+        :param max_interval: 上传间隔的上限
+        :param target_latency: 请求平均延迟不超过此值时视为健康，单位秒
+        :param clock: 计时函数，测试时可以替换
+        """
+        self.name = name
+        self.max_records = records
+        self.min_records = min(min_records, records)
+        self.max_bytes = max_bytes
+        self.max_concurrency = concurrency
+        self.min_concurrency = min(min_concurrency, concurrency)
+        self.min_interval = min(min_interval, max_interval)
+        self.max_interval = max_interval
+        self.target_latency = target_latency
+        self.clock = clock
+        self.__lock = threading.Lock()
+        self.__records = float(records)
+        self.__concurrency = float(concurrency)
+        self.__interval = clamp(interval, self.min_interval, self.max_interval)
+        # 本轮的请求数、总延迟以及是否出现拥塞信号
+        self.__requests = 0
+        self.__latency = 0.0
+        self.__congested = False
+        # 绑定的刷写策略，调整上传间隔时同步修改其 max_latency
+        self.__policies: List = []
+
+    @property
+    def chunk_records(self) -> int:
+        return int(self.__records)
+
+    @property
+    def chunk_bytes(self) -> int:
+        return max(1, int(self.max_bytes * self.__records / self.max_records))
+
+    @property
+    def concurrency(self) -> int:
+        return int(self.__concurrency)
+
+    @property
+    def interval(self) -> float:
+        return self.__interval
+
+    def state(self) -> dict:
+        return {
+            "chunk_records": self.chunk_records,
+            "chunk_bytes": self.chunk_bytes,
+            "concurrency": self.concurrency,
+            "interval": self.interval,
+        }
+
+    def bind(self, policy):
+        """
+        绑定刷写策略（FlushPolicy），其 max_latency 随上传间隔调整
+        """
+        policy.max_latency = self.__interval
+        self.__policies.append(policy)
+
+    def observe(self, latency: float, congested: bool = False):
+        """
+        记录本轮中的一个请求
+        :param latency: 请求耗时，单位秒
+        :param congested: 请求是否出现拥塞信号
+        """
+        with self.__lock:
+            self.__requests += 1
+            self.__latency += latency
+            self.__congested = self.__congested or congested
+
+    def track(self, send: Callable[[T], None], pending: Callable[[], bool] = lambda: False) -> Callable[[T], None]:
+        """
+        包装上传函数，记录每次调用的耗时以及是否出现拥塞信号
+        :param send: 上传函数
+        :param pending: 调用后判断客户端是否被挂起（服务端返回 202）
+        """
+
+        def wrapper(chunk: T):
+            start = self.clock()
+            try:
+                send(chunk)
+            except Exception as e:
+                self.observe(self.clock() - start, is_congestion(e))
+                raise
+            self.observe(self.clock() - start, pending())
+
+        return wrapper
+
+    def adjust(self):
+        """
+        结束一轮，根据本轮的请求调整分块大小、并发数与上传间隔，本轮没有请求时不调整
+        """
+        with self.__lock:
+            requests_, latency, congested = self.__requests, self.__latency, self.__congested
+            self.__requests, self.__latency, self.__congested = 0, 0.0, False
+            if requests_ == 0:
+                return
+            if congested:
+                self.__records = max(self.min_records, self.__records * self.DECREASE)
+                self.__concurrency = max(self.min_concurrency, self.__concurrency * self.DECREASE)
+                self.__interval = min(self.max_interval, self.__interval / self.DECREASE)
+                telemetry.incr(f"upload.adaptive.{self.name}.decrease")
+            elif latency / requests_ > self.target_latency:
+                # 请求偏慢但没有出错，保持分块大小与并发数，减少请求频率
+                self.__interval = min(self.max_interval, self.__interval + self.INTERVAL_STEP)
+            else:
+                step = max(1.0, self.max_records / 10)
+                self.__records = min(float(self.max_records), self.__records + step)
+                self.__concurrency = min(float(self.max_concurrency), self.__concurrency + 1)
+                self.__interval = max(self.min_interval, self.__interval - self.INTERVAL_STEP)
+            for policy in self.__policies:
+                policy.max_latency = self.__interval
+
+
+controllers: Dict[str, AdaptiveController] = {}
+"""
+每种指标类型一个控制器，在每个实验开始时重置
+"""
+__lock = threading.Lock()
+
+
+def create_controller(name: str) -> AdaptiveController:
+    """
+    根据当前设置创建控制器，关闭自适应时上下限相等，所有值固定为用户设置
+    """
+    settings = get_settings()
+    adaptive = settings.upload_adaptive
+    return AdaptiveController(
+        name,
+        records=settings.upload_chunk_records,
+        min_records=settings.upload_min_chunk_records if adaptive else settings.upload_chunk_records,
+        max_bytes=settings.upload_chunk_bytes,
+        concurrency=settings.upload_concurrency,
+        min_concurrency=1 if adaptive else settings.upload_concurrency,
+        interval=settings.upload_interval,
+        min_interval=settings.upload_min_interval if adaptive else settings.upload_interval,
+        max_interval=settings.upload_max_interval if adaptive else settings.upload_interval,
+        target_latency=settings.upload_target_latency,
+    )
+
+
+def get_controller(name: str) -> AdaptiveController:
+    """
+    获取某种指标类型的控制器，不存在时根据当前设置创建
+    """
+    with __lock:
+        controller = controllers.get(name)
+        if controller is None:
+            controller = controllers[name] = create_controller(name)
+        return controller
+
+
+def reset_controllers():
+    with __lock:
+        controllers.clear()
+
+
+__all__ = ["AdaptiveController", "is_congestion", "get_controller", "reset_controllers"]
@@ -0,0 +1,177 @@
+"""
+@author: cunyue
+@file: batch.py
+@time: 2025/7/15 10:20
+@description: 指标分块上传，将大批量的指标拆分为大小受限的块，并发上传
+同一指标的块按顺序上传，某个块上传失败时，只有未确认的块需要重试
+"""
+
+import contextlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, Future
+from typing import List, Callable, TypeVar, Generic, Set, Dict, Optional
+
+from swanlab.error import SyncError, PartialSyncError
+from swanlab.log import swanlog
+from swanlab.swanlab_settings import get_settings
+from ..client import sync_error_handler
+
+T = TypeVar("T")
+
+executors: Dict[str, ThreadPoolExecutor] = {}
+"""
+每种指标类型一个分块上传线程池，在整个实验期间复用，避免每次上传都创建与销毁线程
+"""
+__lock = threading.Lock()
+
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    """
+    获取某种指标类型的分块上传线程池，不存在时创建，线程数为 upload_concurrency（并发数的上限）
+    """
+    with __lock:
+        executor = executors.get(name)
+        if executor is None:
+            executor = executors[name] = ThreadPoolExecutor(
+                max_workers=get_settings().upload_concurrency,
+                thread_name_prefix=f"SwanLabChunkUploader-{name}",
+            )
+        return executor
+
+
+def shutdown_executors():
+    """
+    关闭所有分块上传线程池，在实验结束以及新的实验开始时调用，空闲线程随之退出
+    """
+    with __lock:
+        for executor in executors.values():
+            executor.shutdown(wait=False)
+        executors.clear()
+
+
+class Chunk(Generic[T]):
+    """
+    一个上传块，包含若干条指标以及它们涉及的指标名称
+    """
+
+    def __init__(self):
+        self.items: List[T] = []
+        self.keys: Set[str] = set()
+        self.size = 0
+
+    def add(self, item: T, key: str, size: int):
+        self.items.append(item)
+        self.keys.add(key)
+        self.size += size
+
+
+def create_chunks(
+    items: List[T],
+    key: Callable[[T], str],
+    size: Callable[[T], int],
+    max_records: int,
+    max_bytes: int,
+) -> List[Chunk[T]]:
+    """
+    将指标拆分为多个块，每个块的记录数不超过 max_records，大小不超过 max_bytes（单条超过 max_bytes 的指标独占一个块）
+    拆分前会按照指标名称稳定分组，同一指标的数据连续且保持原有顺序，这样不同指标的块之间没有依赖，可以并发上传
+    :param items: 指标列表
+    :param key: 获取指标名称的函数
+    :param size: 估算单条指标大小的函数
+    :param max_records: 单个块的最大记录数
+    :param max_bytes: 单个块的最大字节数
+    """
+    groups: Dict[str, List[T]] = {}
+    for item in items:
+        groups.setdefault(key(item), []).append(item)
+    chunks: List[Chunk[T]] = []
+    chunk = Chunk()
+    for k, group in groups.items():
+        for item in group:
+            s = size(item)
+            if len(chunk.items) > 0 and (len(chunk.items) >= max_records or chunk.size + s > max_bytes):
+                chunks.append(chunk)
+                chunk = Chunk()
+            chunk.add(item, k, s)
+    if len(chunk.items) > 0:
+        chunks.append(chunk)
+    return chunks
+
+
+def upload_chunks(
+    chunks: List[Chunk[T]],
+    send: Callable[[List[T]], None],
+    max_workers: int = 1,
+    executor: Optional[ThreadPoolExecutor] = None,
+):
+    """
+    上传所有块，最多同时有 max_workers 个请求在进行
+    一个块只有在所有包含相同指标的前序块上传成功后才会开始上传，以保证同一指标的数据按顺序到达
+    :param chunks: 由 create_chunks 生成的块
+    :param send: 上传单个块的函数
+    :param max_workers: 最大并发请求数
+    :param executor: 复用的线程池（见 get_executor），线程数不少于 max_workers，为 None 时创建临时的线程池
+    :raises PartialSyncError: 部分块上传失败，异常中包含需要重试的数据（失败的块以及因此未上传的后续块）
+    """
+    # 计算每个块依赖的前序块
+    deps: List[Set[int]] = []
+    last: Dict[str, int] = {}
+    for index, chunk in enumerate(chunks):
+        deps.append({last[k] for k in chunk.keys if k in last})
+        for k in chunk.keys:
+            last[k] = index
+    safe_send = sync_error_handler(send)
+    # 已经完成（成功或者因未知错误被丢弃）的块
+    done: Set[int] = set()
+    # 上传失败需要重试的块，包括因前序块失败而未上传的块
+    failed: Set[int] = set()
+    errors: List[SyncError] = []
+
+    def settle(i: int, e: Exception = None):
+        if isinstance(e, SyncError):
+            errors.append(e)
+            failed.add(i)
+            return
+        if e is not None:
+            # 未知错误无法通过重试解决，与其他上传任务一致，丢弃数据并报告
+            swanlog.error(f"upload chunk error: {e}, it might be a swanlab bug, data will be lost!")
+        done.add(i)
+
+    waiting = list(range(len(chunks)))
+    if max_workers <= 1 or len(chunks) == 1:
+        for i in waiting:
+            if deps[i] & failed:
+                failed.add(i)
+                continue
+            settle(i, safe_send(chunks[i].items)[1])
+    else:
+        running: Dict[Future, int] = {}
+        if executor is None:
+            executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="SwanLabChunkUploader")
+            scope = executor
+        else:
+            # 复用的线程池在上传结束后不关闭
+            scope = contextlib.nullcontext()
+        with scope:
+            while waiting or running:
+                # 提交所有依赖已经满足的块
+                for i in list(waiting):
+                    if len(running) >= max_workers:
+                        break
+                    if deps[i] & failed:
+                        failed.add(i)
+                        waiting.remove(i)
+                    elif deps[i] <= done:
+                        running[executor.submit(safe_send, chunks[i].items)] = i
+                        waiting.remove(i)
+                if not running:
+                    continue
+                finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    settle(running.pop(future), future.result()[1])
+    if failed:
+        remaining = [item for i in sorted(failed) for item in chunks[i].items]
+        raise PartialSyncError(errors[0], remaining)
+
+
+__all__ = ["Chunk", "create_chunks", "upload_chunks", "get_executor", "shutdown_executors"]
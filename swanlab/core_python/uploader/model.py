@@ -10,8 +10,8 @@ from datetime import datetime
 from enum import Enum
 from typing import List, Optional, TypedDict, Literal
 
-from swanlab.data.modules import MediaBuffer
 from swanlab.toolkit import ColumnClass, ColumnConfig
+from ..client.cos import UploadBuffer
 
 
 class ColumnModel:
@@ -119,7 +119,7 @@ class MediaModel:
         key_encoded: str,
         step: int,
         epoch: int,
-        buffers: List[MediaBuffer] = None,
+        buffers: List[UploadBuffer] = None,
     ):
 
         # -------------------------- 🤡这里是一点小小的💩 --------------------------
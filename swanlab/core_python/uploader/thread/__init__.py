@@ -10,5 +10,7 @@ r"""
 """
 from .start_thread import ThreadPool
 from .task_types import UploadType
+from .channel import FlushPolicy
+from .lane import Lane, default_lanes
 
-__all__ = ["UploadType", "ThreadPool"]
+__all__ = ["UploadType", "ThreadPool", "FlushPolicy", "Lane", "default_lanes"]
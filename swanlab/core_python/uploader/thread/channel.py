@@ -0,0 +1,415 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+r"""
+@DATE: 2025/7/17 14:05
+@File: channel.py
+@IDE: pycharm
+@Description:
+    主线程与上传线程之间的通信管道，以及上传刷写策略
+"""
+import threading
+import time
+from collections import deque
+from typing import Tuple, List, Optional, Deque, Iterable
+
+try:
+    from typing import Literal  # Python 3.8+
+except ImportError:
+    from typing_extensions import Literal
+
+from .retry import RetryQueue
+from .task_types import UploadType
+from .utils import MsgType, Clock, estimate_size
+
+OverflowPolicy = Literal["block", "drop_media", "spill"]
+"""
+管道满时的处理策略：
+1. block: 阻塞写入方，直到有空余或者超时，超时后丢弃这条数据
+2. drop_media: 丢弃媒体数据（优先丢弃队列中最早的媒体数据），标量等其他数据总会被接收
+3. spill: 将超出的数据按顺序写入磁盘，上传线程取出内存中的数据后再读回
+"""
+
+
+class FlushPolicy:
+    """
+    上传刷写策略，满足以下任一条件时上传线程被唤醒并上传：
+    1. 队列中的记录数达到 max_records
+    2. 队列中的数据量（估算值）达到 max_bytes
+    3. 队列中最早的数据已等待超过 max_latency 秒
+    队列为空时上传线程无限期休眠，直到有新数据写入
+    """
+
+    def __init__(self, max_records: int = 1000, max_bytes: int = 4 * 1024 * 1024, max_latency: float = 3):
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.max_latency = max_latency
+
+    def wait_time(self, records: int, nbytes: int, oldest: Optional[float], now: float) -> Optional[float]:
+        """
+        计算距离下一次刷写还需等待的时间
+        :param records: 当前队列中的记录数
+        :param nbytes: 当前队列中的数据量
+        :param oldest: 队列中最早数据的写入时间，队列为空时为 None
+        :param now: 当前时间
+        :return: 0 代表需要立即刷写，None 代表队列为空，可以无限期等待
+        """
+        if oldest is None:
+            return None
+        if records >= self.max_records or nbytes >= self.max_bytes:
+            return 0
+        return max(0.0, oldest + self.max_latency - now)
+
+
+class Watermark:
+    """
+    水位线，用于在不同的上传通道之间建立顺序依赖
+    published 为已经写入通道的数据条数，done 为已经处理完成（上传成功或被丢弃）的数据条数
+    依赖方在上传前等待 done 达到其取出数据时的 published，从而保证在这之前写入的被依赖数据先上传
+    """
+
+    def __init__(self):
+        self.__cond = threading.Condition()
+        self.__published = 0
+        self.__done = 0
+        self.__closed = False
+
+    @property
+    def published(self) -> int:
+        return self.__published
+
+    @property
+    def done(self) -> int:
+        return self.__done
+
+    def publish(self, n: int = 1):
+        with self.__cond:
+            self.__published += n
+
+    def advance(self, done: int):
+        """
+        标记前 done 条数据已经处理完成
+        """
+        with self.__cond:
+            if done > self.__done:
+                self.__done = done
+                self.__cond.notify_all()
+
+    def wait(self, target: int, timeout: Optional[float] = None) -> bool:
+        """
+        等待前 target 条数据处理完成
+        :return: 是否处理完成，超时或者水位线被关闭时返回 False
+        """
+        with self.__cond:
+            self.__cond.wait_for(lambda: self.__closed or self.__done >= target, timeout)
+            return self.__done >= target
+
+    def close(self):
+        """
+        关闭水位线，唤醒所有等待中的线程
+        """
+        with self.__cond:
+            self.__closed = True
+            self.__cond.notify_all()
+
+
+class MsgChannel:
+    """
+    线程间通信管道，基于条件变量实现
+    写入数据、请求刷写或关闭管道时都会唤醒等待中的上传线程
+    管道可以设置记录数与数据量的上限，超出上限时按照 overflow 策略处理
+    """
+
+    def __init__(
+        self,
+        clock: Clock = time.monotonic,
+        max_records: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        overflow: OverflowPolicy = "spill",
+        block_timeout: float = 10,
+        spill_dir: Optional[str] = None,
+        droppable: Iterable[UploadType] = (UploadType.MEDIA_METRIC,),
+    ):
+        """
+        :param clock: 时钟函数，测试时可以替换为假时钟
+        :param max_records: 管道中最多保存的记录数，为 None 时不限制
+        :param max_bytes: 管道中最多保存的数据量（估算值），为 None 时不限制
+        :param overflow: 管道满时的处理策略
+        :param block_timeout: block 策略下写入方最多阻塞的时间，单位秒
+        :param spill_dir: spill 策略下溢出数据的存储目录，为 None 时使用临时目录
+        :param droppable: drop_media 策略下可以被丢弃的数据类型
+        """
+        self.clock = clock
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        self.droppable = set(droppable)
+        self.__cond = threading.Condition()
+        # 内存中的数据，每一项为 (数据, 记录数, 估算大小)
+        self.__msgs: Deque[Tuple[MsgType, int, int]] = deque()
+        # spill 策略下溢出到磁盘的数据，每次只读回一个磁盘段
+        self.__spill = RetryQueue(spill_dir=spill_dir, max_memory=0) if overflow == "spill" else None
+        # 内存中的记录数与估算数据量
+        self.__records = 0
+        self.__bytes = 0
+        # 队列中最早数据的写入时间
+        self.__oldest: Optional[float] = None
+        # 刷写请求的代数，每次请求刷写时递增；上传线程取出数据时更新 __flush_drained，
+        # 取出的数据全部上传完成后才更新 __flushed，上传失败等待重试期间刷写请求仍未完成
+        self.__flush_requested = 0
+        self.__flush_drained = 0
+        self.__flushed = 0
+        self.__closed = False
+        # 正在阻塞等待的写入方数量
+        self.__blocked = 0
+        # 因管道已满被丢弃的记录数
+        self.__dropped = 0
+
+    @property
+    def closed(self) -> bool:
+        return self.__closed
+
+    @property
+    def records(self) -> int:
+        return self.__records
+
+    @property
+    def nbytes(self) -> int:
+        return self.__bytes
+
+    @property
+    def dropped(self) -> int:
+        return self.__dropped
+
+    @property
+    def spilled(self) -> int:
+        """
+        溢出到磁盘（尚未读回）的数据条数
+        """
+        with self.__cond:
+            return self.__spilled()
+
+    @property
+    def oldest_age(self) -> float:
+        """
+        队列中最早数据已等待的时间，队列为空时为 0
+        """
+        oldest = self.__oldest
+        return 0.0 if oldest is None else self.clock() - oldest
+
+    def stats(self) -> dict:
+        """
+        管道状态，用于观察上传是否滞后
+        """
+        with self.__cond:
+            return {
+                "records": self.__records,
+                "bytes": self.__bytes,
+                "oldest_age": self.oldest_age,
+                "dropped": self.__dropped,
+                "spilled": self.__spilled(),
+            }
+
+    def __spilled(self) -> int:
+        return 0 if self.__spill is None else len(self.__spill)
+
+    def __full(self, records: int, size: int) -> bool:
+        """
+        再写入一条数据后管道是否超出上限，空管道总是可以写入
+        """
+        if not self.__msgs:
+            return False
+        if self.max_records is not None and self.__records + records > self.max_records:
+            return True
+        if self.max_bytes is not None and self.__bytes + size > self.max_bytes:
+            return True
+        return False
+
+    def __append(self, msg: MsgType, records: int, size: int):
+        self.__msgs.append((msg, records, size))
+        self.__records += records
+        self.__bytes += size
+        if self.__oldest is None:
+            self.__oldest = self.clock()
+
+    def __popleft(self) -> MsgType:
+        msg, records, size = self.__msgs.popleft()
+        self.__records -= records
+        self.__bytes -= size
+        return msg
+
+    def put(self, msg: MsgType) -> bool:
+        """
+        写入一条数据
+        :return: 数据是否被接收，管道已满且数据被丢弃时返回 False
+        """
+        records, size = len(msg[1]), estimate_size(msg)
+        with self.__cond:
+            try:
+                if self.__spill is not None and len(self.__spill) > 0:
+                    # 已经有数据溢出到磁盘，为保证顺序后续数据也写入磁盘
+                    self.__spill.push(msg)
+                    if self.__oldest is None:
+                        self.__oldest = self.clock()
+                    return True
+                if not self.__full(records, size):
+                    self.__append(msg, records, size)
+                    return True
+                if self.overflow == "spill":
+                    self.__spill.push(msg)
+                    return True
+                if self.overflow == "drop_media":
+                    return self.__put_drop_media(msg, records, size)
+                return self.__put_block(msg, records, size)
+            finally:
+                self.__cond.notify_all()
+
+    def __put_drop_media(self, msg: MsgType, records: int, size: int) -> bool:
+        if msg[0] in self.droppable:
+            self.__dropped += records
+            return False
+        # 按时间顺序丢弃队列中的媒体数据，直到可以写入
+        kept: Deque[Tuple[MsgType, int, int]] = deque()
+        for item in self.__msgs:
+            if item[0][0] in self.droppable and self.__full(records, size):
+                self.__records -= item[1]
+                self.__bytes -= item[2]
+                self.__dropped += item[1]
+            else:
+                kept.append(item)
+        self.__msgs = kept
+        # 非媒体数据总会被接收
+        self.__append(msg, records, size)
+        return True
+
+    def __put_block(self, msg: MsgType, records: int, size: int) -> bool:
+        deadline = self.clock() + self.block_timeout
+        self.__blocked += 1
+        try:
+            while self.__full(records, size) and not self.__closed:
+                # 唤醒上传线程取出数据
+                self.__cond.notify_all()
+                remaining = deadline - self.clock()
+                if remaining <= 0:
+                    self.__dropped += records
+                    return False
+                self.__cond.wait(remaining)
+            self.__append(msg, records, size)
+            return True
+        finally:
+            self.__blocked -= 1
+
+    def get(self) -> MsgType:
+        with self.__cond:
+            while not self.__msgs:
+                self.__cond.wait()
+            msg = self.__popleft()
+            if not self.__msgs:
+                self.__oldest = None
+            self.__cond.notify_all()
+            return msg
+
+    def drain(self) -> Tuple[List[MsgType], int]:
+        """
+        取出内存中的所有信息，溢出到磁盘的数据会在之后按顺序读回内存，等待下一次取出
+        :return: 信息列表，以及取出时已经请求的刷写代数，这些数据全部上传完成后应调用 mark_flushed 标记
+        """
+        with self.__cond:
+            msgs = [m[0] for m in self.__msgs]
+            self.__msgs.clear()
+            self.__records = 0
+            self.__bytes = 0
+            self.__oldest = None
+            if self.__spill is not None and len(self.__spill) > 0:
+                head = self.__spill.head()
+                self.__spill.pop(len(head))
+                for msg in head:
+                    self.__append(msg, len(msg[1]), estimate_size(msg))
+            self.__flush_drained = self.__flush_requested
+            # 唤醒被阻塞的写入方
+            self.__cond.notify_all()
+            return msgs, self.__flush_requested
+
+    def next_wait(self, policy: FlushPolicy, idle_timeout: Optional[float] = None) -> Optional[float]:
+        """
+        计算上传线程还需等待的时间，0 代表应当立即上传，None 代表无限期等待
+        :param policy: 刷写策略
+        :param idle_timeout: 队列为空时的等待时间，例如存在待重试的数据时需要定期唤醒
+        """
+        with self.__cond:
+            return self.__next_wait(policy, idle_timeout)
+
+    def __next_wait(self, policy: FlushPolicy, idle_timeout: Optional[float]) -> Optional[float]:
+        # 已经取出但仍在等待重试的刷写请求不再唤醒上传线程，重试时间由 idle_timeout 决定
+        if self.__closed or self.__flush_requested > self.__flush_drained:
+            return 0
+        # 管道已满、有写入方被阻塞或者有数据溢出时，需要尽快取出数据
+        if self.__blocked > 0 or self.__spilled() > 0:
+            return 0
+        wait = policy.wait_time(self.__records, self.__bytes, self.__oldest, self.clock())
+        if wait is None:
+            return idle_timeout
+        if idle_timeout is not None:
+            return min(wait, idle_timeout)
+        return wait
+
+    def wait(self, policy: FlushPolicy, idle_timeout: Optional[float] = None) -> bool:
+        """
+        阻塞等待，直到满足刷写条件、收到刷写请求、空闲等待超时或管道被关闭
+        :return: 管道被关闭时返回 False，否则返回 True
+        """
+        with self.__cond:
+            deadline = None if idle_timeout is None else self.clock() + idle_timeout
+            while True:
+                if self.__closed:
+                    return False
+                remaining = None if deadline is None else deadline - self.clock()
+                if remaining is not None and remaining <= 0:
+                    return True
+                wait = self.__next_wait(policy, remaining)
+                if wait == 0:
+                    return True
+                self.__cond.wait(wait)
+
+    def request_flush(self) -> int:
+        """
+        请求上传线程立即上传
+        :return: 本次请求的刷写代数
+        """
+        with self.__cond:
+            self.__flush_requested += 1
+            self.__cond.notify_all()
+            return self.__flush_requested
+
+    def mark_flushed(self, generation: int):
+        """
+        标记某一代的刷写请求已经完成
+        """
+        with self.__cond:
+            if generation > self.__flushed:
+                self.__flushed = generation
+            self.__cond.notify_all()
+
+    def wait_flushed(self, generation: int, timeout: Optional[float] = None) -> bool:
+        """
+        等待某一代的刷写请求完成，管道关闭时立即返回
+        :return: 是否在超时前完成
+        """
+        with self.__cond:
+            return self.__cond.wait_for(lambda: self.__closed or self.__flushed >= generation, timeout)
+
+    def close(self):
+        """
+        关闭管道，唤醒所有等待中的线程
+        """
+        with self.__cond:
+            self.__closed = True
+            self.__cond.notify_all()
+
+    def cleanup(self):
+        """
+        清理溢出到磁盘的数据，应当在所有数据取出后调用
+        """
+        with self.__cond:
+            if self.__spill is not None:
+                self.__spill.close()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+r"""
+@DATE: 2025/7/19 10:30
+@File: lane.py
+@IDE: pycharm
+@Description:
+    上传通道，不同类型的数据在各自的通道中独立排队、刷写与上传，
+    大文件上传不会阻塞标量和终端日志的上传
+"""
+from enum import Enum
+from typing import Tuple, Optional, List, Dict, TYPE_CHECKING
+
+from .channel import FlushPolicy, Watermark
+from .task_types import UploadType
+from .utils import MsgType
+
+if TYPE_CHECKING:
+    import threading
+    from .channel import MsgChannel
+    from .log_collector import LogCollectorTask
+
+
+class Lane:
+    """
+    上传通道，拥有独立的管道、上传线程、刷写策略与重试队列
+    通道之间可以声明依赖：依赖方上传前，被依赖通道中在此之前写入的数据必须已经上传完成
+    """
+
+    def __init__(
+        self,
+        name: str,
+        types: Tuple[Enum, ...],
+        policy: Optional[FlushPolicy] = None,
+        after: Tuple[str, ...] = (),
+        priority: int = 0,
+    ):
+        """
+        :param name: 通道名称
+        :param types: 通道负责上传的数据类型
+        :param policy: 通道的刷写策略，为 None 时使用线程池的默认策略
+        :param after: 依赖的通道名称
+        :param priority: 结束时上传剩余数据的优先级，数值越小越先上传，相同时按照通道顺序
+        """
+        self.name = name
+        self.types = types
+        self.policy = policy
+        self.after = after
+        self.priority = priority
+        self.watermark = Watermark()
+        # 以下属性由线程池在启动通道时设置
+        self.channel: Optional["MsgChannel"] = None
+        self.collector: Optional["LogCollectorTask"] = None
+        self.thread: Optional["threading.Thread"] = None
+
+
+def default_lanes() -> List[Lane]:
+    """
+    默认的上传通道：
+    1. meta: 列信息与实验配置文件，数据量小，需要先于指标上传
+    2. scalar: 标量指标，依赖 meta 通道，保证列创建后才上传其指标
+    3. media: 媒体指标，依赖 meta 通道，文件较大，不会阻塞其他通道
+    4. log: 终端日志
+    结束时的上传顺序为 meta、scalar、log、media，时间不足时优先保证数据量小、价值高的标量与日志
+    """
+    return [
+        Lane("meta", (UploadType.COLUMN, UploadType.FILE), priority=0),
+        Lane("scalar", (UploadType.SCALAR_METRIC,), after=("meta",), priority=1),
+        Lane("media", (UploadType.MEDIA_METRIC,), after=("meta",), priority=3),
+        Lane("log", (UploadType.LOG,), priority=2),
+    ]
+
+
+class LaneRouter:
+    """
+    按照数据类型将数据写入对应通道的管道
+    """
+
+    def __init__(self, lanes: List[Lane]):
+        self.__routes: Dict[Enum, Lane] = {t: lane for lane in lanes for t in lane.types}
+
+    def put(self, msg: MsgType) -> bool:
+        lane = self.__routes.get(msg[0])
+        if lane is None:
+            raise ValueError(f"No upload lane for {msg[0]}")
+        accepted = lane.channel.put(msg)
+        # 数据写入管道后才发布，依赖方取出数据时读取到的水位线一定包含在此之前写入的数据
+        accepted and lane.watermark.publish()
+        return accepted
@@ -8,13 +8,17 @@ r"""
     日志集合和上传记录器
 """
 import time
-from typing import List
+from collections import defaultdict
+from enum import Enum
+from typing import List, Optional, Iterable, Dict
 
-from swanlab.error import SyncError
+from swanlab.error import SyncError, PartialSyncError
 from swanlab.log import swanlog
-from swanlab.swanlab_settings import get_settings
+from swanlab.toolkit.telemetry import telemetry
+from .channel import FlushPolicy, Watermark
+from .retry import RetryQueue, Backoff, CircuitBreaker, is_retryable
 from .task_types import UploadType
-from .utils import LogQueue
+from .utils import LogQueue, Clock
 from .utils import ThreadUtil, ThreadTaskABC
 
 
@@ -24,14 +28,54 @@ class LogCollectorTask(ThreadTaskABC):
     并且定义日志上传接口
     """
 
-    def __init__(self, upload_type=UploadType):
+    def __init__(
+        self,
+        upload_type=UploadType,
+        policy: FlushPolicy = None,
+        pending: RetryQueue = None,
+        backoff: Backoff = None,
+        breaker: CircuitBreaker = None,
+        clock: Clock = time.monotonic,
+        watermark: Watermark = None,
+        after: Iterable[Watermark] = (),
+    ):
         self.container: List[LogQueue.MsgType] = []
         """
-        日志容器，存储从管道中获取的日志信息
+        日志容器，存储本次需要上传的日志信息，上传后只保留需要重试的部分
         """
-        self.lock = False
         self.upload_type = upload_type
-        self.upload_interval = get_settings().upload_interval
+        self.policy = policy if policy is not None else FlushPolicy()
+        self.pending = pending if pending is not None else RetryQueue()
+        """
+        待上传队列，从管道中取出的数据先按顺序进入此队列，内存放不下时溢出到磁盘
+        """
+        self.backoff = backoff if backoff is not None else Backoff()
+        self.breaker = breaker if breaker is not None else CircuitBreaker(clock=clock)
+        self.clock = clock
+        # 连续上传失败的次数，以及下一次允许重试的时间
+        self.attempts = 0
+        self.retry_at: Optional[float] = None
+        self.watermark = watermark
+        """
+        本通道的水位线，待上传队列清空时推进到已取出的数据条数
+        """
+        self.after = list(after)
+        """
+        依赖的通道的水位线，上传前需要等待这些通道中先写入的数据上传完成
+        """
+        self.drained = 0
+        self.generation = 0
+        """
+        已经取出数据的刷写代数，待上传队列清空（包括之前等待重试的数据）后才标记完成
+        """
+        # 按数据类型统计的记录数：取出的、上传成功的与无法重试而丢弃的，其余的仍在等待上传
+        self.received: Dict[Enum, int] = defaultdict(int)
+        self.uploaded: Dict[Enum, int] = defaultdict(int)
+        self.lost: Dict[Enum, int] = defaultdict(int)
+        self.aborted = False
+        """
+        结束时超过截止时间，当前请求完成后不再发起新的请求
+        """
 
     @staticmethod
     def report_known_error(errors: List[SyncError]):
@@ -68,55 +112,180 @@ class LogCollectorTask(ThreadTaskABC):
                 upload_tasks_dict[msg[0]].extend(msg[1])
 
         tasks_key_list = [key for key in upload_tasks_dict if len(upload_tasks_dict[key]) > 0]
+        for key in tasks_key_list:
+            telemetry.observe(f"upload.batch.{key.name.lower()}", len(upload_tasks_dict[key]))
 
         # 同步执行所有的上传任务
         results = [x.value['upload'](upload_tasks_dict[x]) for x in tasks_key_list]
         for index, result in enumerate(results):
+            key = tasks_key_list[index]
+            total = len(upload_tasks_dict[key])
             # 如果出现已知问题
             _, e = result
+            # 如果部分数据已经上传成功，只保留需要重试的数据
+            if isinstance(e, PartialSyncError):
+                upload_tasks_dict[key] = e.remaining
             if isinstance(e, SyncError):
                 known_errors.append(e)
-                continue
+                self.uploaded[key] += total - len(upload_tasks_dict[key])
+                if is_retryable(e):
+                    continue
+                # 重试也无法成功的错误（例如请求参数错误），丢弃这部分数据
+                self.discard(key, len(upload_tasks_dict[key]))
+                swanlog.error(f"{key.name} upload failed and cannot be retried, data will be lost!")
             # 如果出现其他问题，没有办法处理，就直接跳过，但是会有警告
             elif e is not None:
-                error = f"{tasks_key_list[index].name} error: {e}, it might be a swanlab bug, data will be lost!"
+                error = f"{key.name} error: {e}, it might be a swanlab bug, data will be lost!"
+                self.discard(key, total)
                 swanlog.error(error)
                 # continue
                 # raise e
+            else:
+                self.uploaded[key] += total
             # 标记所有已经成功的任务
-            success_tasks_type.append(tasks_key_list[index])
+            success_tasks_type.append(key)
 
         # ---------------------------------- 最后错误处理 ----------------------------------
 
-        self.container = [(x, upload_tasks_dict[x]) for x in upload_tasks_dict if x not in success_tasks_type]
+        self.container = [
+            (x, upload_tasks_dict[x])
+            for x in upload_tasks_dict
+            if x not in success_tasks_type and len(upload_tasks_dict[x]) > 0
+        ]
         self.report_known_error(known_errors)
 
-    def task(self, u: ThreadUtil, *args):
+    def discard(self, key: Enum, n: int):
         """
-        定时任务，定时上传日志信息
-        :param u: 线程工具类
+        记录丢弃的数据
+        """
+        telemetry.incr("upload.lost", n)
+        self.lost[key] += n
+
+    def receive(self, msgs: List[LogQueue.MsgType]):
+        """
+        将从管道中取出的数据加入待上传队列，新数据排在待重试数据之后，保证上传顺序
+        """
+        self.pending.extend(msgs)
+        self.drained += len(msgs)
+        for t, items in msgs:
+            self.received[t] += len(items)
+
+    def remaining(self) -> Dict[Enum, int]:
+        """
+        按数据类型统计仍在等待上传的记录数
+        """
+        return {t: n - self.uploaded[t] - self.lost[t] for t, n in self.received.items()}
+
+    def abort(self):
+        """
+        结束时超过截止时间，放弃上传剩余数据，正在进行的请求不会被中断
         """
-        # 从管道中获取所有的日志信息，存储到self.container中
-        if self.lock:
-            return swanlog.debug("upload task still in progressing, passed")
-        self.container.extend(u.queue.get_all())
-        # print("线程" + u.name + "获取到的日志信息: ", self.container)
-        if u.timer.can_run(self.upload_interval, len(self.container) == 0):
-            self.lock = True
+        self.aborted = True
+
+    def next_retry(self) -> Optional[float]:
+        """
+        距离下一次允许上传还需等待的时间，没有待上传的数据时返回 None
+        """
+        if len(self.pending) == 0:
+            return None
+        until = max(self.retry_at or 0, self.breaker.open_until or 0)
+        return max(0.0, until - self.clock())
+
+    def process(self, force: bool = False) -> bool:
+        """
+        按顺序上传待上传队列中的数据，直到队列为空或者上传失败
+        上传失败后按照退避策略和熔断器决定下一次重试的时间，在此之前不再发起请求
+        :param force: 是否忽略退避等待，结束时使用
+        :return: 队列是否已经清空
+        """
+        while len(self.pending) > 0:
+            if self.aborted:
+                return False
+            if not force and self.next_retry() > 0:
+                return False
+            head = self.pending.head()
+            self.container = head
             try:
                 self.upload()
             except Exception as e:
                 swanlog.error(f"upload error: {e}")
-            self.lock = False
+                self.container = []
+                for t, items in head:
+                    self.discard(t, len(items))
+            if len(self.container) == 0:
+                self.pending.pop(len(head))
+                self.attempts = 0
+                self.retry_at = None
+                self.breaker.record_success()
+                continue
+            # 保留需要重试的数据，等待退避时间后重试
+            self.pending.replace(len(head), self.container)
+            self.container = []
+            self.attempts += 1
+            telemetry.incr("upload.retries")
+            self.retry_at = self.clock() + self.backoff.delay(self.attempts)
+            self.breaker.record_failure()
+            return False
+        return True
+
+    def task(self, u: ThreadUtil, *args):
+        """
+        上传任务，阻塞等待直到满足刷写条件后上传日志信息
+        队列为空且没有待重试的数据时无限期休眠，不会定时轮询；存在待重试的数据时在退避时间结束后被唤醒
+        :param u: 线程工具类
+        """
+        if not u.queue.wait(self.policy, self.next_retry()):
+            # 管道已关闭，剩余数据交由回调函数处理
+            return u.timer.cancel()
+        msgs, generation = u.queue.drain()
+        self.generation = max(self.generation, generation)
+        self.receive(msgs)
+        # 取出数据后再读取依赖通道的水位线，此时读到的值一定包含在这些数据之前写入的依赖数据
+        targets = [(w, w.published) for w in self.after]
+        for watermark, target in targets:
+            if not watermark.wait(target):
+                # 水位线已关闭，剩余数据交由回调函数处理
+                return u.timer.cancel()
+        if self.process():
+            self.advance()
+            # 上传失败或者等待重试时刷写请求仍未完成，调用方会等待到超时
+            u.queue.mark_flushed(self.generation)
+
+    def advance(self):
+        """
+        待上传队列已清空，推进本通道的水位线
+        """
+        self.watermark is not None and self.watermark.advance(self.drained)
+
+    def collect(self, channel):
+        """
+        取出管道中的所有剩余数据，此时上传线程已经退出，管道已经关闭
+        NOTE 此函数运行在主线程
+        :param channel: 本通道的管道
+        """
+        # 溢出到磁盘的数据需要多次取出
+        msgs, generation = channel.drain()
+        while msgs:
+            self.receive(msgs)
+            msgs, _ = channel.drain()
+        channel.mark_flushed(generation)
+
+    def finish(self):
+        """
+        结束时上传所有剩余数据，忽略退避等待，被中止或上传失败时停止
+        失败的数据仍然保存在本地备份中，可以通过 `swanlab sync` 重新上传
+        NOTE 此函数运行在结束线程中
+        """
+        if self.process(force=True):
+            self.advance()
+        self.pending.close()
 
     def callback(self, u: ThreadUtil, *args):
         """
-        回调函数，用于结束时的回调
+        回调函数，作为线程的结束任务时一直等待剩余数据上传完成
+        线程池按照通道优先级与截止时间调用 collect 与 finish，不使用此函数
         NOTE 此函数运行在主线程
         :param u: 线程工具类
         """
-        # 如果当前上传任务正在进行，等待上传任务结束
-        while self.lock:
-            time.sleep(0.1)
-        self.container.extend(u.queue.get_all())
-        return self.upload()
+        self.collect(u.queue)
+        self.finish()
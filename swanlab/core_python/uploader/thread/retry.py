@@ -0,0 +1,225 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+r"""
+@DATE: 2025/7/16 10:12
+@File: retry.py
+@IDE: pycharm
+@Description:
+    上传失败重试相关工具：退避策略、熔断器以及可以溢出到磁盘的重试队列
+"""
+import os
+import pickle
+import random
+import shutil
+import tempfile
+import time
+from collections import deque
+from typing import Optional, Callable, Deque, List
+
+from swanlab.error import SyncError, ApiError, PartialSyncError
+from .utils import MsgType, Clock, estimate_size
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    判断上传错误是否可以通过重试解决
+    只有已知的同步错误可以重试，但是客户端错误（4xx，除了 408 请求超时和 429 请求过多）重试也不会成功
+    """
+    if isinstance(error, PartialSyncError):
+        error = error.error
+    if not isinstance(error, SyncError):
+        return False
+    if isinstance(error, ApiError) and error.resp is not None:
+        code = error.resp.status_code
+        return not (400 <= code < 500 and code not in (408, 429))
+    return True
+
+
+class Backoff:
+    """
+    带抖动的指数退避，第 n 次失败后等待 [d/2, d) 秒，其中 d = min(cap, base * 2 ^ (n - 1))
+    """
+
+    def __init__(self, base: float = 1, cap: float = 60, rng: Callable[[], float] = random.random):
+        """
+        :param base: 初始等待时间
+        :param cap: 最长等待时间
+        :param rng: 随机数生成器，返回 [0, 1) 之间的数，测试时可以替换
+        """
+        self.base = base
+        self.cap = cap
+        self.rng = rng
+
+    def delay(self, attempt: int) -> float:
+        """
+        计算第 attempt 次失败后的等待时间
+        """
+        if attempt <= 0:
+            return 0
+        d = min(self.cap, self.base * 2 ** min(attempt - 1, 32))
+        return d / 2 + self.rng() * d / 2
+
+
+class CircuitBreaker:
+    """
+    熔断器，连续失败 threshold 次后熔断 cooldown 秒，期间不再发起请求
+    熔断结束后允许一次试探请求，试探失败则再次熔断
+    """
+
+    def __init__(self, threshold: int = 5, cooldown: float = 60, clock: Clock = time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.open_until: Optional[float] = None
+
+    @property
+    def opened(self) -> bool:
+        return self.open_until is not None and self.clock() < self.open_until
+
+    def allow(self) -> bool:
+        """
+        当前是否允许发起请求
+        """
+        return not self.opened
+
+    def record_success(self):
+        self.failures = 0
+        self.open_until = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.threshold:
+            self.open_until = self.clock() + self.cooldown
+
+
+class RetryQueue:
+    """
+    上传队列，先进先出，内存中最多保存 max_memory 字节（估算值）的数据，超出的部分按顺序写入磁盘
+    一旦有数据写入磁盘，后续数据也会写入磁盘，直到磁盘中的数据被重新读回内存，从而保证整体顺序
+    磁盘数据按段存储，每段为一个文件，包含若干条连续的 pickle 记录
+    """
+
+    SEGMENT_BYTES = 4 * 1024 * 1024
+    """
+    单个磁盘段的最大字节数（估算值），超过后写入新的段
+    """
+
+    def __init__(self, spill_dir: Optional[str] = None, max_memory: int = 16 * 1024 * 1024):
+        """
+        :param spill_dir: 溢出数据的存储目录，为 None 时在第一次溢出时创建临时目录
+        :param max_memory: 内存中最多保存的数据量，单位字节
+        """
+        self.spill_dir = spill_dir
+        self.max_memory = max_memory
+        self.__memory: Deque[MsgType] = deque()
+        self.__memory_bytes = 0
+        # 磁盘段，每一项为 [路径, 记录数, 字节数]，最后一项可能正在写入
+        self.__segments: Deque[list] = deque()
+        self.__writer = None
+        self.__index = 0
+        self.__created_dir: Optional[str] = None
+
+    def __len__(self):
+        return len(self.__memory) + self.spilled
+
+    @property
+    def spilled(self) -> int:
+        """
+        磁盘中的记录数
+        """
+        return sum(s[1] for s in self.__segments)
+
+    @property
+    def memory_bytes(self) -> int:
+        return self.__memory_bytes
+
+    def push(self, msg: MsgType):
+        size = estimate_size(msg)
+        if not self.__segments and (not self.__memory or self.__memory_bytes + size <= self.max_memory):
+            self.__memory.append(msg)
+            self.__memory_bytes += size
+            return
+        self.__spill(msg, size)
+
+    def extend(self, msgs: List[MsgType]):
+        for msg in msgs:
+            self.push(msg)
+
+    def head(self) -> List[MsgType]:
+        """
+        返回内存中的数据，如果内存有空余，会先从磁盘中按顺序读取数据
+        """
+        while self.__segments and (not self.__memory or self.__memory_bytes < self.max_memory):
+            self.__load()
+        return list(self.__memory)
+
+    def pop(self, n: int):
+        """
+        移除内存中的前 n 条数据，通常在这些数据上传成功后调用
+        """
+        for _ in range(min(n, len(self.__memory))):
+            self.__memory_bytes -= estimate_size(self.__memory.popleft())
+        self.__memory_bytes = max(0, self.__memory_bytes)
+
+    def replace(self, n: int, msgs: List[MsgType]):
+        """
+        将内存中的前 n 条数据替换为 msgs，通常在部分数据上传失败后调用，保留需要重试的部分
+        """
+        self.pop(n)
+        for msg in reversed(msgs):
+            self.__memory.appendleft(msg)
+            self.__memory_bytes += estimate_size(msg)
+
+    def close(self):
+        """
+        清理磁盘上的溢出数据
+        """
+        self.__close_writer()
+        for path, _, _ in self.__segments:
+            if os.path.exists(path):
+                os.remove(path)
+        self.__segments.clear()
+        if self.__created_dir is not None:
+            shutil.rmtree(self.__created_dir, ignore_errors=True)
+            self.__created_dir = None
+        elif self.spill_dir is not None and os.path.isdir(self.spill_dir) and not os.listdir(self.spill_dir):
+            os.rmdir(self.spill_dir)
+
+    def __close_writer(self):
+        if self.__writer is not None:
+            self.__writer.close()
+            self.__writer = None
+
+    def __spill(self, msg: MsgType, size: int):
+        if self.__writer is None or self.__segments[-1][2] >= self.SEGMENT_BYTES:
+            self.__close_writer()
+            if self.spill_dir is None:
+                self.spill_dir = self.__created_dir = tempfile.mkdtemp(prefix="swanlab-retry-")
+            os.makedirs(self.spill_dir, exist_ok=True)
+            path = os.path.join(self.spill_dir, f"{self.__index:08d}.pkl")
+            self.__index += 1
+            self.__writer = open(path, "wb")
+            self.__segments.append([path, 0, 0])
+        # 枚举值中包含上传函数，无法直接序列化，因此按名称存储
+        t, items = msg
+        pickle.dump((type(t), t.name, items), self.__writer, protocol=pickle.HIGHEST_PROTOCOL)
+        segment = self.__segments[-1]
+        segment[1] += 1
+        segment[2] += size
+
+    def __load(self):
+        """
+        将最早的一个磁盘段读回内存
+        """
+        path, count, _ = self.__segments.popleft()
+        if not self.__segments:
+            # 正在写入的段被读取，后续数据写入新的段
+            self.__close_writer()
+        with open(path, "rb") as f:
+            for _ in range(count):
+                cls, name, items = pickle.load(f)
+                msg = (cls[name], items)
+                self.__memory.append(msg)
+                self.__memory_bytes += estimate_size(msg)
+        os.remove(path)
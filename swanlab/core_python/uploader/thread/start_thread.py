@@ -7,21 +7,24 @@ r"""
 @Description:
     生成线程池，生成通信管道
 """
+import os
 import threading
 import time
-from queue import Queue
-from typing import List, Tuple, Callable, Dict
+from typing import List, Tuple, Callable, Dict, Optional
 
 from swanlab.log import swanlog
+from .channel import MsgChannel, FlushPolicy, OverflowPolicy
+from .lane import Lane, LaneRouter, default_lanes
 from .log_collector import LogCollectorTask
-from .utils import LogQueue, TimerFlag
+from .retry import RetryQueue
+from .utils import LogQueue, TimerFlag, Clock
 from .utils import ThreadUtil
 
 
 class ThreadPool:
     """
     线程池类，负责管理线程和为线程生成通信管道
-    只生成一个管道，用于其他线程与主要线程的通信
+    每个上传通道拥有独立的管道与上传线程，其他线程通过同一个写入队列与上传通道通信，数据按类型路由到对应通道
     """
 
     SLEEP_TIME = 1
@@ -30,27 +33,70 @@ class ThreadPool:
     """
     UPLOAD_THREAD_NAME = "MsgUploader"
     """
-    数据上传线程的名称
+    数据上传线程的名称前缀，每个上传通道的线程名称为 {UPLOAD_THREAD_NAME}-{通道名称}
     """
 
-    def __init__(self, upload_sleep_time: float = None):
+    def __init__(
+        self,
+        policy: FlushPolicy = None,
+        clock: Clock = time.monotonic,
+        spill_dir: Optional[str] = None,
+        retry_memory: int = 16 * 1024 * 1024,
+        queue_max_records: Optional[int] = None,
+        queue_max_bytes: Optional[int] = None,
+        queue_overflow: OverflowPolicy = "spill",
+        queue_timeout: float = 10,
+        lanes: Optional[List[Lane]] = None,
+    ):
+        """
+        :param policy: 上传刷写策略，为 None 时使用默认策略，没有单独设置刷写策略的通道使用此策略
+        :param clock: 时钟函数，测试时可以替换为假时钟
+        :param spill_dir: 数据超出内存限制时的溢出目录，为 None 时使用临时目录
+        :param retry_memory: 每个通道待上传数据在内存中的最大字节数（估算值）
+        :param queue_max_records: 每个通道的管道中最多保存的记录数，为 None 时不限制
+        :param queue_max_bytes: 每个通道的管道中最多保存的数据量（估算值），为 None 时不限制
+        :param queue_overflow: 管道满时的处理策略
+        :param queue_timeout: 管道满时写入方最多阻塞的时间，仅在 block 策略下生效
+        :param lanes: 上传通道，为 None 时使用默认通道
+        """
         self.thread_pool = {}
-        # 日志聚合器
-        self.collector = LogCollectorTask()
+        self.spill_dir = spill_dir
+        self.policy = policy if policy is not None else FlushPolicy()
         # timer集合
         self.thread_timer: Dict[str, TimerFlag] = {}
         self.__callbacks: List[Callable] = []
-        self.__queue = Queue()
-        # 生成数据上传线程，此线程包含聚合器和数据上传任务，负责收集所有线程向主线程发送的日志信息
-        self.upload_thread = self.create_thread(
-            target=self.collector.task,
-            args=(),
-            name=self.UPLOAD_THREAD_NAME,
-            sleep_time=upload_sleep_time,
-            callback=self.collector.callback,
-        )
+        self.lanes: Dict[str, Lane] = {lane.name: lane for lane in (lanes if lanes is not None else default_lanes())}
+        for lane in self.lanes.values():
+            lane.channel = MsgChannel(
+                clock=clock,
+                max_records=queue_max_records,
+                max_bytes=queue_max_bytes,
+                overflow=queue_overflow,
+                block_timeout=queue_timeout,
+                spill_dir=self.__spill_path(lane.name, "queue"),
+            )
+            lane.collector = LogCollectorTask(
+                upload_type=lane.types,
+                policy=lane.policy if lane.policy is not None else self.policy,
+                pending=RetryQueue(spill_dir=self.__spill_path(lane.name, "pending"), max_memory=retry_memory),
+                clock=clock,
+                watermark=lane.watermark,
+                after=[self.lanes[name].watermark for name in lane.after],
+            )
+        self.__router = LaneRouter(list(self.lanes.values()))
+        # 为每个通道生成数据上传线程，负责收集所有线程向此通道发送的日志信息并上传
+        # 上传任务本身会阻塞等待刷写条件，因此不需要额外休眠
+        # 结束时的剩余数据由 finish 按照通道优先级上传，不注册回调函数
+        for lane in self.lanes.values():
+            lane.thread = self.create_thread(
+                target=lane.collector.task,
+                args=(),
+                name=f"{self.UPLOAD_THREAD_NAME}-{lane.name}",
+                sleep_time=0,
+                queue=LogQueue(queue=lane.channel, readable=True, writable=False),
+            )
 
-        self.queue = LogQueue(queue=self.__queue, readable=False, writable=True)
+        self.queue = LogQueue(queue=self.__router, readable=False, writable=True)
         """
         一个线程安全的队列，用于主线程向数据上传线程通信
         """
@@ -62,6 +108,7 @@ class ThreadPool:
         name: str = None,
         sleep_time: float = None,
         callback: Callable = None,
+        queue: LogQueue = None,
     ) -> threading.Thread:
         """
         创建一个线程
@@ -70,6 +117,7 @@ class ThreadPool:
         :param name: 线程名称
         :param sleep_time: 任务休眠时间
         :param callback: 线程结束时的回调函数
+        :param queue: 线程使用的队列，为 None 时使用只写队列
         :return: 线程对象
         """
         if name is None:
@@ -78,10 +126,7 @@ class ThreadPool:
             raise Exception(f"Thread name {name} already exists")
         if sleep_time is None:
             sleep_time = self.SLEEP_TIME
-        if name == self.UPLOAD_THREAD_NAME:
-            q = LogQueue(queue=self.__queue, readable=True, writable=False)
-        else:
-            q = LogQueue(queue=self.__queue, readable=False, writable=True)
+        q = queue if queue is not None else LogQueue(queue=self.__router, readable=False, writable=True)
         thread_util = ThreadUtil(q, name)
         callback = ThreadUtil.wrapper_callback(callback, (thread_util, *args)) if callback is not None else None
         task = self._create_loop(name, sleep_time, target, (thread_util, *args))
@@ -95,9 +140,10 @@ class ThreadPool:
     @property
     def sub_threads(self):
         """
-        除了日志上传线程外的所有线程
+        除了数据上传线程外的所有线程
         """
-        return {name: thread for name, thread in self.thread_pool.items() if name != self.UPLOAD_THREAD_NAME}
+        uploaders = {lane.thread for lane in self.lanes.values()}
+        return {name: thread for name, thread in self.thread_pool.items() if thread not in uploaders}
 
     def _create_loop(self, name: str, sleep_time: float, task: Callable, args: Tuple[ThreadUtil, ...]) -> [Callable]:
         """
@@ -117,33 +163,124 @@ class ThreadPool:
                 swanlog.debug(f"{threading.current_thread().name} is running")
                 # 如果task是同步函数，直接调用，否则使用await调用
                 task(*args)
-                time.sleep(sleep_time)
+                if sleep_time > 0:
+                    time.sleep(sleep_time)
                 # 如果定时器停止，则退出循环
                 if not timer.running:
                     return swanlog.debug(f"{threading.current_thread().name} is stopped")
 
         return new_task
 
-    def finish(self):
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        [在主线程中] 唤醒所有数据上传线程，立即上传当前队列中的所有数据，并等待上传完成
+        :param timeout: 最长等待时间，单位秒，为 None 时一直等待
+        :return: 是否在超时前上传完成
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        channels = [lane.channel for lane in self.lanes.values() if not lane.channel.closed]
+        requests = [(channel, channel.request_flush()) for channel in channels]
+        for channel, generation in requests:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not channel.wait_flushed(generation, remaining):
+                return False
+        return True
+
+    def finish(self, timeout: Optional[float] = None) -> dict:
         """
         [在主线程中] 结束线程池中的所有线程，并执行所有线程的结束任务
+        剩余数据在单独的结束线程中按照通道优先级依次上传，超过 timeout 后不再发起新的请求，
+        正在进行的请求不会被中断，但也不再等待，未上传的数据仍然保存在本地备份中
+        :param timeout: 最长等待时间，单位秒，为 None 时一直等待所有数据上传完成
+        :return: 上传报告，见 report
         """
-        # print("线程池准备停止")
-        # 第一步停止所有非日志上传线程
+        deadline = None if timeout is None else time.monotonic() + timeout
+        # 停止所有线程的任务
         for name, _ in self.thread_pool.items():
             self.thread_timer[name].cancel()
+        # 关闭管道与水位线，唤醒正在等待的数据上传线程，并等待其完成当前上传后退出
+        for lane in self.lanes.values():
+            lane.channel.close()
+            lane.watermark.close()
+        lanes = sorted(self.lanes.values(), key=lambda x: x.priority)
+        for lane in lanes:
+            lane.thread.join(self.__remaining(deadline))
+        # 超时仍未退出的上传线程继续持有其待上传队列，结束时不再处理这些通道
+        finishing = [lane for lane in lanes if not lane.thread.is_alive()]
+        for lane in finishing:
+            lane.collector.collect(lane.channel)
+        finisher = threading.Thread(
+            target=lambda: [lane.collector.finish() for lane in finishing],
+            daemon=True,
+            name=f"{self.UPLOAD_THREAD_NAME}-finish",
+        )
+        finisher.start()
+        finisher.join(self.__remaining(deadline))
+        completed = not finisher.is_alive() and len(finishing) == len(lanes)
+        if not completed:
+            for lane in lanes:
+                lane.collector.abort()
+        # 倒序执行其他线程的回调函数
+        [cb() for cb in self.__callbacks[::-1]]
+        for lane in finishing:
+            lane.channel.cleanup()
+            self.__remove_empty(self.__spill_path(lane.name))
+        self.__remove_empty(self.spill_dir)
+        report = self.report()
+        report["completed"] = completed and not any(report["remaining"].values())
+        remaining = {k: v for k, v in report["remaining"].items() if v > 0}
+        if remaining:
+            swanlog.warning(
+                f"{sum(remaining.values())} records ({', '.join(f'{k}: {v}' for k, v in remaining.items())}) "
+                "were not uploaded before the run finished, you can upload them later with `swanlab sync`."
+            )
+        return report
 
-        # 由于线程池中的线程是daemon线程，并且已经cancel()，因此不需要等待，因为不会再有新的消息产生
-        # for _, thread in self.thread_pool.items():
-        #     thread.join()
-        #     # print(f"{thread.name} is stopped")
+    def report(self) -> dict:
+        """
+        按数据类型统计的上传报告：
+        1. uploaded: 上传成功的记录数
+        2. remaining: 未上传的记录数，这些数据仍然保存在本地备份中
+        3. lost: 无法重试而丢弃的记录数
+        """
+        report = {"uploaded": {}, "remaining": {}, "lost": {}}
+        for lane in self.lanes.values():
+            collector = lane.collector
+            remaining = collector.remaining()
+            for t in lane.types:
+                name = t.name.lower()
+                report["uploaded"][name] = collector.uploaded[t]
+                report["remaining"][name] = remaining.get(t, 0)
+                report["lost"][name] = collector.lost[t]
+        return report
 
-        # print("非日志上传线程结束")
-        # 倒序执行回调函数
+    @staticmethod
+    def __remaining(deadline: Optional[float]) -> Optional[float]:
+        return None if deadline is None else max(0.0, deadline - time.monotonic())
 
-        [cb() for cb in self.__callbacks[::-1]]
-        # 停止日志上传线程的任务
-        self.thread_timer[self.UPLOAD_THREAD_NAME].cancel()
-        # 等待日志上传线程结束
-        self.upload_thread.join()
-        # print("线程池结束")
+    @staticmethod
+    def __remove_empty(path: Optional[str]):
+        if path is not None and os.path.isdir(path) and not os.listdir(path):
+            os.rmdir(path)
+
+    def __spill_path(self, *names: str) -> Optional[str]:
+        return None if self.spill_dir is None else os.path.join(self.spill_dir, *names)
+
+    def stats(self) -> dict:
+        """
+        上传状态，包括所有通道的管道深度之和、最早数据的等待时间、丢弃的记录数以及等待重试的数据
+        每个通道的状态保存在 lanes 字段中
+        """
+        lanes = {}
+        for name, lane in self.lanes.items():
+            stats = lane.channel.stats()
+            stats["pending"] = len(lane.collector.pending)
+            stats["pending_spilled"] = lane.collector.pending.spilled
+            lanes[name] = stats
+        total = {
+            key: sum(stats[key] for stats in lanes.values())
+            for key in ["records", "bytes", "dropped", "spilled", "pending", "pending_spilled"]
+        }
+        total["oldest_age"] = max([stats["oldest_age"] for stats in lanes.values()], default=0.0)
+        total["lanes"] = lanes
+        return total
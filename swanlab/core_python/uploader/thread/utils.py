@@ -7,23 +7,54 @@ r"""
 @Description:
     日志队列
 """
-from queue import Queue
-from typing import Tuple, Callable, List
 import time
 from abc import ABC, abstractmethod
+from typing import Tuple, Callable, List, Optional, Union, TYPE_CHECKING
+
+from swanlab.core_python.client.cos import buffer_size
 from .task_types import UploadType
 
+if TYPE_CHECKING:
+    from .channel import MsgChannel, FlushPolicy
+    from .lane import LaneRouter
 
-class LogQueue:
+MsgType = Tuple[UploadType, List]
+"""
+传入日志聚合器的日志信息类型，应该是一个元组，第一个元素是文件类型，第二个元素是日志信息，日志信息应该是一个列表
+"""
+
+Clock = Callable[[], float]
+"""
+时钟函数类型，返回单调递增的秒数，测试时可以替换为假时钟
+"""
+
+
+def estimate_size(msg: MsgType) -> int:
     """
-    日志队列，定义一些工具和可读可写性质
+    估算一条日志信息的大小（字节），只用于判断是否需要刷写，不要求精确
+    1. 媒体指标按照其携带的文件大小计算
+    2. 终端日志按照日志内容长度计算
+    3. 其余类型按照固定大小计算
     """
-    MsgType = Tuple[UploadType, List]
+    size = 0
+    for item in msg[1]:
+        buffers = getattr(item, "buffers", None)
+        if buffers:
+            size += sum(buffer_size(buffer) for buffer in buffers)
+        elif isinstance(item, dict) and "contents" in item:
+            size += sum(len(content["message"]) for content in item["contents"])
+        size += 128
+    return size
+
+
+class LogQueue:
     """
-    传入日志聚合器的日志信息类型，应该是一个元组，第一个元素是文件类型，第二个元素是日志信息，日志信息应该是一个列表
+    日志队列，定义一些工具和可读可写性质
     """
 
-    def __init__(self, queue: Queue, readable: bool = True, writable: bool = True):
+    MsgType = MsgType
+
+    def __init__(self, queue: Union["MsgChannel", "LaneRouter"], readable: bool = True, writable: bool = True):
         self.q = queue
         self.__readable = readable
         self.__writable = writable
@@ -61,10 +92,7 @@ class LogQueue:
         """
         if not self.readable:
             raise Exception("The queue is not readable")
-        msgs = []
-        while not self.q.empty():
-            msgs.append(self.q.get())
-        return msgs
+        return self.q.drain()[0]
 
     def put_all(self, msgs: List[MsgType]):
         """
@@ -76,6 +104,30 @@ class LogQueue:
         for msg in msgs:
             self.q.put(msg)
 
+    def wait(self, policy: "FlushPolicy", idle_timeout: Optional[float] = None) -> bool:
+        """
+        阻塞等待直到需要上传，参见 MsgChannel.wait
+        """
+        if not self.readable:
+            raise Exception("The queue is not readable")
+        return self.q.wait(policy, idle_timeout)
+
+    def drain(self) -> Tuple[List[MsgType], int]:
+        """
+        取出所有日志信息以及对应的刷写代数，参见 MsgChannel.drain
+        """
+        if not self.readable:
+            raise Exception("The queue is not readable")
+        return self.q.drain()
+
+    def mark_flushed(self, generation: int):
+        """
+        标记刷写完成，参见 MsgChannel.mark_flushed
+        """
+        if not self.readable:
+            raise Exception("The queue is not readable")
+        self.q.mark_flushed(generation)
+
 
 class TimerFlag:
     """
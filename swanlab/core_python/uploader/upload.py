@@ -5,11 +5,15 @@
 @description: 定义上传函数
 """
 
+import json
 from typing import List, Union, Literal
 
 from swanlab.log import swanlog
+from .adaptive import get_controller
+from .batch import create_chunks, upload_chunks, get_executor
 from .model import ColumnModel, MediaModel, ScalarModel, FileModel, LogModel
 from ..client import get_client, sync_error_handler, decode_response
+from ..client.cos import buffer_size
 from ...error import ApiError
 
 house_url = '/house/metrics'
@@ -65,29 +69,80 @@ def upload_logs(logs: List[LogModel]):
     return None
 
 
+def media_size(media: MediaModel) -> int:
+    """
+    估算媒体指标的上传大小，包含其文件大小
+    """
+    size = len(json.dumps(media.to_dict()))
+    for buffer in media.buffers or []:
+        size += buffer_size(buffer)
+    return size
+
+
 @sync_error_handler
 def upload_media_metrics(media_metrics: List[MediaModel]):
     """
-    上传指标的媒体数据
+    上传指标的媒体数据，数据将被分块并发上传，每个块先上传文件再上传指标信息，分块大小与并发数由自适应控制器调整
     :param media_metrics: 媒体指标数据集合
     """
     client = get_client()
-    buffers = []
-    for media in media_metrics:
-        media.buffers and buffers.extend(media.buffers)
-    if not client.pending:
+    if client.pending:
+        return
+
+    def send(chunk: List[MediaModel]):
+        buffers = []
+        for media in chunk:
+            media.buffers and buffers.extend(media.buffers)
         client.upload_files(buffers)
         # 上传指标信息
-        trace_metrics(house_url, create_data([x.to_dict() for x in media_metrics], MediaModel.type.value))
+        trace_metrics(house_url, create_data([x.to_dict() for x in chunk], MediaModel.type.value))
+
+    controller = get_controller(MediaModel.type.value)
+    chunks = create_chunks(
+        media_metrics,
+        key=lambda x: x.key,
+        size=media_size,
+        max_records=controller.chunk_records,
+        max_bytes=controller.chunk_bytes,
+    )
+    try:
+        upload_chunks(
+            chunks,
+            controller.track(send, lambda: client.pending),
+            max_workers=controller.concurrency,
+            executor=get_executor(controller.name),
+        )
+    finally:
+        controller.adjust()
 
 
 @sync_error_handler
 def upload_scalar_metrics(scalar_metrics: List[ScalarModel]):
     """
-    上传指标的标量数据
+    上传指标的标量数据，数据将被分块并发上传，分块大小与并发数由自适应控制器根据请求延迟与错误调整
     """
-    data = create_data([x.to_dict() for x in scalar_metrics], ScalarModel.type.value)
-    trace_metrics(house_url, data)
+    client = get_client()
+
+    def send(chunk: List[ScalarModel]):
+        trace_metrics(house_url, create_data([x.to_dict() for x in chunk], ScalarModel.type.value))
+
+    controller = get_controller(ScalarModel.type.value)
+    chunks = create_chunks(
+        scalar_metrics,
+        key=lambda x: x.key,
+        size=lambda x: len(json.dumps(x.to_dict())),
+        max_records=controller.chunk_records,
+        max_bytes=controller.chunk_bytes,
+    )
+    try:
+        upload_chunks(
+            chunks,
+            controller.track(send, lambda: client.pending),
+            max_workers=controller.concurrency,
+            executor=get_executor(controller.name),
+        )
+    finally:
+        controller.adjust()
 
 
 @sync_error_handler
@@ -15,10 +15,13 @@ from .run import (
     get_url,
     get_project_url,
     config,
+    SystemCollector,
+    SystemMetric,
 )
 from .sdk import (
     login,
     register_callbacks,
+    register_collectors,
     init,
     log,
     finish,
@@ -8,17 +8,27 @@ r"""
     回调函数注册抽象模块
 """
 import atexit
+import signal
 import sys
+import threading
+import time
 import traceback
+from typing import Optional
 
 from swanlab.data.run import SwanLabRunState, get_run
 from swanlab.log import swanlog
+from swanlab.log.policy import ConsolePolicy
 from swanlab.swanlab_settings import get_settings
 from swanlab.toolkit import SwanKitCallback
 from . import utils
 from ..porter import DataPorter
 from ..store import get_run_store
 
+SIGTERM_TIMEOUT = 25
+"""
+收到 SIGTERM 信号后上传剩余数据的默认最长时间，单位秒，常见调度系统在 SIGTERM 与 SIGKILL 之间的宽限期为 30 秒
+"""
+
 
 class SwanLabRunCallback(SwanKitCallback):
     """
@@ -34,6 +44,10 @@ class SwanLabRunCallback(SwanKitCallback):
         self.run_store = get_run_store()
         self.porter = DataPorter()
         self.user_settings = get_settings()
+        # 注册 SIGTERM 处理函数前的处理函数，没有注册时为 None
+        self._sigterm_previous = None
+        # 收到 SIGTERM 信号的时间，用于计算剩余的结束时间
+        self._terminated_at: Optional[float] = None
 
     def _register_sys_callback(self):
         """
@@ -41,6 +55,11 @@ class SwanLabRunCallback(SwanKitCallback):
         """
         sys.excepthook = self._except_handler
         atexit.register(self._clean_handler)
+        if self.user_settings.finish_on_sigterm:
+            # 信号处理函数只能在主线程中注册
+            if threading.current_thread() is not threading.main_thread():
+                return swanlog.debug("Not in the main thread, skip registering the SIGTERM handler.")
+            self._sigterm_previous = signal.signal(signal.SIGTERM, self._sigterm_handler)
 
     def _unregister_sys_callback(self):
         """
@@ -48,10 +67,31 @@ class SwanLabRunCallback(SwanKitCallback):
         """
         sys.excepthook = sys.__excepthook__
         atexit.unregister(self._clean_handler)
+        if self._sigterm_previous is not None and threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, self._sigterm_previous)
+            self._sigterm_previous = None
+
+    def _sigterm_handler(self, signum, frame):
+        """
+        SIGTERM 信号处理函数
+        没有用户注册的处理函数时抛出 SystemExit，主线程中正在执行的代码正常展开并释放持有的锁，
+        随后由退出清理函数在剩余的时间内结束实验；否则交给用户注册的处理函数决定是否退出。
+        原来的处理方式为忽略（SIG_IGN）时只记录日志，进程继续运行
+        """
+        if self._sigterm_previous is signal.SIG_IGN:
+            return swanlog.debug("SIGTERM received but it is ignored, keep running.")
+        if self._terminated_at is not None:
+            return swanlog.debug("Duplicate SIGTERM, ignore it.")
+        self._terminated_at = time.monotonic()
+        swanlog.warning("SIGTERM received, finishing the run.")
+        if callable(self._sigterm_previous):
+            return self._sigterm_previous(signum, frame)
+        raise SystemExit(128 + signum)
 
     def _clean_handler(self):
         """
         正常退出清理函数，此函数调用`run.finish`
+        因 SIGTERM 退出时，实验被标记为失败，并且只在剩余的时间内上传数据
         """
         run = get_run()
         if run is None:
@@ -59,7 +99,13 @@ class SwanLabRunCallback(SwanKitCallback):
         # 打印训练结束信息
         utils.print_train_finish(self.run_store.run_name)
         # 如果正在运行
-        run.finish() if run.running else swanlog.debug("Duplicate finish, ignore it.")
+        if not run.running:
+            return swanlog.debug("Duplicate finish, ignore it.")
+        if self._terminated_at is None:
+            return run.finish()
+        timeout = self.user_settings.finish_timeout or SIGTERM_TIMEOUT
+        timeout = max(0.0, timeout - (time.monotonic() - self._terminated_at))
+        run.finish(SwanLabRunState.CRASHED, error="Terminated by SIGTERM", timeout=timeout)
 
     @staticmethod
     def _except_handler(tp, val, tb):
@@ -94,7 +140,34 @@ class SwanLabRunCallback(SwanKitCallback):
             max_log_length=self.user_settings.max_log_length,
             handler=handler,
             epoch=self.run_store.log_epoch,
+            progress_interval=self.user_settings.log_progress_interval,
+            policy=self._create_console_policy(),
         )
 
+    def _create_console_policy(self) -> Optional[ConsolePolicy]:
+        """
+        根据用户设置创建终端输出的采集策略，没有开启任何选项时返回 None，每一行不需要经过策略的锁
+        """
+        settings = self.user_settings
+        if not (
+            settings.log_coalesce
+            or settings.log_max_lines_per_second is not None
+            or settings.log_max_bytes_per_second is not None
+            or settings.log_drop_patterns
+        ):
+            return None
+        return ConsolePolicy(
+            coalesce=settings.log_coalesce,
+            max_lines=settings.log_max_lines_per_second,
+            max_bytes=settings.log_max_bytes_per_second,
+            drop_patterns=settings.log_drop_patterns,
+        )
+
+    def on_flush(self, timeout: float = None) -> bool:
+        """
+        立即上传已经记录的数据，由 `run.flush` 触发
+        """
+        return self.porter.flush(timeout)
+
     def __str__(self):
         raise NotImplementedError("Please implement this method")
@@ -167,18 +167,24 @@ class CloudPyCallback(SwanLabRunCallback):
             return
         self.porter.trace_metric(metric_info)
 
-    def on_stop(self, error: str = None, *args, **kwargs):
+    def on_stop(self, error: str = None, timeout: Optional[float] = None, *args, **kwargs):
         success = get_run().success
         http = get_client()
         if http.pending:
             swanlog.warning("This run was destroyed but it is pending!")
         # 打印信息
         U.print_cloud_web()
+        # 终端输出在后台线程中处理，等待已经输出的内容交给 porter
+        swanlog.flush(timeout)
         error_epoch = swanlog.epoch + 1
         self._unregister_sys_callback()
-        self.porter.close_trace(success, error=error, epoch=error_epoch)
+        report = self.porter.close_trace(success, error=error, epoch=error_epoch, timeout=timeout)
         # 更新实验状态，在此之后实验会话关闭
         http.update_state(success)
         reset_client()
-        if not self.user_settings.backup:
+        if report is not None and not report["completed"]:
+            # 未上传的数据需要通过本地备份重新上传，即使用户关闭了备份也保留实验目录
+            swanlog.warning(f"Run `swanlab sync {self.run_store.run_dir}` to upload the rest of this run.")
+        elif not self.user_settings.backup:
             shutil.rmtree(self.run_store.run_dir, ignore_errors=True)
+        return report
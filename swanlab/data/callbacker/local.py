@@ -149,4 +149,6 @@ class LocalRunCallback(SwanLabRunCallback):
         # 打印信息
         utils.print_watch(self.run_store.swanlog_dir)
         self._unregister_sys_callback()
+        # 终端输出在后台线程中处理，等待已经输出的内容交给 porter
+        swanlog.flush()
         self.porter.close_trace(success=get_run().success, error=error, epoch=swanlog.epoch + 1)
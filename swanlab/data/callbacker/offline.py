@@ -59,6 +59,8 @@ class OfflineCallback(SwanLabRunCallback):
     def on_stop(self, error: str = None, *args, **kwargs):
         U.print_sync(self.run_store.run_dir)
         success = get_run().success
+        # 终端输出在后台线程中处理，等待已经输出的内容交给 porter
+        swanlog.flush()
         error_epoch = swanlog.epoch + 1
         self._unregister_sys_callback()
         self.porter.close_trace(success, error=error, epoch=error_epoch)
@@ -11,6 +11,7 @@ from typing import Union, List, Optional
 
 from swanlab.error import DataTypeError
 from swanlab.toolkit import ParseResult, ParseErrorInfo, MediaType, ChartReference
+from swanlab.toolkit.telemetry import telemetry
 from .custom_charts import Echarts
 from .line import Line
 
@@ -117,7 +118,8 @@ class DataWrapper:
         for i in self.__data:
             try:
                 i.inject(**kwargs)
-                d, r = i.parse()
+                with telemetry.timer("media.encode.time"):
+                    d, r = i.parse()
             except DataTypeError as e:
                 self.__error = ParseErrorInfo(e.expected, e.got, result.chart)
                 return None
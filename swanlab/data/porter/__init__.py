@@ -12,16 +12,21 @@ SwanLab 不生产数据，我们只是 AI 训练的搬运工，祝愿所有训
 """
 
 import os
-from concurrent.futures import ThreadPoolExecutor
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from typing import Optional, Literal, List, Union, Tuple
 
 import wrapt
 
 from swanlab.core_python import get_client
-from swanlab.core_python.uploader.thread import ThreadPool, UploadType
+from swanlab.core_python.uploader.adaptive import get_controller, reset_controllers, controllers
+from swanlab.core_python.uploader.batch import shutdown_executors
+from swanlab.core_python.uploader.model import MetricType
+from swanlab.core_python.uploader.thread import ThreadPool, UploadType, FlushPolicy, default_lanes
 from swanlab.data.store import RunStore, get_run_store, reset_run_store
 from swanlab.log.type import LogData
 from swanlab.proto.v0 import Log, Header, Project, Experiment, Column, Metric, BaseModel, Runtime, Footer, Media, Scalar
+from swanlab.swanlab_settings import get_settings
 from swanlab.toolkit import MetricInfo, ColumnInfo, RuntimeInfo, create_time
 from .datastore import DataStore
 
@@ -101,6 +106,40 @@ def async_io():
     return wrapper
 
 
+def create_pool(run_dir: str) -> ThreadPool:
+    """
+    根据用户设置创建上传线程池
+    标量与媒体通道的上传间隔由对应的自适应控制器调整，其他通道使用固定的上传间隔
+    :param run_dir: 实验目录，上传失败的数据超出内存限制时溢出到此目录下
+    """
+    settings = get_settings()
+
+    def create_policy() -> FlushPolicy:
+        return FlushPolicy(
+            max_records=settings.upload_max_records,
+            max_bytes=settings.upload_max_bytes,
+            max_latency=settings.upload_interval,
+        )
+
+    reset_controllers()
+    shutdown_executors()
+    lanes = default_lanes()
+    for lane in lanes:
+        if lane.name in (MetricType.SCALAR.value, MetricType.MEDIA.value):
+            lane.policy = create_policy()
+            get_controller(lane.name).bind(lane.policy)
+    return ThreadPool(
+        lanes=lanes,
+        policy=create_policy(),
+        spill_dir=os.path.join(run_dir, "retry"),
+        retry_memory=settings.upload_retry_memory,
+        queue_max_records=settings.upload_queue_max_records,
+        queue_max_bytes=settings.upload_queue_max_bytes,
+        queue_overflow=settings.upload_queue_overflow,
+        queue_timeout=settings.upload_queue_timeout,
+    )
+
+
 class DataPorter:
     _instance: Optional['DataPorter'] = None
     _run_store: Optional[RunStore] = None
@@ -178,7 +217,7 @@ class DataPorter:
                 get_client()
             except ValueError:
                 raise ValueError("Client not initialized when creating ProtoTransfer instance")
-            self._pool = ThreadPool()
+            self._pool = create_pool(self._run_store.run_dir)
         elif backend == 'go':
             raise NotImplementedError("swanlab-core is not ready yet.")
         elif backend == 'none':
@@ -268,7 +307,7 @@ class DataPorter:
                     os.makedirs(path, exist_ok=True)
                     # 写入数据
                     with open(os.path.join(path, data.metric["data"][i]), "wb") as f:
-                        f.write(r.getvalue())
+                        f.write(r.getbuffer())
             self._publish((UploadType.MEDIA_METRIC, [media.to_media_model(data.swanlab_media_dir)]))
             return media
 
@@ -304,13 +343,67 @@ class DataPorter:
         self._publish((UploadType.LOG, [log.to_log_model() for log in logs]))
         return logs
 
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        立即上传当前已经记录的所有数据，并等待上传完成，只在实验日志跟踪模式下生效
+        :param timeout: 最长等待时间，单位秒，为 None 时一直等待
+        :return: 是否在超时前完成
+        """
+        if self._closed or self._mode != 1:
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def remaining():
+            return None if deadline is None else max(0.0, deadline - time.monotonic())
+
+        # 等待工作线程处理完已提交的任务，单工作线程保证了任务的先后顺序
+        if self._executor is not None and not self._executor._shutdown:
+            try:
+                self._executor.submit(lambda: None).result(remaining())
+            except FutureTimeoutError:
+                return False
+        self._f.ensure_flushed()
+        if self._pool is not None:
+            return self._pool.flush(remaining())
+        return True
+
+    @property
+    def trace_queue(self) -> int:
+        """
+        等待工作线程处理的数据条数
+        """
+        if self._executor is None:
+            return 0
+        return self._executor._work_queue.qsize()
+
+    def stats(self) -> Optional[dict]:
+        """
+        上传线程池的状态，未开启上传时返回 None
+        adaptive 字段为自适应控制器当前的分块大小、并发数与上传间隔
+        """
+        if self._pool is None or self._closed:
+            return None
+        stats = self._pool.stats()
+        stats["adaptive"] = {name: controller.state() for name, controller in list(controllers.items())}
+        return stats
+
     @traced()
-    def close_trace(self, success: bool, error: str = None, epoch: int = None):
+    def close_trace(
+        self,
+        success: bool,
+        error: str = None,
+        epoch: int = None,
+        timeout: Optional[float] = None,
+    ) -> Optional[dict]:
         """
         停止日志跟踪，清理相关资源
+        所有数据都会先写入本地备份，然后在 timeout 内上传剩余数据，超时后未上传的数据可以通过 `swanlab sync` 重新上传
+        :param timeout: 上传剩余数据的最长时间，单位秒，为 None 时一直等待
+        :return: 上传报告，见 ThreadPool.report，没有开启上传时返回 None
         """
         assert self._closed is False, "DataPorter has already rested, cannot close trace again."
         assert self._mode == 1, "DataPorter is not in trace mode, cannot close trace."
+        deadline = None if timeout is None else time.monotonic() + timeout
 
         # 上传错误日志
         if error is not None:
@@ -318,12 +411,14 @@ class DataPorter:
             self._publish((UploadType.LOG, [log.to_log_model()]))
             # 备份日志
             self._f.write(log.to_record())
-        # 停止worker
+        # 停止worker，worker 负责写入本地备份，因此总是等待其完成
         if self._executor is not None:
             self._executor.shutdown(wait=True)
         # 停止上传线程池
+        report = None
         if self._pool is not None:
-            self._pool.finish()
+            report = self._pool.finish(None if deadline is None else max(0.0, deadline - time.monotonic()))
+            shutdown_executors()
         # 写入结束标志
         footer = Footer.model_validate({"create_time": create_time(), "success": success})
         self._f.write(footer.to_record())
@@ -331,6 +426,7 @@ class DataPorter:
         self._f.close()
         self._closed = True
         DataPorter._reset()
+        return report
 
     @classmethod
     def _reset(cls):
@@ -350,7 +446,7 @@ class DataPorter:
         assert os.path.isfile(backup_file), f"Backup file {backup_file} does not exist."
         self._f.open_for_scan(backup_file)
         if backend == 'python':
-            self._pool = ThreadPool()
+            self._pool = create_pool(self._run_store.run_dir)
         elif backend == 'go':
             raise NotImplementedError("swanlab-core is not ready yet.")
         else:
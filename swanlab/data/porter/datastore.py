@@ -242,6 +242,10 @@ class DataStore:
 
     def ensure_flushed(self) -> None:
         self._fp.flush()
+        try:
+            os.fsync(self._fp.fileno())
+        except OSError:
+            pass
 
     def close(self):
         # 关闭文件句柄
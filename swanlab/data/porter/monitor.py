@@ -0,0 +1,132 @@
+"""
+@author: cunyue
+@file: monitor.py
+@time: 2025/7/17 16:30
+@description: 上传状态监控，将上传队列的状态以及 SDK 自身的运行状态作为系统指标记录，用于观察上传是否滞后
+"""
+
+from typing import Optional, Dict, Tuple
+
+from swanlab.data.run.metadata.hardware.type import HardwareCollector, HardwareConfig, HardwareInfoList
+from swanlab.data.run.metadata.hardware.utils import generate_key, random_index
+from swanlab.toolkit.telemetry import telemetry
+
+UPLOAD_QUEUE_CONFIG = HardwareConfig(y_range=(0, None), chart_name="Upload Queue", chart_index=random_index())
+UPLOAD_LAG_CONFIG = HardwareConfig(y_range=(0, None), chart_name="Upload Lag (s)").clone()
+UPLOAD_DROPPED_CONFIG = HardwareConfig(y_range=(0, None), chart_name="Upload Dropped Records").clone()
+
+# 上传状态字段、指标 key、指标名称与图表配置
+UPLOAD_METRICS = [
+    (
+        "records",
+        generate_key("upload.queue.records"),
+        "Upload Queued Records",
+        UPLOAD_QUEUE_CONFIG.clone(metric_name="Queued"),
+    ),
+    (
+        "pending",
+        generate_key("upload.queue.pending"),
+        "Upload Pending Tasks",
+        UPLOAD_QUEUE_CONFIG.clone(metric_name="Pending"),
+    ),
+    (
+        "spilled",
+        generate_key("upload.queue.spilled"),
+        "Upload Spilled Tasks",
+        UPLOAD_QUEUE_CONFIG.clone(metric_name="Spilled"),
+    ),
+    ("oldest_age", generate_key("upload.queue.lag"), "Upload Lag (s)", UPLOAD_LAG_CONFIG),
+    ("dropped", generate_key("upload.queue.dropped"), "Upload Dropped Records", UPLOAD_DROPPED_CONFIG),
+]
+
+
+SDK_LATENCY_CONFIG = HardwareConfig(y_range=(0, None), chart_name="SDK Latency (ms)", chart_index=random_index())
+SDK_SENT_CONFIG = HardwareConfig(y_range=(0, None), chart_name="SDK Sent (MB)").clone()
+SDK_RETRIES_CONFIG = HardwareConfig(y_range=(0, None), chart_name="SDK Upload Retries").clone()
+SDK_TRACE_QUEUE_CONFIG = HardwareConfig(y_range=(0, None), chart_name="SDK Trace Queue").clone()
+
+# SDK 自身运行状态的分布名称、指标 key、指标名称与图表配置，数值为两次采集之间的平均值，单位毫秒
+SDK_LATENCY_METRICS = [
+    ("log.time", generate_key("sdk.log.latency"), "SDK Log Latency (ms)", SDK_LATENCY_CONFIG.clone(metric_name="Log")),
+    (
+        "http.request.time",
+        generate_key("sdk.request.latency"),
+        "SDK Request Latency (ms)",
+        SDK_LATENCY_CONFIG.clone(metric_name="Request"),
+    ),
+    (
+        "media.encode.time",
+        generate_key("sdk.media.encode"),
+        "SDK Media Encode (ms)",
+        SDK_LATENCY_CONFIG.clone(metric_name="Media Encode"),
+    ),
+]
+
+
+class UploadMonitor(HardwareCollector):
+    """
+    采集当前实验上传队列的状态以及 SDK 自身的运行状态，未开启上传时不产生任何数据
+    """
+
+    def __init__(self):
+        super().__init__()
+        # 上一次采集时各个分布的次数与总和，用于计算两次采集之间的平均值
+        self.__last: Dict[str, Tuple[int, float]] = {}
+
+    def collect(self) -> Optional[HardwareInfoList]:
+        from . import DataPorter
+
+        porter = DataPorter._instance
+        stats = porter.stats() if porter is not None else None
+        if stats is None:
+            return None
+        result = [
+            {
+                "key": key,
+                "name": name,
+                "value": round(stats[field], 3),
+                "config": config,
+            }
+            for field, key, name, config in UPLOAD_METRICS
+        ]
+        for field, key, name, config in SDK_LATENCY_METRICS:
+            value = self.__interval_mean(field)
+            if value is not None:
+                result.append({"key": key, "name": name, "value": round(value * 1000, 3), "config": config})
+        sent = telemetry.counter("http.bytes_sent") + telemetry.counter("cos.bytes_sent")
+        result.extend(
+            [
+                {
+                    "key": generate_key("sdk.sent"),
+                    "name": "SDK Sent (MB)",
+                    "value": round(sent / 1024 / 1024, 3),
+                    "config": SDK_SENT_CONFIG,
+                },
+                {
+                    "key": generate_key("sdk.upload.retries"),
+                    "name": "SDK Upload Retries",
+                    "value": telemetry.counter("upload.retries"),
+                    "config": SDK_RETRIES_CONFIG,
+                },
+                {
+                    "key": generate_key("sdk.trace.queue"),
+                    "name": "SDK Trace Queue",
+                    "value": porter.trace_queue,
+                    "config": SDK_TRACE_QUEUE_CONFIG,
+                },
+            ]
+        )
+        return result
+
+    def __interval_mean(self, name: str) -> Optional[float]:
+        """
+        距离上一次采集期间观测值的平均值，期间没有观测值时返回 None
+        """
+        distribution = telemetry.distribution(name)
+        if distribution is None:
+            return None
+        count, total = self.__last.get(name, (0, 0.0))
+        self.__last[name] = (distribution["count"], distribution["total"])
+        if distribution["count"] <= count:
+            return None
+        return (distribution["total"] - total) / (distribution["count"] - count)
@@ -100,6 +100,7 @@ class SwanLabExp:
         section_type: SectionType,
         data: DataWrapper,
         step: int = None,
+        timestamp: str = None,
     ) -> MetricInfo:
         """记录一条新的key数据
 
@@ -118,6 +119,8 @@ class SwanLabExp:
         step : int, optional
             步数，如果不传则默认当前步数为'已添加数据数量+1'
             在log函数中已经做了处理，此处不需要考虑数值类型等情况
+        timestamp : str, optional
+            数据的创建时间，如果不传则为添加数据的时间，例如系统信息使用开始采集的时间
         """
         key_index = self._generate_key_index(key, column_class)
         # 判断tag是否存在，如果不存在则创建tag
@@ -162,7 +165,7 @@ class SwanLabExp:
         if not key_obj.is_chart_valid:
             self._warn_chart_error(key_index, key)
             return MetricErrorInfo(key_obj.column_info, error=key_obj.column_info.error)
-        key_info = key_obj.add(data)
+        key_info = key_obj.add(data, timestamp)
         key_info.buffers = data.parse().buffers
         key_info.media_dir = self._run_store.media_dir
         return key_info
@@ -176,6 +179,7 @@ class SwanLabExp:
         column_config: Optional[ColumnConfig] = None,
         section_type: SectionType = "PUBLIC",
         step: int = None,
+        timestamp: str = None,
     ) -> MetricInfo:
         """记录一条新的key数据
         Parameters
@@ -195,8 +199,10 @@ class SwanLabExp:
         step : int, optional
             步数，如果不传则默认当前步数为'已添加数据数量+1'
             在log函数中已经做了处理，此处不需要考虑数值类型等情况
+        timestamp : str, optional
+            数据的创建时间，如果不传则为添加数据的时间，例如系统信息使用开始采集的时间
         """
         section_type: SectionType = 'CUSTOM' if data.is_custom else section_type
-        m = self._add(key, name, column_class, column_config, section_type, data, step)
+        m = self._add(key, name, column_class, column_config, section_type, data, step, timestamp)
         self._operator.on_metric_create(m)
         return m
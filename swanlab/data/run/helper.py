@@ -7,14 +7,19 @@ r"""
 @Description:
     回调函数操作员，批量处理回调函数的调用
 """
+import math
 import threading
+import time
+from concurrent.futures import Future
 from enum import Enum
 from typing import List, Union, Dict, Any, Tuple, Callable, Optional
 
+from swanlab.data.run.metadata.hardware.pool import WorkerPool
 from swanlab.data.run.webhook import try_send_webhook
 from swanlab.log import swanlog
 from swanlab.swanlab_settings import get_settings
-from swanlab.toolkit import SwanKitCallback, MetricInfo, ColumnInfo, RuntimeInfo
+from swanlab.toolkit import SwanKitCallback, MetricInfo, ColumnInfo, RuntimeInfo, create_time
+from swanlab.toolkit.telemetry import telemetry
 
 OperatorReturnType = Dict[str, Any]
 
@@ -56,6 +61,19 @@ class SwanLabRunOperator(SwanKitCallback):
     def __run_all(self, method: str, *args, **kwargs):
         return {name: getattr(callback, method)(*args, **kwargs) for name, callback in self.callbacks.items()}
 
+    REPORT_CALLBACK = "SwanLabCloudPyCallback"
+    """
+    返回上传报告的内置回调（CloudPyCallback）的名称
+    """
+
+    @classmethod
+    def get_report(cls, ret: OperatorReturnType) -> Optional[dict]:
+        """
+        从 on_stop 的返回值中取出内置云端回调的上传报告，不使用其他回调（包括用户注册的回调）的返回值
+        非云端模式时返回 None
+        """
+        return ret.get(cls.REPORT_CALLBACK)
+
     @classmethod
     def parse_return(cls, ret: OperatorReturnType, key: str = None):
         """
@@ -117,8 +135,21 @@ class SwanLabRunOperator(SwanKitCallback):
     def on_column_create(self, column_info: ColumnInfo, *args, **kwargs):
         return self.__run_all("on_column_create", column_info, *args, **kwargs)
 
-    def on_stop(self, error: str = None, epoch: int = None, *args, **kwargs):
-        r = self.__run_all("on_stop", error=error, epoch=epoch, *args, **kwargs)
+    def on_flush(self, timeout: float = None) -> bool:
+        """
+        通知所有支持刷写的回调立即上传数据，用户自定义的回调可以不实现此方法
+        :return: 是否所有回调都在超时前完成刷写
+        """
+        results = [
+            callback.on_flush(timeout=timeout) for callback in self.callbacks.values() if hasattr(callback, "on_flush")
+        ]
+        return all(results)
+
+    def on_stop(self, error: str = None, epoch: int = None, timeout: float = None, *args, **kwargs):
+        """
+        :param timeout: 上传剩余数据的最长时间，单位秒，为 None 时一直等待
+        """
+        r = self.__run_all("on_stop", error=error, epoch=epoch, timeout=timeout, *args, **kwargs)
         # 清空所有注册的回调函数
         self.callbacks.clear()
         return r
@@ -135,31 +166,191 @@ class SwanLabRunState(Enum):
     RUNNING = 0
 
 
+class MonitorEntry:
+    """
+    调度器中的一个采集器及其状态
+    """
+
+    def __init__(self, collector: Callable[[], Optional[List[dict]]], timeout: float):
+        self.collector = collector
+        self.name = getattr(collector, "name", None) or collector.__class__.__name__
+        self.timeout = timeout
+        # 采集器单独的采集间隔，为 None 时跟随调度器的采集（采样）间隔
+        self.interval: Optional[float] = getattr(collector, "interval", None)
+        # 下一次应该执行采集的时间
+        self.next_run = 0.0
+        # 正在执行的采集，执行完成前不会再次提交
+        self.running: Optional[Future] = None
+        # 连续失败（超时、出错或者没有结果）的次数，以及隔离结束的时间
+        self.failures = 0
+        self.quarantined_until = 0.0
+        # 高频采样时本次采集开始的时间，用于判断超时
+        self.started = 0.0
+        # 本次采集是否已经因为超时记录过失败，每次超时的采集只记录一次失败
+        self.timed_out = False
+
+    def fail(self, now: float, interval: float):
+        """
+        记录一次失败，连续失败达到阈值后隔离，隔离时间随失败次数成倍增长
+        """
+        self.failures += 1
+        telemetry.incr("monitor.failures")
+        if self.failures < MonitorCron.QUARANTINE_AFTER:
+            return
+        backoff = min(interval * 2 ** (self.failures - MonitorCron.QUARANTINE_AFTER), MonitorCron.MAX_BACKOFF)
+        self.quarantined_until = now + backoff
+        swanlog.debug(f"Collector {self.name} failed {self.failures} times, skip it for {backoff:.0f}s.")
+
+
+class MonitorAggregator:
+    """
+    高频采样时聚合一个上报周期内的采样结果，线程安全
+    数值指标上报均值（使用原来的 key），以及 aggregates 中指定的最小值、最大值与 p95（key 后添加 .min、.max、.p95），
+    非数值指标上报最后一次的结果。每个周期上报的数据量与采样频率无关
+    """
+
+    AGGREGATES = ("min", "max", "p95")
+
+    def __init__(self, aggregates: Tuple[str, ...] = AGGREGATES):
+        self.aggregates = aggregates
+        self.__lock = threading.Lock()
+        # 每个采集器的采样结果：key -> (最后一次的硬件信息, 采样值列表)，按照采集器顺序上报
+        self.__samples: Dict[int, Dict[str, Tuple[dict, list]]] = {}
+        # 聚合指标的图表配置，每个 key 只生成一次，保证颜色不变
+        self.__configs: Dict[Tuple[str, str], Any] = {}
+
+    def add(self, index: int, infos: List[dict]):
+        """
+        添加一个采集器的一次采样结果
+        :param index: 采集器的顺序
+        :param infos: 采集到的硬件信息
+        """
+        with self.__lock:
+            samples = self.__samples.setdefault(index, {})
+            for info in infos:
+                values = samples[info["key"]][1] if info["key"] in samples else []
+                value = info["value"]
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    values.append(value)
+                samples[info["key"]] = (info, values)
+
+    def flush(self) -> List[dict]:
+        """
+        聚合当前周期的采样结果并开始新的周期
+        """
+        with self.__lock:
+            samples, self.__samples = self.__samples, {}
+            infos = []
+            for index in sorted(samples):
+                for key, (info, values) in samples[index].items():
+                    if not values:
+                        infos.append(info)
+                        continue
+                    infos.append({**info, "value": sum(values) / len(values)})
+                    infos.extend(self.__aggregate(info, values))
+            return infos
+
+    def __aggregate(self, info: dict, values: list) -> List[dict]:
+        values = sorted(values)
+        result = {
+            "min": values[0],
+            "max": values[-1],
+            # 最近秩法
+            "p95": values[max(0, math.ceil(0.95 * len(values)) - 1)],
+        }
+        return [
+            {
+                "key": f"{info['key']}.{name}",
+                "name": f"{info['name']} ({name})",
+                "value": result[name],
+                "config": self.__config(info, name),
+            }
+            for name in self.aggregates
+        ]
+
+    def __config(self, info: dict, name: str):
+        """
+        聚合指标与原指标显示在同一张图表中
+        """
+        key = (info["key"], name)
+        if key not in self.__configs:
+            config = info["config"]
+            if config is not None:
+                metric_name = f"{config.metric_name} ({name})" if config.metric_name else None
+                config = config.clone(metric_name=metric_name)
+            self.__configs[key] = config
+        return self.__configs[key]
+
+
 class MonitorCron:
     """
     用于定时采集系统信息
+    一个调度线程按照采集间隔触发采集，所有采集器在各自的后台线程中并发执行，每个采集器有单独的超时时间：
+    1. 超时的采集结果被丢弃，采集器执行完成前不会被再次提交，因此卡住的采集器不会堆积
+    2. 连续失败的采集器被隔离一段时间，隔离时间成倍增长，成功一次后恢复
+    3. 采集结果按照采集顺序交给处理函数，时间戳为开始采集的时间
+    设置了采样间隔时，调度线程按照采样间隔提交采集器（仍在执行的采集器跳过本次采样），采集完成后结果交给 MonitorAggregator，
+    按照采集间隔上报聚合结果，时间戳为上报周期开始的时间
+    声明了 interval 的采集器按照各自的间隔执行：不采样时取整到最接近的采集周期（不会比采集间隔更频繁），
+    采样时按照各自的间隔提交，不受采样间隔限制
     """
 
-    def __init__(self, monitor_func: Callable):
-        self.count = 0  # 计数器,执行次数
-        self.monitor_interval = get_settings().hardware_interval  # 用户设置的采集间隔
+    QUARANTINE_AFTER = 3
+    """
+    连续失败多少次后隔离采集器
+    """
 
-        def _():
-            monitor_func()
-            self.count += 1
-            self.timer = threading.Timer(self.sleep_time, _)
-            self.timer.daemon = True
-            self.timer.start()
+    MAX_BACKOFF = 600
+    """
+    隔离时间上限，单位秒
+    """
 
+    def __init__(
+        self,
+        collectors: List[Callable[[], Optional[List[dict]]]],
+        handler: Callable[[List[dict], str], None],
+        timeout: float = None,
+        sample_interval: float = None,
+    ):
+        """
+        :param collectors: 采集器列表，返回硬件信息列表，失败时返回 None
+        :param handler: 处理函数，参数为本次采集到的所有硬件信息与采集时间，在调度线程中调用
+        :param timeout: 单个采集器的超时时间，单位秒，不超过采集间隔，为 None 时使用用户设置
+        :param sample_interval: 高频采样的间隔，单位秒，为 None 时使用用户设置
+        """
+        settings = get_settings()
+        self.count = 0  # 计数器,执行次数
+        self.monitor_interval = settings.hardware_interval  # 用户设置的采集间隔
+        self.timeout = timeout if timeout is not None else settings.hardware_timeout
+        self.sample_interval = sample_interval if sample_interval is not None else settings.hardware_sample_interval
+        self.aggregator = MonitorAggregator(settings.hardware_aggregates) if self.sample_interval else None
+        self.handler = handler
+        # 上报周期开始的时间
+        self.__window = create_time()
+        self.entries = [MonitorEntry(c, self.timeout) for c in collectors]
+        # 同一个采集器在上一次执行完成前不会被再次提交，因此每个采集器最多占用一个线程
+        self.__pool = WorkerPool(len(self.entries), name="SwanLabMonitor")
+        self.__stop = threading.Event()
+        # 采集完成时唤醒调度线程
+        self.__wakeup = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, name="SwanLabMonitor", daemon=True)
         # 立即执行
-        self.timer = threading.Timer(0, _)
-        self.timer.daemon = True
-        self.timer.start()
+        self.__thread.start()
 
     def cancel(self):
-        if self.timer is not None:
-            self.timer.cancel()
-            self.timer.join()
+        """
+        停止调度，等待调度线程退出，仍在执行的采集不会被等待，其结果被丢弃
+        之后关闭已经结束的采集器持有的资源（例如 NVML 会话）
+        """
+        self.__stop.set()
+        self.__wakeup.set()
+        if self.__thread is not threading.current_thread():
+            self.__thread.join()
+        self.__pool.shutdown()
+        for entry in self.entries:
+            close = getattr(entry.collector, "close", None)
+            if entry.running is None and close is not None:
+                close()
 
     @property
     def sleep_time(self):
@@ -175,6 +366,152 @@ class MonitorCron:
         else:
             return 60
 
+    def __run(self):
+        if self.aggregator is not None:
+            return self.__run_sampling()
+        next_time = time.monotonic()
+        while not self.__stop.wait(max(0.0, next_time - time.monotonic())):
+            started = time.monotonic()
+            self.tick()
+            self.count += 1
+            # 按照固定的频率采集，错过的采集不再补充
+            next_time = max(started + self.sleep_time, time.monotonic())
+
+    def __run_sampling(self):
+        """
+        采样与上报分别按照各自的固定频率进行，错过的采样与上报不再补充
+        """
+        next_report = time.monotonic() + self.sleep_time
+        while not self.__stop.wait(max(0.0, self.__next_wakeup(next_report) - time.monotonic())):
+            now = time.monotonic()
+            self.sample()
+            if now >= next_report:
+                self.report()
+                self.count += 1
+                next_report = max(now + self.sleep_time, time.monotonic())
+
+    def sample(self):
+        """
+        执行一次高频采样，只提交到期的空闲采集器，不等待采集完成
+        """
+        now = time.monotonic()
+        interval = self.sleep_time
+        for index, entry in enumerate(self.entries):
+            if entry.next_run > now:
+                continue
+            # 按照固定的频率采样，错过的采样不再补充
+            period = entry.interval or self.sample_interval
+            entry.next_run = entry.next_run + period if entry.next_run + period > now else now + period
+            if entry.quarantined_until > now:
+                continue
+            if entry.running is not None:
+                # 仍在执行的采集器跳过本次采样，超时后只记录一次失败，直到下一次采集开始
+                if now - entry.started > entry.timeout and not entry.timed_out:
+                    entry.timed_out = True
+                    entry.fail(now, interval)
+                continue
+            entry.started, entry.timed_out = now, False
+            future = self.__submit(entry)
+            future.add_done_callback(lambda f, i=index, e=entry, t=now: self.__sampled(i, e, t, f))
+
+    def __next_wakeup(self, next_report: float) -> float:
+        """
+        下一次唤醒调度线程的时间，即最早到期的采样或者上报时间
+        """
+        return min([next_report, *(entry.next_run for entry in self.entries)])
+
+    def __sampled(self, index: int, entry: MonitorEntry, started: float, future: Future):
+        """
+        一次采样完成，在采集器的线程中调用，超时的结果被丢弃
+        """
+        now = time.monotonic()
+        if now - started > entry.timeout:
+            swanlog.debug(f"Collector {entry.name} timed out.")
+            telemetry.incr("monitor.timeouts")
+            return
+        result = None if future.exception() is not None else future.result()
+        if result is None:
+            return entry.fail(now, self.sleep_time)
+        entry.failures = 0
+        self.aggregator.add(index, result)
+
+    def report(self):
+        """
+        上报当前周期的聚合结果，时间戳为周期开始的时间
+        """
+        sampled_at, self.__window = self.__window, create_time()
+        infos = self.aggregator.flush()
+        if self.__stop.is_set():
+            return
+        if not infos:
+            return swanlog.debug("Hardware info is empty. Skip it.")
+        self.handler(infos, sampled_at)
+
+    def tick(self):
+        """
+        执行一次采集
+        """
+        now = time.monotonic()
+        sampled_at = create_time()
+        interval = self.sleep_time
+        pending: Dict[MonitorEntry, Future] = {}
+        for entry in self.entries:
+            # 单独设置了采集间隔的采集器，在最接近到期时间的一次采集中执行
+            if entry.interval is not None and entry.next_run - now > interval / 2:
+                continue
+            if entry.quarantined_until > now:
+                continue
+            entry.next_run = now + (entry.interval or 0)
+            if entry.running is not None:
+                # 上一次的采集仍未结束
+                entry.fail(now, interval)
+                continue
+            entry.running = pending[entry] = self.__submit(entry)
+        # 等待所有采集完成或者超时
+        results: Dict[MonitorEntry, List[dict]] = {}
+        deadline = {entry: now + min(entry.timeout, interval) for entry in pending}
+        while pending and not self.__stop.is_set():
+            for entry, future in list(pending.items()):
+                if not future.done():
+                    continue
+                del pending[entry]
+                entry.running = None
+                result = None if future.exception() is not None else future.result()
+                if result is None:
+                    entry.fail(time.monotonic(), interval)
+                    continue
+                entry.failures = 0
+                results[entry] = result
+            remaining = min(deadline[entry] for entry in pending) - time.monotonic() if pending else 0
+            if remaining <= 0:
+                break
+            self.__wakeup.wait(remaining)
+            self.__wakeup.clear()
+        # 超时的采集器，结果在完成后被丢弃
+        for entry in pending:
+            swanlog.debug(f"Collector {entry.name} timed out.")
+            telemetry.incr("monitor.timeouts")
+            entry.fail(time.monotonic(), interval)
+        if self.__stop.is_set():
+            return
+        infos = [info for entry in self.entries if entry in results for info in results[entry]]
+        if not infos:
+            return swanlog.debug("Hardware info is empty. Skip it.")
+        self.handler(infos, sampled_at)
+
+    def __submit(self, entry: MonitorEntry) -> Future:
+        """
+        在线程池中执行一个采集器，线程为守护线程，卡住的采集器不会阻止进程退出
+        """
+        future = entry.running = self.__pool.submit(entry.collector)
+
+        def done(f: Future):
+            entry.running = None if entry.running is f else entry.running
+            self.__wakeup.set()
+
+        future.add_done_callback(done)
+        return future
+
 
 def check_log_level(log_level: Optional[str]) -> str:
     """检查日志等级是否合法"""
@@ -65,7 +65,7 @@ class SwanLabKey:
         """判断当前tag对应的自动创建图表是否成功"""
         return self.column_info.error is None
 
-    def add(self, data: DataWrapper) -> MetricInfo:
+    def add(self, data: DataWrapper, timestamp: str = None) -> MetricInfo:
         """添加一个数据，在内部完成数据类型转换
         如果转换失败，打印警告并退出
         并且添加数据，当前的数据保存是直接保存，后面会改成缓存形式
@@ -75,6 +75,8 @@ class SwanLabKey:
         ----------
         data : DataType
             待添加的数据
+        timestamp : str, optional
+            数据的创建时间，如果不传则为当前时间
 
         Returns
         -------
@@ -123,7 +125,7 @@ class SwanLabKey:
         if len(self._collection["data"]) >= self.__slice_size:
             self._collection = self.__new_metric_collection()
 
-        new_data = self.__new_metric(result.step, r, more=result.more)
+        new_data = self.__new_metric(result.step, r, more=result.more, timestamp=timestamp)
         self._collection["data"].append(new_data)
         epoch = len(self.steps)
         mu = math.ceil(epoch / self.__slice_size)
@@ -189,7 +191,7 @@ class SwanLabKey:
         return column_info
 
     @staticmethod
-    def __new_metric(index, data, more: dict = None) -> dict:
+    def __new_metric(index, data, more: dict = None, timestamp: str = None) -> dict:
         """创建一个新的data数据，实际上是一个字典，包含一些默认信息
 
         Parameters
@@ -200,18 +202,20 @@ class SwanLabKey:
             数据
         more : dict, optional
             更多的数据，如果有的话
+        timestamp : str, optional
+            创建时间，如果不传则为当前时间
         """
         if more is None:
             return {
                 "index": int(index),
                 "data": data,
-                "create_time": create_time(),
+                "create_time": timestamp or create_time(),
             }
         else:
             return {
                 "index": int(index),
                 "data": data,
-                "create_time": create_time(),
+                "create_time": timestamp or create_time(),
                 "more": more,
             }
 
@@ -8,6 +8,7 @@ r"""
     在此处定义SwanLabRun类并导出
 """
 import os
+import time
 from typing import Any, Dict, Optional, List, Tuple
 
 from swanlab.data.modules import DataWrapper, FloatConvertible, Line, Echarts, PyEchartsBase, PyEchartsTable
@@ -15,10 +16,12 @@ from swanlab.env import get_mode
 from swanlab.log import swanlog
 from swanlab.swanlab_settings import reset_settings, get_settings
 from swanlab.toolkit import MediaType
+from swanlab.toolkit.telemetry import telemetry
 from .config import SwanLabConfig
 from .exp import SwanLabExp
 from .helper import SwanLabRunOperator, RuntimeInfo, SwanLabRunState, MonitorCron
 from .metadata import get_requirements, get_conda, HardwareCollector
+from .profiler import SamplingProfiler
 from .public import SwanLabPublicConfig
 from ..formatter import check_key_format
 from ..store import get_run_store, reset_run_store
@@ -56,11 +59,15 @@ class SwanLabRun:
         run_store = get_run_store()
         # ---------------------------------- 初始化类内参数 ----------------------------------
         operator = operator or SwanLabRunOperator()
+        # SDK 自身的运行状态只统计当前实验
+        telemetry.reset()
         # 0. 下面的参数会在实验结束后进行副作用清理
         self.__operator = operator
         self.__state = SwanLabRunState.RUNNING
         self.__monitor_cron: Optional[MonitorCron] = None
+        self.__profiler: Optional[SamplingProfiler] = None
         self.__config: Optional[SwanLabConfig] = None
+        self.__report: Optional[dict] = None
         # 1. 设置常规参数
         self.__mode = get_mode()
         self.__public = SwanLabPublicConfig()
@@ -97,46 +104,54 @@ class SwanLabRun:
             if monitor_funcs is not None and len(monitor_funcs) != 0:
                 swanlog.debug("Monitor on.")
 
-                # 定义定时任务函数
-                def monitor_func():
-                    monitor_info_list = [f() for f in monitor_funcs]
-                    # 剔除其中为None的数据
-                    for monitor_info in monitor_info_list:
-                        if monitor_info is None:
-                            swanlog.debug("Hardware info is empty. Skip it.")
-                            continue
-                        for info in monitor_info:
-                            key, name, value, cfg = (
-                                info['key'],
-                                info['name'],
-                                info['value'],
-                                info['config'],
-                            )
-                            v = DataWrapper(key, [Line(value)], reference="TIME")
-                            self.__exp.add(
-                                data=v,
-                                key=key,
-                                name=name,
-                                column_config=cfg,
-                                column_class="SYSTEM",
-                                section_type="SYSTEM",
-                            )
-
-                self.__monitor_cron = MonitorCron(monitor_func)
-
-    def __cleanup(self, error: str = None):
+                # 定义采集结果的处理函数，在调度线程中按照采集顺序调用
+                def monitor_handler(monitor_info_list: List[dict], timestamp: str):
+                    for info in monitor_info_list:
+                        key, name, value, cfg = (
+                            info['key'],
+                            info['name'],
+                            info['value'],
+                            info['config'],
+                        )
+                        v = DataWrapper(key, [Line(value)], reference="TIME")
+                        self.__exp.add(
+                            data=v,
+                            key=key,
+                            name=name,
+                            column_config=cfg,
+                            column_class="SYSTEM",
+                            section_type="SYSTEM",
+                            timestamp=timestamp,
+                        )
+
+                self.__monitor_cron = MonitorCron(monitor_funcs, monitor_handler)
+        # 采样分析器，结果保存在实验目录的 files 文件夹中
+        settings = get_settings()
+        if settings.profiler:
+            self.__profiler = SamplingProfiler(
+                run_store.file_dir,
+                rate=settings.profiler_rate,
+                interval=settings.profiler_interval,
+                max_overhead=settings.profiler_max_overhead,
+            )
+
+    def __cleanup(self, error: str = None, timeout: float = None):
         """
         停止部分功能，内部清理时调用
+        :param timeout: 上传剩余数据的最长时间，单位秒，为 None 时一直等待
         """
         # 1. 停止硬件监控
         if self.__monitor_cron is not None:
             self.__monitor_cron.cancel()
+        # 停止采样分析器，写入最后一个周期的结果
+        if self.__profiler is not None:
+            self.__profiler.stop()
         # 2. 更新状态
         self.__state = SwanLabRunState.SUCCESS if error is None else SwanLabRunState.CRASHED
         # 3. 触发回调
         if get_settings().log_proxy_type not in ['stderr', 'all']:
             error = None
-        self.__operator.on_stop(error)
+        self.__report = self.__operator.get_report(self.__operator.on_stop(error, timeout=timeout))
         # 4. 更新实验 config
         _config = SwanLabConfig(config)
         self.__config = _config
@@ -161,6 +176,15 @@ class SwanLabRun:
             return self.__run_id
         return None
 
+    @property
+    def report(self) -> Optional[dict]:
+        """
+        The upload report of the finished run, None if the run is still running or nothing is uploaded (e.g. local
+        mode). It contains the number of records that were `uploaded`, that are `remaining` in the local backup and
+        that were `lost` for each data type, and whether the upload is `completed`.
+        """
+        return self.__report
+
     @property
     def public(self):
         return self.__public
@@ -210,7 +234,7 @@ class SwanLabRun:
         return self.__state == SwanLabRunState.RUNNING
 
     @staticmethod
-    def finish(state: SwanLabRunState = SwanLabRunState.SUCCESS, error=None):
+    def finish(state: SwanLabRunState = SwanLabRunState.SUCCESS, error=None, timeout: float = None):
         """
         Finish the current run and close the current experiment
         Normally, swanlab will run this function automatically,
@@ -220,6 +244,9 @@ class SwanLabRun:
 
         :param state: The state of the experiment, it can be 'SUCCESS', 'CRASHED' or 'RUNNING'.
         :param error: The error message when the experiment is marked as 'CRASHED'. If not 'CRASHED', it should be None.
+        :param timeout: The maximum time in seconds to spend uploading the remaining data. Scalars are uploaded first,
+            then logs, then media. Data that is not uploaded in time stays in the local backup and can be uploaded
+            later with `swanlab sync`. If None, use `Settings.finish_timeout`, which waits for all data by default.
         """
         global run, config
         # 分为几步
@@ -233,8 +260,10 @@ class SwanLabRun:
         if state == SwanLabRunState.CRASHED and error is None:
             raise ValueError("When the state is 'CRASHED', the error message cannot be None.")
         error = error if state == SwanLabRunState.CRASHED else None
+        if timeout is None:
+            timeout = get_settings().finish_timeout
         # 清理内部副作用，触发 on_stop 回调
-        getattr(run, "_SwanLabRun__cleanup")(error)
+        getattr(run, "_SwanLabRun__cleanup")(error, timeout)
         # 重置输出代理
         swanlog.reset()
         # 清空配置
@@ -244,6 +273,43 @@ class SwanLabRun:
         old_run, run = run, None
         return old_run
 
+    def flush(self, timeout: float = None) -> bool:
+        """
+        Upload all data logged so far immediately instead of waiting for the next scheduled upload,
+        and block until the upload is finished.
+
+        :param timeout: The maximum time to wait, in seconds. If None, wait until the upload is finished.
+        :return: True if all data has been uploaded before the timeout, otherwise False.
+        """
+        if self.__state != SwanLabRunState.RUNNING:
+            raise RuntimeError("After experiment finished, you can no longer flush data of the current experiment")
+        # 终端输出在后台线程中处理，先等待已经输出的内容交给 porter
+        deadline = None if timeout is None else time.monotonic() + timeout
+        if not swanlog.flush(timeout):
+            return False
+        return self.__operator.on_flush(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+
+    def stats(self) -> dict:
+        """
+        Return a snapshot of SwanLab's own runtime statistics for the current run, which helps to tell whether
+        a lagging dashboard is caused by the SDK, the network or the server.
+
+        :return: A dict with the following fields:
+            - counters: accumulated counts, e.g. `http.requests`, `http.bytes_sent`, `upload.retries`
+            - distributions: count/total/mean/max of observed values, e.g. `log.time` (seconds spent in `log`),
+              `http.request.time`, `media.encode.time`, `upload.batch.scalar_metric` (records per upload batch)
+            - overhead: time spent recording these statistics, and its ratio to the time spent in `log`
+            - trace_queue: number of records waiting to be processed by the background worker
+            - upload: upload queue depth, lag, drops and retries; None if nothing is uploaded
+        """
+        from ..porter import DataPorter
+
+        snapshot = telemetry.snapshot()
+        porter = DataPorter._instance
+        snapshot["trace_queue"] = porter.trace_queue if porter is not None else 0
+        snapshot["upload"] = porter.stats() if porter is not None else None
+        return snapshot
+
     @property
     def config(self) -> SwanLabConfig:
         """
@@ -254,6 +320,7 @@ class SwanLabRun:
         """
         return self.__config
 
+    @telemetry.timed("log.time")
     def log(self, data: dict, step: int = None):
         """
         Log a row of data to the current run. Unlike `swanlab.log`, this api will be called directly based on the
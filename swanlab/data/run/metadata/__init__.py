@@ -16,9 +16,11 @@ from .requirements import get_requirements
 from .runtime import get_runtime_info
 
 
-def get_metadata(logdir: str = None) -> Tuple[dict, List[HardwareCollector]]:
+def get_metadata(logdir: str = None, collectors: List[SystemCollector] = None) -> Tuple[dict, List[HardwareCollector]]:
     """
     采集实验的全部信息
+    :param logdir: 实验目录
+    :param collectors: 用户注册的系统指标采集器
     """
     settings = get_settings()
     # 1. 按照配置采集元信息
@@ -26,11 +28,19 @@ def get_metadata(logdir: str = None) -> Tuple[dict, List[HardwareCollector]]:
     if settings.metadata_collect:
         # 1.1 采集软硬件信息
         if settings.collect_hardware:
-            hardware_info, monitor_funcs = get_hardware_info()
+            hardware_info, monitor_funcs = get_hardware_info(logdir)
         # 1.2 如果硬件监控被关闭，则monitor_funcs置空
         if not settings.hardware_monitor:
             monitor_funcs = []
-        # 1.3 采集运行时信息
+        # 1.3 用户注册与通过 entry points 发现的采集器，在内置采集器之后执行
+        else:
+            monitor_funcs = [*monitor_funcs, *get_plugin_collectors(collectors)]
+        # 1.4 上传队列状态监控
+        if settings.upload_monitor:
+            from swanlab.data.porter.monitor import UploadMonitor
+
+            monitor_funcs = [*monitor_funcs, UploadMonitor()]
+        # 1.5 采集运行时信息
         if settings.collect_runtime:
             runtime_info = get_runtime_info()
     # 2. swanlab官方信息收集
@@ -61,9 +71,12 @@ def get_metadata(logdir: str = None) -> Tuple[dict, List[HardwareCollector]]:
 
 __all__ = [
     "get_metadata",
+    "check_collectors",
     "get_requirements",
     "get_conda",
     "get_cooperation_info",
     "HardwareInfo",
     "HardwareCollector",
+    "SystemCollector",
+    "SystemMetric",
 ]
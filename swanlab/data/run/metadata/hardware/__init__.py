@@ -5,50 +5,102 @@
 @description: 硬件信息采集
 """
 
-from typing import Callable, List, Any, Optional, Tuple
+import platform
+from typing import Callable, List, Any, Optional, Tuple, Dict
 
+from swanlab.swanlab_settings import get_settings
+from swanlab.toolkit import is_macos
 from .cpu import get_cpu_info
 from .dcu.hygon import get_hygon_dcu_info
-from .disk import get_disk_info
+from .discovery import DiscoveryCache, discover, has_device, linux_binary, nvidia_present
+from .disk import get_disk_info, get_disk_devices_info
 from .gpu.metax import get_metax_gpu_info
 from .gpu.moorethreads import get_moorethreads_gpu_info
 from .gpu.nvidia import get_nvidia_gpu_info
 from .memory import get_memory_size
 from .mlu.cambricon import get_cambricon_mlu_info
-from .network import get_network_info
+from .network import get_network_info, get_network_interfaces_info
+from .nfs import get_nfs_info
 from .npu.ascend import get_ascend_npu_info
+from .plugin import SystemCollector, SystemMetric, check_collectors, get_plugin_collectors
+from .process import get_process_tree_info
 from .soc.apple import get_apple_chip_info
 from .type import HardwareFuncResult, HardwareCollector, HardwareInfo
 from .utils import is_system_key
 from .xpu.kunlunxin import get_kunlunxin_xpu_info
 
-__all__ = ["get_hardware_info", "HardwareCollector", "HardwareInfo", "is_system_key"]
+__all__ = [
+    "get_hardware_info",
+    "get_plugin_collectors",
+    "check_collectors",
+    "HardwareCollector",
+    "HardwareInfo",
+    "SystemCollector",
+    "SystemMetric",
+    "is_system_key",
+]
 
 
-def get_hardware_info() -> Tuple[Optional[Any], List[HardwareCollector]]:
+# 计算芯片厂商：名称、分类、探测函数与廉价的存在性检查，存在性检查不通过时跳过探测，避免导入失败或者启动不存在的命令
+# 我们希望计算芯片的信息放在最前面，前端展示用，因此顺序即为采集器的顺序
+VENDORS: List[Tuple[str, str, Callable[[], HardwareFuncResult], Callable[[], bool]]] = [
+    ("nvidia", "gpu", get_nvidia_gpu_info, nvidia_present),
+    ("moorethreads", "gpu", get_moorethreads_gpu_info, linux_binary("mthreads-gmi")),
+    ("ascend", "npu", get_ascend_npu_info, lambda: platform.system() == "Linux" and has_device("davinci")),
+    ("cambricon", "mlu", get_cambricon_mlu_info, linux_binary("cnmon")),
+    ("apple", "soc", get_apple_chip_info, is_macos),
+    ("kunlunxin", "xpu", get_kunlunxin_xpu_info, linux_binary("xpu-smi")),
+    ("metax", "gpu", get_metax_gpu_info, linux_binary("mx-smi")),
+    ("hygon", "dcu", get_hygon_dcu_info, linux_binary("hy-smi")),
+]
+
+# 通用硬件，每次都需要探测
+COMMONS: List[Tuple[str, Callable[[], HardwareFuncResult]]] = [
+    ("cpu", get_cpu_info),
+    ("memory", get_memory_size),
+    ("disk", get_disk_info),
+    ("network", get_network_info),
+    ("disk_devices", get_disk_devices_info),
+    ("network_interfaces", get_network_interfaces_info),
+    ("process", get_process_tree_info),
+]
+
+
+def get_hardware_info(run_dir: str = None) -> Tuple[Optional[Any], List[HardwareCollector]]:
     """
     采集硬件信息，包括CPU、GPU、内存、硬盘等
+    :param run_dir: 实验目录，位于 NFS 挂载点时采集该挂载点的 NFS 客户端信息
+    1. 跳过缓存中记录为不存在、或者存在性检查不通过的厂商
+    2. 其余探测在后台线程中并发执行，总耗时不超过 hardware_discovery_timeout，超时的探测被放弃
+    3. 探测后不存在的厂商写入缓存，同一主机本次启动期间的下一次实验直接跳过
     """
-    monitor_funcs = []
-    # 我们希望计算芯片的信息放在最前面，前端展示用
-    nvidia = dec_hardware_func(get_nvidia_gpu_info, monitor_funcs)
-    moorethreads = dec_hardware_func(get_moorethreads_gpu_info, monitor_funcs)
-    ascend = dec_hardware_func(get_ascend_npu_info, monitor_funcs)
-    cambricon = dec_hardware_func(get_cambricon_mlu_info, monitor_funcs)
-    apple = dec_hardware_func(get_apple_chip_info, monitor_funcs)
-    kunlunxin = dec_hardware_func(get_kunlunxin_xpu_info, monitor_funcs)
-    metax = dec_hardware_func(get_metax_gpu_info, monitor_funcs)
-    hygon = dec_hardware_func(get_hygon_dcu_info, monitor_funcs)
-    c = dec_hardware_func(get_cpu_info, monitor_funcs)
-    m = dec_hardware_func(get_memory_size, monitor_funcs)
-    d = dec_hardware_func(get_disk_info, monitor_funcs)
-    n = dec_hardware_func(get_network_info, monitor_funcs)
+    settings = get_settings()
+    cache = DiscoveryCache(settings.hardware_cache_ttl)
+    cached_absent = set(cache.load())
+    probes: Dict[str, Callable[[], HardwareFuncResult]] = {}
+    absent = []
+    for name, _, func, present in VENDORS:
+        if name in cached_absent or not present():
+            absent.append(name)
+        else:
+            probes[name] = func
+    probes.update(COMMONS)
+    probes["nfs"] = lambda: get_nfs_info(run_dir)
+    results = discover(probes, settings.hardware_discovery_timeout)
+    # 探测完成但是不存在的厂商，超时的厂商不写入缓存，下一次重新探测
+    absent += [name for name, *_ in VENDORS if results.get(name, ()) == (None, None)]
+    if set(absent) != cached_absent:
+        cache.save(absent)
 
+    monitor_funcs = []
+    values = {}
+    for name in probes:
+        values[name] = dec_hardware_func(lambda: results.get(name, (None, None)), monitor_funcs)
     info = {
-        "memory": m,
-        "cpu": c,
-        "disk": d,
-        "network": n,
+        "memory": values["memory"],
+        "cpu": values["cpu"],
+        "disk": values["disk"],
+        "network": values["network"],
         "gpu": {},
         "npu": {},
         "mlu": {},
@@ -56,22 +108,9 @@ def get_hardware_info() -> Tuple[Optional[Any], List[HardwareCollector]]:
         "soc": {},
         "dcu": {},
     }
-    if nvidia is not None:
-        info["gpu"]["nvidia"] = nvidia
-    if moorethreads is not None:
-        info["gpu"]["moorethreads"] = moorethreads
-    if metax is not None:
-        info["gpu"]["metax"] = metax
-    if ascend is not None:
-        info["npu"]["ascend"] = ascend
-    if apple is not None:
-        info["soc"]["apple"] = apple
-    if cambricon is not None:
-        info["mlu"]["cambricon"] = cambricon
-    if kunlunxin is not None:
-        info["xpu"]["kunlunxin"] = kunlunxin
-    if hygon is not None:
-        info["dcu"]["hygon"] = hygon
+    for name, category, *_ in VENDORS:
+        if values.get(name) is not None:
+            info[category][name] = values[name]
     return filter_none(info, fallback={}), monitor_funcs
 
 
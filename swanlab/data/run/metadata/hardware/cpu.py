@@ -12,6 +12,7 @@ import subprocess
 import psutil
 
 from swanlab.data.run.metadata.hardware.type import HardwareFuncResult, HardwareCollector, HardwareInfoList
+from swanlab.swanlab_settings import get_settings
 from swanlab.toolkit import is_macos
 from .utils import CpuBaseCollector as C
 
@@ -50,24 +51,24 @@ def get_cpu_brand_windows():
 
 
 def get_cpu_brand_linux():
-    # lscpu 命令获取 CPU 品牌
+    # 优先读取 /proc/cpuinfo 获取CPU品牌，不需要启动子进程
     cpu_brand = None
     try:
-        result = subprocess.run(["lscpu"], capture_output=True, text=True)
-        for line in result.stdout.split("\n"):
-            if "model name" in line.lower():
-                cpu_brand = line.split(":")[1].strip()
-                break
+        with open("/proc/cpuinfo", "r") as f:
+            for line in f:
+                if "model name" in line.lower():
+                    cpu_brand = line.split(":")[1].strip()
+                    break
     except Exception:  # noqa
         pass
     if cpu_brand is None:
+        # 部分架构（例如 ARM）的 /proc/cpuinfo 中没有型号，使用 lscpu 命令获取 CPU 品牌
         try:
-            # 使用 cat /proc/cpuinfo 获取CPU品牌
-            with open("/proc/cpuinfo", "r") as f:
-                for line in f:
-                    if "model name" in line.lower():
-                        cpu_brand = line.split(":")[1].strip()
-                        break
+            result = subprocess.run(["lscpu"], capture_output=True, text=True)
+            for line in result.stdout.split("\n"):
+                if "model name" in line.lower():
+                    cpu_brand = line.split(":")[1].strip()
+                    break
         except Exception:  # noqa
             pass
     return cpu_brand
@@ -77,10 +78,12 @@ class CpuCollector(HardwareCollector, C):
     def __init__(self):
         super().__init__()
         self.current_process = psutil.Process()
+        # 是否采集每个 CPU 核心的使用率
+        self.per_cpu = get_settings().hardware_per_cpu
 
     def collect(self) -> HardwareInfoList:
         return [
             self.get_cpu_usage(),
-            # *self.get_per_cpu_usage(),
+            *(self.get_per_cpu_usage() if self.per_cpu else []),
             self.get_cur_proc_thds_num(self.current_process),
         ]
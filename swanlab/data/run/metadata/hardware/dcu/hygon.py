@@ -6,10 +6,9 @@
 """
 
 import json
-import math
 import platform
 import subprocess
-from typing import Optional, Tuple
+from typing import Optional, Tuple, Callable
 
 from ..type import HardwareCollector as H
 from ..type import HardwareConfig, HardwareFuncResult, HardwareInfoList
@@ -89,6 +88,19 @@ def map_hygon_dcu() -> Tuple[Optional[str], dict]:
     return driver_version, dcu_map
 
 
+def query_dcu() -> dict:
+    """
+    运行一次 hy-smi，同时查询利用率、显存占用率、温度与功耗，hy-smi 将同一设备的所有字段合并输出，例如：
+    {"card0": {"DCU use (%)": "0", "DCU memory use (%)": "1", "Temperature (Sensor junction) (C)": "51.0", ...}}
+    """
+    output = subprocess.run(
+        ["hy-smi", "--showuse", "--showmemuse", "--showtemp", "--showpower", "--json"],
+        capture_output=True,
+        text=True,
+    ).stdout
+    return json.loads(output)
+
+
 class DCUCollector(H):
     def __init__(self, dcu_map, max_mem_value):
         super().__init__()
@@ -149,6 +161,8 @@ class DCUCollector(H):
             self.per_power_configs[metric_name] = power_config.clone(metric_name=metric_name)
 
     def collect(self) -> HardwareInfoList:
+        # 每次采集只运行一次 hy-smi，同时查询所有指标，所有指标都从这一次的输出中解析
+        snapshot = query_dcu()
         result: HardwareInfoList = []
         usage_methods = [
             self.get_utilization_usage,
@@ -159,84 +173,69 @@ class DCUCollector(H):
         ]
 
         for method in usage_methods:
-            result.extend(method().values())
+            result.extend(method(snapshot).values())
         return result
 
-    def get_utilization_usage(self) -> dict:
+    @staticmethod
+    def __parse(snapshot: dict, field: str, build: Callable[[str, float], dict]) -> dict:
         """
-        获取指定DCU设备的利用率
+        从 hy-smi 的输出中解析某一字段，hy-smi 按照设备顺序输出，设备 ID 为顺序编号，缺少该字段的设备跳过
         """
-        output_str = subprocess.run(
-            ["hy-smi", "--showuse", "--json"],
-            capture_output=True,
-            text=True,
-        ).stdout
-        output_json = json.loads(output_str)
-        util_infos = {}
-        for idx, (dcu_key, dcu_info) in enumerate(output_json.items()):
+        infos = {}
+        for idx, (dcu_key, dcu_info) in enumerate(snapshot.items()):
             dcu_id = str(idx)
+            try:
+                infos[dcu_id] = build(dcu_id, float(dcu_info[field]))
+            except Exception:  # noqa
+                continue
+        return infos
 
-            util_infos[dcu_id] = {
+    def get_utilization_usage(self, snapshot: dict) -> dict:
+        """
+        获取指定DCU设备的利用率
+        """
+        return self.__parse(
+            snapshot,
+            "DCU use (%)",
+            lambda dcu_id, value: {
                 "key": self.util_key.format(dcu_index=dcu_id),
                 "name": f"DCU {dcu_id} Utilization (%)",
-                "value": math.nan,
+                "value": value,
                 "config": self.per_util_configs[f"DCU {dcu_id}"],
-            }
-            dcu_utilization = dcu_info["DCU use (%)"]
-            util_infos[dcu_id]["value"] = float(dcu_utilization)
-        return util_infos
+            },
+        )
 
-    def get_memory_usage(self) -> dict:
+    def get_memory_usage(self, snapshot: dict) -> dict:
         """
         获取指定DCU设备的内存占用率
         """
-        output_str = subprocess.run(
-            ["hy-smi", "--showmemuse", "--json"],
-            capture_output=True,
-            text=True,
-        ).stdout
-        output_json = json.loads(output_str)
-        mem_infos = {}
-
-        for idx, (dcu_key, dcu_info) in enumerate(output_json.items()):
-            dcu_id = str(idx)
-            mem_infos[dcu_id] = {
+        return self.__parse(
+            snapshot,
+            "DCU memory use (%)",
+            lambda dcu_id, value: {
                 "key": self.memory_key.format(dcu_index=dcu_id),
                 "name": f"DCU {dcu_id} Memory Allocated (%)",
-                "value": math.nan,
+                "value": value,
                 "config": self.per_memory_configs[f"DCU {dcu_id}"],
-            }
-
-            dcu_mem_use = dcu_info["DCU memory use (%)"]
-            mem_infos[dcu_id]["value"] = float(dcu_mem_use)
-        return mem_infos
+            },
+        )
 
-    def get_mem_value_usage(self) -> dict:
+    def get_mem_value_usage(self, snapshot: dict) -> dict:
         """
         获取指定DCU设备的内存使用量（MB）
         """
-        output_str = subprocess.run(
-            ["hy-smi", "--showmemuse", "--json"],
-            capture_output=True,
-            text=True,
-        ).stdout
-        output_json = json.loads(output_str)
-        mem_value_infos = {}
-
-        for idx, (dcu_key, dcu_info) in enumerate(output_json.items()):
-            dcu_id = str(idx)
-            mem_value_infos[dcu_id] = {
+        return self.__parse(
+            snapshot,
+            "DCU memory use (%)",
+            lambda dcu_id, value: {
                 "key": self.mem_value_key.format(dcu_index=dcu_id),
                 "name": f"DCU {dcu_id} Memory Allocated (MB)",
-                "value": math.nan,
+                "value": value * 0.01 * self.max_mem_value,
                 "config": self.per_mem_value_configs[f"DCU {dcu_id}"],
-            }
-
-            dcu_mem_use_rate = dcu_info["DCU memory use (%)"]
-            mem_value_infos[dcu_id]["value"] = float(dcu_mem_use_rate) * 0.01 * self.max_mem_value
-        return mem_value_infos
+            },
+        )
 
-    def get_temperature_usage(self) -> dict:
+    def get_temperature_usage(self, snapshot: dict) -> dict:
         """
         获取指定DCU设备的温度(°C) (采集 Junction 核心温度)
         {
@@ -247,46 +246,28 @@ class DCUCollector(H):
           }
         }
         """
-        output_str = subprocess.run(
-            ["hy-smi", "--showtemp", "--json"],
-            capture_output=True,
-            text=True,
-        ).stdout
-        output_json = json.loads(output_str)
-        temp_infos = {}
-        for idx, (dcu_key, dcu_info) in enumerate(output_json.items()):
-            dcu_id = str(idx)
-
-            temp_infos[dcu_id] = {
+        return self.__parse(
+            snapshot,
+            "Temperature (Sensor junction) (C)",
+            lambda dcu_id, value: {
                 "key": self.temp_key.format(dcu_index=dcu_id),
                 "name": f"DCU {dcu_id} Temperature (°C)",
-                "value": math.nan,
+                "value": value,
                 "config": self.per_temp_configs[f"DCU {dcu_id}"],
-            }
-            dcu_temp = dcu_info["Temperature (Sensor junction) (C)"]
-            temp_infos[dcu_id]["value"] = float(dcu_temp)
-        return temp_infos
+            },
+        )
 
-    def get_power_usage(self) -> dict:
+    def get_power_usage(self, snapshot: dict) -> dict:
         """
-        获取指定DCUhy-smi --设备的功耗(W)
+        获取指定DCU设备的功耗(W)
         """
-        output_str = subprocess.run(
-            ["hy-smi", "--showpower", "--json"],
-            capture_output=True,
-            text=True,
-        ).stdout
-        output_json = json.loads(output_str)
-        power_infos = {}
-        for idx, (dcu_key, dcu_info) in enumerate(output_json.items()):
-            dcu_id = str(idx)
-
-            power_infos[dcu_id] = {
+        return self.__parse(
+            snapshot,
+            "Average Graphics Package Power (W)",
+            lambda dcu_id, value: {
                 "key": self.power_key.format(dcu_index=dcu_id),
                 "name": f"DCU {dcu_id} Power (W)",
-                "value": math.nan,
+                "value": value,
                 "config": self.per_power_configs[f"DCU {dcu_id}"],
-            }
-            dcu_power = dcu_info["Average Graphics Package Power (W)"]
-            power_infos[dcu_id]["value"] = float(dcu_power)
-        return power_infos
+            },
+        )
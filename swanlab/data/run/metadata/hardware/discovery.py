@@ -0,0 +1,149 @@
+"""
+@author: cunyue
+@file: discovery.py
+@time: 2025/7/25 10:20
+@description: 硬件信息发现：廉价的存在性检查、并发探测与按主机缓存的探测结果
+"""
+
+import json
+import os
+import platform
+import shutil
+import socket
+import time
+from concurrent.futures import wait
+from typing import Callable, Dict, List, Optional
+
+import psutil
+
+from swanlab.log import swanlog
+from swanlab.toolkit import get_save_dir
+from swanlab.toolkit.telemetry import telemetry
+from .pool import WorkerPool
+from .type import HardwareFuncResult
+
+
+def has_binary(*names: str) -> bool:
+    """
+    PATH 中是否存在任一命令行工具
+    """
+    return any(shutil.which(name) is not None for name in names)
+
+
+def has_device(*prefixes: str) -> bool:
+    """
+    /dev 下是否存在以任一前缀开头的设备文件，只在 Linux 下有效
+    """
+    try:
+        return any(name.startswith(prefixes) for name in os.listdir("/dev"))
+    except OSError:
+        return False
+
+
+def nvidia_present() -> bool:
+    """
+    NVIDIA 驱动是否存在，Windows 下由 NVML 自行判断
+    WSL2 下 GPU 通过 /dev/dxg 暴露
+    """
+    system = platform.system()
+    if system == "Windows":
+        return True
+    if system != "Linux":
+        return False
+    return os.path.exists("/proc/driver/nvidia") or has_device("nvidia", "dxg")
+
+
+def linux_binary(*names: str) -> Callable[[], bool]:
+    """
+    只在 Linux 下存在的厂商工具
+    """
+    return lambda: platform.system() == "Linux" and has_binary(*names)
+
+
+def boot_id() -> str:
+    """
+    当前系统本次启动的标识，重启后硬件可能发生变化，缓存随之失效
+    """
+    try:
+        with open("/proc/sys/kernel/random/boot_id") as f:
+            return f.read().strip()
+    except OSError:
+        return str(int(psutil.boot_time()))
+
+
+class DiscoveryCache:
+    """
+    按照主机名与启动标识缓存不存在的硬件厂商，缓存有效期内直接跳过这些厂商的探测
+    只缓存“不存在”的结果，存在的硬件每次都需要重新探测以创建采集器
+    """
+
+    FILENAME = "hardware.json"
+
+    def __init__(self, ttl: Optional[float], folder: str = None):
+        """
+        :param ttl: 缓存有效期，单位秒，为 None 时不使用缓存
+        :param folder: 缓存文件所在的文件夹，默认为 swanlab 全局文件夹
+        """
+        self.ttl = ttl
+        self.folder = folder
+        self.key = f"{socket.gethostname()}:{boot_id()}" if ttl is not None else None
+
+    @property
+    def path(self) -> str:
+        return os.path.join(self.folder or get_save_dir(), self.FILENAME)
+
+    def load(self) -> List[str]:
+        """
+        读取缓存中不存在的厂商，缓存不存在、已过期或者属于其他主机时返回空列表
+        """
+        if self.ttl is None:
+            return []
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+            if data["key"] != self.key or time.time() - data["time"] > self.ttl:
+                return []
+            return list(data["absent"])
+        except Exception:  # noqa
+            return []
+
+    def save(self, absent: List[str]):
+        if self.ttl is None:
+            return
+        try:
+            path = self.path
+            # 先写入临时文件再替换，避免多个进程同时启动时读到不完整的文件
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "w") as f:
+                json.dump({"key": self.key, "time": time.time(), "absent": sorted(absent)}, f)
+            os.replace(tmp, path)
+        except Exception as e:  # noqa
+            swanlog.debug(f"Failed to save hardware discovery cache: {e}")
+
+
+def discover(probes: Dict[str, Callable[[], HardwareFuncResult]], timeout: float) -> Dict[str, HardwareFuncResult]:
+    """
+    在线程池中并发执行所有探测函数，最多等待 timeout 秒
+    超时的探测被放弃（线程为守护线程，不会阻止进程退出），其结果不出现在返回值中
+    :return: 按照 probes 顺序排列的已完成探测的结果
+    """
+
+    def run(name: str, probe: Callable[[], HardwareFuncResult]) -> HardwareFuncResult:
+        try:
+            return probe()
+        except Exception as e:  # noqa
+            swanlog.debug(f"Hardware discovery failed: {name}, {e}")
+            return None, None
+
+    pool = WorkerPool(len(probes), name="SwanLabDiscovery")
+    futures = {name: pool.submit(run, name, probe) for name, probe in probes.items()}
+    wait(futures.values(), timeout=timeout)
+    pool.shutdown()
+    results = {}
+    for name, future in futures.items():
+        if future.done():
+            results[name] = future.result()
+            continue
+        swanlog.debug(f"Hardware discovery timed out: {name}")
+        telemetry.incr("hardware.discovery_timeouts")
+    return results
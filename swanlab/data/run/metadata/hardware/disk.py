@@ -5,14 +5,23 @@
 @description: 磁盘信息采集
 """
 
+import os
+import platform
 import time
-from typing import List
+from typing import List, Dict, Sequence
 
 import psutil
 
 from swanlab.swanlab_settings import get_settings
-from .type import HardwareFuncResult, HardwareCollector, HardwareInfo, HardwareConfig
-from .utils import random_index, generate_key
+from .type import HardwareFuncResult, HardwareCollector, HardwareInfo, HardwareConfig, HardwareInfoList
+from .utils import random_index, generate_key, match_device
+
+DISKSTATS = "/proc/diskstats"
+
+SECTOR_SIZE = 512
+"""
+/proc/diskstats 中扇区的大小固定为 512 字节，与设备实际的扇区大小无关
+"""
 
 
 def get_disk_info() -> HardwareFuncResult:
@@ -20,6 +29,45 @@ def get_disk_info() -> HardwareFuncResult:
     return None, DiskCollector()
 
 
+def read_diskstats(path: str = DISKSTATS) -> Dict[str, List[int]]:
+    """
+    读取 /proc/diskstats，返回每个设备的前 11 个计数器：
+    读完成次数、读合并次数、读扇区数、读耗时(ms)、写完成次数、写合并次数、写扇区数、写耗时(ms)、
+    进行中的 I/O 数、I/O 耗时(ms)、加权 I/O 耗时(ms)
+    """
+    stats = {}
+    with open(path) as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) < 14:
+                continue
+            stats[parts[2]] = [int(v) for v in parts[3:14]]
+    return stats
+
+
+def get_disk_devices_info() -> HardwareFuncResult:
+    """
+    获取按设备采集磁盘 I/O 的采集器，只支持 Linux
+    没有设置 hardware_disk_include 时只采集整块磁盘（/sys/block 下的设备），不采集分区
+    """
+    settings = get_settings()
+    if not settings.hardware_io_devices or platform.system() != "Linux":
+        return None, None
+    try:
+        stats = read_diskstats()
+    except OSError:
+        return None, None
+    include, exclude = settings.hardware_disk_include, settings.hardware_disk_exclude
+    devices = [
+        name
+        for name in stats
+        if match_device(name, include, exclude) and (include or os.path.exists(os.path.join("/sys/block", name)))
+    ]
+    if not devices:
+        return None, None
+    return None, DiskDeviceCollector(devices)
+
+
 class DiskCollector(HardwareCollector):
     def __init__(self):
         super().__init__()
@@ -101,3 +149,89 @@ class DiskCollector(HardwareCollector):
         self.last_disk_io = current_disk_io
         self.last_time = current_time
         return disk_result
+
+
+class DiskDeviceCollector(HardwareCollector):
+    """
+    按设备采集磁盘 I/O：吞吐量、IOPS、平均等待时间（await）与繁忙程度（util），直接读取 /proc/diskstats，
+    不同设备（例如 NVMe 本地盘与系统盘）分别上报
+    """
+
+    def __init__(self, devices: Sequence[str], path: str = DISKSTATS):
+        """
+        :param devices: 需要采集的设备名称，例如 nvme0n1
+        :param path: diskstats 文件的路径
+        """
+        super().__init__()
+        self.devices = list(devices)
+        self.path = path
+        self.last_stats = read_diskstats(path)
+        self.last_time = time.time()
+        self.unit = 1024**2
+        read_config = HardwareConfig(y_range=(0, None), chart_name="Disk Read (MB/s)", chart_index=random_index())
+        write_config = HardwareConfig(y_range=(0, None), chart_name="Disk Write (MB/s)", chart_index=random_index())
+        iops_config = HardwareConfig(y_range=(0, None), chart_name="Disk IOPS", chart_index=random_index())
+        await_config = HardwareConfig(y_range=(0, None), chart_name="Disk Await (ms)", chart_index=random_index())
+        util_config = HardwareConfig(y_range=(0, 100), chart_name="Disk Busy (%)", chart_index=random_index())
+        # 每个设备的 key 与图表配置：(key, 名称, 配置)
+        self.metrics: Dict[str, Dict[str, tuple]] = {}
+        for device in self.devices:
+            self.metrics[device] = {
+                "read": (
+                    generate_key(f"disk.{device}.read"),
+                    f"Disk {device} Read (MB/s)",
+                    read_config.clone(metric_name=device),
+                ),
+                "write": (
+                    generate_key(f"disk.{device}.write"),
+                    f"Disk {device} Write (MB/s)",
+                    write_config.clone(metric_name=device),
+                ),
+                "read_iops": (
+                    generate_key(f"disk.{device}.read.iops"),
+                    f"Disk {device} Read IOPS",
+                    iops_config.clone(metric_name=f"{device} read"),
+                ),
+                "write_iops": (
+                    generate_key(f"disk.{device}.write.iops"),
+                    f"Disk {device} Write IOPS",
+                    iops_config.clone(metric_name=f"{device} write"),
+                ),
+                "await": (
+                    generate_key(f"disk.{device}.await"),
+                    f"Disk {device} Await (ms)",
+                    await_config.clone(metric_name=device),
+                ),
+                "util": (
+                    generate_key(f"disk.{device}.util"),
+                    f"Disk {device} Busy (%)",
+                    util_config.clone(metric_name=device),
+                ),
+            }
+
+    def collect(self) -> HardwareInfoList:
+        stats = read_diskstats(self.path)
+        current_time = time.time()
+        time_diff = current_time - self.last_time
+        result: HardwareInfoList = []
+        for device in self.devices:
+            if device not in stats or device not in self.last_stats:
+                continue
+            # 计数器回绕或者设备被重新挂载时差值可能为负数
+            diff = [max(0, c - l) for c, l in zip(stats[device], self.last_stats[device])]
+            reads, _, sectors_read, read_ms, writes, _, sectors_written, write_ms, _, busy_ms, _ = diff
+            values = {
+                "read": self.division_guard(sectors_read * SECTOR_SIZE, time_diff * self.unit),
+                "write": self.division_guard(sectors_written * SECTOR_SIZE, time_diff * self.unit),
+                "read_iops": self.division_guard(reads, time_diff),
+                "write_iops": self.division_guard(writes, time_diff),
+                # 这段时间内完成的 I/O 的平均耗时，包括排队时间
+                "await": self.division_guard(read_ms + write_ms, reads + writes),
+                "util": min(100.0, self.division_guard(busy_ms, time_diff * 1000) * 100),
+            }
+            for name, value in values.items():
+                key, metric_name, config = self.metrics[device][name]
+                result.append({"key": key, "name": metric_name, "value": value, "config": config})
+        self.last_stats = stats
+        self.last_time = current_time
+        return result
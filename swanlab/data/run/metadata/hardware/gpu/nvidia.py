@@ -5,7 +5,9 @@
 @description: NVIDIA GPU信息采集
 """
 
+import shutil
 import subprocess
+import threading
 
 import pynvml
 
@@ -20,9 +22,10 @@ def get_nvidia_gpu_info() -> HardwareFuncResult:
     info = {"driver": None, "cores": None, "type": [], "memory": [], "cuda": None, "architecture": [], "cudacores": []}
     max_gpu_mem_mb = 0
     try:
-        pynvml.nvmlInit()
+        handles = session.open()
     except Exception:  # noqa
         return None, None
+    collector = None
     try:
         # 获取 NVIDIA 驱动版本信息
         nv_driver = pynvml.nvmlSystemGetDriverVersion()
@@ -34,10 +37,9 @@ def get_nvidia_gpu_info() -> HardwareFuncResult:
         info["cuda"] = get_cuda_version()
 
         # 获取 NVIDIA GPU 数量
-        info["cores"] = pynvml.nvmlDeviceGetCount()
+        info["cores"] = len(handles)
         # 遍历每个 GPU，获取 GPU 信息
-        for i in range(info["cores"]):
-            handle = pynvml.nvmlDeviceGetHandleByIndex(i)
+        for handle in handles:
             # 获取 GPU 型号
             gpu_name = pynvml.nvmlDeviceGetName(handle)  # types: bytes | str
             if isinstance(gpu_name, bytes):  # Fix for pynvml 早期版本，关联 issue: #605
@@ -74,13 +76,20 @@ def get_nvidia_gpu_info() -> HardwareFuncResult:
     except pynvml.NVMLError:
         pass
     finally:
-        pynvml.nvmlShutdown()
         count = info["cores"]
-        return info, None if not count else GpuCollector(count=count, max_mem_mb=max_gpu_mem_mb)
+        # 采集器继续使用同一个 NVML 会话，在实验结束时关闭
+        if count:
+            collector = GpuCollector(count=count, max_mem_mb=max_gpu_mem_mb)
+            collector.open()
+        session.close()
+        return info, collector
 
 
 def get_cuda_version():
     """获取 CUDA 版本"""
+    # 没有安装 CUDA Toolkit 时不启动子进程
+    if shutil.which("nvcc") is None:
+        return None
     try:
         output = subprocess.check_output(["nvcc", "--version"]).decode("utf-8")
         for line in output.split('\n'):
@@ -91,10 +100,65 @@ def get_cuda_version():
         return None
 
 
+class NvmlSession:
+    """
+    进程内共用的 NVML 会话，线程安全
+    第一次打开时初始化 NVML 并缓存所有设备的句柄，最后一次关闭时才执行 nvmlShutdown，
+    因此硬件信息发现与之后的每次采集使用同一个会话，不会反复初始化、获取句柄
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__refs = 0
+        self.handles = []
+
+    @property
+    def opened(self) -> bool:
+        return self.__refs > 0
+
+    def open(self) -> list:
+        """
+        打开会话，返回缓存的设备句柄
+        """
+        with self.__lock:
+            if self.__refs == 0:
+                pynvml.nvmlInit()
+                try:
+                    self.handles = [pynvml.nvmlDeviceGetHandleByIndex(i) for i in range(pynvml.nvmlDeviceGetCount())]
+                except Exception:
+                    pynvml.nvmlShutdown()
+                    raise
+                swanlog.debug("NVIDIA GPU nvml inited.")
+            self.__refs += 1
+            return self.handles
+
+    def close(self):
+        """
+        关闭会话，所有使用者都关闭后执行 nvmlShutdown
+        """
+        with self.__lock:
+            if self.__refs == 0:
+                return
+            self.__refs -= 1
+            if self.__refs > 0:
+                return
+            self.handles = []
+            try:
+                pynvml.nvmlShutdown()
+                swanlog.debug("NVIDIA GPU nvml shutdown.")
+            except Exception as e:  # noqa
+                swanlog.debug(f"NVIDIA GPU nvml shutdown failed: {e}")
+
+
+session = NvmlSession()
+
+
 class GpuCollector(HardwareCollector):
 
     def __init__(self, count: int, max_mem_mb: int):
         super().__init__()
+        # 是否持有 NVML 会话，在实验结束时关闭
+        self.__opened = False
         # GPU 利用率
         self.gpu_util_key = generate_key("gpu.{idx}.pct")
         util_config = HardwareConfig(y_range=(0, 100), chart_name="GPU Utilization (%)", chart_index=random_index())
@@ -128,7 +192,6 @@ class GpuCollector(HardwareCollector):
             self.gpu_mem_time_key: [],
             self.gpu_util_key: [],
         }
-        self.handles = []
         for idx in range(count):
             metric_name = "GPU {idx}".format(idx=idx)
             self.per_gpu_configs[self.gpu_mem_pct_key].append(mem_pct_config.clone(metric_name=metric_name))
@@ -146,12 +209,12 @@ class GpuCollector(HardwareCollector):
         return self.per_gpu_configs[key][idx]
 
     @HardwareCollector.try_run()
-    def get_gpu_util(self, idx: int) -> HardwareInfo:
+    def get_gpu_util(self, idx: int, util_info=None) -> HardwareInfo:
         """
         获取 GPU 利用率
         """
-        handle = self.handles[idx]
-        util_info = pynvml.nvmlDeviceGetUtilizationRates(handle)
+        if util_info is None:
+            util_info = pynvml.nvmlDeviceGetUtilizationRates(self.handles[idx])
         return {
             "key": self.gpu_util_key.format(idx=idx),
             "value": util_info.gpu,
@@ -160,12 +223,12 @@ class GpuCollector(HardwareCollector):
         }
 
     @HardwareCollector.try_run()
-    def get_gpu_mem_pct(self, idx: int) -> HardwareInfo:
+    def get_gpu_mem_pct(self, idx: int, mem_info=None) -> HardwareInfo:
         """
         获取 GPU 内存使用率
         """
-        handle = self.handles[idx]
-        mem_info = pynvml.nvmlDeviceGetMemoryInfo(handle)
+        if mem_info is None:
+            mem_info = pynvml.nvmlDeviceGetMemoryInfo(self.handles[idx])
         mem_pct = mem_info.used / mem_info.total * 100
         return {
             "key": self.gpu_mem_pct_key.format(idx=idx),
@@ -175,12 +238,12 @@ class GpuCollector(HardwareCollector):
         }
 
     @HardwareCollector.try_run()
-    def get_gpu_mem_value(self, idx: int) -> HardwareInfo:
+    def get_gpu_mem_value(self, idx: int, mem_info=None) -> HardwareInfo:
         """
         获取 GPU 内存使用量(MB)
         """
-        handle = self.handles[idx]
-        mem_info = pynvml.nvmlDeviceGetMemoryInfo(handle)
+        if mem_info is None:
+            mem_info = pynvml.nvmlDeviceGetMemoryInfo(self.handles[idx])
         return {
             "key": self.gpu_mem_value_key.format(idx=idx),
             "value": mem_info.used >> 20,
@@ -218,12 +281,12 @@ class GpuCollector(HardwareCollector):
         }
 
     @HardwareCollector.try_run()
-    def get_gpu_mem_time(self, idx: int) -> HardwareInfo:
+    def get_gpu_mem_time(self, idx: int, info=None) -> HardwareInfo:
         """
         获取 GPU 访存时间百分比
         """
-        handle = self.handles[idx]
-        info = pynvml.nvmlDeviceGetUtilizationRates(handle)
+        if info is None:
+            info = pynvml.nvmlDeviceGetUtilizationRates(self.handles[idx])
         return {
             "key": self.gpu_mem_time_key.format(idx=idx),
             "value": info.memory,
@@ -233,31 +296,72 @@ class GpuCollector(HardwareCollector):
 
     def collect(self) -> HardwareInfoList:
         """
-        采集信息
+        采集信息，每个设备的利用率与显存信息只查询一次
         """
         result: HardwareInfoList = []
         for idx, handle in enumerate(self.handles):
-            result.append(self.get_gpu_mem_pct(idx))
-            result.append(self.get_gpu_mem_value(idx))
-            result.append(self.get_gpu_util(idx))
+            mem_info = self.query(pynvml.nvmlDeviceGetMemoryInfo, handle)
+            util_info = self.query(pynvml.nvmlDeviceGetUtilizationRates, handle)
+            if mem_info is not None:
+                result.append(self.get_gpu_mem_pct(idx, mem_info))
+                result.append(self.get_gpu_mem_value(idx, mem_info))
+            if util_info is not None:
+                result.append(self.get_gpu_util(idx, util_info))
             result.append(self.get_gpu_temp(idx))
             result.append(self.get_gpu_power(idx))
-            result.append(self.get_gpu_mem_time(idx))
+            if util_info is not None:
+                result.append(self.get_gpu_mem_time(idx, util_info))
         return result
 
+    @staticmethod
+    def query(func, handle):
+        """
+        查询一项 NVML 信息，失败时返回 None，不影响其他信息的采集
+        """
+        try:
+            return func(handle)
+        except Exception as e:  # noqa
+            swanlog.debug(f"Atoms collection failed: {func.__name__}, {str(e)}")
+            return None
+
+    @property
+    def handles(self) -> list:
+        """
+        缓存的设备句柄，会话未打开时为空
+        """
+        return session.handles if self.__opened else []
+
+    def open(self):
+        """
+        打开 NVML 会话，已经打开时不做任何操作
+        """
+        if not self.__opened:
+            session.open()
+            self.__opened = True
+
+    def close(self):
+        """
+        实验结束时关闭 NVML 会话
+        """
+        if self.__opened:
+            self.__opened = False
+            session.close()
+
     def __del__(self):
-        pynvml.nvmlShutdown()
+        try:
+            self.close()
+        except Exception:  # noqa
+            pass
+
+    def before_collect(self):
+        # 会话在整个实验期间保持打开，不再按照采集次数反复初始化与关闭，只在会话尚未打开时打开
+        self.open()
+
+    def after_collect(self):
+        pass
 
     def before_collect_impl(self):
-        # 低频采集下（30s以下），应该每次采集时都执行pynvml.nvmlInit()
-        # 高频采集下（30s以上），应该在初始化时执行pynvml.nvmlInit()，在最后一次采集时执行pynvml.nvmlShutdown()
-        # 在外部定时任务处，超过10次即变为低频采集，因此需要判断一下
-        pynvml.nvmlInit()
-        for i in range(pynvml.nvmlDeviceGetCount()):
-            self.handles.append(pynvml.nvmlDeviceGetHandleByIndex(i))
-        swanlog.debug("NVIDIA GPU nvml inited.")
+        self.open()
 
     def after_collect_impl(self):
-        pynvml.nvmlShutdown()
-        self.handles.clear()
-        swanlog.debug("NVIDIA GPU nvml shutdown.")
+        self.close()
@@ -5,13 +5,17 @@
 @description: 网络信息采集
 """
 
+import platform
 import time
-from typing import List
+from typing import List, Dict, Sequence, Tuple
 
 import psutil
 
-from .type import HardwareFuncResult, HardwareCollector, HardwareInfo
-from .utils import generate_key, random_index, HardwareConfig
+from swanlab.swanlab_settings import get_settings
+from .type import HardwareFuncResult, HardwareCollector, HardwareInfo, HardwareInfoList
+from .utils import generate_key, random_index, HardwareConfig, match_device
+
+NET_DEV = "/proc/net/dev"
 
 
 def get_network_info() -> HardwareFuncResult:
@@ -19,6 +23,41 @@ def get_network_info() -> HardwareFuncResult:
     return None, NetworkCollector()
 
 
+def read_net_dev(path: str = NET_DEV) -> Dict[str, Tuple[int, int]]:
+    """
+    读取 /proc/net/dev，返回每个网卡累计接收与发送的字节数
+    """
+    stats = {}
+    with open(path) as f:
+        # 前两行为表头
+        for line in f.readlines()[2:]:
+            name, _, data = line.partition(":")
+            fields = data.split()
+            if len(fields) < 16:
+                continue
+            stats[name.strip()] = (int(fields[0]), int(fields[8]))
+    return stats
+
+
+def get_network_interfaces_info() -> HardwareFuncResult:
+    """
+    获取按网卡采集网络流量的采集器，只支持 Linux
+    """
+    settings = get_settings()
+    if not settings.hardware_io_devices or platform.system() != "Linux":
+        return None, None
+    try:
+        stats = read_net_dev()
+    except OSError:
+        return None, None
+    interfaces = [
+        name for name in stats if match_device(name, settings.hardware_net_include, settings.hardware_net_exclude)
+    ]
+    if not interfaces:
+        return None, None
+    return None, NetworkInterfaceCollector(interfaces)
+
+
 class NetworkCollector(HardwareCollector):
     """网络信息采集器"""
 
@@ -80,3 +119,57 @@ class NetworkCollector(HardwareCollector):
             "value": self.division_guard(diff, time_diff * self.unit),
             "config": self.recv_config,
         }
+
+
+class NetworkInterfaceCollector(HardwareCollector):
+    """
+    按网卡采集网络流量，直接读取 /proc/net/dev，不同网卡（例如 InfiniBand 与管理网卡）分别上报
+    """
+
+    def __init__(self, interfaces: Sequence[str], path: str = NET_DEV):
+        """
+        :param interfaces: 需要采集的网卡名称，例如 eth0、ib0
+        :param path: net/dev 文件的路径
+        """
+        super().__init__()
+        self.interfaces = list(interfaces)
+        self.path = path
+        self.last_stats = read_net_dev(path)
+        self.last_time = time.time()
+        self.unit = 1024**2
+        recv_config = HardwareConfig(
+            y_range=(0, None), chart_name="Network Received (MB/s)", chart_index=random_index()
+        )
+        sent_config = HardwareConfig(y_range=(0, None), chart_name="Network Sent (MB/s)", chart_index=random_index())
+        self.recv_configs = {name: recv_config.clone(metric_name=name) for name in self.interfaces}
+        self.sent_configs = {name: sent_config.clone(metric_name=name) for name in self.interfaces}
+
+    def collect(self) -> HardwareInfoList:
+        stats = read_net_dev(self.path)
+        current_time = time.time()
+        time_diff = current_time - self.last_time
+        result: HardwareInfoList = []
+        for name in self.interfaces:
+            if name not in stats or name not in self.last_stats:
+                continue
+            recv = max(0, stats[name][0] - self.last_stats[name][0])
+            sent = max(0, stats[name][1] - self.last_stats[name][1])
+            result.append(
+                {
+                    "key": generate_key(f"network.{name}.recv"),
+                    "name": f"Network {name} Received (MB/s)",
+                    "value": self.division_guard(recv, time_diff * self.unit),
+                    "config": self.recv_configs[name],
+                }
+            )
+            result.append(
+                {
+                    "key": generate_key(f"network.{name}.sent"),
+                    "name": f"Network {name} Sent (MB/s)",
+                    "value": self.division_guard(sent, time_diff * self.unit),
+                    "config": self.sent_configs[name],
+                }
+            )
+        self.last_stats = stats
+        self.last_time = current_time
+        return result
@@ -0,0 +1,167 @@
+"""
+@author: cunyue
+@file: nfs.py
+@time: 2025/7/27 10:40
+@description: NFS 客户端信息采集，统计实验目录所在 NFS 挂载点的读写吞吐量、操作数与延迟
+"""
+
+import os
+import platform
+import time
+from typing import Dict, List, Optional
+
+from swanlab.swanlab_settings import get_settings
+from .type import HardwareFuncResult, HardwareCollector, HardwareInfoList
+from .utils import generate_key, random_index, HardwareConfig
+
+MOUNTSTATS = "/proc/self/mountstats"
+
+
+def parse_mountstats(text: str) -> Dict[str, dict]:
+    """
+    解析 /proc/self/mountstats，返回挂载点到挂载信息的映射，挂载信息包括：
+    1. fstype: 文件系统类型
+    2. device: 挂载的设备，NFS 下为 server:/export
+    3. bytes: NFS 挂载点的 bytes 统计，依次为 normal/direct/server 的读写字节数以及读写页数
+    4. ops: NFS 挂载点每种操作的统计，依次为操作数、传输次数、超时次数、发送字节数、接收字节数、排队时间(ms)、往返时间(ms)、总耗时(ms)
+    """
+    mounts: Dict[str, dict] = {}
+    current: Optional[dict] = None
+    for line in text.splitlines():
+        if line.startswith("device "):
+            # device server:/export mounted on /mnt/data with fstype nfs4 statvers=1.1
+            parts = line.split()
+            if len(parts) < 8 or parts[2:4] != ["mounted", "on"] or parts[5:7] != ["with", "fstype"]:
+                current = None
+                continue
+            # 挂载点中的空格被转义为 \040
+            mountpoint = parts[4].replace("\\040", " ")
+            current = mounts[mountpoint] = {"fstype": parts[7], "device": parts[1], "bytes": None, "ops": {}}
+            continue
+        if current is None:
+            continue
+        name, sep, data = line.strip().partition(":")
+        if not sep:
+            continue
+        fields = data.split()
+        if name == "bytes":
+            current["bytes"] = [int(v) for v in fields]
+        elif name.isupper() and fields and all(v.isdigit() for v in fields):
+            current["ops"][name] = [int(v) for v in fields]
+    return mounts
+
+
+def find_mount(mountpoints: List[str], path: str) -> Optional[str]:
+    """
+    查找路径所在的挂载点，即最长的前缀
+    """
+    path = os.path.realpath(path)
+    best = None
+    for mountpoint in mountpoints:
+        prefix = mountpoint.rstrip("/") + "/"
+        if (path == mountpoint or path.startswith(prefix)) and (best is None or len(mountpoint) > len(best)):
+            best = mountpoint
+    return best
+
+
+def get_nfs_info(run_dir: Optional[str]) -> HardwareFuncResult:
+    """
+    实验目录位于 NFS 挂载点时，获取 NFS 客户端采集器，只支持 Linux
+    """
+    if run_dir is None or not get_settings().hardware_io_devices or platform.system() != "Linux":
+        return None, None
+    try:
+        with open(MOUNTSTATS) as f:
+            mounts = parse_mountstats(f.read())
+    except OSError:
+        return None, None
+    mountpoint = find_mount(list(mounts), run_dir)
+    if mountpoint is None or not mounts[mountpoint]["fstype"].startswith("nfs"):
+        return None, None
+    return None, NfsCollector(mountpoint)
+
+
+class NfsCollector(HardwareCollector):
+    """
+    NFS 客户端采集器：实验目录所在挂载点的读写吞吐量（实际经过网络的字节数）、READ/WRITE 操作数、
+    平均往返时间（RTT）以及 RPC 重传次数
+    """
+
+    def __init__(self, mountpoint: str, path: str = MOUNTSTATS):
+        """
+        :param mountpoint: NFS 挂载点
+        :param path: mountstats 文件的路径
+        """
+        super().__init__()
+        self.mountpoint = mountpoint
+        self.path = path
+        self.last = self.read()
+        self.last_time = time.time()
+        self.unit = 1024**2
+        throughput_config = HardwareConfig(y_range=(0, None), chart_name="NFS I/O (MB/s)", chart_index=random_index())
+        ops_config = HardwareConfig(y_range=(0, None), chart_name="NFS Operations (/s)", chart_index=random_index())
+        rtt_config = HardwareConfig(y_range=(0, None), chart_name="NFS RTT (ms)", chart_index=random_index())
+        # 每个指标的 key、名称与图表配置
+        self.metrics = {
+            "read": (generate_key("nfs.read"), "NFS Read (MB/s)", throughput_config.clone(metric_name="read")),
+            "write": (generate_key("nfs.write"), "NFS Write (MB/s)", throughput_config.clone(metric_name="write")),
+            "read_ops": (
+                generate_key("nfs.read.ops"),
+                "NFS READ Operations (/s)",
+                ops_config.clone(metric_name="READ"),
+            ),
+            "write_ops": (
+                generate_key("nfs.write.ops"),
+                "NFS WRITE Operations (/s)",
+                ops_config.clone(metric_name="WRITE"),
+            ),
+            "retrans": (
+                generate_key("nfs.retrans"),
+                "NFS Retransmissions (/s)",
+                ops_config.clone(metric_name="retransmissions"),
+            ),
+            "read_rtt": (generate_key("nfs.read.rtt"), "NFS READ RTT (ms)", rtt_config.clone(metric_name="READ")),
+            "write_rtt": (generate_key("nfs.write.rtt"), "NFS WRITE RTT (ms)", rtt_config.clone(metric_name="WRITE")),
+        }
+
+    def read(self) -> Optional[dict]:
+        """
+        读取挂载点当前的统计，挂载点不存在（例如已经被卸载）时返回 None
+        """
+        with open(self.path) as f:
+            return parse_mountstats(f.read()).get(self.mountpoint)
+
+    def collect(self) -> HardwareInfoList:
+        current = self.read()
+        current_time = time.time()
+        time_diff = current_time - self.last_time
+        last, self.last, self.last_time = self.last, current, current_time
+        if current is None or last is None or current["bytes"] is None or last["bytes"] is None:
+            return []
+
+        def diff(values, last_values, index):
+            if len(values) <= index or len(last_values) <= index:
+                return 0
+            return max(0, values[index] - last_values[index])
+
+        def op(name, index):
+            return diff(current["ops"].get(name, []), last["ops"].get(name, []), index)
+
+        # 操作统计依次为操作数、传输次数、超时次数、发送字节数、接收字节数、排队时间、往返时间、总耗时
+        read_ops, write_ops = op("READ", 0), op("WRITE", 0)
+        retrans = sum(op(name, 1) - op(name, 0) for name in current["ops"])
+        values = {
+            # server 读写字节数，即实际经过网络传输的字节数
+            "read": self.division_guard(diff(current["bytes"], last["bytes"], 4), time_diff * self.unit),
+            "write": self.division_guard(diff(current["bytes"], last["bytes"], 5), time_diff * self.unit),
+            "read_ops": self.division_guard(read_ops, time_diff),
+            "write_ops": self.division_guard(write_ops, time_diff),
+            "retrans": self.division_guard(max(0, retrans), time_diff),
+            "read_rtt": self.division_guard(op("READ", 6), read_ops),
+            "write_rtt": self.division_guard(op("WRITE", 6), write_ops),
+        }
+        result: HardwareInfoList = []
+        for name, value in values.items():
+            key, metric_name, config = self.metrics[name]
+            result.append({"key": key, "name": metric_name, "value": value, "config": config})
+        return result
@@ -8,8 +8,9 @@
 import math
 import os
 import platform
+import re
 import subprocess
-from typing import Optional
+from typing import Optional, Dict, Tuple
 
 from ..type import HardwareCollector as H
 from ..type import HardwareConfig, HardwareFuncResult, HardwareInfo, HardwareInfoList
@@ -132,6 +133,65 @@ def get_chip_usage(npu_id: str, chip_id: str):
     return usage
 
 
+_BUS_ID_RE = re.compile(r"^[0-9a-fA-F]{4}:[0-9a-fA-F]{2}:")
+_MEMORY_RE = re.compile(r"(\d+)\s*/\s*(\d+)")
+
+
+def _to_float(value: str) -> float:
+    try:
+        return float(value)
+    except ValueError:
+        # 不支持的指标显示为 NA
+        return math.nan
+
+
+def query_npu() -> Dict[Tuple[str, str], dict]:
+    """
+    运行一次 npu-smi info，从表格中解析所有芯片的利用率、HBM 用量、温度与功耗，表格样例：
+    | NPU   Name                | Health        | Power(W)    Temp(C)           Hugepages-Usage(page)|
+    | Chip                      | Bus-Id        | AICore(%)   Memory-Usage(MB)  HBM-Usage(MB)        |
+    +===========================+===============+====================================================+
+    | 0     910B1               | OK            | 94.4        43                0    / 0             |
+    | 0                         | 0000:C1:00.0  | 0           0    / 0          3395 / 65536         |
+    每个 NPU 一行，之后每个芯片一行（第二列为总线 ID），功耗与温度以 NPU 为单位，芯片使用所属 NPU 的值
+    部分型号没有 HBM，使用 Memory-Usage 作为显存用量
+    :return: (NPU ID, 芯片 ID) -> {"util", "hbm_used", "hbm_total", "power", "temp"}
+    """
+    output = subprocess.run(["npu-smi", "info"], capture_output=True, text=True).stdout
+    snapshot = {}
+    npu_id, power, temp = None, math.nan, math.nan
+    for line in output.split("\n"):
+        # 之后是进程表格
+        if "process id" in line.lower():
+            break
+        cells = [cell.strip() for cell in line.strip().strip("|").split("|")]
+        if len(cells) < 3:
+            continue
+        first, values = cells[0].split(), cells[2].split()
+        if not first or not first[0].isdigit() or not values:
+            continue
+        if not _BUS_ID_RE.match(cells[1]):
+            npu_id = first[0]
+            power = _to_float(values[0])
+            temp = _to_float(values[1]) if len(values) > 1 else math.nan
+            continue
+        if npu_id is None:
+            continue
+        # 取最后一个总量不为 0 的用量，有 HBM 时为 HBM 用量
+        used, total = 0.0, 0.0
+        for u, t in _MEMORY_RE.findall(cells[2]):
+            if int(t) > 0:
+                used, total = float(u), float(t)
+        snapshot[(npu_id, first[0])] = {
+            "util": _to_float(values[0]),
+            "hbm_used": used if total else math.nan,
+            "hbm_total": total,
+            "power": power,
+            "temp": temp,
+        }
+    return snapshot
+
+
 class AscendCollector(H):
     def __init__(self, npu_map, max_hbm_value: int):
         super().__init__()
@@ -189,12 +249,22 @@ class AscendCollector(H):
                 self.per_power_config[metric_name] = power_config.clone(metric_name=metric_name)
 
     def collect(self) -> HardwareInfoList:
+        # 每次采集只运行一次 npu-smi info，所有芯片的指标都从这一次的输出中解析
+        snapshot = query_npu()
         result: HardwareInfoList = []
         for npu_id in self.npu_map:
             for chip_id in self.npu_map[npu_id]:
-                result.extend(self.get_usage(npu_id, chip_id))
-                result.append(self.get_chip_temp(npu_id, chip_id))
-                result.append(self.get_chip_power(npu_id, chip_id))
+                stats = snapshot.get((npu_id, chip_id))
+                if stats is None:
+                    # 无法从表格中解析此芯片（例如未知的输出格式），逐项查询
+                    result.extend(self.get_usage(npu_id, chip_id))
+                    result.append(self.get_chip_temp(npu_id, chip_id))
+                    result.append(self.get_chip_power(npu_id, chip_id))
+                    continue
+                hbm_rate = stats["hbm_used"] / stats["hbm_total"] * 100 if stats["hbm_total"] else math.nan
+                result.extend(self.get_usage_infos(npu_id, chip_id, stats["util"], hbm_rate, stats["hbm_used"]))
+                result.append(self.get_temp_info(npu_id, chip_id, stats["temp"]))
+                result.append(self.get_power_info(npu_id, chip_id, stats["power"]))
         return result
 
     def get_usage(self, npu_id: str, chip_id: str) -> HardwareInfoList:
@@ -206,44 +276,51 @@ class AscendCollector(H):
             capture_output=True,
             text=True,
         ).stdout
+        util, hbm_rate, hbm_value = math.nan, math.nan, math.nan
+        for line in output.split("\n"):
+            if "aicore usage rate" in line.lower():
+                line = line.split(":")
+                # 利用率的值在最后一个
+                util = line[-1].strip()
+                util = float(util) if util.isdigit() else math.nan
+                continue
+
+            if "hbm usage rate" in line.lower():
+                line = line.split(":")
+                # HBM Capacity的值在最后一个
+                hbm = line[-1].strip()
+                if hbm.isdigit():
+                    hbm_rate = float(hbm)
+                    hbm_value = float(hbm) * self.max_hbm_value * 0.01
+                continue
+        return self.get_usage_infos(npu_id, chip_id, util, hbm_rate, hbm_value)
+
+    def get_usage_infos(
+        self, npu_id: str, chip_id: str, util: float, hbm_rate: float, hbm_value: float
+    ) -> HardwareInfoList:
+        """
+        生成指定芯片的利用率、HBM 占用率与 HBM 用量
+        """
         # 格式化获取NPU ID和芯片ID
         _id, metric_name = self.get_label(npu_id, chip_id)
-        # 获取信息
         util_info = {
             "key": self.util_key.format(npu_index=_id),
             "name": f"{metric_name} Utilization (%)",
-            "value": math.nan,
+            "value": util,
             "config": self.per_util_configs[metric_name],
         }
         hbm_info = {
             "key": self.hbm_rate_key.format(npu_index=_id),
             "name": f"{metric_name} Memory Allocated (%)",
-            "value": math.nan,
+            "value": hbm_rate,
             "config": self.per_hbm_configs[metric_name],
         }
         hbm_value_info = {
             "key": self.hbm_value_key.format(npu_index=_id),
             "name": f"{metric_name} Memory Allocated (MB)",
-            "value": math.nan,
+            "value": hbm_value,
             "config": self.per_hbm_value_configs[metric_name],
         }
-        for line in output.split("\n"):
-            if "aicore usage rate" in line.lower():
-                line = line.split(":")
-                # 利用率的值在最后一个
-                util = line[-1].strip()
-                if util.isdigit():
-                    util_info["value"] = float(util)
-                continue
-
-            if "hbm usage rate" in line.lower():
-                line = line.split(":")
-                # HBM Capacity的值在最后一个
-                hbm = line[-1].strip()
-                if hbm.isdigit():
-                    hbm_info["value"] = float(hbm)
-                    hbm_value_info["value"] = float(hbm) * self.max_hbm_value * 0.01
-                continue
         return [util_info, hbm_info, hbm_value_info]
 
     def get_chip_temp(self, npu_id: str, chip_id: str) -> HardwareInfo:
@@ -255,7 +332,9 @@ class AscendCollector(H):
             capture_output=True,
             text=True,
         ).stdout.strip()
-        temp = float(output.split(":")[-1].strip())
+        return self.get_temp_info(npu_id, chip_id, float(output.split(":")[-1].strip()))
+
+    def get_temp_info(self, npu_id: str, chip_id: str, temp: float) -> HardwareInfo:
         _id, metric_name = self.get_label(npu_id, chip_id)
         return {
             "key": self.temp_key.format(npu_index=_id),
@@ -273,7 +352,9 @@ class AscendCollector(H):
             capture_output=True,
             text=True,
         ).stdout.strip()
-        power = float(output.split(":")[-1].strip())
+        return self.get_power_info(npu_id, chip_id, float(output.split(":")[-1].strip()))
+
+    def get_power_info(self, npu_id: str, chip_id: str, power: float) -> HardwareInfo:
         _id, metric_name = self.get_label(npu_id, chip_id)
         return {
             "key": self.power_key.format(npu_index=_id),
@@ -0,0 +1,219 @@
+"""
+@author: cunyue
+@file: plugin.py
+@time: 2025/7/28 10:30
+@description: 用户自定义的系统指标采集器（插件），可以通过 swanlab.register_collectors 注册，
+也可以在开启 hardware_plugins 后通过 entry points（swanlab.collectors 分组）被自动发现，与内置采集器在同一个调度器中执行
+"""
+
+import re
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Union, Sequence
+
+from swanlab.log import swanlog
+from swanlab.swanlab_settings import get_settings
+from swanlab.toolkit import YRange
+from .discovery import discover
+from .type import HardwareCollector, HardwareInfoList
+from .utils import generate_key, random_index, HardwareConfig
+
+ENTRY_POINT_GROUP = "swanlab.collectors"
+"""
+第三方包通过此 entry points 分组注册采集器，值可以是 SystemCollector 的子类、实例，或者返回实例（列表）的函数
+"""
+
+NAME_PATTERN = re.compile(r"^[0-9a-zA-Z_\-]+(\.[0-9a-zA-Z_\-]+)*$")
+
+
+class SystemMetric:
+    """
+    采集器声明的一个系统指标
+    """
+
+    def __init__(
+        self,
+        key: str,
+        name: Optional[str] = None,
+        chart: Optional[str] = None,
+        y_range: YRange = None,
+        metric_name: Optional[str] = None,
+    ):
+        """
+        :param key: 指标的 key，在采集器内唯一，例如 power，最终的 key 为 {采集器名称}.{key}
+        :param name: 指标的显示名称，默认为 key
+        :param chart: 图表名称，同一个采集器中图表名称相同的指标显示在同一张图表中，默认为指标名称
+        :param y_range: 图表的 y 轴范围
+        :param metric_name: 指标在图表中的名称，默认在图表只有一个指标时为空，否则为指标名称
+        """
+        if not isinstance(key, str) or not NAME_PATTERN.match(key):
+            raise ValueError(f"Invalid metric key: {key!r}, only letters, digits, '_', '-' and '.' are allowed.")
+        self.key = key
+        self.name = name or key
+        self.chart = chart or self.name
+        self.y_range = y_range
+        self.metric_name = metric_name
+
+
+class SystemCollector(ABC):
+    """
+    用户自定义的系统指标采集器，子类需要：
+    1. 声明 metrics，即采集器上报的所有指标
+    2. 实现 collect 方法，返回指标 key 到数值的映射，没有声明的 key 与非数值的结果被忽略
+    可选地设置 name（默认为类名的小写）与 interval（单独的采集间隔，单位秒），覆写 setup 与 close 获取、释放资源
+    采集器与内置采集器在同一个调度器中执行，有相同的超时时间与错误隔离：超时、出错的采集被丢弃，连续失败的采集器被暂时跳过
+    """
+
+    name: Optional[str] = None
+    """
+    采集器名称，作为指标 key 的前缀，不同采集器的名称不能重复
+    """
+
+    interval: Optional[float] = None
+    """
+    采集间隔，单位秒，为 None 时跟随内置采集器的采集（采样）间隔
+    """
+
+    metrics: Sequence[SystemMetric] = ()
+    """
+    采集器上报的指标
+    """
+
+    def setup(self):
+        """
+        实验开始时在后台线程中调用一次，受硬件探测超时的限制，出错时此采集器不会被启用
+        """
+        pass
+
+    @abstractmethod
+    def collect(self) -> Dict[str, Union[int, float]]:
+        """
+        采集一次指标，返回指标 key 到数值的映射
+        """
+        pass
+
+    def close(self):
+        """
+        实验结束时调用一次
+        """
+        pass
+
+
+def get_collector_name(collector: SystemCollector) -> str:
+    return collector.name or collector.__class__.__name__.lower()
+
+
+def check_collectors(collectors: List[SystemCollector]) -> List[SystemCollector]:
+    """
+    检查采集器是否合法：类型、名称、采集间隔，以及名称与指标 key 是否重复
+    """
+    names = set()
+    for collector in collectors:
+        if not isinstance(collector, SystemCollector):
+            raise TypeError(f"Unsupported collector type: {type(collector)}, it must be an instance of SystemCollector")
+        name = get_collector_name(collector)
+        if not NAME_PATTERN.match(name):
+            raise ValueError(f"Invalid collector name: {name!r}, only letters, digits, '_', '-' and '.' are allowed.")
+        if name in names:
+            raise ValueError(f"Collector name {name!r} is duplicated.")
+        names.add(name)
+        if collector.interval is not None and not collector.interval > 0:
+            raise ValueError(f"The interval of collector {name!r} must be positive, got {collector.interval}.")
+        keys = [metric.key for metric in collector.metrics]
+        if len(keys) != len(set(keys)):
+            raise ValueError(f"Collector {name!r} declares duplicated metric keys.")
+    return collectors
+
+
+def load_entry_points() -> List[SystemCollector]:
+    """
+    加载通过 entry points 注册的采集器，加载失败的采集器被跳过
+    """
+    from importlib.metadata import entry_points
+
+    eps = entry_points()
+    # python3.10 之前 entry_points 返回以分组为 key 的字典
+    eps = eps.select(group=ENTRY_POINT_GROUP) if hasattr(eps, "select") else eps.get(ENTRY_POINT_GROUP, [])
+    collectors = []
+    for ep in eps:
+        try:
+            obj = ep.load()
+            if isinstance(obj, type) and issubclass(obj, SystemCollector):
+                obj = obj()
+            elif not isinstance(obj, SystemCollector) and callable(obj):
+                obj = obj()
+            collectors.extend(obj if isinstance(obj, (list, tuple)) else [obj])
+        except Exception as e:  # noqa
+            swanlog.warning(f"Failed to load collector from entry point {ep.name}: {e}")
+    return collectors
+
+
+def get_plugin_collectors(collectors: List[SystemCollector] = None) -> List[HardwareCollector]:
+    """
+    获取用户注册与通过 entry points 发现的采集器，在后台线程中并发执行 setup，受 hardware_discovery_timeout 的限制
+    只有开启 hardware_plugins 时才加载 entry points，与已经注册的采集器重名或者不合法的 entry points 采集器被跳过
+    """
+    settings = get_settings()
+    collectors = list(collectors or [])
+    if settings.hardware_plugins:
+        for collector in load_entry_points():
+            try:
+                check_collectors([*collectors, collector])
+            except (TypeError, ValueError) as e:
+                swanlog.warning(f"Skip collector from entry points: {e}")
+                continue
+            collectors.append(collector)
+    if not collectors:
+        return []
+    probes = {get_collector_name(c): (lambda c=c: (None, PluginCollector(c))) for c in collectors}
+    results = discover(probes, settings.hardware_discovery_timeout)
+    return [collector for _, collector in results.values() if collector is not None]
+
+
+class PluginCollector(HardwareCollector):
+    """
+    将用户的 SystemCollector 适配为内置的 HardwareCollector，生成指标 key 与图表配置
+    """
+
+    def __init__(self, collector: SystemCollector):
+        super().__init__()
+        self.collector = collector
+        self.name = get_collector_name(collector)
+        self.interval = collector.interval
+        collector.setup()
+        # 同一个采集器中图表名称相同的指标显示在同一张图表中
+        charts: Dict[str, List[SystemMetric]] = {}
+        for metric in collector.metrics:
+            charts.setdefault(metric.chart, []).append(metric)
+        # 指标 key -> (key, 名称, 图表配置)
+        self.metrics: Dict[str, tuple] = {}
+        for chart, metrics in charts.items():
+            config = HardwareConfig(y_range=metrics[0].y_range, chart_name=chart, chart_index=random_index())
+            for metric in metrics:
+                metric_name = metric.metric_name or (metric.name if len(metrics) > 1 else None)
+                self.metrics[metric.key] = (
+                    generate_key(f"{self.name}.{metric.key}"),
+                    metric.name,
+                    config.clone(y_range=metric.y_range, metric_name=metric_name),
+                )
+        self.__warned = set()
+
+    def collect(self) -> HardwareInfoList:
+        values = self.collector.collect()
+        if values is None:
+            return None
+        result: HardwareInfoList = []
+        for key, value in values.items():
+            if key not in self.metrics or not isinstance(value, (int, float)) or isinstance(value, bool):
+                if key not in self.__warned:
+                    self.__warned.add(key)
+                    swanlog.debug(f"Collector {self.name} returned an undeclared or non-numeric metric: {key}")
+                continue
+            swanlab_key, name, config = self.metrics[key]
+            result.append({"key": swanlab_key, "name": name, "value": value, "config": config})
+        return result
+
+    def close(self):
+        try:
+            self.collector.close()
+        except Exception as e:  # noqa
+            swanlog.debug(f"Failed to close collector {self.name}: {e}")
@@ -0,0 +1,80 @@
+"""
+@author: cunyue
+@file: pool.py
+@time: 2025/7/30 10:10
+@description: 硬件采集与探测使用的有界线程池
+与 concurrent.futures.ThreadPoolExecutor 不同，工作线程为守护线程：解释器退出时 ThreadPoolExecutor 会等待所有工作线程结束，
+卡住的厂商工具（例如 nvidia-smi 无响应）会阻止训练进程退出
+"""
+
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Callable, List
+
+
+class WorkerPool:
+    """
+    最多 max_workers 个守护线程的线程池，线程按需创建并复用，没有空闲线程且未达到上限时才创建新线程
+    卡住的任务只占用一个线程，调用方需要保证同一个采集器在上一次执行完成前不会被再次提交
+    """
+
+    def __init__(self, max_workers: int, name: str):
+        """
+        :param max_workers: 最大线程数
+        :param name: 线程名称的前缀
+        """
+        self.max_workers = max(1, max_workers)
+        self.name = name
+        self.__queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self.__threads: List[threading.Thread] = []
+        # 空闲线程的数量，提交任务时优先交给空闲线程
+        self.__idle = threading.Semaphore(0)
+        self.__lock = threading.Lock()
+        self.__shutdown = False
+
+    def submit(self, func: Callable, *args) -> Future:
+        """
+        提交一个任务，返回对应的 Future
+        """
+        future = Future()
+        with self.__lock:
+            if self.__shutdown:
+                raise RuntimeError("Cannot submit to a pool after shutdown")
+            self.__queue.put((future, func, args))
+            if not self.__idle.acquire(blocking=False) and len(self.__threads) < self.max_workers:
+                thread = threading.Thread(target=self.__work, name=f"{self.name}-{len(self.__threads)}", daemon=True)
+                self.__threads.append(thread)
+                thread.start()
+        return future
+
+    def __work(self):
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                # 通知其他线程退出
+                self.__queue.put(None)
+                return
+            future, func, args = item
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(func(*args))
+                except BaseException as e:  # noqa
+                    future.set_exception(e)
+            del item, future
+            self.__idle.release()
+
+    def shutdown(self):
+        """
+        停止线程池，不等待正在执行的任务，空闲线程立即退出，卡住的线程在任务结束后退出
+        """
+        with self.__lock:
+            self.__shutdown = True
+            self.__queue.put(None)
+
+    @property
+    def threads(self) -> int:
+        """
+        已经创建的线程数
+        """
+        return len(self.__threads)
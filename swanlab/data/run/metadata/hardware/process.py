@@ -0,0 +1,225 @@
+"""
+@author: cunyue
+@file: process.py
+@time: 2025/7/26 10:15
+@description: 进程树资源采集，统计主进程及其所有子进程（DataLoader worker、torchrun 子进程等）的资源使用
+"""
+
+import time
+from typing import Dict, List, Optional, Tuple
+
+import psutil
+
+from swanlab.swanlab_settings import get_settings
+from .type import HardwareFuncResult, HardwareCollector, HardwareInfo, HardwareInfoList
+from .utils import generate_key, random_index, HardwareConfig
+
+
+def get_process_tree_info() -> HardwareFuncResult:
+    """获取进程树采集器"""
+    settings = get_settings()
+    if not settings.hardware_process_tree:
+        return None, None
+    return None, ProcessTreeCollector(top=settings.hardware_process_top, pss=settings.hardware_process_pss)
+
+
+class ProcessSample:
+    """
+    进程树中一个进程的一次采样
+    """
+
+    def __init__(
+        self,
+        proc: psutil.Process,
+        cpu: float,
+        rss: int,
+        pss: int,
+        fds: int,
+        threads: int,
+        io: Optional[Tuple[int, int]],
+    ):
+        self.proc = proc
+        self.cpu = cpu
+        self.rss = rss
+        self.pss = pss
+        self.fds = fds
+        self.threads = threads
+        # 累计读写字节数，不支持时（例如 macOS）为 None
+        self.io = io
+
+
+class ProcessTreeCollector(HardwareCollector):
+    """
+    进程树资源采集器：汇总主进程与所有子孙进程的 CPU 使用率、RSS/PSS、打开的文件数、线程数与 I/O 速度，
+    并按照 CPU 使用率上报前 top 个子进程的 CPU 使用率与 RSS
+    子进程列表在两次枚举之间被缓存（枚举子进程需要遍历系统中的所有进程），psutil.Process 对象在采集之间复用，
+    CPU 使用率为两次采集之间的平均值，不阻塞
+    """
+
+    REFRESH = 10
+    """
+    重新枚举子进程的最短间隔，单位秒，期间退出的子进程在采集时被移除，新创建的子进程在下一次枚举时加入
+    """
+
+    def __init__(self, top: int = 3, pss: bool = False, proc: psutil.Process = None):
+        """
+        :param top: 上报前多少个子进程的资源使用情况
+        :param pss: 是否采集 PSS（只在 Linux 下有效，需要读取 smaps，开销较大），否则只采集 RSS
+        :param proc: 进程树的根进程，默认为当前进程
+        """
+        super().__init__()
+        self.top = top
+        self.pss = pss
+        self.root = proc or psutil.Process()
+        self.children: Dict[int, psutil.Process] = {}
+        self.last_refresh: Optional[float] = None
+        # 每个进程上次采集时的累计读写字节数，用于计算 I/O 速度
+        self.last_io: Dict[int, Tuple[int, int]] = {}
+        self.last_time = time.time()
+        self.unit = 1024**2
+        # 初始化 CPU 使用率的基准
+        self.root.cpu_percent()
+
+        # 进程树整体
+        self.cpu_key = generate_key("proc.tree.cpu")
+        self.cpu_config = HardwareConfig(y_range=(0, None), chart_name="Process Tree CPU Utilization (%)").clone()
+        memory_config = HardwareConfig(
+            y_range=(0, None), chart_name="Process Tree Memory (MB)", chart_index=random_index()
+        ).clone()
+        self.rss_key = generate_key("proc.tree.rss")
+        self.rss_config = memory_config.clone(metric_name="rss")
+        self.pss_key = generate_key("proc.tree.pss")
+        self.pss_config = memory_config.clone(metric_name="pss")
+        self.fds_key = generate_key("proc.tree.fds")
+        self.fds_config = HardwareConfig(y_range=(0, None), chart_name="Process Tree Open Files").clone()
+        self.threads_key = generate_key("proc.tree.threads")
+        self.threads_config = HardwareConfig(y_range=(0, None), chart_name="Process Tree Threads").clone()
+        self.count_key = generate_key("proc.tree.count")
+        self.count_config = HardwareConfig(y_range=(0, None), chart_name="Process Tree Processes").clone()
+        io_config = HardwareConfig(
+            y_range=(0, None), chart_name="Process Tree I/O (MB/s)", chart_index=random_index()
+        ).clone()
+        self.read_key = generate_key("proc.tree.io.read")
+        self.read_config = io_config.clone(metric_name="read")
+        self.write_key = generate_key("proc.tree.io.write")
+        self.write_config = io_config.clone(metric_name="write")
+
+        # 前 top 个子进程，按照排名而不是进程号生成 key，避免 worker 重启时产生新的指标
+        self.top_cpu_key = generate_key("proc.child.{rank}.cpu")
+        top_cpu_config = HardwareConfig(
+            y_range=(0, None), chart_name="Top Child Processes CPU Utilization (%)", chart_index=random_index()
+        )
+        self.top_rss_key = generate_key("proc.child.{rank}.rss")
+        top_rss_config = HardwareConfig(
+            y_range=(0, None), chart_name="Top Child Processes Memory (MB)", chart_index=random_index()
+        )
+        self.top_cpu_configs = [top_cpu_config.clone(metric_name=f"Top {rank}") for rank in range(1, top + 1)]
+        self.top_rss_configs = [top_rss_config.clone(metric_name=f"Top {rank}") for rank in range(1, top + 1)]
+
+    def get_children(self) -> List[psutil.Process]:
+        """
+        获取缓存的子孙进程，超过 REFRESH 秒后重新枚举
+        重新枚举时复用已有的 psutil.Process 对象，保留其 CPU 使用率的基准
+        """
+        now = time.monotonic()
+        if self.last_refresh is None or now - self.last_refresh >= self.REFRESH:
+            self.last_refresh = now
+            try:
+                children = self.root.children(recursive=True)
+            except psutil.Error:
+                children = []
+            refreshed = {}
+            for child in children:
+                cached = self.children.get(child.pid)
+                # 进程号可能被复用，psutil 通过进程创建时间判断是否为同一个进程
+                refreshed[child.pid] = cached if cached is not None and cached == child else child
+            self.children = refreshed
+        return list(self.children.values())
+
+    def sample(self, proc: psutil.Process) -> Optional[ProcessSample]:
+        """
+        采样一个进程，进程已经退出或者无权访问时返回 None
+        """
+        try:
+            with proc.oneshot():
+                cpu = proc.cpu_percent()
+                # 只有 Linux 下的 memory_full_info 包含 pss
+                memory = proc.memory_full_info() if self.pss else proc.memory_info()
+                fds = proc.num_fds() if hasattr(proc, "num_fds") else proc.num_handles()
+                threads = proc.num_threads()
+                io = None
+                if hasattr(proc, "io_counters"):
+                    counters = proc.io_counters()
+                    io = (counters.read_bytes, counters.write_bytes)
+            return ProcessSample(proc, cpu, memory.rss, getattr(memory, "pss", 0), fds, threads, io)
+        except (psutil.NoSuchProcess, psutil.ZombieProcess):
+            self.children.pop(proc.pid, None)
+            return None
+        except psutil.AccessDenied:
+            return None
+
+    def collect(self) -> HardwareInfoList:
+        now = time.time()
+        time_diff = now - self.last_time
+        self.last_time = now
+        children = [s for s in map(self.sample, self.get_children()) if s is not None]
+        root = self.sample(self.root)
+        samples = [root, *children] if root is not None else children
+        # I/O 速度：同一进程两次采集之间的差值，第一次采集到的进程只记录基准，避免把进程启动以来的全部读写计入这一次
+        read, write, last_io = 0, 0, {}
+        for s in samples:
+            if s.io is None:
+                continue
+            last_read, last_write = self.last_io.get(s.proc.pid, s.io)
+            read += max(0, s.io[0] - last_read)
+            write += max(0, s.io[1] - last_write)
+            last_io[s.proc.pid] = s.io
+        self.last_io = last_io
+        cpu = sum(s.cpu for s in samples)
+        rss = sum(s.rss for s in samples) / self.unit
+        result: HardwareInfoList = [
+            self.info(self.cpu_key, "Process Tree CPU Utilization (%)", cpu, self.cpu_config),
+            self.info(self.rss_key, "Process Tree Memory RSS (MB)", rss, self.rss_config),
+            self.info(self.fds_key, "Process Tree Open Files", sum(s.fds for s in samples), self.fds_config),
+            self.info(self.threads_key, "Process Tree Threads", sum(s.threads for s in samples), self.threads_config),
+            self.info(self.count_key, "Process Tree Processes", len(samples), self.count_config),
+        ]
+        if self.pss:
+            pss = sum(s.pss for s in samples) / self.unit
+            result.append(self.info(self.pss_key, "Process Tree Memory PSS (MB)", pss, self.pss_config))
+        if any(s.io is not None for s in samples):
+            read_speed = self.division_guard(read, time_diff * self.unit)
+            write_speed = self.division_guard(write, time_diff * self.unit)
+            result.append(self.info(self.read_key, "Process Tree I/O Read (MB/s)", read_speed, self.read_config))
+            result.append(self.info(self.write_key, "Process Tree I/O Write (MB/s)", write_speed, self.write_config))
+        result.extend(self.get_top_children(children))
+        return result
+
+    def get_top_children(self, children: List[ProcessSample]) -> HardwareInfoList:
+        """
+        按照 CPU 使用率排序，上报前 top 个子进程的 CPU 使用率与 RSS
+        """
+        result: HardwareInfoList = []
+        top = sorted(children, key=lambda s: (s.cpu, s.rss), reverse=True)[: self.top]
+        for rank, s in enumerate(top, start=1):
+            result.append(
+                self.info(
+                    self.top_cpu_key.format(rank=rank),
+                    f"Top {rank} Child Process CPU Utilization (%)",
+                    s.cpu,
+                    self.top_cpu_configs[rank - 1],
+                )
+            )
+            result.append(
+                self.info(
+                    self.top_rss_key.format(rank=rank),
+                    f"Top {rank} Child Process Memory (MB)",
+                    s.rss / self.unit,
+                    self.top_rss_configs[rank - 1],
+                )
+            )
+        return result
+
+    @staticmethod
+    def info(key: str, name: str, value, config: HardwareConfig) -> HardwareInfo:
+        return {"key": key, "name": name, "value": value, "config": config}
@@ -11,6 +11,7 @@ import subprocess
 
 import psutil
 
+from swanlab.swanlab_settings import get_settings
 from swanlab.toolkit import is_macos
 from ..type import HardwareFuncResult, HardwareInfoList, HardwareCollector as H
 from ..utils import CpuBaseCollector as C, MemoryBaseCollector as M
@@ -48,11 +49,13 @@ class AppleChipCollector(H, C, M):
     def __init__(self):
         super().__init__()
         self.current_process = psutil.Process()
+        # 是否采集每个 CPU 核心的使用率
+        self.per_cpu = get_settings().hardware_per_cpu
 
     def collect(self) -> HardwareInfoList:
         return [
             self.get_cpu_usage(),
-            # *self.get_per_cpu_usage(),
+            *(self.get_per_cpu_usage() if self.per_cpu else []),
             self.get_cur_proc_thds_num(self.current_process),
             self.get_mem_usage(),
             *self.get_cur_proc_mem(self.current_process),
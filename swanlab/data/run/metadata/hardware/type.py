@@ -84,6 +84,8 @@ class CollectGuard:
     """
 
     def __init__(self):
+        # 继续调用 MRO 中之后的初始化函数，使采集器混入的采集基类可以初始化自己的状态
+        super().__init__()
         self.collect_num = 0
 
     def before_collect(self):
@@ -117,6 +119,11 @@ class CollectGuard:
 
 
 class HardwareCollector(CollectGuard, ABC):
+    interval: Optional[float] = None
+    """
+    采集器单独的采集间隔，单位秒，为 None 时跟随 MonitorCron 的采集（采样）间隔
+    """
+
     @abstractmethod
     def collect(self) -> HardwareInfoList:
         """
@@ -162,6 +169,12 @@ class HardwareCollector(CollectGuard, ABC):
         finally:
             self.after_collect()
 
+    def close(self):
+        """
+        实验结束时调用一次，释放采集器在整个实验期间持有的资源，子类按需覆写
+        """
+        pass
+
     @staticmethod
     def division_guard(a: Union[int, float], b: Union[int, float]) -> float:
         """
@@ -5,7 +5,9 @@
 @description: 硬件信息采集工具函数
 """
 
+import fnmatch
 import random
+from typing import Sequence
 
 import psutil
 
@@ -21,6 +23,15 @@ def random_index(length: int = 8) -> str:
     return "".join(random.choices(ALPHABET, k=length))
 
 
+def match_device(name: str, include: Sequence[str], exclude: Sequence[str]) -> bool:
+    """
+    按照 shell 通配符过滤设备或网卡名称，include 为空时匹配所有名称，exclude 的优先级更高
+    """
+    if any(fnmatch.fnmatchcase(name, pattern) for pattern in exclude):
+        return False
+    return not include or any(fnmatch.fnmatchcase(name, pattern) for pattern in include)
+
+
 def generate_key(suffix: str) -> str:
     """
     生成key，用于标识系统列，避免与用户输入的key冲突
@@ -60,37 +71,67 @@ CPU_THDS_CONFIG = HardwareConfig(
 ).clone()
 
 
+def cpu_busy_percent(last, current) -> float:
+    """
+    根据两次 psutil.cpu_times 的结果计算这段时间内的 CPU 使用率，计算方式与 psutil.cpu_percent 相同：
+    guest 时间已经包含在 user 时间中，不重复计算；iowait 视为空闲
+    :param last: 上一次的 cpu_times
+    :param current: 本次的 cpu_times
+    :return: 使用率，0~100
+    """
+
+    def split(times):
+        total = sum(times) - getattr(times, "guest", 0) - getattr(times, "guest_nice", 0)
+        return total, total - times.idle - getattr(times, "iowait", 0)
+
+    last_total, last_busy = split(last)
+    total, busy = split(current)
+    # 两次采样之间没有时间流逝，或者计数器回绕
+    if total <= last_total or busy <= last_busy:
+        return 0.0
+    return round(min((busy - last_busy) / (total - last_total) * 100, 100.0), 1)
+
+
 class CpuBaseCollector:
     """
     cpu采集基类，为子类赋予cpu采集的能力
+    使用率为两次采集之间 CPU 时间的差值，第一次采集与初始化之间的差值，采集时不阻塞
     """
 
-    __per_cpu_configs = []
+    def __init__(self):
+        super().__init__()
+        self.__last_cpu_times = psutil.cpu_times()
+        self.__last_per_cpu_times = psutil.cpu_times(percpu=True)
 
-    @staticmethod
-    def get_cpu_usage() -> HardwareInfo:
+    def get_cpu_usage(self) -> HardwareInfo:
         """
-        获取当前 CPU 使用率
+        获取上次采集以来的 CPU 使用率
         """
+        current = psutil.cpu_times()
+        value = cpu_busy_percent(self.__last_cpu_times, current)
+        self.__last_cpu_times = current
         return {
             "key": CPU_PCT_KEY,
             "name": "CPU Utilization (%)",
-            "value": psutil.cpu_percent(interval=1),
+            "value": value,
             "config": CPU_PCT_CONFIG,
         }
 
-    @staticmethod
-    def get_per_cpu_usage() -> HardwareInfoList:
+    def get_per_cpu_usage(self) -> HardwareInfoList:
         """
-        获取每个 CPU 核心的使用率
+        获取上次采集以来每个 CPU 核心的使用率
         """
-        per_cpu_usages = psutil.cpu_percent(interval=1, percpu=True)
+        current = psutil.cpu_times(percpu=True)
+        last, self.__last_per_cpu_times = self.__last_per_cpu_times, current
         result: HardwareInfoList = []
-        for idx, value in enumerate(per_cpu_usages):
+        # 核心数变化（例如 CPU 热插拔）时只计算两次都存在的核心
+        for idx, (last_times, times) in enumerate(zip(last, current)):
+            if idx >= len(CPU_INDEX_PER_CONFIGS):
+                break
             info: HardwareInfo = {
                 "key": CPU_INDEX_PER_KEY.format(idx=idx),
                 "name": f"CPU {idx} Utilization (%)",
-                "value": value,
+                "value": cpu_busy_percent(last_times, times),
                 "config": CPU_INDEX_PER_CONFIGS[idx],
             }
             result.append(info)
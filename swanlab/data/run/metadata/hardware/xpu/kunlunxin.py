@@ -5,10 +5,9 @@
 @description: 昆仑芯xpu信息采集
 """
 
-import math
 import platform
 import subprocess
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Dict, List, Callable
 
 from ..type import HardwareFuncResult, HardwareInfoList, HardwareConfig, HardwareCollector as H
 from ..utils import generate_key, random_index
@@ -73,6 +72,27 @@ def map_xpu() -> Tuple[Optional[str], dict]:
     return driver, xpu_map
 
 
+# xpu-smi -m 输出中每个设备一行，以空格分隔，各指标所在的列
+XPU_ID_COLUMN = 1
+XPU_TEMP_COLUMN = 4
+XPU_POWER_COLUMN = 8
+XPU_MEMORY_COLUMN = 17
+XPU_UTIL_COLUMN = 19
+
+
+def query_xpu() -> Dict[str, List[str]]:
+    """
+    运行一次 xpu-smi -m，返回每个设备对应的一行输出（以空格分隔），键为设备 ID
+    """
+    output = subprocess.run(["xpu-smi", "-m"], capture_output=True, text=True).stdout
+    snapshot = {}
+    for line in output.split("\n"):
+        fields = line.split()
+        if len(fields) > XPU_UTIL_COLUMN:
+            snapshot[fields[XPU_ID_COLUMN]] = fields
+    return snapshot
+
+
 class KunlunxinCollector(H):
     def __init__(self, xpu_map):
         super().__init__()
@@ -122,6 +142,8 @@ class KunlunxinCollector(H):
             self.per_power_configs[metric_name] = power_config.clone(metric_name=metric_name)
 
     def collect(self) -> HardwareInfoList:
+        # 每次采集只运行一次 xpu-smi，所有指标都从这一次的输出中解析
+        snapshot = query_xpu()
         result: HardwareInfoList = []
         usage_methods = [
             self.get_utilization_usage,
@@ -131,132 +153,80 @@ class KunlunxinCollector(H):
         ]
 
         for method in usage_methods:
-            result.extend(method().values())
+            result.extend(method(snapshot).values())
         return result
 
-    def get_utilization_usage(self) -> dict:
+    def __parse(self, snapshot: Dict[str, List[str]], column: int, build: Callable[[str, float], dict]) -> dict:
         """
-        获取指定xpu设备的利用率
+        从 xpu-smi 的输出中解析某一列，列的值不是数字时跳过该设备
         """
-        output = subprocess.run(["xpu-smi", "-m"], capture_output=True, text=True).stdout
-
-        util_infos = {}
-        xpu_ids = []
-
-        # 获取所有xpu ID
+        infos = {}
         for xpu_id in self.xpu_map:
-            xpu_ids.append(xpu_id)
-
-        index = 0
-        lines = output.split("\n")
-        for line in lines:
-            try: 
-                
-                util = line.split()[19]
-                if util.isdigit():
-                    util_infos[xpu_ids[index]] = {
-                        "key": self.util_key.format(xpu_index=xpu_ids[index]),
-                        "name": f"XPU {xpu_ids[index]} Utilization (%)",
-                        "value": math.nan,
-                        "config": self.per_util_configs[f"XPU {xpu_ids[index]}"],
-                    }
-                    util_infos[xpu_ids[index]]['value'] = float(util)
-                    index += 1
+            fields = snapshot.get(xpu_id)
+            if fields is None or len(fields) <= column or not fields[column].isdigit():
+                continue
+            try:
+                infos[xpu_id] = build(xpu_id, float(fields[column]))
             except Exception:  # noqa
                 continue
+        return infos
 
-        return util_infos
+    def get_utilization_usage(self, snapshot: Dict[str, List[str]]) -> dict:
+        """
+        获取指定xpu设备的利用率
+        """
+        return self.__parse(
+            snapshot,
+            XPU_UTIL_COLUMN,
+            lambda xpu_id, value: {
+                "key": self.util_key.format(xpu_index=xpu_id),
+                "name": f"XPU {xpu_id} Utilization (%)",
+                "value": value,
+                "config": self.per_util_configs[f"XPU {xpu_id}"],
+            },
+        )
 
-    def get_memory_usage(self) -> dict:
+    def get_memory_usage(self, snapshot: Dict[str, List[str]]) -> dict:
         """
         获取指定xpu设备的显存占用率
         """
-        output = subprocess.run(["xpu-smi", "-m"], capture_output=True, text=True).stdout
-
-        memory_infos = {}
-        xpu_ids = []
-
-        # 获取所有xpu ID
-        for xpu_id in self.xpu_map:
-            xpu_ids.append(xpu_id)
-
-        index = 0
-        lines = output.split("\n")
-        for line in lines:
-            try:
-                memory = line.split()[17]
-                if memory.isdigit():
-                    memory_infos[xpu_ids[index]] = {
-                        "key": self.memory_key.format(xpu_index=xpu_ids[index]),
-                        "name": f"XPU {xpu_ids[index]} Memory Allocated (%)",
-                        "value": math.nan,
-                        "config": self.per_memory_configs[f"XPU {xpu_ids[index]}"],
-                    }
-                    memory_infos[xpu_ids[index]]['value'] = float(memory) / (self.xpu_map[xpu_ids[index]]['memory'] * 1024) * 100
-                    index += 1
-            except Exception:  # noqa
-                continue
-
-        return memory_infos
+        return self.__parse(
+            snapshot,
+            XPU_MEMORY_COLUMN,
+            lambda xpu_id, value: {
+                "key": self.memory_key.format(xpu_index=xpu_id),
+                "name": f"XPU {xpu_id} Memory Allocated (%)",
+                "value": value / (self.xpu_map[xpu_id]['memory'] * 1024) * 100,
+                "config": self.per_memory_configs[f"XPU {xpu_id}"],
+            },
+        )
 
-    def get_temperature_usage(self) -> dict:
+    def get_temperature_usage(self, snapshot: Dict[str, List[str]]) -> dict:
         """
         获取指定xpu设备的温度(°C)
         """
-        output = subprocess.run(["xpu-smi", "-m"], capture_output=True, text=True).stdout
-        temp_infos = {}
-        xpu_ids = []
-
-        # 获取所有xpu ID
-        for xpu_id in self.xpu_map:
-            xpu_ids.append(xpu_id)
-
-        index = 0
-        lines = output.split("\n")
-        for line in lines:
-            try:
-                temp = line.split()[4]
-                if temp.isdigit():
-                    temp_infos[xpu_ids[index]] = {
-                        "key": self.temp_key.format(xpu_index=xpu_ids[index]),
-                        "name": f"XPU {xpu_ids[index]} Temperature (°C)",
-                        "value": math.nan,
-                        "config": self.per_temp_configs[f"XPU {xpu_ids[index]}"],
-                    }
-                    temp_infos[xpu_ids[index]]['value'] = float(temp)
-                    index += 1
-            except Exception:  # noqa
-                continue
-
-        return temp_infos
+        return self.__parse(
+            snapshot,
+            XPU_TEMP_COLUMN,
+            lambda xpu_id, value: {
+                "key": self.temp_key.format(xpu_index=xpu_id),
+                "name": f"XPU {xpu_id} Temperature (°C)",
+                "value": value,
+                "config": self.per_temp_configs[f"XPU {xpu_id}"],
+            },
+        )
 
-    def get_power_usage(self) -> dict:
+    def get_power_usage(self, snapshot: Dict[str, List[str]]) -> dict:
         """
         获取指定xpu设备的功耗(W)
         """
-        output = subprocess.run(["xpu-smi", "-m"], capture_output=True, text=True).stdout
-        power_infos = {}
-        xpu_ids = []
-
-        # 获取所有xpu ID
-        for xpu_id in self.xpu_map:
-            xpu_ids.append(xpu_id)
-
-        index = 0
-        lines = output.split("\n")
-        for line in lines:
-            try:
-                power = line.split()[8]
-                if power.isdigit():
-                    power_infos[xpu_ids[index]] = {
-                        "key": self.power_key.format(xpu_index=xpu_ids[index]),
-                        "name": f"XPU {xpu_ids[index]} Power (W)",
-                        "value": math.nan,
-                        "config": self.per_power_configs[f"XPU {xpu_ids[index]}"],
-                    }
-                    power_infos[xpu_ids[index]]['value'] = float(power)
-                    index += 1
-            except Exception:  # noqa
-                continue
-
-        return power_infos
+        return self.__parse(
+            snapshot,
+            XPU_POWER_COLUMN,
+            lambda xpu_id, value: {
+                "key": self.power_key.format(xpu_index=xpu_id),
+                "name": f"XPU {xpu_id} Power (W)",
+                "value": value,
+                "config": self.per_power_configs[f"XPU {xpu_id}"],
+            },
+        )
@@ -0,0 +1,258 @@
+"""
+@author: cunyue
+@file: profiler.py
+@time: 2025/7/29 10:20
+@description: 内置的采样分析器，后台线程按照固定频率遍历 sys._current_frames() 采样所有线程的 Python 调用栈，
+不需要 ptrace 权限。采样结果按照周期聚合，写入实验目录的 files 文件夹：
+1. profile.folded: 整个实验的折叠调用栈（collapsed stacks），可以用 flamegraph.pl 或者 speedscope 打开
+2. profile.speedscope.json: speedscope 格式，包括整个实验的汇总以及最近 MAX_WINDOWS 个周期各自的调用栈
+"""
+
+import collections
+import json
+import os
+import sys
+import threading
+import time
+from types import CodeType
+from typing import Deque, Dict, List, Optional, Tuple
+
+from swanlab.log import swanlog
+from swanlab.package import get_package_version
+from swanlab.toolkit import create_time
+from swanlab.toolkit.telemetry import telemetry
+
+# 一个调用栈：(线程名称, 从叶子到根的代码对象)
+Stack = Tuple[str, Tuple[CodeType, ...]]
+
+
+class ProfileWindow:
+    """
+    一个聚合周期的采样结果
+    """
+
+    def __init__(self, started_at: str, duration: float, ticks: int, counts: Dict[Stack, int]):
+        self.started_at = started_at
+        self.duration = duration
+        # 采样次数，每次采样每个线程记录一个调用栈
+        self.ticks = ticks
+        self.counts = counts
+
+    @property
+    def scale(self) -> float:
+        """
+        每个采样代表的时间，单位秒，采样频率被降低时仍然准确
+        """
+        return self.duration / self.ticks if self.ticks else 0.0
+
+
+class SamplingProfiler:
+    """
+    采样分析器，创建后立即在守护线程中开始采样，调用 stop 后停止并写入最后一个周期的结果
+    采样时持有 GIL，会暂停其他 Python 线程，单次采样的耗时记录在 telemetry 的 profiler.sample 中。
+    采样耗时占采样间隔的比例超过 max_overhead 时自动降低采样频率，保证开销有上限
+    """
+
+    FOLDED = "profile.folded"
+    SPEEDSCOPE = "profile.speedscope.json"
+
+    MAX_WINDOWS = 60
+    """
+    speedscope 文件中最多保留的周期数，避免长时间运行的实验文件无限增长
+    """
+
+    def __init__(
+        self,
+        folder: str,
+        rate: float = 100,
+        interval: float = 60,
+        max_overhead: float = 0.02,
+        max_depth: int = 256,
+    ):
+        """
+        :param folder: 保存结果的文件夹
+        :param rate: 采样频率，单位 Hz
+        :param interval: 聚合并写入结果的间隔，单位秒
+        :param max_overhead: 采样耗时占墙钟时间的上限
+        :param max_depth: 调用栈的最大深度，超过时只保留靠近叶子的部分
+        """
+        self.folder = folder
+        self.period = 1 / rate
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self.max_depth = max_depth
+        # 当前周期的采样结果
+        self.__counts: Dict[Stack, int] = {}
+        self.__ticks = 0
+        self.__window_start = time.perf_counter()
+        self.__window_started_at = create_time()
+        # 整个实验的采样次数与时间（秒）
+        self.total_counts: Dict[Stack, int] = {}
+        self.total_weights: Dict[Stack, float] = {}
+        self.windows: Deque[ProfileWindow] = collections.deque(maxlen=self.MAX_WINDOWS)
+        # 线程号到线程名称的映射，遇到新的线程时刷新
+        self.__threads: Dict[int, str] = {}
+        # 代码对象到显示名称的缓存
+        self.__names: Dict[CodeType, Tuple[str, str, int]] = {}
+        self.__stop = threading.Event()
+        self.__thread = threading.Thread(target=self.__run, name="SwanLabProfiler", daemon=True)
+        self.__thread.start()
+
+    def stop(self):
+        """
+        停止采样，等待采样线程写入最后一个周期的结果后退出
+        """
+        self.__stop.set()
+        if self.__thread is not threading.current_thread():
+            self.__thread.join()
+
+    def __run(self):
+        next_sample = next_flush = time.perf_counter()
+        next_flush += self.interval
+        try:
+            while not self.__stop.wait(max(0.0, next_sample - time.perf_counter())):
+                started = time.perf_counter()
+                self.sample()
+                cost = time.perf_counter() - started
+                telemetry.observe("profiler.sample", cost)
+                # 按照固定的频率采样（等待 GIL 的延迟不会累积），采样开销过大时降低采样频率，错过的采样不再补充
+                next_sample = max(next_sample + max(self.period, cost / self.max_overhead), time.perf_counter())
+                if started >= next_flush:
+                    self.flush()
+                    next_flush = started + self.interval
+        finally:
+            self.flush()
+
+    def sample(self):
+        """
+        采样一次所有线程（采样线程本身除外）的调用栈
+        """
+        me, frame = threading.get_ident(), None
+        frames = sys._current_frames()  # noqa
+        try:
+            for tid, frame in frames.items():
+                if tid == me:
+                    continue
+                codes = []
+                while frame is not None and len(codes) < self.max_depth:
+                    codes.append(frame.f_code)
+                    frame = frame.f_back
+                stack = (self.__thread_name(tid), tuple(codes))
+                self.__counts[stack] = self.__counts.get(stack, 0) + 1
+            self.__ticks += 1
+        finally:
+            # 及时释放帧对象的引用，避免延长局部变量的生命周期
+            del frames, frame
+
+    def __thread_name(self, tid: int) -> str:
+        name = self.__threads.get(tid)
+        if name is None:
+            self.__threads = {t.ident: t.name for t in threading.enumerate()}
+            name = self.__threads.setdefault(tid, f"Thread-{tid}")
+        return name
+
+    def flush(self):
+        """
+        结束当前周期，合并到整个实验的结果中并写入文件，在采样线程中调用
+        """
+        now = time.perf_counter()
+        window = ProfileWindow(self.__window_started_at, now - self.__window_start, self.__ticks, self.__counts)
+        self.__counts, self.__ticks = {}, 0
+        self.__window_start, self.__window_started_at = now, create_time()
+        if not window.counts:
+            return
+        self.windows.append(window)
+        scale = window.scale
+        for stack, count in window.counts.items():
+            self.total_counts[stack] = self.total_counts.get(stack, 0) + count
+            self.total_weights[stack] = self.total_weights.get(stack, 0.0) + count * scale
+        try:
+            os.makedirs(self.folder, exist_ok=True)
+            self.__write(self.FOLDED, self.folded())
+            self.__write(self.SPEEDSCOPE, json.dumps(self.speedscope()))
+        except OSError as e:
+            swanlog.debug(f"Failed to write profile: {e}")
+
+    def __write(self, filename: str, content: str):
+        """
+        原子地写入文件，避免读取到写了一半的结果
+        """
+        path = os.path.join(self.folder, filename)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(path + ".tmp", path)
+
+    def __frame(self, code: CodeType) -> Tuple[str, str, int]:
+        """
+        代码对象的函数名称、文件路径（相对于 sys.path）与行号
+        """
+        frame = self.__names.get(code)
+        if frame is None:
+            frame = self.__names[code] = (code.co_name, short_path(code.co_filename), code.co_firstlineno)
+        return frame
+
+    def folded(self) -> str:
+        """
+        整个实验的折叠调用栈，每行为从根到叶子以分号分隔的调用栈与采样次数
+        """
+        lines = []
+        for (thread, codes), count in self.total_counts.items():
+            names = [thread] + ["{} ({}:{})".format(*self.__frame(code)) for code in reversed(codes)]
+            lines.append(";".join(name.replace(";", ",") for name in names) + f" {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> dict:
+        """
+        speedscope 格式的结果：https://www.speedscope.app/file-format-schema.json
+        """
+        frames: List[dict] = []
+        index: Dict[tuple, int] = {}
+
+        def frame_index(frame: tuple) -> int:
+            if frame not in index:
+                index[frame] = len(frames)
+                name, file, line = frame
+                frames.append({"name": name} if file is None else {"name": name, "file": file, "line": line})
+            return index[frame]
+
+        def profile(name: str, weights: Dict[Stack, float]) -> dict:
+            samples, values = [], []
+            for (thread, codes), weight in weights.items():
+                stack = [frame_index((f"Thread {thread}", None, None))]
+                stack.extend(frame_index(self.__frame(code)) for code in reversed(codes))
+                samples.append(stack)
+                values.append(weight)
+            return {
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(values),
+                "samples": samples,
+                "weights": values,
+            }
+
+        profiles = [profile("All", self.total_weights)]
+        for window in self.windows:
+            scale = window.scale
+            weights = {stack: count * scale for stack, count in window.counts.items()}
+            profiles.append(profile(window.started_at, weights))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": profiles,
+            "name": "SwanLab Profile",
+            "activeProfileIndex": 0,
+            "exporter": f"swanlab@{get_package_version()}",
+        }
+
+
+def short_path(filename: str, paths: Optional[List[str]] = None) -> str:
+    """
+    去掉文件路径中最长的 sys.path 前缀，例如 site-packages/torch/nn/modules/module.py -> torch/nn/modules/module.py
+    """
+    best = ""
+    for path in sys.path if paths is None else paths:
+        if path and filename.startswith(path.rstrip(os.sep) + os.sep) and len(path) > len(best):
+            best = path.rstrip(os.sep) + os.sep
+    return filename[len(best) :]
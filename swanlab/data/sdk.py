@@ -33,6 +33,8 @@ from .run import (
     SwanLabRun,
     get_run,
     get_metadata,
+    check_collectors,
+    SystemCollector,
 )
 from .store import get_run_store
 from .utils import (
@@ -83,11 +85,23 @@ MODES = Literal["disabled", "cloud", "local", "offline"]
 class SwanLabInitializer:
     def __init__(self):
         self.cbs: List[SwanKitCallback] = []
+        self.collectors: List[SystemCollector] = []
 
     @should_call_before_init("After calling swanlab.init(), you can't call it again.")
     def register_callbacks(self, callbacks: List[SwanKitCallback]) -> None:
         self.cbs += callbacks
 
+    @should_call_before_init("After calling swanlab.init(), you can't register collectors.")
+    def register_collectors(self, collectors: List[SystemCollector]) -> None:
+        """
+        注册用户自定义的系统指标采集器，与内置的硬件采集器在同一个调度器中执行，有相同的超时时间与错误隔离
+        第三方包也可以通过 entry points（swanlab.collectors 分组）注册采集器，需要开启 hardware_plugins 设置
+        :param collectors: SystemCollector 列表，采集器名称不能重复
+        :raises TypeError: 当采集器不是 SystemCollector 实例时抛出
+        :raises ValueError: 当采集器名称不合法或者重复时抛出
+        """
+        self.collectors = check_collectors(self.collectors + list(collectors))
+
     def init(
         self,
         project: str = None,
@@ -268,6 +282,7 @@ class SwanLabInitializer:
         # 6. 校验回调函数
         callbacks = check_callback_format(self.cbs + callbacks)
         self.cbs = []
+        collectors, self.collectors = self.collectors, []
         # 7. 校验mode参数并适配 backup 模式
         mode = "cloud" if mode == "online" else mode
         mode, login_info = _init_mode(mode)
@@ -366,7 +381,7 @@ class SwanLabInitializer:
         # 新实验开启系统信息检测，旧实验暂时不开启
         # 并且只在用户设置开启了元数据收集或硬件监控时才开启
         if run_store.new is True and user_settings.metadata_collect:
-            meta, monitor_funcs = get_metadata(run_store.run_dir)
+            meta, monitor_funcs = get_metadata(run_store.run_dir, collectors)
         run = SwanLabRun(run_config=config, operator=operator, metadata=meta, monitor_funcs=monitor_funcs)
         return run
 
@@ -377,6 +392,8 @@ init = initializer.init
 
 register_callbacks = initializer.register_callbacks
 
+register_collectors = initializer.register_collectors
+
 
 @should_call_after_init("You must call swanlab.init() before using log()")
 def log(
@@ -407,18 +424,23 @@ def log(
 
 
 @should_call_after_init("You must call swanlab.init() before using finish()")
-def finish(state: SwanLabRunState = SwanLabRunState.SUCCESS, error=None):
+def finish(state: SwanLabRunState = SwanLabRunState.SUCCESS, error=None, timeout: float = None):
     """
     Finish the current run and close the current experiment
     Normally, swanlab will run this function automatically,
     but you can also execute it manually and mark the experiment as 'completed'.
     Once the experiment is marked as 'completed', no more data can be logged to the experiment by 'swanlab.log'.
     If you mark the experiment as 'CRASHED' manually, `error` must be provided.
+
+    :param timeout: The maximum time in seconds to spend uploading the remaining data, useful for preemptible jobs.
+        Scalars are uploaded first, then logs, then media. Data that is not uploaded in time stays in the local
+        backup and can be uploaded later with `swanlab sync`. If None, use `Settings.finish_timeout`.
+    :return: The upload report of the run, see `SwanLabRun.report`.
     """
     run = get_run()
     if not run.running:
         return swanlog.error("After experiment is finished, you can't call finish() again.")
-    run.finish(state, error)
+    return run.finish(state, error, timeout).report
 
 
 @should_call_before_init("You can't call merge_settings() after swanlab.init()")
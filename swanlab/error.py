@@ -79,6 +79,23 @@ class NetworkError(SyncError):
         self.message = "network error, swanlab will resume uploads when the network improves"
 
 
+class PartialSyncError(SyncError):
+    """
+    分块上传时部分数据上传失败，已经上传成功的数据不需要重试
+    """
+
+    def __init__(self, error: SyncError, remaining: list):
+        """
+        :param error: 导致上传失败的错误
+        :param remaining: 需要重试的数据
+        """
+        super().__init__(*error.args)
+        self.error = error
+        self.remaining = remaining
+        self.log_level = error.log_level
+        self.message = error.message
+
+
 class DataTypeError(Exception):
     """数据类型错误，此时数据类型不符合预期"""
 
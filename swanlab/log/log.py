@@ -7,10 +7,16 @@
 
 import re
 import sys
-from typing import List, Tuple, Callable
+import threading
+import time
+from datetime import datetime, timezone
+from queue import SimpleQueue, Empty
+from typing import List, Tuple, Callable, Optional, Dict
 
 from swanlab.toolkit import SwanKitLogger, create_time
+from swanlab.toolkit.telemetry import telemetry
 from .counter import AtomicCounter
+from .policy import ConsolePolicy
 from .type import LogHandler, LogType, WriteHandler, LogData, LogContent, ProxyType
 
 
@@ -20,6 +26,11 @@ class SwanLog(SwanKitLogger):
     继承自 SwanKitLogger 的同时增加标准输出、标准错误留拦截代理功能
     """
 
+    MAX_BATCH = 1024
+    """
+    后台线程一次最多处理的写入片段数
+    """
+
     def __init__(self, name=__name__.lower(), level="info"):
         super().__init__(name=name, level=level)
         self.__original_level = level
@@ -28,38 +39,34 @@ class SwanLog(SwanKitLogger):
         # 保存原始的标准输出和标准错误流
         self.__origin_stdout_write = None
         self.__origin_stderr_write = None
-        # 代理缓冲区
-        self.__stdout_buffer = ""
-        self.__stderr_buffer = ""
+        # 代理缓冲区，将输出片段组装为行，只在后台线程中访问
+        self.__buffers: Dict[LogType, LineAssembler] = {}
         # 上传到云端的最大长度
         self.__max_upload_len = None
         # 当前的代理类型
         self.__proxy_type = None
+        # 代理处理函数与采集策略
+        self.__handler: Optional[LogHandler] = None
+        self.__policy: Optional[ConsolePolicy] = None
+        # 写入的片段队列与处理队列的后台线程
+        self.__queue: Optional[SimpleQueue] = None
+        self.__worker: Optional[threading.Thread] = None
 
     @property
     def epoch(self):
         return self.__counter.value
 
-    def __create_write_handler(self, write_type: LogType, handler: LogHandler) -> WriteHandler:
+    def __create_write_handler(self, write_type: LogType) -> WriteHandler:
         """
         创建一个新的处理器
         """
         origin_write_handler = self.__origin_stdout_write if write_type == 'stdout' else self.__origin_stderr_write
-
-        def get_buffer():
-            return self.__stdout_buffer if write_type == 'stdout' else self.__stderr_buffer
-
-        def set_buffer(buffer):
-            if write_type == 'stdout':
-                self.__stdout_buffer = buffer
-            else:
-                self.__stderr_buffer = buffer
-
-        max_output_len = self.__max_upload_len
+        queue = self.__queue
 
         def write_handler(message: str):
             """
             处理器函数，线程安全
+            写入线程只负责输出到终端并将片段放入队列，组装、编号与回调都在后台线程中完成，避免多个线程竞争锁
             """
             try:
                 origin_write_handler(message)
@@ -70,33 +77,90 @@ class SwanLog(SwanKitLogger):
                 if "I/O operation on closed file" in str(e):
                     # 遇到文件已关闭问题，直接pass，此时表现为终端不输出
                     pass
-
-            # 进行缓冲处理，主要目的是处理进度条输出：
-            # 1. 如果 message 不包含换行符，则加入缓冲区，否则跳转步骤2
-            # 2. 如果 message 包含换行符，则将换行符之前的内容和当前缓冲区合并，进入步骤3，准备上传
-            # 3. 根据换行符分隔为一个个 message，解析 message，如果 message 包含\r
-            messages, new_buffer = clean_control_chars(get_buffer() + message)
-            set_buffer(new_buffer)
-            # 4. 遍历 messages，上传到云端
-            if len(messages):
-                log_data = LogData(
-                    type=write_type,
-                    contents=[],
-                )
-                with self.__counter as counter:
-                    for message in messages:
-                        log_data['contents'].append(
-                            LogContent(
-                                message=message[:max_output_len],
-                                create_time=create_time(),
-                                epoch=counter.increment(),
-                            )
-                        )
-                # 设置回调
-                handler(log_data)
+            queue.put((write_type, message, time.time()))
 
         return write_handler
 
+    def __work(self, queue: SimpleQueue):
+        """
+        后台线程，阻塞等待写入的片段，每次取出队列中已有的片段批量处理，直到收到停止信号
+        """
+        stopped = False
+        while not stopped:
+            items = [queue.get()]
+            while len(items) < self.MAX_BATCH:
+                try:
+                    items.append(queue.get_nowait())
+                except Empty:
+                    break
+            stopped = self.__consume(items)
+
+    def __consume(self, items: list) -> bool:
+        """
+        处理一批队列中的元素，元素可能是：
+        1. 写入的片段 (输出流, 内容, 写入时间)
+        2. flush 等待的事件，在此之前的片段处理完成后设置
+        3. None，停止信号
+        连续的同一输出流的行合并为一次回调
+        :return: 是否收到了停止信号
+        """
+        stream, lines, stopped = None, [], False
+        for item in items:
+            if isinstance(item, tuple):
+                write_type, text, timestamp = item
+                # 进行缓冲处理，主要目的是处理进度条输出：
+                # 1. 不包含换行符的内容加入缓冲区，\r 之前的内容被覆盖
+                # 2. 遇到换行符时，缓冲区中的内容组成完整的一行，清理控制字符后准备上传
+                # 3. 设置了进度条上传间隔时，被覆盖的进度条状态按照最大频率作为一行上传
+                messages = self.__buffers[write_type].feed(text)
+                # 4. 按照采集策略过滤
+                if len(messages) and self.__policy is not None:
+                    messages = self.__policy.filter(write_type, messages)
+                if not len(messages):
+                    continue
+                if write_type != stream:
+                    self.__dispatch(stream, lines)
+                    stream, lines = write_type, []
+                # 5. 使用写入时的时间作为日志的创建时间
+                created = datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+                lines.extend((message, created) for message in messages)
+                continue
+            self.__dispatch(stream, lines)
+            stream, lines = None, []
+            if item is None:
+                stopped = True
+            else:
+                item.set()
+        self.__dispatch(stream, lines)
+        return stopped
+
+    def __dispatch(self, write_type: Optional[LogType], lines: List[Tuple[str, str]]):
+        """
+        为每一行日志编号，并交给代理处理函数
+        :param lines: (内容, 创建时间) 列表
+        """
+        if not len(lines):
+            return
+        max_output_len = self.__max_upload_len
+        log_data = LogData(
+            type=write_type,
+            contents=[],
+        )
+        with self.__counter as counter:
+            for message, created in lines:
+                log_data['contents'].append(
+                    LogContent(
+                        message=message[:max_output_len],
+                        create_time=created,
+                        epoch=counter.increment(),
+                    )
+                )
+        # 设置回调，回调出错不能影响后台线程继续处理
+        try:
+            self.__handler(log_data)
+        except Exception:  # noqa
+            telemetry.incr("log.errors")
+
     def __exec_fun_by_type(self, stdout_func: Callable, stderr_func: Callable):
         """
         根据设置的类型执行对应的函数
@@ -119,34 +183,63 @@ class SwanLog(SwanKitLogger):
         """
         return self.__origin_stderr_write is not None or self.__origin_stdout_write is not None
 
-    def start_proxy(self, proxy_type: ProxyType, max_log_length: int, handler: LogHandler, epoch: int = None):
+    def start_proxy(
+        self,
+        proxy_type: ProxyType,
+        max_log_length: int,
+        handler: LogHandler,
+        epoch: int = None,
+        progress_interval: float = None,
+        policy: ConsolePolicy = None,
+    ):
         """
         启动代理
         :param max_log_length: 一行日志的最大长度，超过这个长度的日志将被截断，-1 表示不限制
         :param proxy_type: 代理类型，支持 "stdout", "stderr", "all"
-        :param handler: 代理处理函数
+        :param handler: 代理处理函数，在后台线程中调用
         :param epoch: 可选参数，设置当前起始 epoch，默认为 None
+        :param progress_interval: 进度条中间状态作为日志上传的最短间隔，单位秒，为 None 时只上传换行时的最终状态
+        :param policy: 终端输出的采集策略，为 None 时上传所有的行
         """
         if self.proxied:
             raise RuntimeError("Std Proxy is already started")
         # 设置一些状态
         self.__max_upload_len = max_log_length
         self.__proxy_type = proxy_type
+        self.__handler = handler
+        self.__policy = policy
         if epoch is not None:
             self.__counter = AtomicCounter(epoch)
+        self.__queue = SimpleQueue()
 
         # 设置代理
         def set_stdout():
-            self.__stdout_buffer = ""
+            self.__buffers['stdout'] = LineAssembler(progress_interval)
             self.__origin_stdout_write = sys.stdout.write
-            sys.stdout.write = self.__create_write_handler('stdout', handler)
+            sys.stdout.write = self.__create_write_handler('stdout')
 
         def set_stderr():
-            self.__stderr_buffer = ""
+            self.__buffers['stderr'] = LineAssembler(progress_interval)
             self.__origin_stderr_write = sys.stderr.write
-            sys.stderr.write = self.__create_write_handler('stderr', handler)
+            sys.stderr.write = self.__create_write_handler('stderr')
 
         self.__exec_fun_by_type(set_stdout, set_stderr)
+        if self.proxied:
+            self.__worker = threading.Thread(target=self.__work, args=(self.__queue,), name="SwanLabConsole", daemon=True)
+            self.__worker.start()
+
+    def flush(self, timeout: float = None) -> bool:
+        """
+        等待已经写入的内容处理完成，即交给代理处理函数
+        :param timeout: 最长等待时间，单位秒，为 None 时一直等待
+        :return: 是否在超时前处理完成
+        """
+        worker = self.__worker
+        if worker is None or worker is threading.current_thread():
+            return True
+        event = threading.Event()
+        self.__queue.put(event)
+        return event.wait(timeout)
 
     def stop_proxy(self):
         """
@@ -156,24 +249,40 @@ class SwanLog(SwanKitLogger):
         if not self.proxied:
             return
 
-        # 清理标准输出
-        def clean_stdout():
-            if self.__stdout_buffer:
-                sys.stdout.write(self.__stdout_buffer + '\n')
-            self.__stdout_buffer = ""
+        # 恢复标准输出与标准错误，之后的写入不再进入队列
+        def restore_stdout():
             sys.stdout.write = self.__origin_stdout_write
             self.__origin_stdout_write = None
 
-        # 清理标准错误
-        def clean_stderr():
-            if self.__stderr_buffer:
-                sys.stderr.write(self.__stderr_buffer + '\n')
-            self.__stderr_buffer = ""
+        def restore_stderr():
             sys.stderr.write = self.__origin_stderr_write
             self.__origin_stderr_write = None
 
-        self.__exec_fun_by_type(clean_stdout, clean_stderr)
+        self.__exec_fun_by_type(restore_stdout, restore_stderr)
+        # 等待后台线程处理完队列中的片段，之后在当前线程中完成剩余的工作
+        self.__queue.put(None)
+        self.__worker.join()
+        items = []
+        while True:
+            try:
+                items.append(self.__queue.get_nowait())
+            except Empty:
+                break
+        # 未完成的行在终端中已经输出，只需要换行即可使其作为完整的一行上传
+        now = time.time()
+        for stream, buffer in self.__buffers.items():
+            if buffer.pending:
+                getattr(sys, stream).write('\n')
+                items.append((stream, '\n', now))
+        self.__consume(items)
+        if self.__policy is not None:
+            for stream in self.__buffers:
+                self.__dispatch(stream, [(line, create_time()) for line in self.__policy.flush(stream)])
+        self.__buffers = {}
+        self.__queue, self.__worker = None, None
         self.__counter = AtomicCounter(0)
+        self.__handler = None
+        self.__policy = None
 
     def reset(self):
         """
@@ -186,23 +295,72 @@ class SwanLog(SwanKitLogger):
 _ANSI_ESCAPE_RE = re.compile(r'\x1b\[[0-9;]*[a-zA-Z]')  # 匹配ANSI控制码
 
 
-def clean_control_chars(text) -> Tuple[List[str], str]:
+class LineAssembler:
     """
-    清理终端控制字符（模拟终端覆盖行为）
-    特别，如果当前字符串中不包含换行符，则直接返回，不处理
-    如果存在行为空字符串，则将其删除，不在结果中返回
+    将终端输出的片段组装为行，模拟终端的覆盖行为，处理时间与输出长度成线性关系
+    未完成的行保存为片段列表，新的片段包含 \r 或 \x1b[A 时直接丢弃之前的片段，只保留最后一个控制序列之后的内容，
+    因此进度条反复刷新同一行时，每次写入只处理本次写入的内容，缓冲区也不会随刷新次数增长
     """
-    lines = text.split('\n')
-    cleaned_lines = []
-    # 最后一行不处理，因为可能是未完成的行
-    # 这与当前 “如果当前字符串中不包含换行符，则直接返回，不处理” 的设计是一致的，并且有更多的灵活性: 最后一行将被作为 buffer 缓冲
-    for line in lines[:-1]:
-        # 移除控制序列
-        cleaned_line = remove_control_sequences(line)
-        # 使用预编译正则处理字符串，删除ANSI控制码
-        cleaned_line = _ANSI_ESCAPE_RE.sub('', cleaned_line)
-        cleaned_line and cleaned_lines.append(cleaned_line)
-    return cleaned_lines, lines[-1]
+
+    def __init__(self, progress_interval: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        """
+        :param progress_interval: 被覆盖的进度条状态作为一行返回的最短间隔，单位秒，为 None 时不返回
+        :param clock: 时钟函数，测试时可以替换
+        """
+        self.progress_interval = progress_interval
+        self.clock = clock
+        self.__chunks: List[str] = []
+        self.__progress_at: Optional[float] = None
+
+    @property
+    def pending(self) -> bool:
+        """
+        是否存在未完成的行
+        """
+        return any(self.__chunks)
+
+    def feed(self, text: str) -> List[str]:
+        """
+        写入一段终端输出
+        :return: 已经完成的行，已经清理控制字符，空行被忽略
+        """
+        lines = []
+        *completed, rest = text.split('\n')
+        for segment in completed:
+            self.__append(segment, lines)
+            self.__complete(lines)
+        self.__append(rest, lines)
+        return lines
+
+    def __append(self, segment: str, lines: List[str]):
+        """
+        将一段不包含换行符的内容追加到当前行
+        """
+        # 最后一个控制序列的起止位置
+        last_cr, last_up = segment.rfind('\r'), segment.rfind('\x1b[A')
+        if last_cr == -1 and last_up == -1:
+            segment and self.__chunks.append(segment)
+            return
+        start, cut = (last_up, last_up + 3) if last_up > last_cr else (last_cr, last_cr + 1)
+        # 被覆盖的内容为进度条的上一个状态，按照最大频率返回
+        if self.progress_interval is not None:
+            now = self.clock()
+            if self.__progress_at is None or now - self.__progress_at >= self.progress_interval:
+                self.__chunks.append(segment[:start])
+                if self.__complete(lines):
+                    self.__progress_at = now
+        self.__chunks = [segment[cut:]] if cut < len(segment) else []
+
+    def __complete(self, lines: List[str]) -> bool:
+        """
+        当前行结束，清理控制字符后加入结果
+        :return: 是否加入了结果，空行被忽略
+        """
+        line = remove_control_sequences(''.join(self.__chunks))
+        self.__chunks = []
+        line = _ANSI_ESCAPE_RE.sub('', line)
+        line and lines.append(line)
+        return bool(line)
 
 
 def remove_control_sequences(line: str) -> str:
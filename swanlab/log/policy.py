@@ -0,0 +1,138 @@
+"""
+@author: cunyue
+@file: policy.py
+@time: 2025/7/23 15:20
+@description: 终端输出的采集策略，决定哪些已经组装完成的行作为日志上传，终端中的输出不受影响
+"""
+
+import re
+import threading
+import time
+from typing import Optional, List, Dict, Iterable, Callable
+
+from swanlab.toolkit.telemetry import telemetry
+from .type import LogType
+
+
+class ConsolePolicy:
+    """
+    终端输出的采集策略，线程安全：
+    1. 合并连续重复的行：第一行立即上传，之后相同的行合并为一条带重复次数的记录，在出现不同的行或者停止代理时上传
+    2. 限流：每秒最多上传 max_lines 行、max_bytes 字节，超出的行被丢弃，下一秒开始时上传一条摘要说明丢弃了多少行
+    3. 丢弃匹配 drop_patterns 中任一正则表达式的行，正则表达式只在创建时编译一次
+    合并连续重复的行按输出流分别进行，限流的额度由所有输出流共享
+    """
+
+    WINDOW = 1
+    """
+    限流窗口，单位秒
+    """
+
+    def __init__(
+        self,
+        coalesce: bool = False,
+        max_lines: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        drop_patterns: Iterable[str] = (),
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param coalesce: 是否合并连续重复的行
+        :param max_lines: 每秒最多上传的行数，为 None 时不限制
+        :param max_bytes: 每秒最多上传的字节数（UTF-8 编码），为 None 时不限制
+        :param drop_patterns: 不上传的行的正则表达式
+        :param clock: 时钟函数，测试时可以替换
+        """
+        self.coalesce = coalesce
+        self.max_lines = max_lines
+        self.max_bytes = max_bytes
+        patterns = list(drop_patterns)
+        self.drop = re.compile("|".join(f"(?:{p})" for p in patterns)) if patterns else None
+        self.clock = clock
+        self.__lock = threading.Lock()
+        # 每个输出流上一行的内容，以及之后重复的次数
+        self.__last: Dict[LogType, str] = {}
+        self.__repeats: Dict[LogType, int] = {}
+        # 当前限流窗口的开始时间，窗口内已经上传的行数与字节数，以及丢弃的行数与字节数
+        self.__window: Optional[float] = None
+        self.__lines = 0
+        self.__bytes = 0
+        self.__dropped = 0
+        self.__dropped_bytes = 0
+
+    @property
+    def limited(self) -> bool:
+        return self.max_lines is not None or self.max_bytes is not None
+
+    def filter(self, stream: LogType, lines: List[str]) -> List[str]:
+        """
+        过滤一个输出流中新完成的行
+        :return: 需要上传的行
+        """
+        out = []
+        with self.__lock:
+            for line in lines:
+                if self.drop is not None and self.drop.search(line):
+                    telemetry.incr("log.filtered")
+                    continue
+                if self.coalesce:
+                    if line == self.__last.get(stream):
+                        self.__repeats[stream] += 1
+                        continue
+                    self.__end_repeats(stream, out)
+                    self.__last[stream], self.__repeats[stream] = line, 0
+                self.__limit(line, out)
+        return out
+
+    def flush(self, stream: LogType) -> List[str]:
+        """
+        停止代理时调用，返回尚未上传的重复记录与丢弃摘要
+        """
+        out = []
+        with self.__lock:
+            self.__end_repeats(stream, out)
+            self.__last.pop(stream, None)
+            self.__summary(out)
+        return out
+
+    def __end_repeats(self, stream: LogType, out: List[str]):
+        """
+        连续重复结束，上传一条带重复次数的记录
+        """
+        repeats = self.__repeats.get(stream, 0)
+        if repeats == 0:
+            return
+        self.__repeats[stream] = 0
+        telemetry.incr("log.coalesced", repeats)
+        self.__limit(f"{self.__last[stream]} [repeated {repeats} more times]", out)
+
+    def __limit(self, line: str, out: List[str]):
+        if not self.limited:
+            return out.append(line)
+        now = self.clock()
+        if self.__window is None or now - self.__window >= self.WINDOW:
+            self.__summary(out)
+            self.__window, self.__lines, self.__bytes = now, 0, 0
+        size = len(line.encode("utf-8", "replace"))
+        over_lines = self.max_lines is not None and self.__lines >= self.max_lines
+        over_bytes = self.max_bytes is not None and self.__bytes + size > self.max_bytes
+        if over_lines or over_bytes:
+            self.__dropped += 1
+            self.__dropped_bytes += size
+            return
+        self.__lines += 1
+        self.__bytes += size
+        out.append(line)
+
+    def __summary(self, out: List[str]):
+        """
+        上传一条摘要，说明上一个限流窗口中丢弃的行，摘要本身不占用限流额度
+        """
+        if self.__dropped == 0:
+            return
+        telemetry.incr("log.dropped", self.__dropped)
+        out.append(
+            f"swanlab: {self.__dropped} lines ({self.__dropped_bytes} bytes) were not uploaded "
+            "because of the console rate limit"
+        )
+        self.__dropped, self.__dropped_bytes = 0, 0
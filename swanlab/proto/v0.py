@@ -13,9 +13,10 @@ from typing import Optional, List, Literal, Tuple, Union
 import yaml
 from pydantic import BaseModel as PydanticBaseModel
 
+from swanlab.core_python.client import MediaFile
 from swanlab.core_python.uploader import FileModel, ScalarModel, ColumnModel, LogModel, MediaModel
 from swanlab.log.type import LogData
-from swanlab.toolkit import ChartReference, MediaBuffer
+from swanlab.toolkit import ChartReference
 from swanlab.toolkit import ColumnInfo, ColumnConfig, RuntimeInfo, MetricInfo, ColumnClass, SectionType, YRange
 
 
@@ -309,13 +310,11 @@ class Media(Metric):
         将 Media 实例转换为 MediaModel 实例
         """
         buffers = []
-        # 回复原本的 MediaBuffer 对象
+        # 引用已经写入磁盘的媒体文件，上传时再从磁盘流式读取
         if self.buffers_name:
             for i, buffer_name in enumerate(self.buffers_name):
-                buffer = MediaBuffer()
-                buffer.write(open(os.path.join(media_dir, str(self.kid), buffer_name), "rb").read())
-                buffer.file_name = "{}/{}".format(self.key_encoded, self.metric["data"][i])
-                buffers.append(buffer)
+                path = os.path.join(media_dir, str(self.kid), buffer_name)
+                buffers.append(MediaFile(path, "{}/{}".format(self.key_encoded, self.metric["data"][i])))
 
         return MediaModel(
             metric=self.metric,
@@ -8,16 +8,26 @@ r"""
 """
 import json
 import os
+import re
 from pathlib import Path
 
 from swanlab.toolkit import is_windows
 
 try:
-    from typing import Annotated, Literal, Optional  # Python 3.9+
+    from typing import Annotated, Literal, Optional, Tuple  # Python 3.9+
 except ImportError:
-    from typing_extensions import Annotated, Literal, Optional  # Python 3.8
+    from typing_extensions import Annotated, Literal, Optional, Tuple  # Python 3.8
 
-from pydantic import BaseModel, ConfigDict, PositiveInt, StrictBool, DirectoryPath, Field
+from pydantic import (
+    BaseModel,
+    ConfigDict,
+    PositiveInt,
+    PositiveFloat,
+    StrictBool,
+    DirectoryPath,
+    Field,
+    field_validator,
+)
 
 
 class Settings(BaseModel):
@@ -54,15 +64,127 @@ class Settings(BaseModel):
         ge=5,
         description="Hardware monitoring collection interval, in seconds, minimum value is 5 seconds.",
     )
+    # 是否在 Linux 下按设备与网卡采集磁盘 I/O（吞吐量、IOPS、await、繁忙程度）与网络流量，以及实验目录所在 NFS 挂载点的客户端信息，
+    # 指标数量随设备与网卡数量增长，默认关闭
+    hardware_io_devices: StrictBool = False
+    # 按设备采集磁盘 I/O 时设备名称的通配符，include 为空时采集所有整块磁盘（不包括分区），exclude 优先
+    hardware_disk_include: Tuple[str, ...] = ()
+    hardware_disk_exclude: Tuple[str, ...] = ("loop*", "ram*", "zram*", "sr*", "fd*")
+    # 按网卡采集网络流量时网卡名称的通配符，include 为空时采集所有网卡，exclude 优先
+    hardware_net_include: Tuple[str, ...] = ()
+    hardware_net_exclude: Tuple[str, ...] = ("lo", "docker*", "veth*", "br-*", "virbr*", "ifb*", "cali*", "cni*", "flannel*")
+    # 是否监控主进程及其所有子进程（DataLoader worker、torchrun 子进程等）的 CPU、内存、打开的文件数、线程数与 I/O，
+    # 每次采集需要遍历进程树，默认关闭
+    hardware_process_tree: StrictBool = False
+    # 进程树监控时，按照 CPU 使用率单独上报前多少个子进程的 CPU 使用率与内存，为 0 时不上报
+    hardware_process_top: int = Field(default=3, ge=0, le=32)
+    # 进程树监控时是否采集 PSS（只在 Linux 下有效），需要读取每个进程的 smaps，进程内存较大时开销较大
+    hardware_process_pss: StrictBool = False
+    # 高频采样的间隔，单位秒，设置后在每个采集间隔内按照此间隔采样，上报采样值的均值以及 hardware_aggregates 中的聚合值，
+    # 上报的数据量与采样频率无关，可以发现数据加载卡顿等短暂的利用率下降；仍在执行的采集器（例如较慢的 smi 工具）跳过本次采样
+    hardware_sample_interval: Optional[PositiveFloat] = Field(default=None, ge=0.05)
+    # 高频采样时除均值外额外上报的聚合值，为空时只上报均值
+    hardware_aggregates: Tuple[Literal["min", "max", "p95"], ...] = ("min", "max", "p95")
+    # 是否采集每个 CPU 核心的使用率，核心较多时会产生大量的系统指标
+    hardware_per_cpu: StrictBool = False
+    # 实验初始化时探测硬件信息的总超时时间，单位秒，各厂商的探测并发执行，超时的厂商不会被采集与监控
+    hardware_discovery_timeout: PositiveFloat = 15
+    # 探测结果的缓存有效期，单位秒，同一主机本次启动期间不存在的硬件厂商在有效期内不再探测，为 None 时不使用缓存
+    hardware_cache_ttl: Optional[PositiveInt] = 24 * 60 * 60
+    # 是否加载第三方包通过 entry points（swanlab.collectors 分组）注册的采集器，安装的包会在训练进程中执行代码，默认关闭。
+    # 通过 swanlab.register_collectors 注册的采集器不受此设置影响
+    hardware_plugins: StrictBool = False
+    # 单个硬件采集器（例如调用 npu-smi）的超时时间，单位秒，不超过采集间隔，超时的结果被丢弃，连续失败的采集器会被暂时跳过
+    hardware_timeout: PositiveFloat = 10
+    # ---------------------------------- 性能分析部分 ----------------------------------
+    # 是否开启内置的采样分析器，后台线程定期采样所有线程的 Python 调用栈，火焰图文件保存在实验目录的 files 文件夹中
+    profiler: StrictBool = False
+    # 采样频率，单位 Hz
+    profiler_rate: PositiveFloat = Field(default=100, le=1000)
+    # 聚合采样结果并写入火焰图文件的间隔，单位秒
+    profiler_interval: PositiveFloat = 60
+    # 采样耗时占墙钟时间的上限，超过时自动降低采样频率
+    profiler_max_overhead: float = Field(default=0.02, gt=0, le=1)
     # ---------------------------------- 日志上传部分 ----------------------------------
     # 是否开启日志备份功能
     backup: StrictBool = True
-    # 日志上传间隔
+    # 日志上传最大延迟，单位秒，队列中最早的数据等待超过此时间后立即上传；开启 upload_adaptive 时为上传间隔的初始值
     upload_interval: PositiveInt = 3
+    # 队列中累积的记录数达到此值时立即上传
+    upload_max_records: PositiveInt = 1000
+    # 队列中累积的数据量（估算值，单位字节）达到此值时立即上传
+    upload_max_bytes: PositiveInt = 4 * 1024 * 1024
+    # 指标分块上传时单个请求的最大记录数
+    upload_chunk_records: PositiveInt = 3000
+    # 指标分块上传时单个请求的最大数据量（估算值，单位字节），媒体指标包含其文件大小
+    upload_chunk_bytes: PositiveInt = 2 * 1024 * 1024
+    # 指标分块上传时同时进行的最大请求数
+    upload_concurrency: PositiveInt = 4
+    # 是否根据请求延迟与错误自适应调整上传间隔、分块大小与并发数：请求健康时逐步增大分块与并发、缩短间隔，
+    # 超时、429/5xx 或 202 时成倍减小分块与并发、延长间隔；upload_chunk_records、upload_chunk_bytes 与 upload_concurrency 为上限。
+    # 默认关闭，上传间隔、分块大小与并发数固定为用户设置
+    upload_adaptive: StrictBool = False
+    # 自适应调整时上传间隔的下限与上限，单位秒，upload_interval 为初始值，拥塞时最大延迟可以增加到 upload_max_interval
+    upload_min_interval: PositiveFloat = 0.5
+    upload_max_interval: PositiveFloat = 30
+    # 自适应调整时单个请求最少的记录数
+    upload_min_chunk_records: PositiveInt = 100
+    # 自适应调整时请求平均延迟不超过此值视为健康，单位秒
+    upload_target_latency: PositiveFloat = 1
+    # 待上传（包括上传失败等待重试）的数据在内存中的最大字节数（估算值），超出部分写入实验目录下的 retry 文件夹
+    upload_retry_memory: PositiveInt = 16 * 1024 * 1024
+    # 上传队列中最多保存的记录数与数据量（估算值，单位字节），超出后按照 upload_queue_overflow 处理
+    upload_queue_max_records: PositiveInt = 100000
+    upload_queue_max_bytes: PositiveInt = 64 * 1024 * 1024
+    # 上传队列满时的处理策略，"block" 阻塞写入直到超时，"drop_media" 丢弃媒体数据，"spill" 写入磁盘
+    upload_queue_overflow: Literal["block", "drop_media", "spill"] = "spill"
+    # "block" 策略下写入最多阻塞的时间，单位秒，超时后数据被丢弃
+    upload_queue_timeout: PositiveFloat = 10
+    # 上传请求体的压缩方式，服务端不支持时自动降级
+    upload_compression: Literal["gzip", "deflate", "none"] = "none"
+    # 上传请求体超过此字节数时才压缩
+    upload_compression_threshold: PositiveInt = 1024
+    # 媒体文件超过此字节数时使用分片上传，单个分片失败只需重试该分片
+    upload_multipart_threshold: PositiveInt = 64 * 1024 * 1024
+    # 分片上传时单个分片的字节数，对象存储要求除最后一个分片外不小于 5MB
+    upload_part_size: int = Field(ge=5 * 1024 * 1024, default=8 * 1024 * 1024)
+    # http 请求（包括对象存储）建立连接与等待响应的超时时间，单位秒，超时的请求会被重试
+    http_connect_timeout: PositiveFloat = 10
+    http_read_timeout: PositiveFloat = 60
+    # 是否将上传队列状态（深度、最早数据等待时间、丢弃数）以及 SDK 自身的运行状态（耗时、延迟、发送字节数等）作为系统指标记录
+    upload_monitor: StrictBool = False
+    # 结束实验时上传剩余数据的最长时间，单位秒，超时后未上传的数据保存在本地备份中，可以通过 `swanlab sync` 重新上传
+    # 为 None 时一直等待所有数据上传完成，swanlab.finish(timeout=...) 可以单独指定
+    finish_timeout: Optional[PositiveFloat] = None
+    # 是否在收到 SIGTERM 信号（例如 Slurm、Kubernetes 抢占任务）时结束实验，在 finish_timeout 内上传剩余数据后退出
+    # 没有设置 finish_timeout 时最多等待 25 秒，以免超过调度系统的宽限期被强制结束
+    finish_on_sigterm: StrictBool = False
     # 终端日志上传单行最大字符数
     max_log_length: int = Field(ge=500, le=4096, default=1024)
     # 终端日志代理类型，"all"、"stdout"、"stderr"、"none"
     log_proxy_type: Literal["all", "stdout", "stderr", "none"] = "all"
+    # 终端进度条（使用 \r 刷新的行）的中间状态作为日志上传的最短间隔，单位秒，为 None 时只上传换行时的最终状态
+    log_progress_interval: Optional[PositiveFloat] = None
+    # 是否将连续重复的终端日志行合并为一条带重复次数的记录，第一行立即上传，重复结束时上传重复次数
+    log_coalesce: StrictBool = False
+    # 每秒最多上传的终端日志行数与字节数，超出的行不上传（终端中仍然显示），之后上传一条摘要说明丢弃了多少行
+    log_max_lines_per_second: Optional[PositiveInt] = None
+    log_max_bytes_per_second: Optional[PositiveInt] = None
+    # 不上传的终端日志行的正则表达式，匹配任意一个即不上传，例如 (r"^Warning: ", r"it/s\]$")
+    log_drop_patterns: Tuple[str, ...] = ()
+
+    @field_validator("log_drop_patterns")
+    @classmethod
+    def check_log_drop_patterns(cls, patterns: Tuple[str, ...]) -> Tuple[str, ...]:
+        """
+        在创建设置时编译每个正则表达式，不合法时指出具体是哪一个，而不是在启动终端代理时报错
+        """
+        for pattern in patterns:
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                raise ValueError(f"Invalid regular expression in log_drop_patterns: {pattern!r} ({e})")
+        return patterns
 
     def filter_changed_fields(self):
         """
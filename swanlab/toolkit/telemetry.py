@@ -0,0 +1,274 @@
+"""
+@author: cunyue
+@file: telemetry.py
+@time: 2025/7/20 11:05
+@description: SDK 自身的运行状态统计，例如 log 耗时、请求延迟、重试次数、发送字节数等
+用于判断看板滞后时问题出在 SDK、网络还是服务端
+每个线程写入自己的分片，记录时不需要加锁，记录本身的开销按照记录次数与校准得到的单次开销估算，可以通过快照中的 overhead 字段查看
+"""
+
+import functools
+import threading
+import time
+from typing import Dict, Optional, Callable, List
+
+
+class Distribution:
+    """
+    一组观测值的统计：次数、总和、最大值
+    """
+
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self, count: int = 0, total: float = 0.0, max_value: float = 0.0):
+        self.count = count
+        self.total = total
+        self.max = max_value
+
+    def add(self, value: float):
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "Distribution"):
+        self.count += other.count
+        self.total += other.total
+        if other.max > self.max:
+            self.max = other.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "total": self.total,
+            "mean": self.total / self.count if self.count else 0.0,
+            "max": self.max,
+        }
+
+
+class Timer:
+    """
+    计时上下文，退出时将耗时（秒）记录到对应的分布中
+    """
+
+    __slots__ = ("telemetry", "name", "start")
+
+    def __init__(self, telemetry: "Telemetry", name: str):
+        self.telemetry = telemetry
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.telemetry.observe(self.name, time.perf_counter() - self.start)
+
+
+class Shard:
+    """
+    单个线程的统计数据，只有所属线程会写入，因此记录时不需要加锁
+    """
+
+    __slots__ = ("thread", "counters", "distributions", "records")
+
+    def __init__(self, thread: Optional[threading.Thread] = None):
+        self.thread = thread
+        self.counters: Dict[str, float] = {}
+        self.distributions: Dict[str, Distribution] = {}
+        # 记录次数，用于估算记录本身的开销
+        self.records = 0
+
+    def merge(self, other: "Shard"):
+        # 使用 copy 保证读取其他线程的数据时字典不会在遍历中被修改
+        for name, value in other.counters.copy().items():
+            self.counters[name] = self.counters.get(name, 0) + value
+        for name, distribution in other.distributions.copy().items():
+            target = self.distributions.get(name)
+            if target is None:
+                target = self.distributions[name] = Distribution()
+            target.merge(distribution)
+        self.records += other.records
+
+
+class Local(threading.local):
+    """
+    线程本地存储，每个线程第一次访问时创建并注册自己的分片
+    """
+
+    def __init__(self, register: Callable[[], Shard]):
+        self.shard = register()
+
+
+class Telemetry:
+    """
+    线程安全的计数器与分布统计
+    每个线程写入自己的分片，读取快照时再合并，记录时不需要加锁；已经退出的线程的分片会被合并后释放
+    """
+
+    MAX_SHARDS = 64
+    """
+    分片数量超过此值时合并已经退出的线程的分片
+    """
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__shards: List[Shard] = []
+        # 已经退出的线程的统计数据
+        self.__retired = Shard()
+        self.__started = time.perf_counter()
+        self.__local = Local(self.__register)
+
+    def __register(self) -> Shard:
+        shard = Shard(threading.current_thread())
+        with self.__lock:
+            if len(self.__shards) >= self.MAX_SHARDS:
+                self.__retire()
+            self.__shards.append(shard)
+        return shard
+
+    def __retire(self):
+        """
+        合并已经退出的线程的分片，调用前需要持有锁
+        """
+        alive = []
+        for shard in self.__shards:
+            if shard.thread.is_alive():
+                alive.append(shard)
+            else:
+                self.__retired.merge(shard)
+        self.__shards = alive
+
+    def incr(self, name: str, value: float = 1):
+        """
+        累加计数器
+        """
+        shard = self.__local.shard
+        shard.counters[name] = shard.counters.get(name, 0) + value
+        shard.records += 1
+
+    def observe(self, name: str, value: float):
+        """
+        记录一个观测值，例如耗时或者批次大小
+        """
+        shard = self.__local.shard
+        distribution = shard.distributions.get(name)
+        if distribution is None:
+            distribution = shard.distributions[name] = Distribution()
+        # 热路径，不调用 Distribution.add 以减少一次函数调用
+        distribution.count += 1
+        distribution.total += value
+        if value > distribution.max:
+            distribution.max = value
+        shard.records += 1
+
+    def timer(self, name: str) -> Timer:
+        """
+        计时上下文，用法：with telemetry.timer("log"): ...
+        """
+        return Timer(self, name)
+
+    def timed(self, name: str) -> Callable[[Callable], Callable]:
+        """
+        计时装饰器，将函数每次调用的耗时记录到 name 对应的分布中
+        """
+
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                # 不使用 Timer 上下文，减少热路径上的函数调用
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    self.observe(name, time.perf_counter() - start)
+
+            return wrapper
+
+        return decorator
+
+    def __merged(self) -> Shard:
+        with self.__lock:
+            self.__retire()
+            merged = Shard()
+            merged.merge(self.__retired)
+            for shard in self.__shards:
+                merged.merge(shard)
+            return merged
+
+    def counter(self, name: str) -> float:
+        return self.__merged().counters.get(name, 0)
+
+    def distribution(self, name: str) -> Optional[dict]:
+        distribution = self.__merged().distributions.get(name)
+        return None if distribution is None else distribution.to_dict()
+
+    def snapshot(self) -> dict:
+        """
+        当前统计的快照
+        overhead.seconds 为记录本身的耗时，等于记录次数乘以单次计时的开销
+        overhead.ratio 为记录本身的耗时占 log 耗时的比例，没有调用过 log 时为 None
+        """
+        cost = calibrate()
+        merged = self.__merged()
+        log = merged.distributions.get("log.time")
+        overhead = merged.records * cost
+        return {
+            "uptime": time.perf_counter() - self.__started,
+            "counters": merged.counters,
+            "distributions": {name: d.to_dict() for name, d in merged.distributions.items()},
+            "overhead": {
+                "records": merged.records,
+                "seconds": overhead,
+                "ratio": overhead / log.total if log is not None and log.total > 0 else None,
+            },
+        }
+
+    def reset(self):
+        with self.__lock:
+            for shard in self.__shards:
+                shard.counters.clear()
+                shard.distributions.clear()
+                shard.records = 0
+            self.__retired = Shard()
+            self.__started = time.perf_counter()
+
+
+__cost: Optional[float] = None
+
+
+def calibrate(n: int = 1000, rounds: int = 5) -> float:
+    """
+    测量单次计时（计时装饰器相对于直接调用增加的耗时）的开销，单位秒，结果会被缓存
+    计时是开销最大的记录方式，因此用它估算所有记录的开销是偏保守的
+    测量重复 rounds 轮，直接调用与计时调用的耗时分别取最小值后相减，避免其他线程抢占导致结果偏大或者为 0
+    """
+    global __cost
+    if __cost is None:
+
+        def noop():
+            pass
+
+        timed = Telemetry().timed("calibrate")(noop)
+        baselines, costs = [], []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for _ in range(n):
+                noop()
+            baselines.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            for _ in range(n):
+                timed()
+            costs.append(time.perf_counter() - start)
+        # 计时调用至少包含两次 perf_counter 调用，不可能比直接调用更快
+        __cost = max(min(costs) - min(baselines), min(costs) / 2) / n
+    return __cost
+
+
+telemetry = Telemetry()
+"""
+全局统计对象，在每个实验开始时重置
+"""
+
+__all__ = ["Telemetry", "Timer", "Distribution", "Shard", "telemetry", "calibrate"]
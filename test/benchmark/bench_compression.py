@@ -0,0 +1,133 @@
+"""
+@author: cunyue
+@file: bench_compression.py
+@time: 2025/7/18 14:20
+@description: 上传请求体压缩基准测试
+针对典型的标量、日志、列批次，对比不压缩、gzip、deflate 三种方式的传输字节数、压缩 CPU 耗时以及请求耗时
+请求发送到本地测试服务器，服务器会按照 Content-Encoding 解压并校验请求体
+
+运行方式（项目根目录下）：PYTHONPATH=. python test/benchmark/bench_compression.py
+"""
+
+import gzip
+import json
+import random
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from swanlab.core_python.client.encoding import encode_json
+
+
+class Handler(BaseHTTPRequestHandler):
+    received = 0
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        Handler.received += len(body)
+        encoding = self.headers.get("Content-Encoding")
+        if encoding == "gzip":
+            body = gzip.decompress(body)
+        elif encoding == "deflate":
+            body = zlib.decompress(body)
+        json.loads(body)
+        self.send_response(201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def create_time(i: int) -> str:
+    return (datetime(2025, 7, 18, 10, 0, 0) + timedelta(milliseconds=37 * i)).isoformat() + "+00:00"
+
+
+def scalar_batch(n: int = 3000) -> dict:
+    keys = ["loss", "acc", "lr", "grad_norm", "train/loss", "val/loss"]
+    metrics = [
+        {
+            "data": random.random(),
+            "create_time": create_time(i),
+            "key": keys[i % len(keys)],
+            "index": i // len(keys),
+            "epoch": i // len(keys),
+        }
+        for i in range(n)
+    ]
+    return {"projectId": "a" * 21, "experimentId": "b" * 21, "type": "scalar", "metrics": metrics, "flagId": "c" * 21}
+
+
+def log_batch(n: int = 1000) -> dict:
+    metrics = [
+        {
+            "level": "INFO",
+            "create_time": create_time(i),
+            "epoch": i,
+            "message": f"Epoch {i // 100} | step {i} | loss {random.random():.4f} | lr {random.random() / 1000:.6f}",
+        }
+        for i in range(n)
+    ]
+    return {"projectId": "a" * 21, "experimentId": "b" * 21, "type": "log", "metrics": metrics, "flagId": "c" * 21}
+
+
+def column_batch(n: int = 300) -> list:
+    return [
+        {
+            "class": "CUSTOM",
+            "type": "FLOAT",
+            "key": f"layer.{i}.grad_norm",
+            "name": f"layer.{i}.grad_norm",
+            "sectionName": "layer",
+            "sectionType": "PUBLIC",
+            "yRange": None,
+            "chartName": None,
+            "chartIndex": None,
+            "metricName": None,
+            "metricColors": None,
+        }
+        for i in range(n)
+    ]
+
+
+def bench(url: str, name: str, data, repeat: int = 20):
+    raw = len(json.dumps(data).encode("utf-8"))
+    print(f"\n{name}: {raw / 1024:.1f} KiB raw")
+    print(f"  {'encoding':<10}{'wire KiB':>10}{'ratio':>8}{'encode ms':>12}{'request ms':>12}")
+    session = requests.Session()
+    for encoding in [None, "gzip", "deflate"]:
+        cpu = 0.0
+        Handler.received = 0
+        start = time.perf_counter()
+        for _ in range(repeat):
+            t = time.process_time()
+            body, headers = encode_json(data, encoding, threshold=1024)
+            cpu += time.process_time() - t
+            session.post(url, data=body, headers=headers).raise_for_status()
+        elapsed = time.perf_counter() - start
+        wire = Handler.received / repeat
+        print(
+            f"  {encoding or 'none':<10}{wire / 1024:>10.1f}{raw / wire:>8.1f}"
+            f"{cpu / repeat * 1000:>12.2f}{elapsed / repeat * 1000:>12.2f}"
+        )
+
+
+def main():
+    random.seed(0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/house/metrics"
+    try:
+        bench(url, "scalar batch (3000 points)", scalar_batch())
+        bench(url, "log batch (1000 lines)", log_batch())
+        bench(url, "column batch (300 columns)", column_batch())
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
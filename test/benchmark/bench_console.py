@@ -0,0 +1,168 @@
+"""
+@author: cunyue
+@file: bench_console.py
+@time: 2025/7/23 10:40
+@description: 终端代理处理进度条输出的基准测试
+模拟 tqdm 的输出：每一行进度条通过 \r 刷新 updates 次后换行，对比：
+1. legacy: 旧的实现，每次写入都将缓冲区与新内容拼接后重新查找换行符，耗时随刷新次数平方增长
+2. assembler: LineAssembler，每次写入只处理本次写入的内容
+3. proxy: 经过 swanlog 的完整代理（终端输出写入空设备，日志回调为空函数）
+之后模拟多个线程同时打印，统计写入线程中单次写入的耗时（处理在后台线程中完成，不计入）
+最后模拟大量重复输出的任务，对比不同采集策略下上传的行数
+
+运行方式（项目根目录下）：PYTHONPATH=. python test/benchmark/bench_console.py
+"""
+
+import argparse
+import os
+import re
+import sys
+import threading
+import time
+from typing import Callable, List, Tuple
+
+# swanlab 需要运行时环境变量
+os.environ.setdefault("SWANLAB_RUNTIME", "test-no-cloud")
+
+from swanlab.log import swanlog
+from swanlab.log.log import LineAssembler, remove_control_sequences
+from swanlab.log.policy import ConsolePolicy
+
+ANSI_ESCAPE_RE = re.compile(r"\x1b\[[0-9;]*[a-zA-Z]")
+
+
+def tqdm_writes(lines: int, updates: int, width: int = 40) -> List[str]:
+    """
+    生成 tqdm 风格的输出片段，每一行刷新 updates 次
+    """
+    writes = []
+    for line in range(lines):
+        for i in range(1, updates + 1):
+            filled = width * i // updates
+            bar = "█" * filled + " " * (width - filled)
+            writes.append(f"\repoch {line}: {100 * i // updates:3d}%|{bar}| {i}/{updates} [00:01<00:00, 99.9it/s]")
+        writes.append("\n")
+    return writes
+
+
+def clean_control_chars(text: str) -> Tuple[List[str], str]:
+    """
+    旧的实现，仅作为基准测试的对照：处理除最后一行以外的所有行，最后一行作为缓冲区返回
+    """
+    lines = text.split("\n")
+    cleaned_lines = []
+    for line in lines[:-1]:
+        cleaned_line = ANSI_ESCAPE_RE.sub("", remove_control_sequences(line))
+        cleaned_line and cleaned_lines.append(cleaned_line)
+    return cleaned_lines, lines[-1]
+
+
+def legacy(writes: List[str]) -> int:
+    buffer, count = "", 0
+    for w in writes:
+        messages, buffer = clean_control_chars(buffer + w)
+        count += len(messages)
+    return count
+
+
+def assembler(writes: List[str]) -> int:
+    a, count = LineAssembler(), 0
+    for w in writes:
+        count += len(a.feed(w))
+    return count
+
+
+def proxy(writes: List[str], policy: ConsolePolicy = None) -> int:
+    count = [0]
+
+    def handler(data):
+        count[0] += len(data["contents"])
+
+    stdout = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            swanlog.start_proxy("stdout", 1024, handler, policy=policy)
+            for w in writes:
+                sys.stdout.write(w)
+        finally:
+            swanlog.stop_proxy()
+            sys.stdout = stdout
+    return count[0]
+
+
+def threaded(threads: int, lines: int) -> float:
+    """
+    多个线程同时打印，返回写入线程中单次写入的平均耗时，单位微秒
+    """
+    elapsed = []
+
+    def write(n: int):
+        start = time.perf_counter()
+        for i in range(lines):
+            sys.stdout.write(f"thread {n} | batch {i} | loss {1 / (i + 1):.6f}\n")
+        elapsed.append(time.perf_counter() - start)
+
+    stdout = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            swanlog.start_proxy("stdout", 1024, lambda data: None)
+            workers = [threading.Thread(target=write, args=(n,)) for n in range(threads)]
+            for w in workers:
+                w.start()
+            for w in workers:
+                w.join()
+        finally:
+            swanlog.stop_proxy()
+            sys.stdout = stdout
+    return sum(elapsed) / threads / lines * 1e6
+
+
+def chatty_writes(steps: int) -> List[str]:
+    """
+    模拟大量重复输出的任务：每一步打印同样的保存提示与警告，以及一行训练日志
+    """
+    writes = []
+    for i in range(steps):
+        writes.append("Saving checkpoint...\n")
+        writes.append("UserWarning: this overload is deprecated\n" * 5)
+        writes.append(f"step {i} | loss {1 / (i + 1):.6f}\n")
+    return writes
+
+
+def bench(func: Callable[[List[str]], int], writes: List[str]) -> float:
+    start = time.perf_counter()
+    func(writes)
+    return (time.perf_counter() - start) / len(writes) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=5, help="进度条的行数")
+    parser.add_argument("--steps", type=int, default=10000, help="重复输出任务的步数")
+    args = parser.parse_args()
+    print(f"{'updates/line':>14}{'legacy us':>12}{'assembler us':>14}{'proxy us':>10}")
+    for updates in (100, 1000, 5000):
+        writes = tqdm_writes(args.lines, updates)
+        assert legacy(writes) == assembler(writes) == args.lines
+        results = [bench(f, writes) for f in (legacy, assembler, proxy)]
+        print(f"{updates:>14}{results[0]:>12.2f}{results[1]:>14.2f}{results[2]:>10.2f}")
+    print(f"\n{'threads':>14}{'write us':>12}")
+    for threads in (1, 4, 8):
+        print(f"{threads:>14}{threaded(threads, args.steps):>12.2f}")
+    # 写入在一秒内完成，限流的效果即为每秒的预算
+    writes = chatty_writes(args.steps)
+    policies = {
+        "none": None,
+        "coalesce": ConsolePolicy(coalesce=True),
+        "drop pattern": ConsolePolicy(drop_patterns=["^Saving checkpoint", "^UserWarning: "]),
+        "100 lines/s": ConsolePolicy(max_lines=100),
+    }
+    print(f"\n{'policy':>14}{'uploaded lines':>16}")
+    for name, policy in policies.items():
+        print(f"{name:>14}{proxy(writes, policy):>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+@author: cunyue
+@file: bench_e2e.py
+@time: 2025/7/21 11:30
+@description: 端到端上传吞吐基准测试
+使用本地模拟的 SwanLab 服务端（tutils/server.py），不需要网络，对不同的实验形态与服务端状况，统计：
+1. points/s: 从第一次 log 到 finish 完成期间，服务端每秒收到的指标数
+2. MB/s: 同一期间服务端每秒收到的请求体字节数（压缩后）
+3. lag: 每个指标从创建到被服务端收到的时间，p50/p95/max
+4. log ms: 单次 swanlab.log 的平均耗时
+
+运行方式（项目根目录下）：PYTHONPATH=. python test/benchmark/bench_e2e.py
+可以通过 --steps 调整每个形态的步数，例如在 CI 中使用 --steps 200 快速运行
+"""
+
+import argparse
+import os
+import time
+from typing import Callable, Dict, Optional
+
+# tutils 需要运行时环境变量，基准测试默认不连接云端
+os.environ.setdefault("SWANLAB_RUNTIME", "test-no-cloud")
+
+import numpy as np
+
+import swanlab
+from tutils.server import FakeServer
+
+
+def scalars(width: int) -> Callable[[int], Optional[Dict]]:
+    """
+    每一步记录 width 个标量
+    """
+    keys = [f"train/metric_{i}" for i in range(width)]
+
+    def step(i: int):
+        return {k: i * j / 7 for j, k in enumerate(keys)}
+
+    return step
+
+
+def images(every: int, size: int) -> Callable[[int], Optional[Dict]]:
+    """
+    每一步记录一个 loss，每 every 步额外记录一张 size x size 的图像
+    """
+
+    def step(i: int):
+        data = {"loss": 1 / (i + 1)}
+        if i % every == 0:
+            data["image"] = swanlab.Image(np.random.randint(0, 255, (size, size, 3), dtype=np.uint8))
+        return data
+
+    return step
+
+
+def logs(lines: int) -> Callable[[int], Optional[Dict]]:
+    """
+    每一步打印 lines 行终端日志并记录一个 loss
+    """
+
+    def step(i: int):
+        for j in range(lines):
+            print(f"epoch {i} | batch {j} | loss {1 / (i + 1):.6f}")
+        return {"loss": 1 / (i + 1)}
+
+    return step
+
+
+SHAPES = {
+    "scalar x10": lambda: scalars(10),
+    "scalar x500": lambda: scalars(500),
+    "image 64px /10 steps": lambda: images(10, 64),
+    "log 5 lines": lambda: logs(5),
+}
+
+SERVERS = {
+    "local": dict(),
+    "latency 20ms": dict(latency=0.02),
+    "5% errors": dict(error_rate=0.05, seed=0),
+    "slow link": dict(latency=0.1, bandwidth=1024 * 1024),
+}
+
+
+def percentile(values, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def bench(server_options: dict, step: Callable[[int], Optional[Dict]], steps: int) -> dict:
+    with FakeServer(**server_options) as server:
+        os.environ["SWANLAB_API_HOST"] = server.api_host
+        os.environ["SWANLAB_WEB_HOST"] = server.url
+        # 模拟服务端接受任意 api key
+        swanlab.login(api_key="0" * 21, save=False)
+        swanlab.init(project="benchmark", mode="cloud", settings=swanlab.Settings(hardware_monitor=False))
+        # 登录与挂载的请求不计入统计
+        received = server.bytes_received
+        start = time.perf_counter()
+        log_time = 0.0
+        for i in range(steps):
+            data = step(i)
+            t = time.perf_counter()
+            swanlab.log(data, step=i)
+            log_time += time.perf_counter() - t
+        swanlab.finish()
+        elapsed = time.perf_counter() - start
+        points = sum(server.points(t) for t in ("scalar", "media", "log"))
+        lags = server.lags("scalar") + server.lags("media")
+        return {
+            "points": points,
+            "points/s": points / elapsed,
+            "MB/s": (server.bytes_received - received) / elapsed / 1024 / 1024,
+            "lag p50": percentile(lags, 0.5),
+            "lag p95": percentile(lags, 0.95),
+            "lag max": max(lags, default=0.0),
+            "log ms": log_time / steps * 1000,
+            "errors": server.errors,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--steps", type=int, default=1000, help="每个形态的步数")
+    parser.add_argument("--shape", action="append", choices=list(SHAPES), help="只运行指定的形态，可以重复")
+    parser.add_argument("--server", action="append", choices=list(SERVERS), help="只运行指定的服务端状况，可以重复")
+    args = parser.parse_args()
+    np.random.seed(0)
+    header = f"{'shape':<22}{'server':<14}{'points':>8}{'points/s':>11}{'MB/s':>8}"
+    header += f"{'lag p50':>9}{'lag p95':>9}{'lag max':>9}{'log ms':>8}{'errors':>8}"
+    results = []
+    for shape in args.shape or SHAPES:
+        for name in args.server or SERVERS:
+            results.append((shape, name, bench(SERVERS[name], SHAPES[shape](), args.steps)))
+    # 实验运行时会打印大量日志，最后统一输出结果
+    print("\n" + header)
+    for shape, name, r in results:
+        print(
+            f"{shape:<22}{name:<14}{r['points']:>8}{r['points/s']:>11.0f}{r['MB/s']:>8.2f}"
+            f"{r['lag p50']:>9.3f}{r['lag p95']:>9.3f}{r['lag max']:>9.3f}{r['log ms']:>8.3f}{r['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
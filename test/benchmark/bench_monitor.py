@@ -0,0 +1,74 @@
+"""
+@author: cunyue
+@file: bench_monitor.py
+@time: 2025/7/25 16:30
+@description: 硬件监控高频采样的开销基准测试
+只使用 CPU、内存、磁盘与网络采集器（不需要 GPU），在不同的采样间隔下运行 MonitorCron，统计：
+1. samples/s: 每秒完成的采样次数
+2. cpu %: 采样期间进程消耗的 CPU 时间占墙钟时间的比例（包括解释器本身的空闲开销）
+3. us/sample: 单次采样（所有采集器）平均消耗的 CPU 时间
+4. reported: 每个上报周期上报的指标数，与采样频率无关
+
+运行方式（项目根目录下）：PYTHONPATH=. python test/benchmark/bench_monitor.py
+"""
+
+import argparse
+import os
+import time
+from typing import Optional
+
+# swanlab 需要运行时环境变量
+os.environ.setdefault("SWANLAB_RUNTIME", "test-no-cloud")
+
+from swanlab.data.run.helper import MonitorCron
+from swanlab.data.run.metadata.hardware.cpu import CpuCollector
+from swanlab.data.run.metadata.hardware.disk import DiskCollector
+from swanlab.data.run.metadata.hardware.memory import MemoryCollector
+from swanlab.data.run.metadata.hardware.network import NetworkCollector
+from swanlab.swanlab_settings import Settings, set_settings
+
+
+def bench(sample_interval: Optional[float], seconds: float) -> dict:
+    collectors = [CpuCollector(), MemoryCollector(), DiskCollector(), NetworkCollector()]
+    calls = [0]
+
+    def count(collector):
+        def wrapper():
+            calls[0] += 1
+            return collector()
+
+        wrapper.close = collector.close
+        return wrapper
+
+    reports = []
+    # 上报间隔足够长，手动上报一次
+    set_settings(Settings(hardware_interval=3600, hardware_sample_interval=sample_interval))
+    cpu, wall = time.process_time(), time.perf_counter()
+    cron = MonitorCron([count(c) for c in collectors], lambda infos, _: reports.append(len(infos)))
+    time.sleep(seconds)
+    if cron.aggregator is not None:
+        cron.report()
+    cron.cancel()
+    cpu, wall = time.process_time() - cpu, time.perf_counter() - wall
+    samples = calls[0] / len(collectors)
+    return {
+        "samples/s": samples / wall,
+        "cpu %": cpu / wall * 100,
+        "us/sample": cpu / samples * 1e6 if samples else 0.0,
+        "reported": reports[-1] if reports else 0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=5, help="每种采样间隔运行的时间")
+    args = parser.parse_args()
+    print(f"{'interval':>10}{'samples/s':>11}{'cpu %':>8}{'us/sample':>11}{'reported':>10}")
+    for interval in (None, 1, 0.1, 0.05):
+        r = bench(interval, args.seconds)
+        name = "report" if interval is None else f"{interval}s"
+        print(f"{name:>10}{r['samples/s']:>11.1f}{r['cpu %']:>8.2f}{r['us/sample']:>11.0f}{r['reported']:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+@author: cunyue
+@file: bench_profiler.py
+@time: 2025/7/29 17:00
+@description: 采样分析器的开销基准测试
+主线程运行固定的纯 Python 计算，另有若干个空闲线程（模拟 DataLoader worker、上传线程等），比较不开启与开启采样分析器时的耗时：
+1. slowdown %: 相对于不开启采样分析器时耗时增加的比例（取多次运行的最小值）
+2. samples/s: 实际的采样频率
+3. us/sample: 单次采样（所有线程）的平均耗时，采样时持有 GIL
+4. cpu %: 采样耗时占墙钟时间的比例
+
+运行方式（项目根目录下）：PYTHONPATH=. python test/benchmark/bench_profiler.py
+"""
+
+import argparse
+import os
+import tempfile
+import threading
+import time
+from typing import Optional
+
+# swanlab 需要运行时环境变量
+os.environ.setdefault("SWANLAB_RUNTIME", "test-no-cloud")
+
+from swanlab.data.run.profiler import SamplingProfiler
+from swanlab.toolkit.telemetry import telemetry
+
+
+def fib(n: int) -> int:
+    return n if n < 2 else fib(n - 1) + fib(n - 2)
+
+
+def workload(n: int):
+    for _ in range(n):
+        fib(20)
+
+
+def run(rate: Optional[float], n: int, folder: str) -> dict:
+    telemetry.reset()
+    profiler = SamplingProfiler(folder, rate=rate, interval=1) if rate else None
+    start = time.perf_counter()
+    workload(n)
+    elapsed = time.perf_counter() - start
+    if profiler is not None:
+        profiler.stop()
+    sample = telemetry.snapshot()["distributions"].get("profiler.sample", {"count": 0, "total": 0.0})
+    return {
+        "elapsed": elapsed,
+        "samples/s": sample["count"] / elapsed,
+        "us/sample": sample["total"] / sample["count"] * 1e6 if sample["count"] else 0.0,
+        "cpu %": sample["total"] / elapsed * 100,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--n", type=int, default=300, help="workload 的迭代次数")
+    parser.add_argument("--repeat", type=int, default=5, help="每种采样频率重复运行的次数")
+    parser.add_argument("--threads", type=int, default=8, help="空闲线程的数量")
+    args = parser.parse_args()
+    stop = threading.Event()
+    for i in range(args.threads):
+        threading.Thread(target=stop.wait, name=f"Idle-{i}", daemon=True).start()
+    print(f"{'rate':>8}{'elapsed s':>11}{'slowdown %':>12}{'samples/s':>11}{'us/sample':>11}{'cpu %':>8}")
+    baseline = None
+    with tempfile.TemporaryDirectory() as folder:
+        for rate in (None, 100, 1000):
+            results = [run(rate, args.n, folder) for _ in range(args.repeat)]
+            r = min(results, key=lambda x: x["elapsed"])
+            baseline = r["elapsed"] if baseline is None else baseline
+            slowdown = (r["elapsed"] / baseline - 1) * 100
+            name = "off" if rate is None else f"{rate}Hz"
+            print(
+                f"{name:>8}{r['elapsed']:>11.3f}{slowdown:>12.2f}{r['samples/s']:>11.1f}"
+                f"{r['us/sample']:>11.0f}{r['cpu %']:>8.2f}"
+            )
+    stop.set()
+
+
+if __name__ == "__main__":
+    main()
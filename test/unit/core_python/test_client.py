@@ -5,7 +5,11 @@
 @description: 测试客户端功能
 """
 
+import gzip
+import json
 import os
+import time
+from datetime import datetime, timezone
 
 import nanoid
 import pytest
@@ -16,8 +20,10 @@ from responses import registries
 from swanlab.core_python import create_client, Client, CosClient, reset_client
 from swanlab.core_python.auth import login_by_key
 from swanlab.package import get_host_api
+from swanlab.swanlab_settings import Settings, set_settings, reset_settings
 from swanlab.toolkit import MediaBuffer
 from tutils import is_skip_cloud_test, TEMP_PATH, API_KEY
+from tutils.server import FakeServer
 from tutils.setup import *
 
 
@@ -97,6 +103,84 @@ def test_retry():
         assert rsp4.call_count == 1
 
 
+class TestCompression:
+    """
+    测试请求体压缩与降级
+    """
+
+    @staticmethod
+    def setup_method():
+        set_settings(Settings(upload_compression="gzip", upload_compression_threshold=100))
+
+    @staticmethod
+    def teardown_method():
+        reset_settings()
+
+    def test_compress(self):
+        data = [{"key": "loss", "index": i, "data": 0.1} for i in range(100)]
+        with UseMocker() as mocker:
+            mocker.post("/house/metrics", status_code=201)
+            with UseMockRunState() as run_state:
+                run_state.client.post("/house/metrics", data)
+                request = mocker.last_request
+                assert request.headers["Content-Encoding"] == "gzip"
+                assert json.loads(gzip.decompress(request.body)) == data
+                assert len(request.body) < len(json.dumps(data)) / 5
+                # 小于阈值时不压缩
+                run_state.client.post("/house/metrics", {"a": 1})
+                assert "Content-Encoding" not in mocker.last_request.headers
+                assert mocker.last_request.json() == {"a": 1}
+
+    def test_fallback(self):
+        """
+        服务端返回 415 时根据 Accept-Encoding 降级，不支持压缩时发送原始数据
+        """
+        data = [{"key": "loss", "index": i} for i in range(100)]
+
+        def callback(request, context):
+            encoding = request.headers.get("Content-Encoding")
+            if encoding == "gzip":
+                context.status_code = 415
+                context.headers["Accept-Encoding"] = "deflate"
+            elif encoding == "deflate":
+                context.status_code = 415
+                context.headers["Accept-Encoding"] = "identity"
+            else:
+                context.status_code = 201
+            return ""
+
+        with UseMocker() as mocker:
+            mocker.post("/house/metrics", text=callback)
+            with UseMockRunState() as run_state:
+                client = run_state.client
+                _, resp = client.post("/house/metrics", data)
+                assert resp.status_code == 201
+                assert [r.headers.get("Content-Encoding") for r in mocker.request_history] == ["gzip", "deflate", None]
+                assert client.encoding is None
+                assert mocker.last_request.json() == data
+
+    @pytest.mark.parametrize("compression", ["gzip", "none"])
+    def test_nan(self, compression):
+        """
+        压缩与不压缩时 NaN 与 Infinity 的序列化方式相同，请求体是合法的 json
+        """
+        set_settings(Settings(upload_compression=compression, upload_compression_threshold=100))
+        data = [{"key": "loss", "index": i, "data": v} for i, v in enumerate([float("nan"), float("inf"), 0.1] * 20)]
+        with UseMocker() as mocker:
+            mocker.post("/house/metrics", status_code=201)
+            with UseMockRunState() as run_state:
+                run_state.client.post("/house/metrics", data)
+                request = mocker.last_request
+                body = gzip.decompress(request.body) if compression == "gzip" else request.body
+                assert request.headers.get("Content-Encoding") == (None if compression == "none" else "gzip")
+
+        def reject(constant):
+            raise ValueError(constant)
+
+        sent = json.loads(body, parse_constant=reject)
+        assert [m["data"] for m in sent[:3]] == ["NaN", "INF", 0.1]
+
+
 @pytest.mark.skipif(is_skip_cloud_test, reason="skip cloud test")
 class TestCosSuite:
     http: Client = None
@@ -211,3 +295,43 @@ class TestExpSuite:
         assert new is True, "Experiment should not exist before creation"
         new = self.client.mount_exp(exp_name, ('#ffffff', '#ffffff'), cuid=cuid)
         assert new is False, "Experiment should exist after creation"
+
+
+class TestSidRefresh:
+    """
+    测试 sid 的刷新，使用本地模拟的服务端
+    """
+
+    @staticmethod
+    def teardown_method():
+        reset_client()
+
+    def test_refresh_in_background(self):
+        """
+        sid 进入刷新时间后在后台刷新，不阻塞请求
+        """
+        with FakeServer(session_ttl=Client.REFRESH_TIME - 3600) as server:
+            client = create_client(server.login())
+            expired_at = client.sid_expired_at
+            server.session_ttl = 30 * 24 * 60 * 60
+            client.mount_project("test")
+            for _ in range(50):
+                if client.sid_expired_at != expired_at:
+                    break
+                time.sleep(0.1)
+            assert client.sid_expired_at > expired_at
+            assert server.logins == 2
+            # 刷新后不再刷新
+            client.mount_project("test")
+            assert server.logins == 2
+
+    def test_refresh_expired(self):
+        """
+        sid 即将过期时先刷新再请求
+        """
+        with FakeServer(session_ttl=Client.EXPIRED_MARGIN / 2) as server:
+            client = create_client(server.login())
+            server.session_ttl = 30 * 24 * 60 * 60
+            client.mount_project("test")
+            assert server.logins == 2
+            assert (client.sid_expired_at - datetime.now(timezone.utc)).total_seconds() > Client.REFRESH_TIME
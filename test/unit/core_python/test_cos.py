@@ -0,0 +1,218 @@
+"""
+@author: cunyue
+@file: test_cos.py
+@time: 2025/7/18 16:40
+@description: 测试对象存储上传，使用 moto 模拟 S3 兼容的对象存储
+"""
+
+import os
+import time
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+from swanlab.core_python.client import CosClient, MediaFile
+from swanlab.core_python.client.cos import buffer_size, open_buffer
+from swanlab.swanlab_settings import Settings, set_settings, reset_settings
+from swanlab.toolkit import MediaBuffer
+from tutils import TEMP_PATH
+
+BUCKET = "swanlab-test"
+PREFIX = "media/run"
+PART_SIZE = 5 * 1024 * 1024
+
+
+@pytest.fixture
+def cos(monkeypatch):
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    set_settings(Settings(upload_multipart_threshold=PART_SIZE, upload_part_size=PART_SIZE))
+    with mock_aws():
+        boto3.client("s3").create_bucket(Bucket=BUCKET)
+        client = CosClient(
+            {
+                "expiredTime": time.time() + 3600,
+                "prefix": PREFIX,
+                "bucket": BUCKET,
+                "region": "us-east-1",
+                "endPoint": "https://s3.amazonaws.com",
+                "pathStyle": True,
+                "credentials": {"tmpSecretId": "id", "tmpSecretKey": "key", "sessionToken": "token"},
+            }
+        )
+        yield client
+        client.close()
+    reset_settings()
+
+
+def get_object(name: str) -> dict:
+    return boto3.client("s3").get_object(Bucket=BUCKET, Key=f"{PREFIX}/{name}")
+
+
+def create_file(name: str, size: int) -> MediaFile:
+    path = os.path.join(TEMP_PATH, name)
+    with open(path, "wb") as f:
+        f.write(os.urandom(size))
+    return MediaFile(path, name)
+
+
+def on_call(cos: CosClient, operation: str, handler):
+    """
+    在请求发送前调用 handler，handler 可以抛出异常模拟请求失败
+    """
+    events = cos._CosClient__client.meta.events
+    events.register(f"provide-client-params.s3.{operation}", lambda params, **_: handler(params))
+
+
+def test_media_file():
+    file = create_file("media.bin", 100)
+    assert buffer_size(file) == 100
+    with open_buffer(file) as f:
+        assert f.read() == file.getvalue()
+    assert buffer_size(MediaFile(os.path.join(TEMP_PATH, "missing"), "missing")) == 0
+    buffer = MediaBuffer()
+    buffer.write(b"swanlab")
+    assert buffer_size(buffer) == 7
+    with open_buffer(buffer) as f:
+        assert f.read() == b"swanlab"
+
+
+def test_upload(cos):
+    buffer = MediaBuffer()
+    buffer.write(b"swanlab")
+    buffer.file_name = "buffer.txt"
+    file = create_file("file.bin", 1024)
+    cos.upload_files([buffer, file])
+    assert get_object("buffer.txt")["Body"].read() == b"swanlab"
+    obj = get_object("file.bin")
+    assert obj["Body"].read() == file.getvalue()
+    assert obj["CacheControl"] == "max-age=31536000"
+    # 多次上传复用同一个线程池
+    executor = cos._CosClient__executor
+    cos.upload_files([file])
+    assert cos._CosClient__executor is executor
+
+
+def test_multipart(cos):
+    file = create_file("video.mp4", 2 * PART_SIZE + 100)
+    parts = []
+    on_call(cos, "UploadPart", lambda params: parts.append(params["PartNumber"]))
+    cos.upload(file)
+    obj = get_object("video.mp4")
+    assert obj["Body"].read() == file.getvalue()
+    # 分片上传的 ETag 以分片数结尾
+    assert obj["ETag"].strip('"').endswith("-3")
+    assert parts == [1, 2, 3]
+
+
+def test_multipart_resume(cos, monkeypatch):
+    """
+    分片上传失败后，再次上传只需上传未完成的分片
+    """
+    monkeypatch.setattr(CosClient, "PART_ATTEMPTS", 1)
+    file = create_file("model.glb", 2 * PART_SIZE + 100)
+    parts = []
+    fail = {2}
+
+    def handler(params):
+        if params["PartNumber"] in fail:
+            raise ConnectionError("network down")
+        parts.append(params["PartNumber"])
+
+    on_call(cos, "UploadPart", handler)
+    cos.upload(file)
+    assert parts == [1]
+    with pytest.raises(ClientError):
+        get_object("model.glb")
+    uploads = boto3.client("s3").list_multipart_uploads(Bucket=BUCKET)["Uploads"]
+    assert len(uploads) == 1
+    # 网络恢复后续传
+    fail.clear()
+    cos.upload(file)
+    assert parts == [1, 2, 3]
+    assert get_object("model.glb")["Body"].read() == file.getvalue()
+    assert "Uploads" not in boto3.client("s3").list_multipart_uploads(Bucket=BUCKET)
+
+
+def test_multipart_resume_changed(cos, monkeypatch):
+    """
+    续传时大小一致但内容已经改变的分片需要重新上传
+    """
+    monkeypatch.setattr(CosClient, "PART_ATTEMPTS", 1)
+    file = create_file("changed.bin", 2 * PART_SIZE + 100)
+    parts = []
+    fail = {3}
+
+    def handler(params):
+        if params["PartNumber"] in fail:
+            raise ConnectionError("network down")
+        parts.append(params["PartNumber"])
+
+    on_call(cos, "UploadPart", handler)
+    cos.upload(file)
+    assert parts == [1, 2]
+    # 修改第二个分片的内容，大小保持不变
+    with open(file.path, "r+b") as f:
+        f.seek(PART_SIZE)
+        f.write(os.urandom(100))
+    fail.clear()
+    cos.upload(file)
+    assert parts == [1, 2, 2, 3]
+    assert get_object("changed.bin")["Body"].read() == file.getvalue()
+
+
+def test_abort_multipart_uploads(cos, monkeypatch):
+    """
+    实验结束时中止当前实验目录下未完成的分片上传
+    """
+    monkeypatch.setattr(CosClient, "PART_ATTEMPTS", 1)
+
+    def handler(params):
+        if params["PartNumber"] == 2:
+            raise ConnectionError("network down")
+
+    on_call(cos, "UploadPart", handler)
+    cos.upload(create_file("broken.bin", PART_SIZE + 100))
+    s3 = boto3.client("s3")
+    # 其他实验目录下的分片上传不受影响
+    other = s3.create_multipart_upload(Bucket=BUCKET, Key="media/other/file.bin")["UploadId"]
+    assert len(s3.list_multipart_uploads(Bucket=BUCKET)["Uploads"]) == 2
+    cos.abort_multipart_uploads()
+    uploads = s3.list_multipart_uploads(Bucket=BUCKET)["Uploads"]
+    assert [u["UploadId"] for u in uploads] == [other]
+
+
+def test_multipart_part_retry(cos, monkeypatch):
+    """
+    单个分片失败时只重试该分片
+    """
+    monkeypatch.setattr("swanlab.core_python.client.cos.time.sleep", lambda _: None)
+    file = create_file("large.bin", PART_SIZE + 100)
+    calls = []
+
+    def handler(params):
+        calls.append(params["PartNumber"])
+        if calls.count(2) == 1 and params["PartNumber"] == 2:
+            raise ConnectionError("network down")
+
+    on_call(cos, "UploadPart", handler)
+    cos.upload(file)
+    assert calls == [1, 2, 2]
+    assert get_object("large.bin")["Body"].read() == file.getvalue()
+
+
+def test_multipart_fallback(cos):
+    """
+    凭证没有分片上传权限时降级为普通上传
+    """
+
+    def handler(_):
+        raise ClientError({"Error": {"Code": "AccessDenied", "Message": "denied"}}, "CreateMultipartUpload")
+
+    on_call(cos, "CreateMultipartUpload", handler)
+    file = create_file("denied.bin", PART_SIZE + 100)
+    cos.upload(file)
+    obj = get_object("denied.bin")
+    assert obj["Body"].read() == file.getvalue()
+    assert "-" not in obj["ETag"]
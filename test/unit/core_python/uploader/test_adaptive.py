@@ -0,0 +1,286 @@
+"""
+@author: cunyue
+@file: test_adaptive.py
+@time: 2025/7/22 14:30
+@description: 测试自适应上传控制器，使用模拟的时钟注入请求延迟，模拟网络状况的变化
+"""
+
+from typing import Optional
+
+import pytest
+import requests
+from requests import Response
+
+from swanlab.core_python import create_client, reset_client
+from swanlab.core_python.uploader import ScalarModel
+from swanlab.core_python.uploader.adaptive import (
+    AdaptiveController,
+    is_congestion,
+    get_controller,
+    reset_controllers,
+)
+from swanlab.core_python.uploader.thread import FlushPolicy
+from swanlab.core_python.uploader.upload import upload_scalar_metrics
+from swanlab.error import ApiError, NetworkError
+from swanlab.swanlab_settings import Settings, set_settings, reset_settings
+from swanlab.toolkit import create_time
+from tutils.server import FakeServer
+
+
+def create_controller(**kwargs) -> AdaptiveController:
+    options = dict(
+        records=1000,
+        min_records=100,
+        max_bytes=1000,
+        concurrency=4,
+        min_concurrency=1,
+        interval=3,
+        min_interval=0.5,
+        max_interval=10,
+        target_latency=1,
+    )
+    options.update(kwargs)
+    return AdaptiveController("scalar", **options)
+
+
+def api_error(code: int) -> ApiError:
+    resp = Response()
+    resp.status_code = code
+    return ApiError(resp)
+
+
+def test_is_congestion():
+    assert is_congestion(requests.exceptions.Timeout())
+    assert is_congestion(requests.exceptions.ConnectionError())
+    assert is_congestion(NetworkError())
+    assert is_congestion(api_error(429))
+    assert is_congestion(api_error(503))
+    assert not is_congestion(api_error(400))
+    assert not is_congestion(ValueError())
+
+
+class TestAdaptiveController:
+    def test_healthy(self):
+        """
+        请求健康时缩短上传间隔，分块大小与并发数不超过上限
+        """
+        controller = create_controller()
+        policy = FlushPolicy(max_latency=3)
+        controller.bind(policy)
+        for _ in range(10):
+            controller.observe(0.1)
+            controller.adjust()
+        assert controller.state() == {"chunk_records": 1000, "chunk_bytes": 1000, "concurrency": 4, "interval": 0.5}
+        assert policy.max_latency == 0.5
+
+    def test_congestion(self):
+        """
+        拥塞时乘性减少，之后加性恢复
+        """
+        controller = create_controller(interval=1)
+        controller.observe(0.1)
+        controller.observe(0.1, congested=True)
+        controller.adjust()
+        assert controller.state() == {"chunk_records": 500, "chunk_bytes": 500, "concurrency": 2, "interval": 2}
+        for _ in range(5):
+            controller.observe(5, congested=True)
+            controller.adjust()
+        assert controller.state() == {"chunk_records": 100, "chunk_bytes": 100, "concurrency": 1, "interval": 10}
+        controller.observe(0.1)
+        controller.adjust()
+        assert controller.state() == {"chunk_records": 200, "chunk_bytes": 200, "concurrency": 2, "interval": 9.5}
+
+    def test_slow(self):
+        """
+        请求偏慢但没有出错时只延长上传间隔
+        """
+        controller = create_controller()
+        controller.observe(2)
+        controller.adjust()
+        assert controller.state() == {"chunk_records": 1000, "chunk_bytes": 1000, "concurrency": 4, "interval": 3.5}
+
+    def test_no_requests(self):
+        controller = create_controller()
+        controller.adjust()
+        assert controller.interval == 3
+
+    def test_track(self):
+        controller = create_controller()
+        pending = [False]
+
+        def send(chunk):
+            if chunk == "error":
+                raise api_error(429)
+
+        tracked = controller.track(send, lambda: pending[0])
+        tracked("ok")
+        controller.adjust()
+        assert controller.interval == 2.5
+        with pytest.raises(ApiError):
+            tracked("error")
+        controller.adjust()
+        assert controller.interval == 5
+        # 服务端返回 202 挂起
+        pending[0] = True
+        tracked("ok")
+        controller.adjust()
+        assert controller.interval == 10
+
+    def test_disabled(self):
+        """
+        默认关闭自适应，所有值固定为用户设置
+        """
+        set_settings(Settings(upload_interval=2, upload_chunk_records=500))
+        try:
+            reset_controllers()
+            controller = get_controller("scalar")
+            for congested in [True, False, True]:
+                controller.observe(10, congested)
+                controller.adjust()
+            assert controller.chunk_records == 500
+            assert controller.concurrency == 4
+            assert controller.interval == 2
+        finally:
+            reset_controllers()
+            reset_settings()
+
+
+class Network:
+    """
+    模拟的网络，每个请求按照延迟与带宽推进模拟的时钟，不依赖墙钟时间
+    """
+
+    RECORD_BYTES = 100
+
+    def __init__(self):
+        self.now = 0.0
+        self.latency = 0.01
+        self.bandwidth: Optional[float] = None
+        self.error_status: Optional[int] = None
+        self.pending = False
+        self.requests = 0
+
+    def clock(self) -> float:
+        return self.now
+
+    def send(self, chunk: list):
+        self.requests += 1
+        self.now += self.latency
+        if self.bandwidth is not None:
+            self.now += len(chunk) * self.RECORD_BYTES / self.bandwidth
+        if self.error_status is not None:
+            raise api_error(self.error_status)
+
+
+@pytest.fixture
+def network():
+    set_settings(
+        Settings(
+            upload_chunk_records=400,
+            upload_min_chunk_records=50,
+            upload_concurrency=4,
+            upload_adaptive=True,
+            upload_interval=3,
+            upload_min_interval=0.5,
+            upload_max_interval=3,
+            upload_target_latency=0.1,
+        )
+    )
+    reset_controllers()
+    network = Network()
+    get_controller("scalar").clock = network.clock
+    yield network
+    reset_controllers()
+    reset_settings()
+
+
+def simulate_round(network: Network, n: int = 800) -> dict:
+    """
+    按照控制器当前的分块大小上传 n 条记录，结束一轮并返回调整后的状态
+    """
+    controller = get_controller("scalar")
+    send = controller.track(network.send, lambda: network.pending)
+    records = list(range(n))
+    size = controller.chunk_records
+    for i in range(0, n, size):
+        try:
+            send(records[i : i + size])
+        except ApiError:
+            pass
+    controller.adjust()
+    return controller.state()
+
+
+def test_network_shifts(network):
+    """
+    模拟网络状况变化：局域网 -> 服务端过载 -> 高延迟 -> 低带宽 -> 恢复
+    """
+    # 局域网，上传间隔缩短到下限，分块与并发保持上限
+    for _ in range(5):
+        state = simulate_round(network)
+    assert state == {"chunk_records": 400, "chunk_bytes": 2 * 1024 * 1024, "concurrency": 4, "interval": 0.5}
+    requests_before = network.requests
+    simulate_round(network)
+    assert network.requests - requests_before == 2
+    # 服务端过载，分块与并发成倍减少，间隔成倍延长
+    network.error_status = 503
+    state = simulate_round(network)
+    assert (state["chunk_records"], state["concurrency"], state["interval"]) == (200, 2, 1)
+    network.error_status = 429
+    state = simulate_round(network)
+    assert (state["chunk_records"], state["concurrency"], state["interval"]) == (100, 1, 2)
+    # 服务端恢复但延迟很高，只延长上传间隔
+    network.error_status, network.latency = None, 0.2
+    state = simulate_round(network, 200)
+    assert (state["chunk_records"], state["concurrency"], state["interval"]) == (100, 1, 2.5)
+    # 低带宽，请求变慢，上传间隔不超过 upload_max_interval
+    network.latency, network.bandwidth = 0, 20 * 1024
+    for _ in range(3):
+        state = simulate_round(network, 200)
+        assert state["interval"] <= 3
+    assert (state["chunk_records"], state["concurrency"], state["interval"]) == (100, 1, 3)
+    # 网络恢复，加性增加
+    network.bandwidth = None
+    state = simulate_round(network)
+    assert (state["chunk_records"], state["concurrency"], state["interval"]) == (140, 2, 2.5)
+    for _ in range(10):
+        state = simulate_round(network)
+    assert state == {"chunk_records": 400, "chunk_bytes": 2 * 1024 * 1024, "concurrency": 4, "interval": 0.5}
+
+
+def test_max_interval(network):
+    """
+    持续拥塞时上传间隔增加到 upload_max_interval 为止，得到大而稀疏的批次
+    """
+    set_settings(Settings(upload_adaptive=True, upload_interval=3, upload_max_interval=20, upload_min_chunk_records=50))
+    reset_controllers()
+    get_controller("scalar").clock = network.clock
+    network.error_status = 503
+    intervals = [simulate_round(network)["interval"] for _ in range(5)]
+    assert intervals == [6, 12, 20, 20, 20]
+
+
+@pytest.fixture
+def server():
+    set_settings(Settings(upload_chunk_records=400, upload_concurrency=4, upload_adaptive=True, upload_interval=2))
+    reset_controllers()
+    with FakeServer() as server:
+        client = create_client(server.login())
+        client.mount_project("test")
+        client.mount_exp("test", ("#000000", "#ffffff"))
+        yield server
+    reset_client()
+    reset_controllers()
+    reset_settings()
+
+
+def test_pending(server):
+    """
+    上传使用控制器的分块大小，服务端返回 202 时视为拥塞信号
+    """
+    metrics = [ScalarModel({"data": i, "create_time": create_time()}, f"key-{i % 4}", i, i) for i in range(800)]
+    server.pending_after = 0
+    upload_scalar_metrics(metrics)
+    assert server.house_requests == 2
+    state = get_controller("scalar").state()
+    assert (state["chunk_records"], state["concurrency"], state["interval"]) == (200, 2, 4)
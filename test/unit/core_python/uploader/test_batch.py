@@ -0,0 +1,148 @@
+"""
+@author: cunyue
+@file: test_batch.py
+@time: 2025/7/15 11:05
+@description: 测试指标分块上传
+"""
+
+import threading
+import time
+
+import pytest
+
+from swanlab.core_python.uploader.batch import create_chunks, upload_chunks, get_executor, shutdown_executors
+from swanlab.error import NetworkError, PartialSyncError
+from swanlab.swanlab_settings import Settings, set_settings, reset_settings
+
+
+def make_items(keys, steps):
+    return [(k, s) for s in range(steps) for k in keys]
+
+
+def chunks_of(items, max_records=2, max_bytes=1000):
+    return create_chunks(items, key=lambda x: x[0], size=lambda x: 10, max_records=max_records, max_bytes=max_bytes)
+
+
+class TestCreateChunks:
+    def test_group_by_key(self):
+        """
+        同一指标的数据连续且保持顺序
+        """
+        chunks = chunks_of(make_items(["a", "b"], 3))
+        assert [c.items for c in chunks] == [
+            [("a", 0), ("a", 1)],
+            [("a", 2), ("b", 0)],
+            [("b", 1), ("b", 2)],
+        ]
+        assert chunks[1].keys == {"a", "b"}
+
+    def test_max_bytes(self):
+        chunks = chunks_of(make_items(["a"], 5), max_records=100, max_bytes=25)
+        assert [len(c.items) for c in chunks] == [2, 2, 1]
+
+    def test_oversize_item(self):
+        """
+        单条超过大小限制的数据独占一个块
+        """
+        chunks = create_chunks([1, 2], key=lambda x: "a", size=lambda x: 100, max_records=10, max_bytes=10)
+        assert [c.items for c in chunks] == [[1], [2]]
+
+    def test_empty(self):
+        assert chunks_of([]) == []
+
+
+class TestUploadChunks:
+    @pytest.mark.parametrize("workers", [1, 4])
+    def test_order_per_key(self, workers):
+        """
+        同一指标的块按顺序上传
+        """
+        sent = []
+        lock = threading.Lock()
+
+        def send(items):
+            time.sleep(0.01 if items[0][1] == 0 else 0)
+            with lock:
+                sent.extend(items)
+
+        items = make_items(["a", "b", "c"], 10)
+        upload_chunks(chunks_of(items), send, max_workers=workers)
+        assert len(sent) == len(items)
+        for k in ["a", "b", "c"]:
+            assert [s for key, s in sent if key == k] == list(range(10))
+
+    def test_concurrency_limit(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+
+        def send(items):
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.02)
+            with lock:
+                running.pop()
+
+        # 每个指标一个块，块之间没有依赖
+        items = make_items([str(i) for i in range(8)], 2)
+        upload_chunks(chunks_of(items), send, max_workers=3)
+        assert max(peak) == 3
+
+    @pytest.mark.parametrize("workers", [1, 4])
+    def test_partial_failure(self, workers):
+        """
+        失败的块和同一指标的后续块需要重试，已经确认的块不再重发
+        """
+        sent = []
+
+        def send(items):
+            if items[0] == ("b", 2):
+                raise NetworkError()
+            sent.extend(items)
+
+        items = make_items(["a", "b"], 6)
+        with pytest.raises(PartialSyncError) as e:
+            upload_chunks(chunks_of(items), send, max_workers=workers)
+        assert isinstance(e.value.error, NetworkError)
+        assert e.value.remaining == [("b", 2), ("b", 3), ("b", 4), ("b", 5)]
+        assert sorted(sent) == [("a", i) for i in range(6)] + [("b", 0), ("b", 1)]
+
+    def test_unknown_error_dropped(self):
+        """
+        未知错误无法重试，数据被丢弃，不阻塞后续块
+        """
+        sent = []
+
+        def send(items):
+            if items[0] == ("a", 0):
+                raise ValueError("bug")
+            sent.extend(items)
+
+        upload_chunks(chunks_of(make_items(["a"], 4)), send, max_workers=2)
+        assert sent == [("a", 2), ("a", 3)]
+
+
+def test_executor_reused():
+    """
+    同一种指标的多次上传复用同一个线程池，线程数不超过 upload_concurrency，上传结束后线程池不被关闭
+    """
+    set_settings(Settings(upload_concurrency=3))
+    try:
+        executor = get_executor("scalar")
+        threads = set()
+
+        def send(items):
+            threads.add(threading.current_thread().name)
+
+        for _ in range(5):
+            upload_chunks(chunks_of(make_items(["a", "b", "c", "d"], 2)), send, max_workers=3, executor=executor)
+        assert get_executor("scalar") is executor
+        assert get_executor("media") is not executor
+        assert 1 <= len(threads) <= 3
+        assert all(name.startswith("SwanLabChunkUploader-scalar") for name in threads)
+    finally:
+        shutdown_executors()
+        reset_settings()
+    assert get_executor("scalar") is not executor
+    shutdown_executors()
@@ -0,0 +1,108 @@
+"""
+@author: cunyue
+@file: test_upload.py
+@time: 2025/7/21 14:10
+@description: 使用本地模拟的服务端测试上传函数
+"""
+
+import os
+import time
+
+import pytest
+
+from swanlab.core_python import create_client, reset_client, get_client
+from swanlab.core_python.client import MediaFile
+from swanlab.core_python.uploader import ScalarModel, MediaModel, ColumnModel
+from swanlab.core_python.uploader.upload import upload_scalar_metrics, upload_media_metrics, upload_columns
+from swanlab.error import ApiError, PartialSyncError
+from swanlab.swanlab_settings import Settings, set_settings, reset_settings
+from swanlab.toolkit import create_time
+from tutils import TEMP_PATH
+from tutils.server import FakeServer
+
+
+@pytest.fixture
+def server():
+    with FakeServer() as server:
+        client = create_client(server.login())
+        client.mount_project("test")
+        client.mount_exp("test", ("#000000", "#ffffff"))
+        yield server
+    reset_client()
+
+
+def scalars(n: int):
+    return [ScalarModel({"data": i, "create_time": create_time()}, "loss", i, i) for i in range(n)]
+
+
+def test_upload_scalar(server):
+    _, error = upload_scalar_metrics(scalars(10))
+    assert error is None
+    assert server.points("scalar") == 10
+    assert len(server.lags("scalar")) == 10
+    assert all(lag >= 0 for lag in server.lags("scalar"))
+
+
+def test_upload_columns(server):
+    _, error = upload_columns([ColumnModel("loss", None, "CUSTOM", "FLOAT", None, None, None)])
+    assert error is None
+    assert [c["key"] for c in server.columns] == ["loss"]
+
+
+def test_upload_media(server):
+    path = os.path.join(TEMP_PATH, "image.png")
+    with open(path, "wb") as f:
+        f.write(os.urandom(1024))
+    file = MediaFile(path, "image.png")
+    media = MediaModel({"data": ["image.png"], "create_time": create_time()}, "image", "image", 0, 0, [file])
+    _, error = upload_media_metrics([media])
+    assert error is None
+    assert server.points("media") == 1
+    assert [v for k, v in server.objects.items() if k.endswith("/image.png")] == [file.getvalue()]
+
+
+def test_pending(server):
+    """
+    服务端返回 202 后客户端挂起，不再上传
+    """
+    server.pending_after = 1
+    upload_scalar_metrics(scalars(1))
+    upload_scalar_metrics(scalars(1))
+    assert server.house_requests == 2
+    assert server.points("scalar") == 1
+    upload_scalar_metrics(scalars(1))
+    assert server.house_requests == 2
+
+
+def test_error_injection(server):
+    server.error_rate = 1
+    server.error_status = 503
+    _, error = upload_scalar_metrics(scalars(1))
+    assert isinstance(error, PartialSyncError)
+    assert isinstance(error.error, ApiError)
+    assert error.error.resp.status_code == 503
+    assert server.points("scalar") == 0
+    # 首次请求与 3 次重试
+    assert server.errors == 4
+
+
+def test_stalled_connection():
+    """
+    服务端挂起请求时，客户端在读取超时后重试，不会永远阻塞
+    """
+    set_settings(Settings(http_read_timeout=0.5))
+    try:
+        with FakeServer(stall=1, stall_time=5) as server:
+            create_client(server.login())
+            client = get_client()
+            client.mount_project("test")
+            client.mount_exp("test", ("#000000", "#ffffff"))
+            start = time.monotonic()
+            _, error = upload_scalar_metrics(scalars(10))
+            assert time.monotonic() - start < 3
+            assert error is None
+            assert server.stalled == 1
+            assert server.points("scalar") == 10
+    finally:
+        reset_client()
+        reset_settings()
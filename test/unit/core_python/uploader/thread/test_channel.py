@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+r"""
+@DATE: 2025/7/14 15:20
+@File: test_channel.py
+@IDE: pycharm
+@Description:
+    测试上传线程的通信管道与刷写策略
+"""
+import os
+import threading
+import time
+
+from swanlab.core_python.uploader.thread import UploadType
+from swanlab.core_python.uploader.thread.channel import FlushPolicy, MsgChannel
+from swanlab.core_python.uploader.thread.utils import LogQueue
+from tutils import TEMP_PATH
+
+
+class FakeClock:
+    """
+    假时钟，手动推进时间
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+class TestFlushPolicy:
+    def test_idle(self):
+        """
+        队列为空时无限期等待
+        """
+        assert FlushPolicy().wait_time(0, 0, None, 100) is None
+
+    def test_records(self):
+        policy = FlushPolicy(max_records=10, max_bytes=10000, max_latency=5)
+        assert policy.wait_time(9, 0, 0, 1) == 4
+        assert policy.wait_time(10, 0, 0, 1) == 0
+
+    def test_bytes(self):
+        policy = FlushPolicy(max_records=10, max_bytes=100, max_latency=5)
+        assert policy.wait_time(1, 100, 0, 1) == 0
+
+    def test_latency(self):
+        policy = FlushPolicy(max_records=10, max_bytes=100, max_latency=5)
+        assert policy.wait_time(1, 1, 0, 5) == 0
+        assert policy.wait_time(1, 1, 0, 6) == 0
+
+
+class TestMsgChannel:
+    def test_oldest(self):
+        """
+        最早数据的等待时间以第一次写入为准
+        """
+        clock = FakeClock()
+        channel = MsgChannel(clock=clock)
+        policy = FlushPolicy(max_records=10, max_latency=3)
+        assert channel.next_wait(policy) is None
+        channel.put(("A", [1]))
+        clock.advance(2)
+        channel.put(("A", [2]))
+        assert channel.records == 2
+        assert channel.oldest_age == 2
+        assert channel.next_wait(policy) == 1
+        clock.advance(1)
+        assert channel.next_wait(policy) == 0
+        msgs, _ = channel.drain()
+        assert msgs == [("A", [1]), ("A", [2])]
+        assert channel.records == 0
+        assert channel.next_wait(policy) is None
+
+    def test_idle_timeout(self):
+        channel = MsgChannel(clock=FakeClock())
+        assert channel.next_wait(FlushPolicy(), 2) == 2
+
+    def test_records_threshold(self):
+        channel = MsgChannel(clock=FakeClock())
+        channel.put(("A", [1, 2, 3]))
+        assert channel.next_wait(FlushPolicy(max_records=3)) == 0
+
+    def test_flush_request(self):
+        """
+        请求刷写后立即唤醒，完成后不再唤醒
+        """
+        channel = MsgChannel(clock=FakeClock())
+        policy = FlushPolicy()
+        generation = channel.request_flush()
+        assert channel.next_wait(policy) == 0
+        assert channel.wait_flushed(generation, 0) is False
+        _, g = channel.drain()
+        channel.mark_flushed(g)
+        assert channel.wait_flushed(generation, 0) is True
+        assert channel.next_wait(policy) is None
+
+    def test_flush_pending(self):
+        """
+        取出的数据仍在等待重试时刷写请求没有完成，但不会反复唤醒上传线程
+        """
+        channel = MsgChannel(clock=FakeClock())
+        policy = FlushPolicy()
+        generation = channel.request_flush()
+        channel.put(("A", [1]))
+        channel.drain()
+        assert channel.wait_flushed(generation, 0) is False
+        assert channel.next_wait(policy, 2) == 2
+        channel.mark_flushed(generation)
+        assert channel.wait_flushed(generation, 0) is True
+
+    def test_wait_wakeup(self):
+        """
+        上传线程在空闲时阻塞，写入数据达到阈值后被唤醒
+        """
+        channel = MsgChannel()
+        policy = FlushPolicy(max_records=2, max_latency=1000)
+        result = []
+        t = threading.Thread(target=lambda: result.append(channel.wait(policy)))
+        t.start()
+        channel.put(("A", [1]))
+        t.join(0.1)
+        assert t.is_alive()
+        channel.put(("A", [2]))
+        t.join(5)
+        assert result == [True]
+
+    def test_close(self):
+        channel = MsgChannel()
+        result = []
+        t = threading.Thread(target=lambda: result.append(channel.wait(FlushPolicy())))
+        t.start()
+        channel.close()
+        t.join(5)
+        assert result == [False]
+        # 关闭后等待刷写立即返回
+        assert channel.wait_flushed(channel.request_flush(), 0) is True
+
+
+def test_log_queue_permission():
+    channel = MsgChannel()
+    reader = LogQueue(channel, readable=True, writable=False)
+    writer = LogQueue(channel, readable=False, writable=True)
+    writer.put(("A", [1]))
+    try:
+        writer.drain()
+        assert False, "writer should not be readable"
+    except Exception as e:
+        assert str(e) == "The queue is not readable"
+    assert reader.get_all() == [("A", [1])]
+
+
+class TestOverflow:
+    @staticmethod
+    def scalar(i):
+        return UploadType.SCALAR_METRIC, [i]
+
+    @staticmethod
+    def media(i):
+        return UploadType.MEDIA_METRIC, [i]
+
+    def test_drop_media(self):
+        """
+        管道满时优先丢弃最早的媒体数据，标量总会被接收
+        """
+        channel = MsgChannel(max_records=3, overflow="drop_media")
+        channel.put(self.media(0))
+        channel.put(self.scalar(1))
+        channel.put(self.media(2))
+        assert channel.put(self.media(3)) is False
+        assert channel.put(self.scalar(4)) is True
+        assert channel.put(self.scalar(5)) is True
+        assert channel.dropped == 3
+        assert channel.drain()[0] == [self.scalar(1), self.scalar(4), self.scalar(5)]
+
+    def test_block_timeout(self):
+        channel = MsgChannel(max_records=1, overflow="block", block_timeout=0.05)
+        channel.put(self.scalar(0))
+        assert channel.put(self.scalar(1)) is False
+        assert channel.stats()["dropped"] == 1
+
+    def test_block_timeout_clock(self):
+        """
+        阻塞的超时时间由注入的时钟计算
+        """
+        clock = FakeClock()
+        channel = MsgChannel(max_records=1, overflow="block", block_timeout=5, clock=clock)
+        channel.put(self.scalar(0))
+        # 时钟每次读取都前进超过超时时间，写入方不需要真实等待
+        channel.clock = lambda: clock.advance(10) or clock()
+        start = time.monotonic()
+        assert channel.put(self.scalar(1)) is False
+        assert time.monotonic() - start < 1
+        assert channel.stats()["dropped"] == 1
+
+    def test_block_until_drained(self):
+        """
+        写入方被阻塞时唤醒上传线程，取出数据后写入方继续
+        """
+        channel = MsgChannel(max_records=1, overflow="block", block_timeout=5)
+        channel.put(self.scalar(0))
+        result = []
+        t = threading.Thread(target=lambda: result.append(channel.put(self.scalar(1))))
+        t.start()
+        assert channel.wait(FlushPolicy(max_latency=1000), 5) is True
+        assert channel.drain()[0] == [self.scalar(0)]
+        t.join(5)
+        assert result == [True]
+        assert channel.drain()[0] == [self.scalar(1)]
+
+    def test_spill(self):
+        """
+        超出的数据写入磁盘，按顺序取出
+        """
+        spill_dir = os.path.join(TEMP_PATH, "queue")
+        channel = MsgChannel(max_records=2, overflow="spill", spill_dir=spill_dir)
+        for i in range(5):
+            assert channel.put(self.scalar(i)) is True
+        stats = channel.stats()
+        assert stats["records"] == 2 and stats["spilled"] == 3
+        # 有数据溢出时上传线程需要立即取出
+        assert channel.next_wait(FlushPolicy(max_latency=1000)) == 0
+        received = []
+        msgs, _ = channel.drain()
+        while msgs:
+            received.extend(msgs)
+            msgs, _ = channel.drain()
+        assert received == [self.scalar(i) for i in range(5)]
+        channel.cleanup()
+        assert not os.path.exists(spill_dir)
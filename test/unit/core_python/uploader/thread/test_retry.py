@@ -0,0 +1,185 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+r"""
+@DATE: 2025/7/16 11:30
+@File: test_retry.py
+@IDE: pycharm
+@Description:
+    测试上传失败后的退避重试、熔断以及溢出到磁盘的待上传队列
+"""
+import os
+from enum import Enum
+from typing import Optional
+
+from swanlab.core_python.uploader.thread.log_collector import LogCollectorTask
+from swanlab.core_python.uploader.thread.retry import Backoff, CircuitBreaker, RetryQueue, is_retryable
+from swanlab.error import NetworkError, ApiError
+from tutils import TEMP_PATH
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+
+
+class FakeServer:
+    """
+    假服务器，在 down_until 之前的请求全部失败
+    """
+
+    def __init__(self, clock: FakeClock, down_until: float):
+        self.clock = clock
+        self.down_until = down_until
+        self.received = []
+        self.requests = 0
+        self.failed = 0
+
+    def upload(self, data: list):
+        self.requests += 1
+        if self.clock() < self.down_until:
+            self.failed += 1
+            return None, NetworkError()
+        self.received.extend(data)
+        return None, None
+
+
+server: Optional[FakeServer] = None
+
+
+def fake_upload(data: list):
+    return server.upload(data)
+
+
+class FakeUploadType(Enum):
+    SCALAR = {"upload": fake_upload}
+
+
+def test_backoff():
+    backoff = Backoff(base=1, cap=8, rng=lambda: 0.5)
+    assert backoff.delay(0) == 0
+    assert [backoff.delay(i) for i in range(1, 6)] == [0.75, 1.5, 3, 6, 6]
+    # 抖动范围为 [d/2, d)
+    assert Backoff(base=1, cap=8, rng=lambda: 0).delay(3) == 2
+
+
+def test_circuit_breaker():
+    clock = FakeClock()
+    breaker = CircuitBreaker(threshold=2, cooldown=10, clock=clock)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
+    clock.now = 10
+    assert breaker.allow()
+    # 试探失败，再次熔断
+    breaker.record_failure()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.allow()
+
+
+def test_is_retryable():
+    assert is_retryable(NetworkError())
+    assert is_retryable(ApiError(FakeResponse(500)))
+    assert is_retryable(ApiError(FakeResponse(429)))
+    assert not is_retryable(ApiError(FakeResponse(400)))
+    assert not is_retryable(ValueError())
+
+
+class TestRetryQueue:
+    def test_spill_order(self):
+        """
+        超出内存限制的数据写入磁盘，读取时保持顺序
+        """
+        spill_dir = os.path.join(TEMP_PATH, "retry")
+        q = RetryQueue(spill_dir=spill_dir, max_memory=128 * 3)
+        q.extend([(FakeUploadType.SCALAR, [i]) for i in range(10)])
+        assert len(q) == 10
+        assert q.spilled == 7
+        assert len(os.listdir(spill_dir)) == 1
+        # 溢出后即使内存有空余，新数据也写入磁盘
+        q.pop(1)
+        q.push((FakeUploadType.SCALAR, [10]))
+        assert q.spilled == 8
+        received = []
+        while len(q) > 0:
+            head = q.head()
+            received.extend(x[1][0] for x in head)
+            q.pop(len(head))
+        assert received == list(range(1, 11))
+        q.close()
+        assert not os.path.exists(spill_dir)
+
+    def test_replace(self):
+        q = RetryQueue(max_memory=1024)
+        q.extend([("A", [1, 2]), ("B", [3])])
+        q.replace(2, [("A", [2])])
+        assert q.head() == [("A", [2])]
+
+    def test_temp_dir(self):
+        q = RetryQueue(max_memory=1)
+        q.extend([(FakeUploadType.SCALAR, [1]), (FakeUploadType.SCALAR, [2])])
+        spill_dir = q.spill_dir
+        assert os.path.isdir(spill_dir)
+        q.close()
+        assert not os.path.exists(spill_dir)
+
+
+class TestOutage:
+    @staticmethod
+    def create_collector(s: FakeServer, clock: FakeClock, max_memory: int = 1024):
+        global server
+        server = s
+        collector = LogCollectorTask(
+            upload_type=FakeUploadType,
+            pending=RetryQueue(spill_dir=os.path.join(TEMP_PATH, "retry"), max_memory=max_memory),
+            backoff=Backoff(base=1, cap=30, rng=lambda: 0),
+            breaker=CircuitBreaker(threshold=5, cooldown=60, clock=clock),
+            clock=clock,
+        )
+        return collector, FakeUploadType.SCALAR
+
+    def test_outage(self):
+        """
+        服务器故障 300 秒：退避与熔断限制请求次数，数据溢出到磁盘，恢复后按顺序上传
+        """
+        clock = FakeClock()
+        collector, t = self.create_collector(FakeServer(clock, down_until=300), clock)
+        step = 0
+        while clock.now < 400:
+            # 每秒写入一条数据，并模拟上传线程被唤醒
+            collector.pending.push((t, [step]))
+            collector.process()
+            step += 1
+            clock.now += 1
+            if clock.now < 300:
+                # 内存受限，大部分数据被写入磁盘
+                assert collector.pending.memory_bytes <= 1024 + 128
+        collector.process(force=True)
+        assert server.received == list(range(step))
+        # 300 秒内每秒都重试会产生 300 次失败请求，退避与熔断后请求次数大幅减少
+        assert server.failed < 20
+        assert collector.breaker.allow()
+        collector.pending.close()
+
+    def test_no_retry_before_backoff(self):
+        clock = FakeClock()
+        collector, t = self.create_collector(FakeServer(clock, down_until=5), clock)
+        collector.pending.push((t, [1]))
+        assert collector.process() is False
+        assert collector.next_retry() == 0.5
+        assert collector.process() is False
+        assert server.requests == 1
+        clock.now = 10
+        assert collector.next_retry() == 0
+        assert collector.process() is True
+        assert server.received == [1]
+        collector.pending.close()
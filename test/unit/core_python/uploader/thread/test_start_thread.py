@@ -0,0 +1,317 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+r"""
+@DATE: 2025/7/14 15:40
+@File: test_start_thread.py
+@IDE: pycharm
+@Description:
+    测试上传线程池的事件驱动刷写与上传通道
+"""
+import threading
+import time
+from enum import Enum
+from typing import List
+
+from swanlab.core_python.uploader.thread import ThreadPool, FlushPolicy, Lane
+
+uploaded: List[list] = []
+called = threading.Event()
+
+
+def fake_upload(data: list):
+    uploaded.append(data)
+    called.set()
+    return None, None
+
+
+class FakeUploadType(Enum):
+    SCALAR = {"upload": fake_upload}
+
+
+def create_pool(policy: FlushPolicy) -> ThreadPool:
+    return ThreadPool(policy=policy, lanes=[Lane("scalar", (FakeUploadType.SCALAR,))])
+
+
+def setup_function():
+    uploaded.clear()
+    called.clear()
+
+
+def test_idle_no_upload():
+    """
+    队列为空时不会触发上传
+    """
+    pool = create_pool(FlushPolicy(max_latency=0.01))
+    assert not called.wait(0.1)
+    pool.finish()
+    assert uploaded == []
+    assert not pool.lanes["scalar"].thread.is_alive()
+
+
+def test_flush_explicit():
+    """
+    显式刷写时立即上传，不必等待最大延迟
+    """
+    pool = create_pool(FlushPolicy(max_latency=1000))
+    pool.queue.put((FakeUploadType.SCALAR, [1, 2]))
+    assert pool.flush(5) is True
+    assert uploaded == [[1, 2]]
+    pool.finish()
+    assert uploaded == [[1, 2]]
+
+
+def test_flush_records_threshold():
+    pool = create_pool(FlushPolicy(max_records=3, max_latency=1000))
+    pool.queue.put((FakeUploadType.SCALAR, [1, 2]))
+    assert not called.wait(0.1)
+    pool.queue.put((FakeUploadType.SCALAR, [3]))
+    assert called.wait(5)
+    pool.finish()
+    assert uploaded == [[1, 2, 3]]
+
+
+def test_flush_latency():
+    pool = create_pool(FlushPolicy(max_latency=0.05))
+    pool.queue.put((FakeUploadType.SCALAR, [1]))
+    assert called.wait(5)
+    pool.finish()
+    assert uploaded == [[1]]
+
+
+def test_finish_uploads_rest():
+    """
+    结束时上传剩余的数据
+    """
+    pool = create_pool(FlushPolicy(max_latency=1000))
+    pool.queue.put((FakeUploadType.SCALAR, [1]))
+    pool.finish()
+    assert uploaded == [[1]]
+
+
+def test_partial_retry():
+    """
+    部分上传失败时只重试剩余的数据
+    """
+    from swanlab.core_python.uploader.thread.log_collector import LogCollectorTask
+    from swanlab.error import NetworkError, PartialSyncError
+
+    attempts = []
+
+    def partial_upload(data: list):
+        attempts.append(list(data))
+        if len(attempts) == 1:
+            return None, PartialSyncError(NetworkError(), data[1:])
+        return None, None
+
+    class PartialUploadType(Enum):
+        SCALAR = {"upload": partial_upload}
+
+    collector = LogCollectorTask(upload_type=PartialUploadType)
+    collector.container = [(PartialUploadType.SCALAR, [1, 2, 3])]
+    collector.upload()
+    assert collector.container == [(PartialUploadType.SCALAR, [2, 3])]
+    collector.upload()
+    assert collector.container == []
+    assert attempts == [[1, 2, 3], [2, 3]]
+
+
+def test_stats():
+    pool = create_pool(FlushPolicy(max_latency=1000))
+    pool.queue.put((FakeUploadType.SCALAR, [1, 2]))
+    stats = pool.stats()
+    assert stats["records"] == 2
+    assert stats["dropped"] == 0
+    assert stats["pending"] == 0
+    assert stats["lanes"]["scalar"]["records"] == 2
+    pool.finish()
+    assert pool.stats()["records"] == 0
+
+
+# ---------------------------------- 上传通道 ----------------------------------
+
+
+class LaneRecorder:
+    """
+    记录各个通道的上传顺序，media 通道的上传可以被阻塞以模拟大文件上传
+    """
+
+    def __init__(self):
+        self.events: List[tuple] = []
+        self.lock = threading.Lock()
+        self.media_release = threading.Event()
+        self.column_release = threading.Event()
+        self.column_release.set()
+
+    def record(self, name: str, data: list):
+        with self.lock:
+            self.events.append((name, list(data)))
+
+
+recorder = LaneRecorder()
+
+
+def upload_column(data: list):
+    recorder.column_release.wait(5)
+    recorder.record("column", data)
+    return None, None
+
+
+def upload_scalar(data: list):
+    recorder.record("scalar", data)
+    return None, None
+
+
+def upload_media(data: list):
+    recorder.media_release.wait(5)
+    recorder.record("media", data)
+    return None, None
+
+
+class LaneUploadType(Enum):
+    COLUMN = {"upload": upload_column}
+    SCALAR = {"upload": upload_scalar}
+    MEDIA = {"upload": upload_media}
+
+
+def create_lane_pool() -> ThreadPool:
+    global recorder
+    recorder = LaneRecorder()
+    return ThreadPool(
+        policy=FlushPolicy(max_latency=0.01),
+        lanes=[
+            Lane("meta", (LaneUploadType.COLUMN,)),
+            Lane("scalar", (LaneUploadType.SCALAR,), after=("meta",)),
+            Lane("media", (LaneUploadType.MEDIA,), after=("meta",)),
+        ],
+    )
+
+
+def test_lane_media_not_blocking_scalar():
+    """
+    媒体上传进行中时，标量仍然可以及时上传
+    """
+    pool = create_lane_pool()
+    pool.queue.put((LaneUploadType.MEDIA, ["video"]))
+    pool.queue.put((LaneUploadType.SCALAR, [1]))
+    assert pool.lanes["scalar"].channel.wait_flushed(pool.lanes["scalar"].channel.request_flush(), 5)
+    assert recorder.events == [("scalar", [1])]
+    recorder.media_release.set()
+    pool.finish()
+    assert recorder.events == [("scalar", [1]), ("media", ["video"])]
+
+
+def test_lane_column_before_metric():
+    """
+    列创建完成之前，依赖它的指标不会被上传
+    """
+    pool = create_lane_pool()
+    recorder.media_release.set()
+    recorder.column_release.clear()
+    pool.queue.put((LaneUploadType.COLUMN, ["loss"]))
+    pool.queue.put((LaneUploadType.SCALAR, [1]))
+    pool.queue.put((LaneUploadType.MEDIA, ["image"]))
+    assert pool.flush(0.2) is False
+    assert recorder.events == []
+    recorder.column_release.set()
+    assert pool.flush(5) is True
+    assert recorder.events[0] == ("column", ["loss"])
+    assert sorted(recorder.events[1:]) == [("media", ["image"]), ("scalar", [1])]
+    # 已经创建的列不会阻塞后续的指标
+    pool.queue.put((LaneUploadType.SCALAR, [2]))
+    assert pool.flush(5) is True
+    assert recorder.events[-1] == ("scalar", [2])
+    pool.finish()
+
+
+def test_lane_finish_order():
+    """
+    结束时被依赖的通道先上传剩余数据
+    """
+    pool = create_lane_pool()
+    recorder.media_release.set()
+    recorder.column_release.clear()
+    pool.queue.put((LaneUploadType.COLUMN, ["acc"]))
+    pool.queue.put((LaneUploadType.SCALAR, [1]))
+    recorder.column_release.set()
+    pool.finish()
+    assert recorder.events == [("column", ["acc"]), ("scalar", [1])]
+    assert all(not lane.thread.is_alive() for lane in pool.lanes.values())
+
+
+# ---------------------------------- 结束时的截止时间 ----------------------------------
+
+
+def create_priority_pool() -> ThreadPool:
+    global recorder
+    recorder = LaneRecorder()
+    return ThreadPool(
+        policy=FlushPolicy(max_latency=1000),
+        lanes=[
+            Lane("media", (LaneUploadType.MEDIA,), priority=2),
+            Lane("scalar", (LaneUploadType.SCALAR,), priority=1),
+            Lane("meta", (LaneUploadType.COLUMN,), priority=0),
+        ],
+    )
+
+
+def test_finish_priority():
+    """
+    结束时按照通道优先级上传剩余数据，而不是通道顺序
+    """
+    pool = create_priority_pool()
+    recorder.media_release.set()
+    pool.queue.put((LaneUploadType.MEDIA, ["image"]))
+    pool.queue.put((LaneUploadType.SCALAR, [1, 2]))
+    pool.queue.put((LaneUploadType.COLUMN, ["loss"]))
+    report = pool.finish()
+    assert recorder.events == [("column", ["loss"]), ("scalar", [1, 2]), ("media", ["image"])]
+    assert report == {
+        "uploaded": {"media": 1, "scalar": 2, "column": 1},
+        "remaining": {"media": 0, "scalar": 0, "column": 0},
+        "lost": {"media": 0, "scalar": 0, "column": 0},
+        "completed": True,
+    }
+
+
+def test_finish_timeout():
+    """
+    超过截止时间后不再等待，报告中列出未上传的数据
+    """
+    pool = create_priority_pool()
+    pool.queue.put((LaneUploadType.MEDIA, ["video"]))
+    pool.queue.put((LaneUploadType.SCALAR, [1]))
+    start = time.monotonic()
+    report = pool.finish(timeout=0.2)
+    assert time.monotonic() - start < 2
+    # 标量先上传，媒体上传被阻塞
+    assert recorder.events == [("scalar", [1])]
+    assert report["completed"] is False
+    assert report["uploaded"]["scalar"] == 1
+    assert report["remaining"]["media"] == 1
+    # 被中止的通道在当前请求完成后不再上传
+    recorder.media_release.set()
+    assert all(lane.collector.aborted for lane in pool.lanes.values())
+
+
+def test_finish_lost():
+    """
+    无法重试的错误对应的数据记为丢弃，部分上传成功的数据记为已上传
+    """
+    from requests import Response
+    from swanlab.error import ApiError, PartialSyncError
+
+    resp = Response()
+    resp.status_code = 400
+
+    def partial_upload(data: list):
+        return None, PartialSyncError(ApiError(resp), data[1:])
+
+    class PartialUploadType(Enum):
+        SCALAR = {"upload": partial_upload}
+
+    pool = ThreadPool(policy=FlushPolicy(max_latency=1000), lanes=[Lane("scalar", (PartialUploadType.SCALAR,))])
+    pool.queue.put((PartialUploadType.SCALAR, [1, 2, 3]))
+    report = pool.finish()
+    assert report["uploaded"] == {"scalar": 1}
+    assert report["lost"] == {"scalar": 2}
+    assert report["remaining"] == {"scalar": 0}
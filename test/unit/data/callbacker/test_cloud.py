@@ -6,6 +6,8 @@
 """
 
 import os
+import signal
+import time
 
 import pytest
 
@@ -14,8 +16,11 @@ import tutils as T
 from swanlab.core_python import reset_client, get_client
 from swanlab.core_python.auth.providers.api_key import login_by_key
 from swanlab.data.callbacker import CloudPyCallback
+from swanlab.data.run.helper import SwanLabRunOperator
 from swanlab.data.store import get_run_store
 from swanlab.env import SwanLabEnv
+from swanlab.toolkit import SwanKitCallback
+from tutils.server import FakeServer
 from tutils.setup import mock_login_info, UseMockRunState
 
 
@@ -139,3 +144,149 @@ class TestCloudResume:
             callback.on_init()
             assert run_store.config is not None, "Config should be loaded when resuming."
             assert run_store.config == config, "Config should be loaded when resuming."
+
+
+# ---------------------------------- 结束时的截止时间与 SIGTERM ----------------------------------
+
+
+@pytest.fixture
+def server(monkeypatch):
+    with FakeServer() as server:
+        monkeypatch.setenv(SwanLabEnv.API_HOST.value, server.api_host)
+        monkeypatch.setenv(SwanLabEnv.WEB_HOST.value, server.url)
+        swanlab.login(api_key="0" * 21, save=False)
+        yield server
+    reset_client()
+
+
+def init(**kwargs):
+    return swanlab.init(project="test", mode="cloud", settings=swanlab.Settings(hardware_monitor=False, **kwargs))
+
+
+def test_finish_report(server):
+    """
+    结束时上传所有剩余数据，并返回上传报告
+    """
+    init()
+    for i in range(10):
+        swanlab.log({"loss": i}, step=i)
+    report = swanlab.finish()
+    assert report["completed"] is True
+    assert report["uploaded"]["scalar_metric"] == 10
+    assert report["remaining"]["scalar_metric"] == 0
+    assert server.points("scalar") == 10
+
+
+def test_flush_failed(server):
+    """
+    上传失败等待重试时刷写没有完成，服务端恢复后重试成功
+    """
+    run = init()
+    swanlab.log({"loss": 0}, step=0)
+    assert run.flush(timeout=5) is True
+    # 列已经创建，只有指标上传失败
+    server.error_rate, server.error_status = 1, 503
+    swanlab.log({"loss": 1}, step=1)
+    assert run.flush(timeout=1) is False
+    assert server.points("scalar") == 1
+    server.error_rate = 0
+    assert run.flush(timeout=10) is True
+    assert server.points("scalar") == 2
+    swanlab.finish()
+
+
+class UserCallback(SwanKitCallback):
+    def on_stop(self, error: str = None, *args, **kwargs):
+        return "not a report"
+
+    def __str__(self):
+        return "UserCallback"
+
+
+def test_finish_report_from_cloud(server):
+    """
+    上传报告只来自内置的云端回调，用户注册的回调的返回值不会被当作报告
+    """
+    assert str(CloudPyCallback.__str__(None)) == SwanLabRunOperator.REPORT_CALLBACK
+    swanlab.init(
+        project="test",
+        mode="cloud",
+        callbacks=[UserCallback()],
+        settings=swanlab.Settings(hardware_monitor=False),
+    )
+    swanlab.log({"loss": 1}, step=0)
+    report = swanlab.finish()
+    assert isinstance(report, dict)
+    assert report["uploaded"]["scalar_metric"] == 1
+
+
+def test_finish_timeout(server):
+    """
+    超过截止时间后停止上传，未上传的数据保存在本地备份中，即使关闭了备份也保留实验目录
+    """
+    run = init(backup=False)
+    run_dir = get_run_store().run_dir
+    for i in range(10):
+        swanlab.log({"loss": i}, step=i)
+    server.latency = 0.5
+    start = time.monotonic()
+    report = swanlab.finish(timeout=0.1)
+    # 截止时间之后只等待更新实验状态的请求
+    assert time.monotonic() - start < 2
+    assert report["completed"] is False
+    assert report["remaining"]["scalar_metric"] == 10 - report["uploaded"]["scalar_metric"] > 0
+    assert run.report == report
+    assert os.path.isdir(run_dir)
+
+
+def test_sigterm(server):
+    """
+    收到 SIGTERM 时抛出 SystemExit，退出时在剩余时间内结束实验，并恢复原有的信号处理函数
+    """
+    run = init(finish_on_sigterm=True)
+    handler = signal.getsignal(signal.SIGTERM)
+    assert handler.__self__.__class__ == CloudPyCallback
+    swanlab.log({"loss": 1}, step=0)
+    with pytest.raises(SystemExit) as e:
+        handler(signal.SIGTERM, None)
+    assert e.value.code == 128 + signal.SIGTERM
+    # 模拟解释器退出时调用 atexit 注册的清理函数
+    handler.__self__._clean_handler()
+    assert run.state == swanlab.data.run.SwanLabRunState.CRASHED
+    assert run.report["completed"] is True
+    assert signal.getsignal(signal.SIGTERM) == signal.SIG_DFL
+
+
+def test_sigterm_chain(server):
+    """
+    存在用户注册的处理函数时交给其处理，不会退出
+    """
+    received = []
+    previous = signal.signal(signal.SIGTERM, lambda signum, frame: received.append(signum))
+    try:
+        init(finish_on_sigterm=True)
+        os.kill(os.getpid(), signal.SIGTERM)
+        assert received == [signal.SIGTERM]
+        assert swanlab.get_run().running
+        swanlab.finish()
+        assert signal.getsignal(signal.SIGTERM) != signal.SIG_DFL
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+
+
+def test_sigterm_ignored(server):
+    """
+    原来的处理方式为忽略时不会退出，实验正常结束
+    """
+    previous = signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    try:
+        run = init(finish_on_sigterm=True)
+        handler = signal.getsignal(signal.SIGTERM)
+        assert handler.__self__.__class__ == CloudPyCallback
+        handler(signal.SIGTERM, None)
+        assert run.running
+        handler.__self__._clean_handler()
+        assert run.state == swanlab.data.run.SwanLabRunState.SUCCESS
+        assert signal.getsignal(signal.SIGTERM) == signal.SIG_IGN
+    finally:
+        signal.signal(signal.SIGTERM, previous)
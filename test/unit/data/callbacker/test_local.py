@@ -12,7 +12,9 @@ from nanoid import generate
 
 import tutils as T
 from swanlab.data.callbacker.local import LocalRunCallback
+from swanlab.log.policy import ConsolePolicy
 from swanlab.log.type import LogData
+from swanlab.swanlab_settings import Settings
 from tutils.setup import UseMockRunState
 
 
@@ -56,3 +58,18 @@ def test_local_write_handler(monkeypatch):
             with open(filename, "r") as f:
                 content = f.readlines()
                 assert content[-1] == b + '\n'
+
+
+def test_console_policy():
+    """
+    没有开启任何终端日志选项时不创建采集策略
+    """
+    with UseMockRunState():
+        callback = LocalRunCallback()
+        assert callback._create_console_policy() is None
+        callback.user_settings = Settings(log_drop_patterns=("^Warning: ",))
+        policy = callback._create_console_policy()
+        assert isinstance(policy, ConsolePolicy)
+        assert policy.drop.search("Warning: deprecated")
+        callback.user_settings = Settings(log_max_lines_per_second=10)
+        assert callback._create_console_policy().limited
@@ -1,6 +1,9 @@
+import subprocess
+
 import pytest
 
 from swanlab.data.run.metadata.hardware.dcu.hygon import DCUCollector, map_hygon_dcu
+from tutils.smi import FakeRun
 
 try:
     driver_version, dcu_map = map_hygon_dcu()
@@ -20,3 +23,31 @@ def test_hygon_dcu_info():
     collector = DCUCollector(dcu_map, max_mem_value)
     collector()
     assert collector.collect_num == 1
+
+
+# hy-smi --showuse --showmemuse --showtemp --showpower --json 的输出
+HY_SMI_JSON = """\
+{"card0": {"Average Graphics Package Power (W)": "213.0", "Temperature (Sensor edge) (C)": "52.0",
+"Temperature (Sensor junction) (C)": "51.0", "Temperature (Sensor mem) (C)": "52.0", "DCU use (%)": "97",
+"DCU memory use (%)": "40"},
+"card1": {"Average Graphics Package Power (W)": "98.0", "Temperature (Sensor edge) (C)": "45.0",
+"Temperature (Sensor junction) (C)": "44.0", "Temperature (Sensor mem) (C)": "46.0", "DCU use (%)": "0",
+"DCU memory use (%)": "0"}}
+"""
+
+
+def test_collect_once_per_tick(monkeypatch):
+    """
+    每次采集只运行一次 hy-smi，所有指标都从这一次的输出中解析
+    """
+    fake = FakeRun({"hy-smi --showuse --showmemuse --showtemp --showpower --json": HY_SMI_JSON})
+    monkeypatch.setattr(subprocess, "run", fake)
+    dcu = {"0": {"name": "K100_AI", "memory": "64GB"}, "1": {"name": "K100_AI", "memory": "64GB"}}
+    collector = DCUCollector(dcu, 65536)
+    result = {r["key"]: r["value"] for r in collector()}
+    assert len(fake.calls) == 1
+    assert len(result) == 10
+    assert result["__swanlab__.dcu.0.pct"] == 97
+    assert result["__swanlab__.dcu.0.mem.value"] == 0.4 * 65536
+    assert result["__swanlab__.dcu.1.temp"] == 44
+    assert result["__swanlab__.dcu.1.power"] == 98
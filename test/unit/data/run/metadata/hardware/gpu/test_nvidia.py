@@ -5,9 +5,12 @@
 @description: 测试NVIDIA GPU信息采集
 """
 
+from types import SimpleNamespace
+
 import pynvml
 import pytest
 
+from swanlab.data.run.metadata.hardware.gpu import nvidia
 from swanlab.data.run.metadata.hardware.gpu.nvidia import GpuCollector
 
 
@@ -104,3 +107,103 @@ class TestGpuCollector:
         assert time['config'].metric_name == "GPU 0"
         assert 100 >= time['value'] >= 0
         assert time['config'].metric_name == "GPU 0"
+
+
+class FakeNvml:
+    """
+    模拟 pynvml，记录每个函数的调用次数，不需要 GPU
+    """
+
+    NVML_TEMPERATURE_GPU = 0
+    NVMLError = pynvml.NVMLError
+
+    def __init__(self, count: int):
+        self.count = count
+        self.calls = {}
+
+    def __getattr__(self, name):
+        # 架构等信息不是每个版本都有，模拟为不存在
+        if not name.startswith("nvml"):
+            raise AttributeError(name)
+
+        def func(*args):
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return self.results(name, *args)
+
+        return func
+
+    def results(self, name, *args):
+        if name == "nvmlDeviceGetCount":
+            return self.count
+        if name == "nvmlDeviceGetHandleByIndex":
+            return args[0]
+        if name == "nvmlDeviceGetMemoryInfo":
+            return SimpleNamespace(used=1 << 30, total=8 << 30)
+        if name == "nvmlDeviceGetUtilizationRates":
+            return SimpleNamespace(gpu=50, memory=20)
+        if name == "nvmlDeviceGetPowerUsage":
+            return 100000
+        if name == "nvmlDeviceGetTemperature":
+            return 60
+        if name in ("nvmlSystemGetDriverVersion", "nvmlDeviceGetName"):
+            return "fake"
+        return None
+
+    def reset(self):
+        self.calls.clear()
+
+
+class TestNvmlSession:
+    @pytest.fixture
+    def fake(self, monkeypatch):
+        fake = FakeNvml(2)
+        monkeypatch.setattr(nvidia, "pynvml", fake)
+        monkeypatch.setattr(nvidia, "get_cuda_version", lambda: None)
+        monkeypatch.setattr(nvidia, "session", nvidia.NvmlSession())
+        return fake
+
+    def test_one_session(self, fake):
+        """
+        硬件信息发现与之后的采集共用一个会话，句柄只获取一次，实验结束时关闭一次
+        """
+        info, collector = nvidia.get_nvidia_gpu_info()
+        assert info["cores"] == 2
+        assert fake.calls["nvmlInit"] == 1
+        assert fake.calls["nvmlDeviceGetHandleByIndex"] == 2
+        assert "nvmlShutdown" not in fake.calls
+        for _ in range(100):
+            assert len(collector()) == 12
+        assert fake.calls["nvmlInit"] == 1
+        assert fake.calls["nvmlDeviceGetHandleByIndex"] == 2
+        assert "nvmlShutdown" not in fake.calls
+        collector.close()
+        collector.close()
+        assert fake.calls["nvmlShutdown"] == 1
+        assert collector.handles == []
+
+    def test_tick_cost(self, fake):
+        """
+        每次采集每个设备只查询一次显存与利用率
+        """
+        _, collector = nvidia.get_nvidia_gpu_info()
+        fake.reset()
+        result = collector()
+        assert fake.calls == {
+            "nvmlDeviceGetMemoryInfo": 2,
+            "nvmlDeviceGetUtilizationRates": 2,
+            "nvmlDeviceGetTemperature": 2,
+            "nvmlDeviceGetPowerUsage": 2,
+        }
+        values = {r["key"]: r["value"] for r in result}
+        assert values[collector.gpu_mem_pct_key.format(idx=1)] == 12.5
+        assert values[collector.gpu_mem_value_key.format(idx=1)] == 1024
+        assert values[collector.gpu_util_key.format(idx=1)] == 50
+        assert values[collector.gpu_mem_time_key.format(idx=1)] == 20
+        assert values[collector.gpu_power_key.format(idx=1)] == 100
+        collector.close()
+
+    def test_no_gpu(self, fake):
+        fake.count = 0
+        info, collector = nvidia.get_nvidia_gpu_info()
+        assert collector is None
+        assert fake.calls["nvmlShutdown"] == 1
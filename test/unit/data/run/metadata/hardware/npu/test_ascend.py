@@ -1,12 +1,17 @@
+import math
+import subprocess
+
 import pytest
 
 from swanlab.data.run.metadata.hardware.npu.ascend import (
     AscendCollector,
+    query_npu,
     get_cann_version,
     get_chip_usage,
     get_version,
     map_npu,
 )
+from tutils.smi import FakeRun
 
 try:
     npu_version = get_version()
@@ -31,3 +36,85 @@ def test_ascend_collector():
     collector = AscendCollector(npu_map, hbm_value)
     collector()
     assert collector.collect_num == 1
+
+
+# 8 卡 910B 服务器上 npu-smi info 的输出（节选 2 卡）
+NPU_SMI_INFO = """\
++------------------------------------------------------------------------------------------------+
+| npu-smi 23.0.rc3                 Version: 23.0.rc3                                             |
++---------------------------+---------------+----------------------------------------------------+
+| NPU   Name                | Health        | Power(W)    Temp(C)           Hugepages-Usage(page)|
+| Chip                      | Bus-Id        | AICore(%)   Memory-Usage(MB)  HBM-Usage(MB)        |
++===========================+===============+====================================================+
+| 0     910B1               | OK            | 94.4        43                0    / 0             |
+| 0                         | 0000:C1:00.0  | 37          0    / 0          3395 / 65536         |
++===========================+===============+====================================================+
+| 1     910B1               | OK            | NA          45                0    / 0             |
+| 0                         | 0000:C2:00.0  | 0           0    / 0          0    / 65536         |
++===========================+===============+====================================================+
++---------------------------+---------------+----------------------------------------------------+
+| NPU     Chip              | Process id    | Process name             | Process memory(MB)      |
++===========================+===============+====================================================+
+| 0       0                 | 81923         | python                   | 3012                    |
++===========================+===============+====================================================+
+"""
+
+# 310P3 推理卡，一张卡两个芯片，没有 HBM
+NPU_SMI_INFO_310P = """\
+| NPU     Name                  | Health          | Power(W)     Temp(C)           Hugepages-Usage(page) |
+| Chip    Device                | Bus-Id          | AICore(%)    Memory-Usage(MB)                        |
++===============================+=================+======================================================+
+| 8       310P3                 | OK              | NA           41                0     / 0             |
+| 0       0                     | 0000:01:00.0    | 12           1436 / 21527                            |
+| 1       1                     | 0000:01:00.0    | 0            1295 / 21527                            |
++===============================+=================+======================================================+
+"""
+
+
+def test_query_npu(monkeypatch):
+    monkeypatch.setattr(subprocess, "run", FakeRun({"npu-smi info": NPU_SMI_INFO}))
+    snapshot = query_npu()
+    assert list(snapshot) == [("0", "0"), ("1", "0")]
+    assert snapshot[("0", "0")] == {"util": 37, "hbm_used": 3395, "hbm_total": 65536, "power": 94.4, "temp": 43}
+    assert math.isnan(snapshot[("1", "0")]["power"])
+    monkeypatch.setattr(subprocess, "run", FakeRun({"npu-smi info": NPU_SMI_INFO_310P}))
+    snapshot = query_npu()
+    assert list(snapshot) == [("8", "0"), ("8", "1")]
+    assert snapshot[("8", "0")]["hbm_used"] == 1436 and snapshot[("8", "1")]["temp"] == 41
+
+
+def test_collect_once_per_tick(monkeypatch):
+    """
+    每次采集只运行一次 npu-smi
+    """
+    fake = FakeRun({"npu-smi info": NPU_SMI_INFO})
+    monkeypatch.setattr(subprocess, "run", fake)
+    collector = AscendCollector({"0": {"0": {"id": "0"}}, "1": {"0": {"id": "1"}}}, 65536)
+    result = {r["key"]: r["value"] for r in collector()}
+    assert len(fake.calls) == 1
+    assert result["__swanlab__.npu.0-0.ptc"] == 37
+    assert result["__swanlab__.npu.0-0.mem.ptc"] == 3395 / 65536 * 100
+    assert result["__swanlab__.npu.0-0.mem.value"] == 3395
+    assert result["__swanlab__.npu.1-0.temp"] == 45
+    collector()
+    assert len(fake.calls) == 2
+
+
+def test_collect_fallback(monkeypatch):
+    """
+    表格中没有的芯片逐项查询
+    """
+    fake = FakeRun(
+        {
+            "npu-smi info": "",
+            "npu-smi info -t usages -i 0 -c 0": "Aicore Usage Rate(%) : 20\nHBM Usage Rate(%) : 50\n",
+            "npu-smi info -t temp -i 0 -c 0": "NPU Temperature (C) : 40\n",
+            "npu-smi info -t power -i 0 -c 0": "NPU Real-time Power(W) : 90.5\n",
+        }
+    )
+    monkeypatch.setattr(subprocess, "run", fake)
+    collector = AscendCollector({"0": {"0": {"id": "0"}}}, 1000)
+    result = {r["key"]: r["value"] for r in collector()}
+    assert len(fake.calls) == 4
+    assert result["__swanlab__.npu.0-0.mem.value"] == 500
+    assert result["__swanlab__.npu.0-0.power"] == 90.5
@@ -7,6 +7,8 @@
 
 import pytest
 import platform
+
+from swanlab.swanlab_settings import Settings, set_settings, reset_settings
 from swanlab.data.run.metadata.hardware.cpu import (
     get_cpu_brand_windows,
     get_cpu_brand_linux,
@@ -41,3 +43,17 @@ def test_get_cpu_info():
     info, _ = get_cpu_info()
     assert info is not None and info["cores"] > 0
     assert info["brand"] is not None
+
+
+def test_cpu_collector_per_cpu():
+    """
+    每个核心的使用率需要通过设置开启
+    """
+    keys = [r["key"] for r in CpuCollector()()]
+    assert not any(k.endswith(".0.pct") for k in keys)
+    set_settings(Settings(hardware_per_cpu=True))
+    try:
+        keys = [r["key"] for r in CpuCollector()()]
+        assert any(k.endswith("cpu.0.pct") for k in keys)
+    finally:
+        reset_settings()
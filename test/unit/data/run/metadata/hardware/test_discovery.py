@@ -0,0 +1,134 @@
+"""
+@author: cunyue
+@file: test_discovery.py
+@time: 2025/7/25 11:05
+@description: 测试硬件信息发现：并发探测、超时与缓存
+"""
+
+import threading
+import time
+
+import pytest
+
+from swanlab.data.run.metadata import hardware
+from swanlab.data.run.metadata.hardware.discovery import DiscoveryCache, discover
+from swanlab.swanlab_settings import Settings, set_settings, reset_settings
+
+
+class TestDiscover:
+    def test_concurrent(self):
+        """
+        探测并发执行，结果按照传入的顺序排列
+        """
+        barrier = threading.Barrier(3, timeout=1)
+
+        def probe(value):
+            def func():
+                barrier.wait()
+                return value, None
+
+            return func
+
+        results = discover({"a": probe(1), "b": probe(2), "c": probe(3)}, timeout=2)
+        assert list(results) == ["a", "b", "c"]
+        assert [r[0] for r in results.values()] == [1, 2, 3]
+
+    def test_timeout(self):
+        """
+        超时的探测被放弃，不会阻塞
+        """
+        release = threading.Event()
+
+        def hung():
+            release.wait()
+            return "hung", None
+
+        start = time.monotonic()
+        results = discover({"hung": hung, "ok": lambda: ("ok", None)}, timeout=0.2)
+        assert time.monotonic() - start < 1
+        release.set()
+        assert results == {"ok": ("ok", None)}
+
+    def test_error(self):
+        def error():
+            raise RuntimeError("boom")
+
+        assert discover({"error": error}, timeout=1) == {"error": (None, None)}
+
+
+class TestDiscoveryCache:
+    def test_save_load(self, tmp_path):
+        cache = DiscoveryCache(60, folder=str(tmp_path))
+        assert cache.load() == []
+        cache.save(["nvidia", "apple"])
+        assert cache.load() == ["apple", "nvidia"]
+
+    def test_expired(self, tmp_path):
+        DiscoveryCache(60, folder=str(tmp_path)).save(["nvidia"])
+        cache = DiscoveryCache(60, folder=str(tmp_path))
+        cache.ttl = 0
+        time.sleep(0.01)
+        assert cache.load() == []
+
+    def test_other_host(self, tmp_path):
+        DiscoveryCache(60, folder=str(tmp_path)).save(["nvidia"])
+        cache = DiscoveryCache(60, folder=str(tmp_path))
+        cache.key = "other:boot"
+        assert cache.load() == []
+
+    def test_disabled(self, tmp_path):
+        cache = DiscoveryCache(None, folder=str(tmp_path))
+        cache.save(["nvidia"])
+        assert not (tmp_path / DiscoveryCache.FILENAME).exists()
+        assert cache.load() == []
+
+    def test_broken(self, tmp_path):
+        (tmp_path / DiscoveryCache.FILENAME).write_text("{")
+        assert DiscoveryCache(60, folder=str(tmp_path)).load() == []
+
+
+class TestGetHardwareInfo:
+    @pytest.fixture
+    def vendors(self, monkeypatch, tmp_path):
+        """
+        替换厂商列表与缓存文件夹，记录每个厂商的探测次数
+        """
+        calls = {}
+
+        def vendor(name, found):
+            def probe():
+                calls[name] = calls.get(name, 0) + 1
+                return ({"driver": name}, None) if found else (None, None)
+
+            return probe
+
+        monkeypatch.setattr(
+            hardware,
+            "VENDORS",
+            [
+                ("found", "gpu", vendor("found", True), lambda: True),
+                ("missing", "npu", vendor("missing", False), lambda: True),
+                ("skipped", "mlu", vendor("skipped", True), lambda: False),
+            ],
+        )
+        folder = str(tmp_path)
+        monkeypatch.setattr(hardware, "DiscoveryCache", lambda ttl: DiscoveryCache(ttl, folder=folder))
+        set_settings(Settings(hardware_cache_ttl=60))
+        yield calls
+        reset_settings()
+
+    def test_skip_and_cache(self, vendors):
+        info, collectors = hardware.get_hardware_info()
+        assert info["gpu"] == {"found": {"driver": "found"}}
+        assert "npu" not in info and "mlu" not in info
+        # 存在性检查不通过的厂商不会被探测
+        assert vendors == {"found": 1, "missing": 1}
+        # 第二次探测时跳过缓存中不存在的厂商
+        hardware.get_hardware_info()
+        assert vendors == {"found": 2, "missing": 1}
+
+    def test_no_cache(self, vendors):
+        set_settings(Settings(hardware_cache_ttl=None))
+        hardware.get_hardware_info()
+        hardware.get_hardware_info()
+        assert vendors == {"found": 2, "missing": 2}
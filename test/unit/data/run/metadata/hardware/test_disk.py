@@ -1,10 +1,38 @@
+import platform
 import time
 
 import psutil
+import pytest
 
+from swanlab.data.run.metadata.hardware import disk
 from swanlab.data.run.metadata.hardware.disk import (
     DiskCollector,
+    DiskDeviceCollector,
+    get_disk_devices_info,
+    read_diskstats,
 )
+from swanlab.swanlab_settings import Settings, set_settings, reset_settings
+
+DISKSTATS = """\
+   7       0 loop0 {loop} 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0 0
+ 259       0 nvme0n1 {reads} 0 {sectors_read} {read_ms} {writes} 0 {sectors_written} {write_ms} 0 {busy_ms} 0 0 0 0 0 0 0
+ 259       1 nvme0n1p1 {reads} 0 {sectors_read} {read_ms} {writes} 0 {sectors_written} {write_ms} 0 {busy_ms} 0
+"""
+
+
+def write_diskstats(path, reads=0, sectors_read=0, read_ms=0, writes=0, sectors_written=0, write_ms=0, busy_ms=0):
+    path.write_text(
+        DISKSTATS.format(
+            loop=1,
+            reads=reads,
+            sectors_read=sectors_read,
+            read_ms=read_ms,
+            writes=writes,
+            sectors_written=sectors_written,
+            write_ms=write_ms,
+            busy_ms=busy_ms,
+        )
+    )
 
 
 class TestDiskCollector:
@@ -42,3 +70,58 @@ class TestDiskCollector:
         assert result['name'] == "Disk Utilization (%)"
         assert result['value'] >= 0
         assert result['config'].chart_name == 'Disk Utilization (%)'
+
+
+def test_read_diskstats(tmp_path):
+    path = tmp_path / "diskstats"
+    write_diskstats(path, reads=10, sectors_read=2048, read_ms=5, writes=20, busy_ms=30)
+    stats = read_diskstats(str(path))
+    assert list(stats) == ["loop0", "nvme0n1", "nvme0n1p1"]
+    assert stats["nvme0n1"] == [10, 0, 2048, 5, 20, 0, 0, 0, 0, 30, 0]
+
+
+class TestDiskDeviceCollector:
+    def test_collect(self, tmp_path, monkeypatch):
+        path = tmp_path / "diskstats"
+        write_diskstats(path)
+        now = [1000.0]
+        monkeypatch.setattr(time, "time", lambda: now[0])
+        collector = DiskDeviceCollector(["nvme0n1", "sdz"], path=str(path))
+        # 2 秒内读 100 次共 4 MB，写 300 次共 2 MB，共耗时 800 ms，设备繁忙 1 秒
+        write_diskstats(path, 100, 8192, 200, 300, 4096, 600, 1000)
+        now[0] += 2
+        result = {r["key"]: r for r in collector.collect()}
+        values = {k.replace("__swanlab__.", ""): r["value"] for k, r in result.items()}
+        # 不存在的设备被跳过
+        assert values == {
+            "disk.nvme0n1.read": 2,
+            "disk.nvme0n1.write": 1,
+            "disk.nvme0n1.read.iops": 50,
+            "disk.nvme0n1.write.iops": 150,
+            "disk.nvme0n1.await": 2,
+            "disk.nvme0n1.util": 50,
+        }
+        read = result["__swanlab__.disk.nvme0n1.read"]
+        assert read["config"].chart_name == "Disk Read (MB/s)"
+        assert read["config"].metric_name == "nvme0n1"
+        # 计数器回绕时不会出现负数
+        write_diskstats(path)
+        now[0] += 1
+        assert all(r["value"] == 0 for r in collector.collect())
+
+
+@pytest.mark.skipif(platform.system() != "Linux", reason="only supported on Linux")
+def test_get_disk_devices_info(tmp_path, monkeypatch):
+    """
+    默认关闭，开启后只采集匹配的设备
+    """
+    path = tmp_path / "diskstats"
+    write_diskstats(path)
+    monkeypatch.setattr(disk, "read_diskstats", lambda *_: read_diskstats(str(path)))
+    try:
+        assert get_disk_devices_info() == (None, None)
+        set_settings(Settings(hardware_io_devices=True, hardware_disk_include=("nvme*",)))
+        _, collector = get_disk_devices_info()
+        assert collector.devices == ["nvme0n1", "nvme0n1p1"]
+    finally:
+        reset_settings()
@@ -4,8 +4,17 @@ import psutil
 
 from swanlab.data.run.metadata.hardware.network import (
     NetworkCollector,
+    NetworkInterfaceCollector,
+    read_net_dev,
 )
 
+NET_DEV = """\
+Inter-|   Receive                                                |  Transmit
+ face |bytes    packets errs drop fifo frame compressed multicast|bytes    packets errs drop fifo colls carrier compressed
+    lo: {lo} 10 0 0 0 0 0 0 {lo} 10 0 0 0 0 0 0
+  eth0: {recv} 10 0 0 0 0 0 0 {sent} 10 0 0 0 0 0 0
+"""
+
 
 class TestNetworkCollector:
     collector = NetworkCollector()
@@ -35,3 +44,26 @@ class TestNetworkCollector:
         assert result['name'] == "Network Traffic Received (KB)"
         assert result['value'] >= 0
         assert result['config'].chart_name == 'Network Traffic (KB)'
+
+
+def test_read_net_dev(tmp_path):
+    path = tmp_path / "dev"
+    path.write_text(NET_DEV.format(lo=5, recv=100, sent=200))
+    assert read_net_dev(str(path)) == {"lo": (5, 5), "eth0": (100, 200)}
+
+
+def test_network_interface_collector(tmp_path, monkeypatch):
+    path = tmp_path / "dev"
+    path.write_text(NET_DEV.format(lo=0, recv=0, sent=0))
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    collector = NetworkInterfaceCollector(["eth0"], path=str(path))
+    path.write_text(NET_DEV.format(lo=1024**3, recv=4 * 1024**2, sent=2 * 1024**2))
+    now[0] += 2
+    result = collector.collect()
+    assert {r["key"]: r["value"] for r in result} == {
+        "__swanlab__.network.eth0.recv": 2,
+        "__swanlab__.network.eth0.sent": 1,
+    }
+    assert result[0]["config"].chart_name == "Network Received (MB/s)"
+    assert result[0]["config"].metric_name == "eth0"
@@ -0,0 +1,93 @@
+"""
+@author: cunyue
+@file: test_nfs.py
+@time: 2025/7/27 11:20
+@description: 测试 NFS 客户端信息采集
+"""
+
+import time
+
+from swanlab.data.run.metadata.hardware.nfs import NfsCollector, find_mount, parse_mountstats
+
+MOUNTSTATS = """\
+device rootfs mounted on / with fstype rootfs
+device proc mounted on /proc with fstype proc
+device server:/export mounted on /mnt/my\\040data with fstype nfs4 statvers=1.1
+\topts:\trw,vers=4.2,rsize=1048576,wsize=1048576
+\tage:\t100
+\tbytes:\t{read} {write} 0 0 {read} {write} 10 20
+\tRPC iostats version: 1.1  p/v: 100003/4 (nfs)
+\txprt:\ttcp 0 0 1 0 0 10 10 0 10 0 2 0 0
+\tper-op statistics
+\t        NULL: 0 0 0 0 0 0 0 0
+\t        READ: {reads} {read_trans} 0 0 0 0 {read_rtt} 0 0
+\t       WRITE: {writes} {writes} 0 0 0 0 {write_rtt} 0 0
+"""
+
+
+def write_mountstats(path, read=0, write=0, reads=0, read_trans=0, read_rtt=0, writes=0, write_rtt=0):
+    path.write_text(
+        MOUNTSTATS.format(
+            read=read,
+            write=write,
+            reads=reads,
+            read_trans=read_trans,
+            read_rtt=read_rtt,
+            writes=writes,
+            write_rtt=write_rtt,
+        )
+    )
+
+
+def test_parse_mountstats():
+    text = MOUNTSTATS.format(read=1, write=2, reads=3, read_trans=4, read_rtt=5, writes=6, write_rtt=7)
+    mounts = parse_mountstats(text)
+    assert list(mounts) == ["/", "/proc", "/mnt/my data"]
+    assert mounts["/"] == {"fstype": "rootfs", "device": "rootfs", "bytes": None, "ops": {}}
+    nfs = mounts["/mnt/my data"]
+    assert nfs["fstype"] == "nfs4"
+    assert nfs["device"] == "server:/export"
+    assert nfs["bytes"] == [1, 2, 0, 0, 1, 2, 10, 20]
+    assert nfs["ops"] == {
+        "NULL": [0] * 8,
+        "READ": [3, 4, 0, 0, 0, 0, 5, 0, 0],
+        "WRITE": [6, 6, 0, 0, 0, 0, 7, 0, 0],
+    }
+
+
+def test_find_mount():
+    mounts = ["/", "/mnt", "/mnt/data", "/mnt/data2"]
+    assert find_mount(mounts, "/mnt/data/run") == "/mnt/data"
+    assert find_mount(mounts, "/mnt/data") == "/mnt/data"
+    assert find_mount(mounts, "/mnt/data3") == "/mnt"
+    assert find_mount(mounts, "/home") == "/"
+    assert find_mount(["/mnt"], "/home") is None
+
+
+def test_nfs_collector(tmp_path, monkeypatch):
+    path = tmp_path / "mountstats"
+    write_mountstats(path)
+    now = [1000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    collector = NfsCollector("/mnt/my data", path=str(path))
+    # 2 秒内读 100 次共 4 MB（重传 10 次），写 50 次共 2 MB
+    write_mountstats(path, 4 * 1024**2, 2 * 1024**2, 100, 110, 300, 50, 500)
+    now[0] += 2
+    values = {r["key"].replace("__swanlab__.", ""): r["value"] for r in collector.collect()}
+    assert values == {
+        "nfs.read": 2,
+        "nfs.write": 1,
+        "nfs.read.ops": 50,
+        "nfs.write.ops": 25,
+        "nfs.retrans": 5,
+        "nfs.read.rtt": 3,
+        "nfs.write.rtt": 10,
+    }
+
+
+def test_nfs_collector_unmounted(tmp_path):
+    path = tmp_path / "mountstats"
+    write_mountstats(path)
+    collector = NfsCollector("/mnt/my data", path=str(path))
+    path.write_text("device rootfs mounted on / with fstype rootfs\n")
+    assert collector.collect() == []
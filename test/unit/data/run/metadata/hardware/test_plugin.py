@@ -0,0 +1,171 @@
+"""
+@author: cunyue
+@file: test_plugin.py
+@time: 2025/7/28 14:10
+@description: 测试用户自定义的系统指标采集器
+"""
+
+import textwrap
+import threading
+
+import pytest
+
+from swanlab.data.run.metadata.hardware.plugin import (
+    SystemCollector,
+    SystemMetric,
+    PluginCollector,
+    check_collectors,
+    get_plugin_collectors,
+    load_entry_points,
+)
+from swanlab.swanlab_settings import Settings, set_settings, reset_settings
+
+
+class PduCollector(SystemCollector):
+    interval = 5
+    metrics = [
+        SystemMetric("power", "PDU Power (W)"),
+        SystemMetric("in", "InfiniBand Received (MB/s)", chart="InfiniBand (MB/s)", metric_name="recv"),
+        SystemMetric("out", "InfiniBand Sent (MB/s)", chart="InfiniBand (MB/s)"),
+    ]
+
+    def __init__(self, name=None):
+        self.name = name
+        self.values = {"power": 300, "in": 1.5, "out": 2, "undeclared": 1, "state": "ok"}
+        self.ready = False
+        self.closed = False
+
+    def setup(self):
+        self.ready = True
+
+    def collect(self):
+        return self.values
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def settings():
+    set_settings(Settings(hardware_discovery_timeout=1))
+    yield
+    reset_settings()
+
+
+class TestPluginCollector:
+    def test_collect(self):
+        pdu = PduCollector()
+        collector = PluginCollector(pdu)
+        assert pdu.ready
+        assert collector.interval == 5
+        result = collector()
+        # 没有声明的指标与非数值的结果被忽略
+        assert [r["key"] for r in result] == [
+            "__swanlab__.pducollector.power",
+            "__swanlab__.pducollector.in",
+            "__swanlab__.pducollector.out",
+        ]
+        assert [r["value"] for r in result] == [300, 1.5, 2]
+        power, recv, sent = [r["config"] for r in result]
+        # 同一张图表中的指标共享 chart_index，图表只有一个指标时 metric_name 为空
+        assert power.chart_name == "PDU Power (W)"
+        assert power.metric_name is None
+        assert recv.chart_name == sent.chart_name == "InfiniBand (MB/s)"
+        assert recv.chart_index == sent.chart_index != power.chart_index
+        assert recv.metric_name == "recv"
+        assert sent.metric_name == "InfiniBand Sent (MB/s)"
+        collector.close()
+        assert pdu.closed
+
+    def test_error(self):
+        """
+        采集出错时返回 None，由调度器记录失败
+        """
+        pdu = PduCollector()
+        pdu.collect = lambda: 1 / 0
+        assert PluginCollector(pdu)() is None
+
+
+class TestCheckCollectors:
+    def test_type(self):
+        with pytest.raises(TypeError):
+            check_collectors([object()])
+
+    def test_duplicated(self):
+        with pytest.raises(ValueError):
+            check_collectors([PduCollector("pdu"), PduCollector("pdu")])
+        assert len(check_collectors([PduCollector("pdu"), PduCollector("pdu2")])) == 2
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            check_collectors([PduCollector("pdu power")])
+        with pytest.raises(ValueError):
+            SystemMetric("a b")
+        pdu = PduCollector()
+        pdu.interval = 0
+        with pytest.raises(ValueError):
+            check_collectors([pdu])
+
+
+def test_get_plugin_collectors(settings):
+    """
+    setup 出错或者超时的采集器不会被启用
+    """
+    release = threading.Event()
+    broken, hung = PduCollector("broken"), PduCollector("hung")
+    broken.setup = lambda: 1 / 0
+    hung.setup = release.wait
+    set_settings(Settings(hardware_discovery_timeout=0.2))
+    collectors = get_plugin_collectors([PduCollector("pdu"), broken, hung])
+    release.set()
+    assert [c.name for c in collectors] == ["pdu"]
+    assert get_plugin_collectors() == []
+
+
+@pytest.fixture
+def entry_points(tmp_path, monkeypatch):
+    """
+    在临时目录中安装一个通过 entry points 注册采集器的包
+    """
+    (tmp_path / "fake_collectors.py").write_text(
+        textwrap.dedent(
+            """
+            from swanlab.data.run.metadata.hardware.plugin import SystemCollector, SystemMetric
+
+
+            class NcclCollector(SystemCollector):
+                name = "nccl"
+                metrics = [SystemMetric("bandwidth")]
+
+                def collect(self):
+                    return {"bandwidth": 100}
+
+
+            def broken():
+                raise RuntimeError("boom")
+            """
+        )
+    )
+    dist = tmp_path / "fake_collectors-0.1.dist-info"
+    dist.mkdir()
+    (dist / "METADATA").write_text("Metadata-Version: 2.1\nName: fake-collectors\nVersion: 0.1\n")
+    (dist / "entry_points.txt").write_text(
+        "[swanlab.collectors]\nnccl = fake_collectors:NcclCollector\nbroken = fake_collectors:broken\n"
+    )
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+
+def test_entry_points(entry_points, settings):
+    collectors = load_entry_points()
+    # 加载失败的采集器被跳过
+    assert [c.name for c in collectors] == ["nccl"]
+    # 默认关闭，不加载
+    assert get_plugin_collectors() == []
+    set_settings(Settings(hardware_plugins=True))
+    collectors = get_plugin_collectors([PduCollector("pdu")])
+    assert [c.name for c in collectors] == ["pdu", "nccl"]
+    assert collectors[1]()[0]["key"] == "__swanlab__.nccl.bandwidth"
+    # 与用户注册的采集器重名时被跳过
+    collectors = get_plugin_collectors([PduCollector("nccl")])
+    assert len(collectors) == 1
+    assert isinstance(collectors[0].collector, PduCollector)
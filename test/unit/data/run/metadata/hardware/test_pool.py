@@ -0,0 +1,64 @@
+"""
+@author: cunyue
+@file: test_pool.py
+@time: 2025/7/30 11:00
+@description: 测试硬件采集使用的有界线程池
+"""
+
+import threading
+import time
+
+import pytest
+
+from swanlab.data.run.metadata.hardware.pool import WorkerPool
+
+
+def test_reuse():
+    """
+    线程在任务之间复用，不会为每个任务创建新线程
+    """
+    pool = WorkerPool(4, name="Test")
+    for i in range(50):
+        assert pool.submit(lambda x: x * 2, i).result(timeout=1) == i * 2
+    assert pool.threads == 1
+    pool.shutdown()
+
+
+def test_bounded():
+    """
+    线程数不超过上限，超出的任务排队等待
+    """
+    release = threading.Event()
+    pool = WorkerPool(2, name="Test")
+    futures = [pool.submit(release.wait) for _ in range(5)]
+    time.sleep(0.1)
+    assert pool.threads == 2
+    assert sum(f.running() for f in futures) == 2
+    release.set()
+    assert all(f.result(timeout=1) for f in futures)
+    pool.shutdown()
+
+
+def test_hung():
+    """
+    卡住的任务只占用一个线程，其他任务仍然可以执行，线程为守护线程
+    """
+    release = threading.Event()
+    pool = WorkerPool(2, name="Test")
+    hung = pool.submit(release.wait)
+    for _ in range(10):
+        assert pool.submit(lambda: 1).result(timeout=1) == 1
+    assert pool.threads == 2
+    assert all(t.daemon for t in threading.enumerate() if t.name.startswith("Test-"))
+    pool.shutdown()
+    release.set()
+    assert hung.result(timeout=1)
+
+
+def test_exception():
+    pool = WorkerPool(1, name="Test")
+    with pytest.raises(ZeroDivisionError):
+        pool.submit(lambda: 1 / 0).result(timeout=1)
+    pool.shutdown()
+    with pytest.raises(RuntimeError):
+        pool.submit(lambda: 1)
@@ -0,0 +1,109 @@
+"""
+@author: cunyue
+@file: test_process.py
+@time: 2025/7/26 11:30
+@description: 测试进程树资源采集
+"""
+
+import subprocess
+import sys
+import time
+
+import psutil
+import pytest
+
+from swanlab.data.run.metadata.hardware.process import ProcessTreeCollector, get_process_tree_info
+from swanlab.swanlab_settings import Settings, set_settings, reset_settings
+
+BUSY = "import time\nt = time.time()\nwhile time.time() - t < 30: pass"
+IDLE = "import time\ntime.sleep(30)"
+
+
+@pytest.fixture
+def children():
+    procs = [subprocess.Popen([sys.executable, "-c", code]) for code in (BUSY, IDLE)]
+    # 等待子进程启动
+    time.sleep(0.5)
+    yield procs
+    for p in procs:
+        p.kill()
+        p.wait()
+
+
+def values(result):
+    return {info["key"].replace("__swanlab__.", ""): info["value"] for info in result}
+
+
+def test_tree(children):
+    collector = ProcessTreeCollector(top=2)
+    collector()
+    time.sleep(0.5)
+    result = values(collector())
+    # 测试进程可能还有其他子进程
+    assert result["proc.tree.count"] >= 3
+    assert result["proc.tree.threads"] >= 3
+    assert result["proc.tree.fds"] > 0
+    assert result["proc.tree.rss"] > 0
+    assert "proc.tree.pss" not in result
+    # 忙碌的子进程排在第一位
+    assert result["proc.child.1.cpu"] > result["proc.child.2.cpu"]
+    assert result["proc.tree.cpu"] >= result["proc.child.1.cpu"]
+
+
+def test_cached_children(children, monkeypatch):
+    """
+    子进程列表被缓存，退出的子进程在采集时被移除
+    """
+    collector = ProcessTreeCollector(top=0)
+    calls = []
+    enumerate_children = collector.root.children
+    monkeypatch.setattr(collector.root, "children", lambda **kw: calls.append(1) or enumerate_children(**kw))
+    for _ in range(3):
+        count = values(collector())["proc.tree.count"]
+    assert len(calls) == 1
+    children[0].kill()
+    children[0].wait()
+    result = values(collector())
+    assert result["proc.tree.count"] == count - 1
+    assert children[0].pid not in collector.children
+    assert not any(k.startswith("proc.child.") for k in result)
+    # 超过刷新间隔后重新枚举，复用已有的进程对象
+    cached = collector.children[children[1].pid]
+    collector.last_refresh -= ProcessTreeCollector.REFRESH
+    collector()
+    assert len(calls) == 2
+    assert collector.children[children[1].pid] is cached
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="PSS is only available on Linux")
+def test_pss():
+    result = values(ProcessTreeCollector(pss=True)())
+    assert 0 < result["proc.tree.pss"] <= result["proc.tree.rss"] + 1
+
+
+def test_io():
+    """
+    第一次采集只记录基准，之后上报两次采集之间的读写速度
+    """
+    if not hasattr(psutil.Process, "io_counters"):
+        pytest.skip("io_counters is not available")
+    collector = ProcessTreeCollector()
+    result = values(collector())
+    assert result["proc.tree.io.read"] == 0
+    assert result["proc.tree.io.write"] == 0
+    assert values(collector())["proc.tree.io.write"] >= 0
+    # 上报的是速度
+    io = [r for r in collector() if r["key"].endswith(".io.read")][0]
+    assert io["name"] == "Process Tree I/O Read (MB/s)"
+    assert io["config"].chart_name == "Process Tree I/O (MB/s)"
+
+
+def test_settings():
+    try:
+        # 默认关闭
+        assert get_process_tree_info() == (None, None)
+        set_settings(Settings(hardware_process_tree=True, hardware_process_top=1))
+        _, collector = get_process_tree_info()
+        assert collector.top == 1
+    finally:
+        reset_settings()
@@ -5,7 +5,25 @@
 @description: 测试硬件信息采集工具
 """
 
-from swanlab.data.run.metadata.hardware.utils import random_index, CpuBaseCollector, generate_key
+import time
+from collections import namedtuple
+
+import psutil
+
+from swanlab.data.run.metadata.hardware.utils import (
+    random_index,
+    CpuBaseCollector,
+    generate_key,
+    cpu_busy_percent,
+    match_device,
+)
+
+# linux 下 psutil.cpu_times 的字段
+scputimes = namedtuple("scputimes", "user nice system idle iowait irq softirq steal guest guest_nice")
+
+
+def cpu_times(user, idle, iowait=0.0, guest=0.0):
+    return scputimes(user, 0.0, 0.0, idle, iowait, 0.0, 0.0, 0.0, guest, 0.0)
 
 
 def test_random_index():
@@ -22,6 +40,46 @@ def test_generate_key():
     assert s == "__swanlab__.test"
 
 
+def test_match_device():
+    assert match_device("nvme0n1", (), ("loop*",))
+    assert not match_device("loop0", (), ("loop*",))
+    assert match_device("nvme0n1", ("nvme*", "sd*"), ())
+    assert not match_device("vda", ("nvme*", "sd*"), ())
+    # exclude 优先
+    assert not match_device("nvme0n1p1", ("nvme*",), ("nvme*p*",))
+
+
+def test_cpu_busy_percent():
+    assert cpu_busy_percent(cpu_times(10, 10), cpu_times(13, 11)) == 75.0
+    # iowait 视为空闲，guest 已经包含在 user 中
+    assert cpu_busy_percent(cpu_times(10, 10), cpu_times(12, 11, iowait=1, guest=2)) == 50.0
+    # 没有时间流逝或者计数器回绕
+    assert cpu_busy_percent(cpu_times(10, 10), cpu_times(10, 10)) == 0.0
+    assert cpu_busy_percent(cpu_times(10, 10), cpu_times(5, 20)) == 0.0
+
+
+def test_cpu_usage_delta(monkeypatch):
+    """
+    使用率为两次采集之间 CPU 时间的差值
+    """
+    samples = iter([cpu_times(100, 100), cpu_times(101, 103), cpu_times(105, 103)])
+    per_cpu = iter([[cpu_times(50, 50), cpu_times(50, 50)], [cpu_times(51, 50), cpu_times(50, 51)]])
+    monkeypatch.setattr(psutil, "cpu_times", lambda percpu=False: next(per_cpu) if percpu else next(samples))
+    c = CpuBaseCollector()
+    assert c.get_cpu_usage()["value"] == 25.0
+    assert c.get_cpu_usage()["value"] == 100.0
+    # 只计算启动时存在的核心
+    assert [u["value"] for u in c.get_per_cpu_usage()] == [100.0, 0.0][: psutil.cpu_count()]
+
+
+def test_cpu_usage_not_blocking():
+    c = CpuBaseCollector()
+    start = time.perf_counter()
+    c.get_cpu_usage()
+    c.get_per_cpu_usage()
+    assert time.perf_counter() - start < 0.5
+
+
 def test_cpu_usage():
     c = CpuBaseCollector()
     usage = c.get_cpu_usage()
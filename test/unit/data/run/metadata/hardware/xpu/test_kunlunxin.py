@@ -0,0 +1,40 @@
+"""
+@author: cunyue
+@file: test_kunlunxin.py
+@time: 2025/7/24 10:50
+@description: 测试昆仑芯xpu信息采集，使用录制的 xpu-smi 输出
+"""
+
+import subprocess
+
+from swanlab.data.run.metadata.hardware.xpu.kunlunxin import KunlunxinCollector, query_xpu
+from tutils.smi import FakeRun
+
+# xpu-smi -m 的输出，每个设备一行
+XPU_SMI_M = """\
+0000:03:00.0 0 0 0 41 0 0 0 78 0 0 0 0 0 0 0 0 20480 98304 63 0 (P800 OAM) 0
+0000:04:00.0 1 0 0 39 0 0 0 65 0 0 0 0 0 0 0 0 1024 98304 0 0 (P800 OAM) 0
+"""
+
+
+def test_query_xpu(monkeypatch):
+    monkeypatch.setattr(subprocess, "run", FakeRun({"xpu-smi -m": XPU_SMI_M}))
+    snapshot = query_xpu()
+    assert list(snapshot) == ["0", "1"]
+    assert snapshot["0"][19] == "63"
+
+
+def test_collect_once_per_tick(monkeypatch):
+    """
+    每次采集只运行一次 xpu-smi，所有指标都从这一次的输出中解析
+    """
+    fake = FakeRun({"xpu-smi -m": XPU_SMI_M})
+    monkeypatch.setattr(subprocess, "run", fake)
+    collector = KunlunxinCollector({"0": {"name": "P800 OAM", "memory": 96}, "1": {"name": "P800 OAM", "memory": 96}})
+    result = {r["key"]: r["value"] for r in collector()}
+    assert len(fake.calls) == 1
+    assert len(result) == 8
+    assert result["__swanlab__.xpu.0.ptc"] == 63
+    assert result["__swanlab__.xpu.0.mem.ptc"] == 20480 / (96 * 1024) * 100
+    assert result["__swanlab__.xpu.1.temp"] == 39
+    assert result["__swanlab__.xpu.1.power"] == 65
@@ -5,7 +5,12 @@
 @description: 测试工具函数
 """
 
-from swanlab.data.run.helper import check_log_level
+import threading
+import time
+
+from swanlab.data.run.helper import check_log_level, MonitorCron, MonitorAggregator, MonitorEntry
+from swanlab.swanlab_settings import Settings, set_settings, reset_settings
+from swanlab.toolkit import create_time, ColumnConfig
 
 
 def test_check_log_level():
@@ -17,3 +22,279 @@ def test_check_log_level():
     assert check_log_level("critical") == "critical"
     assert check_log_level("not_exist") == "info"
     assert check_log_level("INFO") == "info"
+
+
+class Collector:
+    """
+    模拟的硬件采集器
+    """
+
+    def __init__(self, key: str, delay: float = 0, fail: bool = False, interval: float = None):
+        self.key = key
+        self.interval = interval
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+        self.closed = 0
+        self.release = threading.Event()
+
+    def __call__(self):
+        self.calls += 1
+        if self.delay is None:
+            # 模拟卡住的采集器，直到测试结束
+            self.release.wait()
+        else:
+            time.sleep(self.delay)
+        if self.fail:
+            return None
+        return [{"key": self.key, "name": self.key, "value": self.calls, "config": None}]
+
+    def close(self):
+        self.closed += 1
+
+
+class TestMonitorCron:
+    @staticmethod
+    def setup_method():
+        # 自动采集只执行第一次，之后手动调用 tick
+        set_settings(Settings(hardware_interval=3600))
+
+    @staticmethod
+    def teardown_method():
+        reset_settings()
+
+    @staticmethod
+    def start(collectors, timeout=1.0):
+        ticks = []
+        first = threading.Event()
+
+        def handler(infos, timestamp):
+            ticks.append((sorted(info["key"] for info in infos), timestamp))
+            first.set()
+
+        cron = MonitorCron(collectors, handler, timeout=timeout)
+        first.wait(5)
+        return cron, ticks
+
+    def test_concurrent(self):
+        """
+        采集器并发执行，时间戳为开始采集的时间
+        """
+        collectors = [Collector(f"c{i}", delay=0.3) for i in range(4)]
+        cron, ticks = self.start(collectors)
+        before = create_time()
+        start = time.monotonic()
+        cron.tick()
+        assert time.monotonic() - start < 1
+        cron.cancel()
+        assert ticks[-1][0] == ["c0", "c1", "c2", "c3"]
+        # 时间戳在开始采集时生成，早于所有采集器完成的时间
+        assert before <= ticks[-1][1] < create_time()
+
+    def test_timeout(self):
+        """
+        卡住的采集器超时后结果被丢弃，不影响其他采集器，执行完成前不会被再次提交
+        """
+        hung = Collector("hung", delay=None)
+        cron, ticks = self.start([Collector("ok"), hung], timeout=0.2)
+        assert ticks[0][0] == ["ok"]
+        cron.tick()
+        assert ticks[1][0] == ["ok"]
+        assert hung.calls == 1
+        # 卡住的采集器恢复后，迟到的结果被丢弃，下一次采集重新提交
+        hung.release.set()
+        time.sleep(0.1)
+        cron.tick()
+        cron.cancel()
+        assert ticks[2][0] == ["hung", "ok"]
+        assert hung.calls == 2
+        assert len(ticks) == 3
+
+    def test_quarantine(self):
+        """
+        连续失败的采集器被隔离，成功后恢复
+        """
+        bad = Collector("bad", fail=True)
+        cron, ticks = self.start([Collector("ok"), bad])
+        for _ in range(MonitorCron.QUARANTINE_AFTER - 1):
+            cron.tick()
+        assert bad.calls == MonitorCron.QUARANTINE_AFTER
+        entry = cron.entries[1]
+        assert entry.quarantined_until > time.monotonic()
+        cron.tick()
+        assert bad.calls == MonitorCron.QUARANTINE_AFTER
+        # 隔离结束后重新采集，成功后失败次数清零
+        entry.quarantined_until = 0
+        bad.fail = False
+        cron.tick()
+        cron.cancel()
+        assert bad.calls == MonitorCron.QUARANTINE_AFTER + 1
+        assert entry.failures == 0
+        assert ticks[-1][0] == ["bad", "ok"]
+
+    def test_pool(self):
+        """
+        采集器在线程池中执行，线程在采集之间复用，卡住的采集器只占用一个线程
+        """
+        hung = Collector("hung", delay=None)
+        cron, ticks = self.start([Collector("a"), Collector("b"), hung], timeout=0.1)
+        for _ in range(10):
+            cron.tick()
+        pool = getattr(cron, "_MonitorCron__pool")
+        assert pool.threads <= 3
+        cron.cancel()
+        hung.release.set()
+        assert len(ticks) == 11
+
+    def test_entry_name(self):
+        """
+        采集器声明了 name 时使用其名称，否则使用类名
+        """
+        named = Collector("pdu")
+        named.name = "pdu"
+        assert MonitorEntry(named, 1).name == "pdu"
+        assert MonitorEntry(Collector("a"), 1).name == "Collector"
+
+    def test_interval(self):
+        """
+        单独设置了采集间隔的采集器，在最接近到期时间的一次采集中执行
+        """
+        slow = Collector("slow", interval=7200)
+        cron, ticks = self.start([Collector("ok"), slow])
+        assert ticks[0][0] == ["ok", "slow"]
+        cron.tick()
+        assert ticks[1][0] == ["ok"]
+        # 距离到期不到半个采集间隔
+        cron.entries[1].next_run = time.monotonic() + 1000
+        cron.tick()
+        cron.cancel()
+        assert ticks[2][0] == ["ok", "slow"]
+        assert slow.calls == 2
+
+    def test_cancel(self):
+        """
+        停止后不再调用处理函数，不等待卡住的采集器
+        """
+        hung = Collector("hung", delay=None)
+        ok = Collector("ok")
+        cron, ticks = self.start([ok, hung], timeout=0.2)
+        start = time.monotonic()
+        cron.cancel()
+        assert time.monotonic() - start < 1
+        hung.release.set()
+        assert len(ticks) == 1
+        # 停止时关闭已经结束的采集器，仍在执行的采集器不会被关闭
+        assert ok.closed == 1
+        assert hung.closed == 0
+
+
+class TestMonitorAggregator:
+    def test_aggregate(self):
+        aggregator = MonitorAggregator()
+        config = ColumnConfig(chart_name="GPU Utilization (%)", chart_index="abc", metric_name="GPU 0")
+        for value in range(1, 101):
+            aggregator.add(0, [{"key": "util", "name": "GPU 0 Utilization (%)", "value": value, "config": config}])
+        infos = aggregator.flush()
+        assert [(i["key"], i["value"]) for i in infos] == [
+            ("util", 50.5),
+            ("util.min", 1),
+            ("util.max", 100),
+            ("util.p95", 95),
+        ]
+        assert infos[1]["name"] == "GPU 0 Utilization (%) (min)"
+        # 聚合指标与原指标在同一张图表中
+        assert infos[1]["config"].chart_index == "abc"
+        assert infos[1]["config"].metric_name == "GPU 0 (min)"
+        # 新的周期重新开始，聚合指标的配置保持不变
+        assert aggregator.flush() == []
+        aggregator.add(0, [{"key": "util", "name": "GPU 0 Utilization (%)", "value": 1, "config": config}])
+        assert aggregator.flush()[1]["config"] is infos[1]["config"]
+
+    def test_order(self):
+        """
+        按照采集器顺序上报，非数值指标上报最后一次的结果
+        """
+        aggregator = MonitorAggregator(aggregates=("max",))
+        aggregator.add(1, [{"key": "b", "name": "b", "value": 1, "config": None}])
+        aggregator.add(0, [{"key": "a", "name": "a", "value": "x", "config": None}])
+        aggregator.add(0, [{"key": "a", "name": "a", "value": "y", "config": None}])
+        aggregator.add(1, [{"key": "b", "name": "b", "value": 3, "config": None}])
+        infos = aggregator.flush()
+        assert [(i["key"], i["value"]) for i in infos] == [("a", "y"), ("b", 2), ("b.max", 3)]
+        assert infos[2]["config"] is None
+
+
+class TestMonitorSampling:
+    @staticmethod
+    def setup_method():
+        set_settings(Settings(hardware_interval=3600, hardware_sample_interval=0.05))
+
+    @staticmethod
+    def teardown_method():
+        reset_settings()
+
+    def test_sampling(self):
+        """
+        按照采样间隔采样，上报时聚合，较慢的采集器跳过采样而不是超时
+        """
+        reports = []
+        fast, slow = Collector("fast"), Collector("slow", delay=0.3)
+        before = create_time()
+        cron = MonitorCron([fast, slow], lambda infos, timestamp: reports.append((infos, timestamp)), timeout=1)
+        time.sleep(0.5)
+        cron.report()
+        cron.cancel()
+        assert fast.calls >= 5
+        assert 1 <= slow.calls <= 2
+        infos, timestamp = reports[0]
+        assert [i["key"] for i in infos[:4]] == ["fast", "fast.min", "fast.max", "fast.p95"]
+        assert infos[2]["value"] > infos[1]["value"]
+        assert "slow" in [i["key"] for i in infos]
+        assert cron.entries[1].failures == 0
+        # 时间戳为上报周期开始的时间
+        assert before <= timestamp
+        slow.release.set()
+
+    def test_interval(self):
+        """
+        每个采集器按照各自的间隔采样，不受采样间隔限制
+        """
+        set_settings(Settings(hardware_interval=3600, hardware_sample_interval=0.2))
+        reports = []
+        fast, slow = Collector("fast", interval=0.05), Collector("slow", interval=3600)
+        cron = MonitorCron([fast, Collector("default"), slow], lambda infos, timestamp: reports.append(infos))
+        time.sleep(0.5)
+        cron.report()
+        cron.cancel()
+        assert fast.calls >= 6
+        assert 2 <= cron.entries[1].collector.calls <= 4
+        assert slow.calls == 1
+
+    def test_timeout(self):
+        """
+        超时的采样结果被丢弃并记录失败
+        """
+        reports = []
+        hung = Collector("hung", delay=None)
+        cron = MonitorCron([Collector("ok"), hung], lambda infos, timestamp: reports.append(infos), timeout=0.1)
+        time.sleep(0.4)
+        cron.report()
+        cron.cancel()
+        hung.release.set()
+        assert [i["key"] for i in reports[0]] == ["ok", "ok.min", "ok.max", "ok.p95"]
+        assert cron.entries[1].failures > 0
+
+    def test_timeout_once(self):
+        """
+        高频采样时，每次超时的采集只记录一次失败，不会因为采样次数多而很快被隔离
+        """
+        set_settings(Settings(hardware_interval=3600, hardware_sample_interval=0.05))
+        slow = Collector("slow", delay=0.5)
+        cron = MonitorCron([slow], lambda infos, timestamp: None, timeout=0.1)
+        time.sleep(0.7)
+        cron.cancel()
+        entry = cron.entries[0]
+        # 约 14 次采样期间只执行了 2 次采集
+        assert slow.calls == 2
+        assert 1 <= entry.failures <= slow.calls
+        assert entry.quarantined_until == 0
@@ -11,6 +11,7 @@ import io
 import json
 import math
 import os
+import time
 
 import nanoid
 import numpy as np
@@ -20,11 +21,14 @@ from PIL import Image as PILImage
 from nanoid import generate
 
 import swanlab
+import swanlab.toolkit.telemetry as telemetry_module
 import tutils as T
 from swanlab import Image, Audio, Text
 from swanlab.data.modules import Line
 from swanlab.data.run.main import SwanLabRun, get_run, SwanLabRunState, swanlog, get_url, get_project_url
+from swanlab.data.run.profiler import SamplingProfiler
 from swanlab.env import SwanLabEnv
+from swanlab.swanlab_settings import Settings, set_settings
 from tutils import TEMP_PATH
 from tutils.setup import UseMockRunState
 
@@ -72,6 +76,19 @@ class TestSwanLabRunInit:
             _run = run.finish()
             assert swanlog.proxied is False
 
+    def test_profiler(self):
+        """
+        开启采样分析器后，实验结束时火焰图文件保存在 files 文件夹中
+        """
+        os.environ[SwanLabEnv.MODE.value] = "disabled"
+        with UseMockRunState() as state:
+            set_settings(Settings(profiler=True, profiler_rate=200))
+            run = SwanLabRun()
+            time.sleep(0.2)
+            run.finish()
+            assert os.path.exists(os.path.join(state.store.file_dir, SamplingProfiler.FOLDED))
+            assert os.path.exists(os.path.join(state.store.file_dir, SamplingProfiler.SPEEDSCOPE))
+
 
 class TestSwanLabRunState:
     """
@@ -105,6 +122,30 @@ class TestSwanLabRunState:
             assert run.state == SwanLabRunState.SUCCESS
             assert run.success is True
 
+    def test_flush(self):
+        with UseMockRunState():
+            run = SwanLabRun()
+            assert run.flush(timeout=1) is True
+            run.finish()
+            with pytest.raises(RuntimeError):
+                run.flush()
+
+    def test_stats(self, monkeypatch):
+        monkeypatch.setattr(telemetry_module, "calibrate", lambda: 2e-6)
+        with UseMockRunState():
+            run = SwanLabRun()
+            for i in range(200):
+                run.log({f"metric{j}": i * j for j in range(10)})
+            stats = run.stats()
+            assert stats["distributions"]["log.time"]["count"] == 200
+            assert stats["trace_queue"] >= 0
+            # 一次 log 只会产生一次计时，开销按照记录次数与单次开销估算
+            assert stats["overhead"]["records"] == 200
+            assert stats["overhead"]["seconds"] == pytest.approx(200 * 2e-6)
+            log_time = stats["distributions"]["log.time"]["total"]
+            assert stats["overhead"]["ratio"] == pytest.approx(200 * 2e-6 / log_time)
+            run.finish()
+
 
 class TestSwanLabRunLog:
     """
@@ -0,0 +1,104 @@
+"""
+@author: cunyue
+@file: test_profiler.py
+@time: 2025/7/29 15:40
+@description: 测试内置的采样分析器
+"""
+
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from swanlab.data.run.profiler import SamplingProfiler, short_path
+from swanlab.toolkit.telemetry import telemetry
+
+
+def busy_worker(stop: threading.Event):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+@pytest.fixture
+def worker():
+    stop = threading.Event()
+    thread = threading.Thread(target=busy_worker, args=(stop,), name="BusyWorker", daemon=True)
+    thread.start()
+    yield thread
+    stop.set()
+    thread.join()
+
+
+def test_profile(tmp_path, worker):
+    profiler = SamplingProfiler(str(tmp_path), rate=200, interval=0.2)
+    time.sleep(0.5)
+    profiler.stop()
+    # 周期结束与停止时都写入了结果
+    assert len(profiler.windows) >= 2
+    folded = (tmp_path / SamplingProfiler.FOLDED).read_text().splitlines()
+    worker_lines = [line for line in folded if line.startswith("BusyWorker;")]
+    assert worker_lines
+    assert any("busy_worker (" in line for line in worker_lines)
+    # 采样线程本身不会被采样
+    assert not any(line.startswith("SwanLabProfiler;") for line in folded)
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in worker_lines) >= 20
+
+    speedscope = json.loads((tmp_path / SamplingProfiler.SPEEDSCOPE).read_text())
+    frames = speedscope["shared"]["frames"]
+    profiles = speedscope["profiles"]
+    assert profiles[0]["name"] == "All"
+    assert len(profiles) == len(profiler.windows) + 1
+    total = profiles[0]
+    assert len(total["samples"]) == len(total["weights"])
+    assert total["endValue"] == pytest.approx(sum(total["weights"]))
+    # 每个线程的权重之和约等于采样的时长
+    worker_weight = sum(
+        w for s, w in zip(total["samples"], total["weights"]) if frames[s[0]]["name"] == "Thread BusyWorker"
+    )
+    assert 0.3 < worker_weight < 1
+    busy = next(f for f in frames if f["name"] == "busy_worker")
+    assert busy["file"].endswith("test_profiler.py")
+    assert not any(f.endswith(".tmp") for f in os.listdir(tmp_path))
+
+
+def test_overhead_bound(tmp_path, worker):
+    """
+    采样耗时超过上限时降低采样频率
+    """
+    telemetry.reset()
+    profiler = SamplingProfiler(str(tmp_path), rate=1000, interval=60, max_overhead=0.001)
+    time.sleep(0.5)
+    profiler.stop()
+    samples = telemetry.snapshot()["distributions"]["profiler.sample"]
+    # 采样耗时占比不超过上限（加上最后一次采样）
+    assert samples["total"] <= 0.5 * 0.001 + samples["max"]
+    assert samples["count"] < 500
+
+
+def test_max_depth(tmp_path):
+    def recurse(n, done: threading.Event):
+        if n:
+            return recurse(n - 1, done)
+        done.wait()
+
+    done = threading.Event()
+    thread = threading.Thread(target=recurse, args=(100, done), name="Deep")
+    thread.start()
+    profiler = SamplingProfiler(str(tmp_path), rate=100, interval=60, max_depth=10)
+    time.sleep(0.1)
+    profiler.stop()
+    done.set()
+    thread.join()
+    stacks = [codes for (name, codes) in profiler.total_counts if name == "Deep"]
+    assert stacks and all(len(codes) == 10 for codes in stacks)
+    # 保留靠近叶子的部分
+    assert all(codes[0].co_name == "wait" for codes in stacks)
+
+
+def test_short_path():
+    paths = ["/usr/lib/python3/site-packages", "/usr/lib/python3", ""]
+    assert short_path("/usr/lib/python3/site-packages/torch/nn/module.py", paths) == "torch/nn/module.py"
+    assert short_path("/usr/lib/python3/threading.py", paths) == "threading.py"
+    assert short_path("/home/user/train.py", paths) == "/home/user/train.py"
@@ -9,13 +9,14 @@ r"""
 """
 import os
 import sys
+import threading
 import time
 
 import pytest
 from nanoid import generate
 
 from swanlab.log import swanlog
-from swanlab.log.log import clean_control_chars, remove_control_sequences
+from swanlab.log.log import remove_control_sequences, LineAssembler
 from swanlab.log.type import LogData, ProxyType
 from tutils import TEMP_PATH
 
@@ -108,6 +109,8 @@ class TestSwanLogInstall:
         print(a)
         b = generate()
         print(b)
+        # 日志在后台线程中处理
+        assert swanlog.flush(1)
         assert os.path.exists(log_file)
         # 比较最后两行内容
         with open(log_file, "r") as f:
@@ -175,8 +178,8 @@ class TestSwanLogInstall:
         sys.stderr.write(a + "\n")
         b = generate()
         sys.stderr.write(b + "\n")
+        assert swanlog.flush(1)
         assert os.path.exists(log_file)
-        time.sleep(0.1)
         # 比较最后两行内容
         with open(log_file, "r") as f:
             content = f.readlines()
@@ -199,6 +202,49 @@ class TestSwanLogInstall:
             assert content[0] == a + "\n"
             assert content[1] == b + "\n"
 
+    def test_write_from_threads(self):
+        """
+        多个线程同时写入，每一行都被完整上传，编号连续
+        """
+        received = []
+        swanlog.start_proxy("stdout", 1024, lambda data: received.extend(data["contents"]))
+
+        def write(n):
+            for i in range(200):
+                sys.stdout.write(f"thread {n} line {i}\n")
+
+        threads = [threading.Thread(target=write, args=(n,)) for n in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        # 未完成的行在停止代理时上传
+        sys.stdout.write("last")
+        swanlog.stop_proxy()
+        messages = [c["message"] for c in received]
+        assert len(messages) == 801 and messages[-1] == "last"
+        for n in range(4):
+            assert [m for m in messages if m.startswith(f"thread {n} ")] == [f"thread {n} line {i}" for i in range(200)]
+        assert [c["epoch"] for c in received] == list(range(1, 802))
+
+    def test_handler_error(self):
+        """
+        回调出错不影响之后的日志
+        """
+        received = []
+
+        def handler(data):
+            if data["contents"][0]["message"] == "boom":
+                raise RuntimeError("boom")
+            received.extend(data["contents"])
+
+        swanlog.start_proxy("stdout", 1024, handler)
+        sys.stdout.write("boom\n")
+        assert swanlog.flush(1)
+        sys.stdout.write("ok\n")
+        assert swanlog.flush(1)
+        assert [c["message"] for c in received] == ["ok"]
+
     # def test_write_sharding(self, monkeypatch):
     #     """
     #     测试日志文件分片
@@ -215,48 +261,48 @@ class TestSwanLogInstall:
     #         assert os.path.exists(p)
 
 
-class TestCleanControlChars:
+class TestLineAssemblerFeed:
+    """
+    一次性写入整段输出，未完成的行保留在缓冲区中，写入换行符后返回
+    """
+
     @staticmethod
     def test_handles_text_with_no_newline():
-        text = "Hello World"
-        cleaned_lines, buffer = clean_control_chars(text)
-        assert cleaned_lines == []
-        assert buffer == "Hello World"
+        assembler = LineAssembler()
+        assert assembler.feed("Hello World") == []
+        assert assembler.pending
+        assert assembler.feed("\n") == ["Hello World"]
 
     @staticmethod
     def test_removes_control_sequences_and_returns_cleaned_lines():
-        text = "Hello\rWorld\nLine\x1b[AOne\nLine Two"
-        cleaned_lines, buffer = clean_control_chars(text)
-        assert cleaned_lines == ["World", "One"]
-        assert buffer == "Line Two"
+        assembler = LineAssembler()
+        assert assembler.feed("Hello\rWorld\nLine\x1b[AOne\nLine Two") == ["World", "One"]
+        assert assembler.feed("\n") == ["Line Two"]
 
     @staticmethod
     def test_handles_empty_text_and_returns_empty():
-        text = ""
-        cleaned_lines, buffer = clean_control_chars(text)
-        assert cleaned_lines == []
-        assert buffer == ""
+        assembler = LineAssembler()
+        assert assembler.feed("") == []
+        assert not assembler.pending
 
     @staticmethod
     def test_handles_text_with_only_newline():
-        text = "\n"
-        cleaned_lines, buffer = clean_control_chars(text)
-        assert cleaned_lines == []
-        assert buffer == ""
+        assembler = LineAssembler()
+        assert assembler.feed("\n") == []
+        assert not assembler.pending
 
     @staticmethod
     def test_handles_text_with_multiple_newlines():
-        text = "Line One\nLine Two\nLine Three\n"
-        cleaned_lines, buffer = clean_control_chars(text)
-        assert cleaned_lines == ["Line One", "Line Two", "Line Three"]
-        assert buffer == ""
+        assembler = LineAssembler()
+        assert assembler.feed("Line One\nLine Two\nLine Three\n") == ["Line One", "Line Two", "Line Three"]
+        assert not assembler.pending
 
     @staticmethod
     def test_removes_ansi_escape_sequences():
+        assembler = LineAssembler()
         text = "Line\x1b[31mRed\x1b[0mOne\nLine\x1b[32mGreen\x1b[0mTwo\n"
-        cleaned_lines, buffer = clean_control_chars(text)
-        assert cleaned_lines == ["LineRedOne", "LineGreenTwo"]
-        assert buffer == ""
+        assert assembler.feed(text) == ["LineRedOne", "LineGreenTwo"]
+        assert not assembler.pending
 
 
 class TestRemoveControlSequences:
@@ -289,3 +335,46 @@ class TestRemoveControlSequences:
     def handles_only_control_sequence_and_returns_empty():
         line = "\r"
         assert remove_control_sequences(line) == ""
+
+
+class TestLineAssembler:
+    @staticmethod
+    def test_same_as_single_feed():
+        """
+        分多次写入的结果与一次性写入整段输出相同
+        """
+        text = "Hello\rWorld\nLine\x1b[AOne\nLine\x1b[31mRed\x1b[0mTwo\n\n\rLast"
+        assembler = LineAssembler()
+        lines = []
+        for i in range(0, len(text), 3):
+            lines.extend(assembler.feed(text[i : i + 3]))
+        assert lines == LineAssembler().feed(text) == ["World", "One", "LineRedTwo"]
+        assert assembler.pending
+        assert assembler.feed("\n") == ["Last"]
+        assert not assembler.pending
+
+    @staticmethod
+    def test_progress_bar_bounded():
+        """
+        进度条反复刷新同一行时，缓冲区只保存最后一次刷新的内容
+        """
+        assembler = LineAssembler()
+        for i in range(10000):
+            assert assembler.feed(f"\r{i / 100:.2f}%|{'#' * (i // 100)}") == []
+        assert getattr(assembler, "_LineAssembler__chunks") == [f"99.99%|{'#' * 99}"]
+        assert assembler.feed("\n") == [f"99.99%|{'#' * 99}"]
+
+    @staticmethod
+    def test_progress_interval():
+        """
+        被覆盖的进度条状态按照最大频率作为一行返回
+        """
+        now = [0.0]
+        assembler = LineAssembler(progress_interval=1, clock=lambda: now[0])
+        lines = []
+        for i in range(10):
+            now[0] = i * 0.4
+            lines.extend(assembler.feed(f"\r{i}%"))
+        lines.extend(assembler.feed("\n"))
+        # 第一次写入时没有被覆盖的内容
+        assert lines == ["0%", "3%", "6%", "9%"]
@@ -0,0 +1,147 @@
+"""
+@author: cunyue
+@file: test_policy.py
+@time: 2025/7/23 16:10
+@description: 测试终端输出的采集策略：合并重复行、限流与正则过滤
+"""
+
+import sys
+
+from swanlab.log import swanlog
+from swanlab.log.policy import ConsolePolicy
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestConsolePolicy:
+    def test_default(self):
+        """
+        默认策略不改变任何行
+        """
+        policy = ConsolePolicy()
+        lines = ["a", "a", "b", ""]
+        assert policy.filter("stdout", lines) == lines
+        assert policy.flush("stdout") == []
+
+    def test_coalesce(self):
+        policy = ConsolePolicy(coalesce=True)
+        assert policy.filter("stdout", ["a", "a", "a"]) == ["a"]
+        assert policy.filter("stdout", ["a", "b", "b", "c"]) == [
+            "a [repeated 3 more times]",
+            "b",
+            "b [repeated 1 more times]",
+            "c",
+        ]
+        # 重复到停止代理时才结束
+        assert policy.filter("stdout", ["c", "c"]) == []
+        assert policy.flush("stdout") == ["c [repeated 2 more times]"]
+        # flush 之后重新开始
+        assert policy.filter("stdout", ["c"]) == ["c"]
+
+    def test_coalesce_per_stream(self):
+        """
+        不同输出流的重复行分别合并
+        """
+        policy = ConsolePolicy(coalesce=True)
+        assert policy.filter("stdout", ["a"]) == ["a"]
+        assert policy.filter("stderr", ["a"]) == ["a"]
+        assert policy.filter("stdout", ["a"]) == []
+        assert policy.filter("stderr", ["b"]) == ["b"]
+        assert policy.flush("stdout") == ["a [repeated 1 more times]"]
+
+    def test_max_lines(self):
+        clock = FakeClock()
+        policy = ConsolePolicy(max_lines=2, clock=clock)
+        assert policy.filter("stdout", ["1", "2", "3", "4"]) == ["1", "2"]
+        assert policy.filter("stderr", ["5"]) == []
+        clock.now = 1.0
+        assert policy.filter("stdout", ["6", "7", "8"]) == [
+            "swanlab: 3 lines (3 bytes) were not uploaded because of the console rate limit",
+            "6",
+            "7",
+        ]
+        assert policy.flush("stdout") == [
+            "swanlab: 1 lines (1 bytes) were not uploaded because of the console rate limit"
+        ]
+        assert policy.flush("stdout") == []
+
+    def test_max_bytes(self):
+        """
+        按照 UTF-8 编码计算字节数
+        """
+        clock = FakeClock()
+        policy = ConsolePolicy(max_bytes=10, clock=clock)
+        assert policy.filter("stdout", ["你好", "你好", "ab"]) == ["你好", "ab"]
+        assert policy.filter("stdout", ["abc", "a"]) == ["a"]
+        clock.now = 1.5
+        assert policy.filter("stdout", ["a"]) == [
+            "swanlab: 2 lines (9 bytes) were not uploaded because of the console rate limit",
+            "a",
+        ]
+
+    def test_drop_patterns(self):
+        policy = ConsolePolicy(drop_patterns=[r"^Warning: ", r"it/s\]$"])
+        lines = ["Warning: deprecated", "loss 0.1", "100%|####| 10/10 [00:01<00:00, 9.9it/s]", "warning: kept"]
+        assert policy.filter("stdout", lines) == ["loss 0.1", "warning: kept"]
+
+    def test_dropped_lines_not_coalesced(self):
+        """
+        被正则过滤的行不会打断重复
+        """
+        policy = ConsolePolicy(coalesce=True, drop_patterns=["^noise"])
+        assert policy.filter("stdout", ["a", "noise", "a", "b"]) == ["a", "a [repeated 1 more times]", "b"]
+
+    def test_chatty_job(self):
+        """
+        模拟大量重复输出的任务，上传的行数被限制在预算内
+        """
+        clock = FakeClock()
+        policy = ConsolePolicy(coalesce=True, max_lines=100, clock=clock)
+        uploaded = []
+        for second in range(10):
+            clock.now = second
+            for i in range(1000):
+                uploaded += policy.filter("stdout", ["same line", f"step {second}-{i}"])
+        uploaded += policy.flush("stdout")
+        # 每秒最多 100 行，加上每秒一条摘要
+        assert len(uploaded) <= 10 * 101
+        assert uploaded[-1].startswith("swanlab: ")
+
+
+class TestProxyPolicy:
+    @staticmethod
+    def setup_method():
+        try:
+            swanlog.reset()
+        except RuntimeError:
+            pass
+
+    @staticmethod
+    def teardown_method():
+        try:
+            swanlog.reset()
+        except RuntimeError:
+            pass
+
+    def test_proxy(self):
+        """
+        终端输出不受影响，上传的日志经过策略处理，停止代理时上传剩余的重复记录
+        """
+        received = []
+        policy = ConsolePolicy(coalesce=True, drop_patterns=["^secret"])
+        swanlog.start_proxy("stdout", 1024, lambda data: received.extend(data["contents"]), policy=policy)
+        for _ in range(5):
+            sys.stdout.write("epoch done\n")
+        sys.stdout.write("secret token\n")
+        sys.stdout.write("last")
+        swanlog.stop_proxy()
+        messages = [c["message"] for c in received]
+        assert messages == ["epoch done", "epoch done [repeated 4 more times]", "last"]
+        # 编号连续
+        assert [c["epoch"] for c in received] == [1, 2, 3]
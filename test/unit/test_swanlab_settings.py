@@ -173,6 +173,19 @@ class TestSwanlabSettings:
             swanlab.Settings(hardware_interval=5.5)
 
 
+def test_log_drop_patterns():
+    """
+    不合法的正则表达式在创建设置时报错，并指出具体是哪一个
+    """
+    assert swanlab.Settings(log_drop_patterns=(r"^Warning: ", r"it/s\]$")).log_drop_patterns == (
+        r"^Warning: ",
+        r"it/s\]$",
+    )
+    with pytest.raises(ValidationError) as e:
+        swanlab.Settings(log_drop_patterns=("^ok$", "(["))
+    assert "'(['" in str(e.value)
+
+
 def test_filter_changed_fields():
     # 默认
     settings = swanlab.Settings()
@@ -0,0 +1,102 @@
+"""
+@author: cunyue
+@file: test_telemetry.py
+@time: 2025/7/20 14:10
+@description: 测试 SDK 自身运行状态统计
+"""
+
+import threading
+import time
+
+import pytest
+
+import swanlab.toolkit.telemetry as telemetry_module
+from swanlab.toolkit.telemetry import Telemetry, calibrate
+
+
+def test_counter():
+    t = Telemetry()
+    assert t.counter("http.requests") == 0
+    t.incr("http.requests")
+    t.incr("http.bytes_sent", 100)
+    t.incr("http.bytes_sent", 50)
+    assert t.counter("http.requests") == 1
+    assert t.snapshot()["counters"] == {"http.requests": 1, "http.bytes_sent": 150}
+
+
+def test_distribution():
+    t = Telemetry()
+    assert t.distribution("upload.batch.log") is None
+    for value in [1, 2, 6]:
+        t.observe("upload.batch.log", value)
+    assert t.distribution("upload.batch.log") == {"count": 3, "total": 9, "mean": 3, "max": 6}
+
+
+def test_timer():
+    t = Telemetry()
+    with t.timer("media.encode.time"):
+        time.sleep(0.01)
+
+    @t.timed("log.time")
+    def log(x):
+        return x + 1
+
+    assert log(1) == 2
+    assert t.distribution("media.encode.time")["total"] >= 0.01
+    assert t.distribution("log.time")["count"] == 1
+    assert log.__name__ == "log"
+
+
+def test_snapshot_and_reset():
+    t = Telemetry()
+    assert t.snapshot()["overhead"]["ratio"] is None
+    with t.timer("log.time"):
+        t.incr("log.metrics", 2)
+    snapshot = t.snapshot()
+    assert snapshot["overhead"]["seconds"] > 0
+    assert snapshot["overhead"]["ratio"] is not None
+    t.reset()
+    snapshot = t.snapshot()
+    assert snapshot["counters"] == {}
+    assert snapshot["distributions"] == {}
+    assert snapshot["overhead"]["seconds"] == 0
+
+
+def test_thread_safe():
+    t = Telemetry()
+
+    def work():
+        for _ in range(1000):
+            t.incr("n")
+            t.observe("v", 1)
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    [th.start() for th in threads]
+    [th.join() for th in threads]
+    assert t.counter("n") == 4000
+    assert t.distribution("v")["count"] == 4000
+
+
+def test_overhead_measured(monkeypatch):
+    """
+    自身统计的开销等于记录次数乘以校准得到的单次开销，比例相对于 log 的总耗时
+    """
+    monkeypatch.setattr(telemetry_module, "calibrate", lambda: 2e-6)
+    t = Telemetry()
+    n = 1000
+    for _ in range(n):
+        t.observe("log.time", 0.001)
+    t.incr("log.metrics")
+    overhead = t.snapshot()["overhead"]
+    assert overhead["records"] == n + 1
+    assert overhead["seconds"] == pytest.approx((n + 1) * 2e-6)
+    assert overhead["ratio"] == pytest.approx((n + 1) * 2e-6 / (n * 0.001))
+
+
+def test_calibrate():
+    """
+    校准结果为正数并且会被缓存
+    """
+    cost = calibrate()
+    assert cost > 0
+    assert calibrate() == cost
@@ -0,0 +1,440 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+r"""
+@DATE: 2025/7/21 10:20
+@File: server.py
+@IDE: pycharm
+@Description:
+    本地模拟的 SwanLab 服务端，运行在本机的一个线程中，不需要网络
+    实现了登录、项目与实验挂载、列创建、指标（标量、媒体、日志）上传以及一个兼容 S3 的对象存储
+    支持模拟请求延迟、带宽限制、按比例注入错误、挂起请求（半开的连接）以及返回 202 使客户端进入挂起状态，
+    用于端到端测试与上传性能基准测试
+"""
+import gzip
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qs, unquote
+from xml.sax.saxutils import escape
+
+import nanoid
+
+from swanlab.core_python import auth
+
+__all__ = ["FakeServer"]
+
+BUCKET = "swanlab-fake"
+"""
+对象存储的桶名称，路径以此开头的请求由对象存储处理
+"""
+
+
+class Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # 客户端关闭长连接时不打印错误
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+class Upload:
+    """
+    对象存储中未完成的分片上传
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.id = nanoid.generate("0123456789abcdef", 32)
+        self.initiated = datetime.utcnow()
+        self.parts: Dict[int, bytes] = {}
+
+
+class FakeServer:
+    """
+    本地模拟的 SwanLab 服务端，用法：
+
+    >>> with FakeServer(latency=0.01) as server:
+    ...     client = create_client(server.login())
+    ...     client.mount_project("test")
+    ...     ...
+    ...     server.points("scalar")
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.0,
+        bandwidth: Optional[float] = None,
+        error_rate: float = 0.0,
+        error_status: int = 500,
+        pending_after: Optional[int] = None,
+        seed: Optional[int] = None,
+        username: str = "swanlab",
+        stall: int = 0,
+        stall_time: float = 5.0,
+        session_ttl: float = 30 * 24 * 60 * 60,
+    ):
+        """
+        :param latency: 每个请求的处理延迟，单位秒
+        :param bandwidth: 每个请求接收请求体的速度，单位字节每秒，为 None 时不限制
+        :param error_rate: 上传请求（指标、列、文件、对象存储）返回错误的概率，登录与挂载请求不会出错
+        :param error_status: 注入错误时返回的状态码
+        :param pending_after: 成功处理多少个指标上传请求后返回 202，为 None 时不返回
+        :param seed: 错误注入使用的随机数种子
+        :param username: 登录后的用户名
+        :param stall: 接下来多少个上传请求被挂起，模拟半开的连接：服务端在 stall_time 秒内不响应，之后直接断开连接
+        :param stall_time: 挂起请求的时间，单位秒
+        :param session_ttl: 登录后 sid 的有效期，单位秒
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.pending_after = pending_after
+        self.username = username
+        self.stall = stall
+        self.stall_time = stall_time
+        self.session_ttl = session_ttl
+        self.__random = random.Random(seed)
+        self.__lock = threading.Lock()
+        # 按类型保存收到的指标，每一项为 (到达时间, 指标)
+        self.metrics: Dict[str, List[Tuple[float, dict]]] = {}
+        self.columns: List[dict] = []
+        self.profile: dict = {}
+        self.state: Optional[str] = None
+        # 对象存储中的文件与未完成的分片上传
+        self.objects: Dict[str, bytes] = {}
+        self.uploads: Dict[str, Upload] = {}
+        # 请求统计
+        self.requests = 0
+        self.errors = 0
+        # 收到的请求体字节数，按照传输时（压缩后）的大小计算
+        self.bytes_received = 0
+        self.house_requests = 0
+        self.logins = 0
+        self.stalled = 0
+        self.__server: Optional[Server] = None
+        self.__thread: Optional[threading.Thread] = None
+
+    # ---------------------------------- 生命周期 ----------------------------------
+
+    def start(self) -> "FakeServer":
+        self.__server = Server(("127.0.0.1", 0), self.__handler())
+        self.__thread = threading.Thread(target=self.__server.serve_forever, name="FakeSwanLabServer", daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        if self.__server is None:
+            return
+        self.__server.shutdown()
+        self.__server.server_close()
+        self.__thread.join()
+        self.__server = None
+
+    def __enter__(self) -> "FakeServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    @property
+    def url(self) -> str:
+        host, port = self.__server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_host(self) -> str:
+        return self.url + "/api"
+
+    def login(self, api_key: str = "0" * 21) -> auth.LoginInfo:
+        """
+        向本服务登录，返回登录信息，可以直接用于创建客户端，任意 api key 都可以登录
+        """
+        resp = auth.login_request(api_key, self.api_host)
+        return auth.LoginInfo(resp, api_key, self.api_host, self.url)
+
+    # ---------------------------------- 统计 ----------------------------------
+
+    def points(self, metric_type: str) -> int:
+        """
+        收到的某一类型的指标数量
+        """
+        with self.__lock:
+            return len(self.metrics.get(metric_type, []))
+
+    def lags(self, metric_type: str) -> List[float]:
+        """
+        某一类型每个指标从创建到被服务端收到的时间，单位秒
+        """
+        with self.__lock:
+            received = list(self.metrics.get(metric_type, []))
+        lags = []
+        for arrived, metric in received:
+            create_time = metric.get("create_time")
+            if create_time is None:
+                continue
+            lags.append(arrived - datetime.fromisoformat(create_time).timestamp())
+        return lags
+
+    # ---------------------------------- 请求处理 ----------------------------------
+
+    def __inject(self) -> bool:
+        """
+        是否为本次请求注入错误
+        """
+        if self.error_rate <= 0:
+            return False
+        with self.__lock:
+            failed = self.__random.random() < self.error_rate
+            self.errors += failed
+        return failed
+
+    def __stall(self) -> bool:
+        """
+        是否挂起本次请求
+        """
+        with self.__lock:
+            if self.stall <= 0:
+                return False
+            self.stall -= 1
+            self.stalled += 1
+        return True
+
+    def __handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self.dispatch("GET")
+
+            def do_POST(self):
+                self.dispatch("POST")
+
+            def do_PUT(self):
+                self.dispatch("PUT")
+
+            def do_PATCH(self):
+                self.dispatch("PATCH")
+
+            def dispatch(self, method: str):
+                if self.headers.get("Transfer-Encoding") == "chunked":
+                    raw = decode_chunked(self.rfile)
+                else:
+                    raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                server.handle(self, method, self.decode(raw), len(raw))
+
+            def decode(self, body: bytes) -> bytes:
+                encoding = self.headers.get("Content-Encoding")
+                if encoding == "gzip":
+                    return gzip.decompress(body)
+                if encoding == "deflate":
+                    return zlib.decompress(body)
+                if encoding == "aws-chunked":
+                    return decode_aws_chunked(body)
+                return body
+
+            def reply(self, status: int, data=None, headers: Optional[Dict[str, str]] = None, xml: str = None):
+                if xml is not None:
+                    content, content_type = xml.encode(), "application/xml"
+                else:
+                    content, content_type = (b"" if data is None else json.dumps(data).encode()), "application/json"
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(content)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(content)
+
+        return Handler
+
+    def handle(self, handler, method: str, body: bytes, size: int):
+        """
+        :param size: 请求体在传输时（压缩后）的字节数
+        """
+        with self.__lock:
+            self.requests += 1
+            self.bytes_received += size
+        delay = self.latency + (size / self.bandwidth if self.bandwidth else 0)
+        delay > 0 and time.sleep(delay)
+        url = urlparse(handler.path)
+        path, query = unquote(url.path), parse_qs(url.query, keep_blank_values=True)
+        if path.startswith(f"/{BUCKET}"):
+            return self.handle_cos(handler, method, path[len(BUCKET) + 2 :], query, body)
+        if path.startswith("/api/"):
+            return self.handle_api(handler, method, path[4:], body)
+        handler.reply(404, {"message": "Not Found"})
+
+    def handle_api(self, handler, method: str, path: str, body: bytes):
+        data = json.loads(body) if body else None
+        parts = path.strip("/").split("/")
+        # 登录，任意 api key 都可以登录
+        if method == "POST" and path == "/login/api_key":
+            with self.__lock:
+                self.logins += 1
+            expired_at = (datetime.utcnow() + timedelta(seconds=self.session_ttl)).strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+            user = {"username": self.username}
+            return handler.reply(200, {"sid": nanoid.generate(), "expiredAt": expired_at, "userInfo": user})
+        # 创建项目
+        if method == "POST" and path == "/project":
+            return handler.reply(201, {"username": data.get("username") or self.username, "name": data["name"]})
+        if parts[0] == "project" and len(parts) == 3 and method == "GET":
+            return handler.reply(200, {"cuid": "proj-" + parts[2], "name": parts[2], "_count": {"experiments": 0}})
+        # 创建实验
+        if parts[0] == "project" and len(parts) == 4 and parts[3] == "experiment" and method == "POST":
+            cuid = data.get("cuid") or nanoid.generate("0123456789abcdefghijklmnopqrstuvwxyz", 21)
+            return handler.reply(201, {"cuid": cuid, "name": data["name"], "flagId": nanoid.generate()})
+        if parts[0] == "project" and len(parts) == 5 and parts[3] == "runs" and method == "GET":
+            return handler.reply(200, {"cuid": parts[4]})
+        if parts[0] == "project" and len(parts) == 6 and parts[5] == "sts":
+            return handler.reply(200, self.sts(parts[4]))
+        if parts[0] == "project" and len(parts) == 6 and parts[5] == "state":
+            self.state = data["state"]
+            return handler.reply(200, {})
+        # 以下为上传请求，可以注入错误或者挂起
+        if self.__stall():
+            time.sleep(self.stall_time)
+            handler.close_connection = True
+            return
+        if self.__inject():
+            return handler.reply(self.error_status, {"message": "Injected error"})
+        if parts[0] == "project" and len(parts) == 6 and parts[5] == "profile":
+            with self.__lock:
+                self.profile.update(data)
+            return handler.reply(200, {})
+        if parts[0] == "experiment" and len(parts) == 3 and parts[2] == "columns":
+            with self.__lock:
+                self.columns.extend(data)
+            return handler.reply(201, {})
+        if method == "POST" and path == "/house/metrics":
+            now = time.time()
+            with self.__lock:
+                self.house_requests += 1
+                pending = self.pending_after is not None and self.house_requests > self.pending_after
+                if not pending:
+                    self.metrics.setdefault(data["type"], []).extend((now, m) for m in data["metrics"])
+            return handler.reply(202 if pending else 201, {})
+        handler.reply(404, {"message": "Not Found"})
+
+    def sts(self, exp_id: str) -> dict:
+        """
+        对象存储的临时凭证，指向本服务
+        """
+        # 客户端按照北京时间判断凭证是否过期，这里给出 12 小时后过期
+        expired = datetime.utcnow() + timedelta(hours=8 + 12)
+        return {
+            "expiredTime": expired.timestamp(),
+            "prefix": f"media/{exp_id}",
+            "bucket": BUCKET,
+            "region": "fake",
+            "endPoint": self.url,
+            "pathStyle": True,
+            "credentials": {"tmpSecretId": "id", "tmpSecretKey": "key", "sessionToken": "token"},
+        }
+
+    def handle_cos(self, handler, method: str, key: str, query: Dict[str, List[str]], body: bytes):
+        """
+        兼容 S3 的对象存储，实现了普通上传、分片上传以及分片上传的查询
+        """
+        if method == "GET" and key == "" and "uploads" in query:
+            prefix = query.get("prefix", [""])[0]
+            with self.__lock:
+                uploads = [u for u in self.uploads.values() if u.key.startswith(prefix)]
+            items = "".join(
+                f"<Upload><Key>{escape(u.key)}</Key><UploadId>{u.id}</UploadId>"
+                f"<Initiated>{u.initiated.isoformat()}Z</Initiated></Upload>"
+                for u in uploads
+            )
+            return handler.reply(200, xml=s3_xml("ListMultipartUploadsResult", f"<Bucket>{BUCKET}</Bucket>{items}"))
+        if method == "GET" and "uploadId" in query:
+            upload = self.uploads.get(query["uploadId"][0])
+            if upload is None:
+                return handler.reply(404, xml=s3_error("NoSuchUpload"))
+            items = "".join(
+                f"<Part><PartNumber>{n}</PartNumber><ETag>\"{etag(p)}\"</ETag><Size>{len(p)}</Size></Part>"
+                for n, p in sorted(upload.parts.items())
+            )
+            return handler.reply(200, xml=s3_xml("ListPartsResult", f"<IsTruncated>false</IsTruncated>{items}"))
+        if method == "POST" and "uploads" in query:
+            upload = Upload(key)
+            with self.__lock:
+                self.uploads[upload.id] = upload
+            inner = f"<Bucket>{BUCKET}</Bucket><Key>{escape(key)}</Key><UploadId>{upload.id}</UploadId>"
+            return handler.reply(200, xml=s3_xml("InitiateMultipartUploadResult", inner))
+        if method == "POST" and "uploadId" in query:
+            with self.__lock:
+                upload = self.uploads.pop(query["uploadId"][0], None)
+            if upload is None:
+                return handler.reply(404, xml=s3_error("NoSuchUpload"))
+            with self.__lock:
+                self.objects[key] = b"".join(p for _, p in sorted(upload.parts.items()))
+            inner = f"<Bucket>{BUCKET}</Bucket><Key>{escape(key)}</Key><ETag>\"{etag(self.objects[key])}\"</ETag>"
+            return handler.reply(200, xml=s3_xml("CompleteMultipartUploadResult", inner))
+        if method == "PUT":
+            if self.__inject():
+                return handler.reply(self.error_status, xml=s3_error("InternalError"))
+            with self.__lock:
+                if "uploadId" in query:
+                    upload = self.uploads.get(query["uploadId"][0])
+                    if upload is None:
+                        return handler.reply(404, xml=s3_error("NoSuchUpload"))
+                    upload.parts[int(query["partNumber"][0])] = body
+                else:
+                    self.objects[key] = body
+            return handler.reply(200, headers={"ETag": f"\"{etag(body)}\""})
+        handler.reply(404, xml=s3_error("NoSuchKey"))
+
+
+def etag(data: bytes) -> str:
+    return hashlib.md5(data).hexdigest()
+
+
+def s3_xml(tag: str, inner: str) -> str:
+    return f'<?xml version="1.0" encoding="UTF-8"?><{tag} xmlns="http://s3.amazonaws.com/doc/2006-03-01/">{inner}</{tag}>'
+
+
+def s3_error(code: str) -> str:
+    return f'<?xml version="1.0" encoding="UTF-8"?><Error><Code>{code}</Code><Message>{code}</Message></Error>'
+
+
+def decode_chunked(stream) -> bytes:
+    """
+    读取 Transfer-Encoding: chunked 的请求体
+    """
+    body = b""
+    while True:
+        size = int(stream.readline().split(b";")[0], 16)
+        if size == 0:
+            # 跳过 trailer 直到空行
+            while stream.readline() not in (b"\r\n", b"\n", b""):
+                pass
+            return body
+        body += stream.read(size)
+        stream.readline()
+
+
+def decode_aws_chunked(body: bytes) -> bytes:
+    """
+    解码 S3 的 aws-chunked 请求体，格式与 chunked 相同，但末尾可能带有校验和 trailer
+    """
+    data, offset = b"", 0
+    while True:
+        end = body.index(b"\r\n", offset)
+        size = int(body[offset:end].split(b";")[0], 16)
+        if size == 0:
+            return data
+        data += body[end + 2 : end + 2 + size]
+        offset = end + 2 + size + 2
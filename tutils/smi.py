@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+r"""
+@DATE: 2025/7/24 10:30
+@File: smi.py
+@IDE: pycharm
+@Description:
+    模拟硬件厂商的命令行工具（npu-smi、xpu-smi、hy-smi 等），使用录制的输出代替 subprocess.run，
+    并记录调用次数，用于在没有对应硬件的机器上测试硬件信息采集
+"""
+import subprocess
+from typing import Dict, List
+
+
+class FakeRun:
+    """
+    替换 subprocess.run，按照命令返回录制的输出
+    """
+
+    def __init__(self, outputs: Dict[str, str]):
+        """
+        :param outputs: 以空格连接的命令 -> 标准输出
+        """
+        self.outputs = outputs
+        self.calls: List[List[str]] = []
+
+    def __call__(self, args, **kwargs):
+        self.calls.append(args)
+        command = " ".join(args)
+        if command not in self.outputs:
+            raise FileNotFoundError(command)
+        return subprocess.CompletedProcess(args, 0, stdout=self.outputs[command], stderr="")